@@ -0,0 +1,54 @@
+"""kernel_blob_store
+
+Revision ID: a7c1e52d9b34
+Revises: 4ce656722c5d
+Create Date: 2024-06-12 10:21:43.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import Column, Integer, String, DateTime, text
+from sqlalchemy.sql import func as sqla_func
+from sqlalchemy.dialects.mysql import TINYINT
+
+# revision identifiers, used by Alembic.
+revision = 'a7c1e52d9b34'
+down_revision = '4ce656722c5d'
+branch_labels = None
+depends_on = None
+
+KERNEL_TABLES = [
+    'conv_kernel_cache', 'conv_job_cache_fin', 'bn_kernel_cache',
+    'bn_job_cache_fin'
+]
+
+
+def upgrade() -> None:
+  op.create_table(
+      'kernel_blob',
+      sa.Column('id', sa.Integer, primary_key=True),
+      sa.Column('insert_ts',
+                DateTime,
+                nullable=False,
+                server_default=sqla_func.now()),
+      sa.Column(
+          'update_ts',
+          DateTime,
+          nullable=False,
+          server_default=text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')),
+      sa.Column('valid', TINYINT(1), nullable=False, server_default="1"),
+      sa.Column('blob_hash', String(length=64), nullable=False),
+      sa.Column('size', Integer, nullable=False, server_default="0"),
+      sa.Column('ref_count', Integer, nullable=False, server_default="0"),
+  )
+  op.create_unique_constraint("uq_idx", "kernel_blob", ["blob_hash"])
+  for table in KERNEL_TABLES:
+    op.add_column(table, Column('blob_hash', String(length=64), nullable=True))
+    op.create_index(f'ix_{table}_blob_hash', table, ['blob_hash'])
+
+
+def downgrade() -> None:
+  for table in KERNEL_TABLES:
+    op.drop_index(f'ix_{table}_blob_hash', table)
+    op.drop_column(table, 'blob_hash')
+  op.drop_table('kernel_blob')
@@ -0,0 +1,31 @@
+"""job_lease
+
+Revision ID: c5e2f1a8d4b7
+Revises: a7c1e52d9b34
+Create Date: 2024-07-02 14:08:11.402913
+
+"""
+from alembic import op
+from sqlalchemy import BigInteger, Column, String
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2f1a8d4b7'
+down_revision = 'a7c1e52d9b34'
+branch_labels = None
+depends_on = None
+
+JOB_TABLES = ['conv_job', 'bn_job', 'fusion_job']
+
+
+def upgrade() -> None:
+  for table in JOB_TABLES:
+    op.add_column(table, Column('lease_owner',
+                                String(length=128),
+                                nullable=True))
+    op.add_column(table, Column('lease_expiry', BigInteger, nullable=True))
+
+
+def downgrade() -> None:
+  for table in JOB_TABLES:
+    op.drop_column(table, 'lease_expiry')
+    op.drop_column(table, 'lease_owner')
@@ -0,0 +1,42 @@
+"""ref_version
+
+Revision ID: d3b8f0c2e6a1
+Revises: c5e2f1a8d4b7
+Create Date: 2024-07-09 11:42:27.615038
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import Integer, String, DateTime, text
+from sqlalchemy.sql import func as sqla_func
+from sqlalchemy.dialects.mysql import TINYINT
+
+# revision identifiers, used by Alembic.
+revision = 'd3b8f0c2e6a1'
+down_revision = 'c5e2f1a8d4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_table(
+      'ref_version',
+      sa.Column('id', sa.Integer, primary_key=True),
+      sa.Column('insert_ts',
+                DateTime,
+                nullable=False,
+                server_default=sqla_func.now()),
+      sa.Column(
+          'update_ts',
+          DateTime,
+          nullable=False,
+          server_default=text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')),
+      sa.Column('valid', TINYINT(1), nullable=False, server_default="1"),
+      sa.Column('name', String(length=64), nullable=False),
+      sa.Column('version', Integer, nullable=False, server_default="0"),
+  )
+  op.create_unique_constraint("uq_idx", "ref_version", ["name"])
+
+
+def downgrade() -> None:
+  op.drop_table('ref_version')
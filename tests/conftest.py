@@ -0,0 +1,82 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Shared pytest fixtures"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.db_engine import get_db_pool
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.utils.sql_profiler import SqlProfiler
+
+
+@pytest.fixture
+def sql_budget():
+  """with sql_budget(limit[, engine]): fail the test when the block sends more
+  than limit statements to engine (default: the process wide pool)"""
+
+  @contextmanager
+  def budget(limit, engine=None):
+    profiler = SqlProfiler()
+    profiler.attach(engine if engine is not None else get_db_pool().engine)
+    try:
+      yield profiler
+    finally:
+      profiler.detach()
+    msg = profiler.check_budget(limit)
+    if msg:
+      pytest.fail(msg)
+
+  return budget
+
+
+@pytest.fixture
+def sqlite_session():
+  """sqlite_session(tables[, rows]): session on a new in-memory SQLite db
+  holding tables (default: all tables), rows maps a table to the rows it is
+  seeded with, the engine is session.bind"""
+  sessions = []
+
+  def make(tables=None, rows=None):
+    engine = create_engine('sqlite://')
+    create_sqlite_tables(engine,
+                         [getattr(tab, '__table__', tab) for tab in tables]
+                         if tables is not None else None)
+    if rows:
+      with engine.begin() as conn:
+        for tab, vals in rows.items():
+          conn.execute(getattr(tab, '__table__', tab).insert(), vals)
+    session = sessionmaker(bind=engine)()
+    sessions.append(session)
+    return session
+
+  yield make
+  for session in sessions:
+    session.close()
+    session.bind.dispose()
@@ -0,0 +1,188 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import random
+
+import pytest
+
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.kernel_blob import KernelBlob
+from tuna.miopen.db.tables import ConvolutionFindDB, ConvolutionKernelCache
+from tuna.miopen.scripts import blob_gc
+from tuna.miopen.utils.blob_store import BlobStore, LocalBlobBackend
+from tuna.miopen.utils.blob_store import get_blob_hash, get_kernel_blob
+from tuna.miopen.utils.fdb_writer import FdbWriter
+from tuna.benchmarks import blob_bench
+
+TABLES = [ConvolutionFindDB, ConvolutionKernelCache, KernelBlob]
+
+
+def get_refs(session):
+  return {row.blob_hash: row.ref_count for row in session.query(KernelBlob)}
+
+
+def test_blob_store(tmp_path, sqlite_session):
+  session = sqlite_session(TABLES)
+  store = BlobStore(LocalBlobBackend(str(tmp_path)))
+  blobs = [b'kernel_a', b'kernel_b', b'kernel_a', b'kernel_a']
+  hashes = store.put_many(session, blobs)
+  session.commit()
+  assert hashes == [get_blob_hash(blob) for blob in blobs]
+  assert get_refs(session) == {hashes[0]: 3, hashes[1]: 1}
+  assert sorted(store.backend.list_hashes()) == sorted(set(hashes))
+  assert store.stats['bytes_written'] == len(b'kernel_a') + len(b'kernel_b')
+
+  #known hashes are not written again
+  mtime = os.path.getmtime(store.backend.get_path(hashes[0]))
+  store.put_many(session, [b'kernel_a'])
+  session.commit()
+  assert get_refs(session)[hashes[0]] == 4
+  assert os.path.getmtime(store.backend.get_path(hashes[0])) == mtime
+  assert store.stats['unique_blobs'] == 2
+  assert store.get(hashes[1]) == b'kernel_b'
+
+  #unreferenced blobs are collected, referenced ones survive
+  store.release(session, [hashes[1], None])
+  session.commit()
+  assert store.collect_garbage(session) == 1
+  assert get_refs(session) == {hashes[0]: 4}
+  assert not store.backend.exists(hashes[1])
+  assert store.backend.exists(hashes[0])
+
+
+def test_fdb_writer_blob_store(tmp_path, sqlite_session):
+  session = sqlite_session(TABLES)
+  store = BlobStore(LocalBlobBackend(str(tmp_path)))
+  writer = FdbWriter(ConvolutionFindDB, ConvolutionKernelCache, None, store)
+  kernel_a, kernel_b = blob_bench.make_kernels(random.Random(1), 2, 4)
+  for config in range(1, 4):
+    writer.add(blob_bench.fdb_row(config, 1), [kernel_a, kernel_b])
+  writer.flush(session)
+  session.commit()
+
+  rows = session.query(ConvolutionKernelCache).all()
+  assert len(rows) == 6
+  assert all(row.kernel_blob == b'' for row in rows)
+  assert {get_kernel_blob(row, store) for row in rows
+         } == {kernel_a['kernel_blob'], kernel_b['kernel_blob']}
+  assert set(get_refs(session).values()) == {3}
+
+  #replacing the kernels of config 1 invalidates its rows, deleting them
+  #releases their references
+  writer.add(blob_bench.fdb_row(1, 1), [kernel_a])
+  writer.flush(session)
+  session.commit()
+  invalid = session.query(ConvolutionKernelCache).filter(
+      ConvolutionKernelCache.valid == 0)
+  assert store.release_rows(session, invalid, ConvolutionKernelCache) == 2
+  invalid.delete()
+  session.commit()
+  assert sorted(get_refs(session).values()) == [2, 3]
+
+  #recount agrees with the incremental counts
+  refs = get_refs(session)
+  store.recount(session, [ConvolutionKernelCache])
+  session.commit()
+  assert get_refs(session) == refs
+
+  #inline rows need no store, stored rows do
+  row = rows[0]
+  row.blob_hash = None
+  row.kernel_blob = b'inline'
+  assert get_kernel_blob(row) == b'inline'
+  row.blob_hash = 'abc'
+  with pytest.raises(ValueError):
+    get_kernel_blob(row, None)
+
+
+def test_blob_bench():
+  res = blob_bench.run(jobs=50, per_job=4, distinct=10, blob_kb=2)
+  assert res['kernels'] == 200
+  assert res['unique_kernels'] <= 10
+  assert res['dedup_ratio'] >= 20
+  assert res['io_savings'] > 0.5
+
+
+def test_orphan_blobs(tmp_path, sqlite_session):
+  session = sqlite_session(TABLES)
+  store = BlobStore(LocalBlobBackend(str(tmp_path)))
+  kept = store.put_many(session, [b'kernel_a'])[0]
+  session.commit()
+  #the file is written, the batch holding its row is rolled back
+  orphan = store.put_many(session, [b'kernel_b'])[0]
+  session.rollback()
+  assert store.backend.exists(orphan)
+
+  #too recent, its writer may still commit
+  assert store.collect_garbage(session) == 0
+  old = os.path.getmtime(store.backend.get_path(orphan)) - 7200
+  os.utime(store.backend.get_path(orphan), (old, old))
+  assert store.collect_garbage(session) == 1
+  assert not store.backend.exists(orphan)
+  assert store.backend.exists(kept)
+
+
+def test_blob_gc(tmp_path, capsys, monkeypatch):
+  monkeypatch.delenv('TUNA_BLOB_STORE', raising=False)
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 2,
+      'max_overflow': 2
+  })
+  create_sqlite_tables(pool.engine, [KernelBlob.__table__] +
+                       [table.__table__ for table in blob_gc.KERNEL_TABLES])
+  prev_pool = set_db_pool(pool)
+  root = str(tmp_path / 'blobs')
+  store = BlobStore(LocalBlobBackend(root))
+  session = pool.session()
+  used, dropped = store.put_many(session, [b'kernel_a', b'kernel_b'])
+  session.add(
+      ConvolutionKernelCache(kernel_name='k',
+                             kernel_args='',
+                             kernel_hash='h',
+                             kernel_blob=b'',
+                             uncompressed_size=8,
+                             blob_hash=used))
+  session.commit()
+  session.close()
+
+  try:
+    assert blob_gc.main([]) == 1
+    #counts still say dropped is referenced
+    assert blob_gc.main(['--blob_store', root]) == 0
+    assert store.backend.exists(dropped)
+    capsys.readouterr()
+    assert blob_gc.main(['--blob_store', root, '--recount']) == 0
+    assert '"collected": 1' in capsys.readouterr().out
+    assert not store.backend.exists(dropped)
+    assert store.backend.exists(used)
+    session = pool.session()
+    assert get_refs(session) == {used: 1}
+    session.close()
+  finally:
+    set_db_pool(prev_pool)
+    pool.dispose()
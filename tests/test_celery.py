@@ -31,7 +31,6 @@ from time import sleep
 from multiprocessing import Value
 import aioredis
 import pytest_asyncio
-from sqlalchemy.inspection import inspect
 
 from utils import GoFishArgs, add_test_jobs, add_test_session
 from tuna.dbBase.sql_alchemy import DbSession
@@ -51,6 +50,7 @@ from tuna.miopen.celery_tuning.celery_tasks import prep_worker
 from tuna.miopen.worker.fin_utils import compose_config_obj, fin_job
 from tuna.miopen.utils.lib_helper import get_worker
 
+
 @pytest.mark.asyncio
 async def test_celery_workers():
   miopen = MIOpen()
@@ -165,8 +165,6 @@ async def test_celery_workers():
 
   #testing get_context_items
   assert miopen.get_context_items()
-  #testing get_fdb_attr
-  assert miopen.get_fdb_attr()
 
   entries = [job for job in jobs]
 
@@ -188,17 +186,13 @@ async def test_celery_workers():
   kwargs['job'] = job_dct
   kwargs['config'] = config_dct
   kwargs['avail_gpus'] = 1
-  fdb_attr = [column.name for column in inspect(miopen.dbt.find_db_table).c]
-  fdb_attr.remove("insert_ts")
-  fdb_attr.remove("update_ts")
   context = {
       'job': job_dct,
       'config': config_dct,
       'operation': Operation.EVAL,
       'arch': miopen.dbt.session.arch,
       'num_cu': miopen.dbt.session.num_cu,
-      'kwargs': kwargs,
-      'fdb_attr': fdb_attr
+      'kwargs': kwargs
   }
 
   worker = prep_worker(copy.deepcopy(context))
@@ -242,9 +236,6 @@ async def test_celery_workers():
   miopen.operation = Operation.COMPILE
   f_vals = miopen.get_f_vals(Machine(local_machine=True), range(0))
   kwargs = miopen.get_kwargs(0, f_vals, tuning=True)
-  fdb_attr = [column.name for column in inspect(miopen.dbt.find_db_table).c]
-  fdb_attr.remove("insert_ts")
-  fdb_attr.remove("update_ts")
 
   redis = await aioredis.from_url("redis://localhost:6379/15")
   print('Established redis connection')
@@ -259,8 +250,7 @@ async def test_celery_workers():
         'operation': miopen.operation,
         'arch': miopen.dbt.session.arch,
         'num_cu': miopen.dbt.session.num_cu,
-        'kwargs': kwargs,
-        'fdb_attr': fdb_attr
+        'kwargs': kwargs
     }
 
     worker = prep_worker(copy.deepcopy(context))
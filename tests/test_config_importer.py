@@ -0,0 +1,158 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import argparse
+import hashlib
+import itertools
+
+from tuna.miopen.db.tables import MIOpenDBTables, ConfigType
+from tuna.miopen.db.tensortable import TensorTable
+from tuna.miopen.db.convolutionjob_tables import ConvolutionConfig
+from tuna.miopen.db.convolutionjob_tables import ConvolutionConfigTags
+from tuna.miopen.db.batch_norm_tables import BNConfig, BNConfigTags
+from tuna.miopen.utils.config_importer import CONV_MD5_COLS, ConfigImporter
+from tuna.miopen.utils.config_importer import get_config_md5
+from tuna.miopen.utils.config_importer import read_unique_lines
+
+NUM_LINES = 1000000
+
+TABLES = [
+    TensorTable, ConvolutionConfig, ConvolutionConfigTags, BNConfig,
+    BNConfigTags
+]
+
+
+def get_args(config_type=ConfigType.convolution, **kwargs):
+  args = argparse.Namespace(config_type=config_type,
+                            command=None,
+                            batch_list=[],
+                            tag='import_test',
+                            mark_recurrent=False,
+                            tag_only=False)
+  vars(args).update(kwargs)
+  return args
+
+
+def conv_lines():
+  """1200 distinct conv driver lines"""
+  for n, c, k, fil, direction in itertools.product([1, 16, 32, 64, 128],
+                                                   [3, 64, 256, 512],
+                                                   [32, 64, 128, 256, 1024],
+                                                   [1, 3, 5], [1, 2, 4]):
+    yield f"./bin/MIOpenDriver conv -n {n} -c {c} -H 28 -W 28 -k {k} -y {fil}"\
+          f" -x {fil} -p 0 -q 0 -u 1 -v 1 -l 1 -j 1 -m conv -g 1 -F {direction}"\
+          " -t 1"
+
+
+def test_config_importer(tmp_path, sqlite_session):
+  unique = list(conv_lines())
+  file_name = tmp_path / 'configs.txt'
+  with open(file_name, 'w') as outfile:
+    for idx in range(NUM_LINES):
+      outfile.write(unique[idx % len(unique)] + '\n')
+    outfile.write('./bin/MIOpenDriver conv -n 1 -c 3 -F 9\n\n')
+
+  lines, line_cnt = read_unique_lines(file_name)
+  assert line_cnt == NUM_LINES + 2
+  assert lines == unique + ['./bin/MIOpenDriver conv -n 1 -c 3 -F 9']
+
+  session = sqlite_session(TABLES)
+  dbt = MIOpenDBTables(config_type=ConfigType.convolution)
+  importer = ConfigImporter(get_args(), dbt, workers=2, chunk_size=500)
+  counts = importer.import_file(session, file_name)
+  assert counts['cnt_lines'] == NUM_LINES + 2
+  assert counts['cnt_errors'] == 1
+  assert counts['cnt_configs'] == len(unique)
+  assert counts['lines_per_sec'] > 0
+  assert session.query(ConvolutionConfig).count() == len(unique)
+  #4 input tensors (c) and 60 weight tensors (k, c, fil)
+  assert session.query(TensorTable).count() == 64
+  assert session.query(ConvolutionConfigTags).filter_by(
+      tag='import_test').count() == len(unique)
+  assert len(counts['cnt_tagged_configs']) == len(unique)
+
+  #rows match what the driver composes
+  config = session.query(ConvolutionConfig).filter_by(batchsize=64,
+                                                      direction='W').first()
+  assert config.input_t.layout == 'NCHW' and config.input_t.dim3 == 28
+  assert config.weight_t.dim0 in (32, 64, 128, 256, 1024)
+
+  #importing again only tags, with recurrent set
+  importer = ConfigImporter(get_args(mark_recurrent=True), dbt, workers=1)
+  counts = importer.import_file(session, file_name)
+  assert counts['cnt_configs'] == 0
+  assert session.query(ConvolutionConfig).count() == len(unique)
+  assert session.query(ConvolutionConfigTags).filter_by(
+      recurrent=1).count() == len(unique)
+
+
+def test_config_md5(sqlite_session):
+  session = sqlite_session(TABLES)
+  dbt = MIOpenDBTables(config_type=ConfigType.convolution)
+  line = './bin/MIOpenDriver conv -n 64 -c 3 -H 28 -W 28 -k 32 -y 3 -x 3 -p 0'\
+         ' -q 0 -u 1 -v 1 -l 1 -j 1 -m conv -g 1 -F 4 -t 1'
+  counts = ConfigImporter(get_args(), dbt,
+                          workers=1).import_lines(session, [line])
+  assert counts['cnt_configs'] == 1
+
+  #the string MySQL CONCAT()s in the md5 trigger, tensors 1 (input), 2 (weight)
+  concat = '6420001101101convdefault000W12NCHW'
+  assert hashlib.md5(concat.encode()).hexdigest() == \
+      '7ff3701cfeba04d61cf9d01ecf53a606'
+  config = session.query(ConvolutionConfig).one()
+  assert config.md5 == '7ff3701cfeba04d61cf9d01ecf53a606'
+
+  #CONCAT with a NULL is NULL, not the text 'None'
+  row = {col: getattr(config, col) for col in CONV_MD5_COLS}
+  assert get_config_md5(row) == config.md5
+  row['out_layout'] = None
+  assert get_config_md5(row) is None
+
+
+def test_config_importer_batch_norm(sqlite_session):
+  session = sqlite_session(TABLES)
+  dbt = MIOpenDBTables(config_type=ConfigType.batch_norm)
+  lines = [
+      './bin/MIOpenDriver bnormfp16 -n 256 -c 1024 -H 14 -W 14 -m 1 --forw 0 -b 1 -r 1',
+      './bin/MIOpenDriver bnormfp16 -n 256 -c 1024 -H 14 -W 14 -m 1 --forw 1 -b 0 -s 1 -r 1',
+      './bin/MIOpenDriver bnorm -n 256 -c 64 -H 56 -W 56 -m 1 --forw 1 -b 0 -s 1 -r 1'
+  ]
+  args = get_args(ConfigType.batch_norm, batch_list=[16, 32])
+  counts = ConfigImporter(args, dbt, workers=1).import_lines(session, lines)
+  assert counts['cnt_configs'] == 6
+  assert sorted(row.batchsize for row in session.query(BNConfig)) == [
+      16, 16, 16, 32, 32, 32
+  ]
+  assert session.query(TensorTable).count() == 2
+  assert session.query(BNConfigTags).count() == 6
+
+  #tag_only tags the known configs and skips the unknown one
+  args = get_args(ConfigType.batch_norm, tag='other', tag_only=True)
+  lines[0] = lines[0].replace('-n 256', '-n 16')
+  counts = ConfigImporter(args, dbt, workers=1).import_lines(session, lines)
+  assert counts['cnt_configs'] == 0
+  assert len(counts['cnt_tagged_configs']) == 1
+  assert session.query(BNConfigTags).filter_by(tag='other').count() == 1
@@ -0,0 +1,134 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import random
+from datetime import datetime
+
+import pytest
+from kombu.serialization import dumps, loads
+
+from tuna.benchmarks import codec_bench
+from tuna.benchmarks.enqueue_bench import make_app, Q_NAME
+from tuna.celery_app import context_codec
+from tuna.celery_app.context_codec import CODEC_NAME, CONTENT_TYPE, MAGIC
+from tuna.celery_app.context_codec import encode, decode, register_codec
+
+
+def get_context():
+  return codec_bench.make_context(random.Random(3), 7, 'mixed_2d')
+
+
+def test_roundtrip():
+  obj = {
+      'ints': [0, 1, 223, 224, -1, -300, 2**70, -2**70],
+      'floats': [0.0, -1.5, 1e300],
+      'strs': ['', 'NCHW', 'ünïcode', 'x' * 500, 'NCHW'],
+      'misc': [None, True, False, b'\x00\xff',
+               datetime(2024, 1, 2, 3, 4, 5)],
+      'nested': [{
+          'a': 1,
+          'b': [1, 2]
+      }, {
+          'a': 2,
+          'b': (3,)
+      }, {}],
+      7: 'int key'
+  }
+  ret = decode(encode(obj, 'none'))
+  assert ret['nested'][1]['b'] == [3]
+  ret['nested'][1]['b'] = (3,)
+  assert ret == obj
+
+  with pytest.raises(TypeError):
+    encode({'obj': object()})
+
+
+def test_context_size():
+  context = get_context()
+  payload = encode(context, 'none')
+  assert payload[:2] == MAGIC
+  assert payload[2] == context_codec.FORMAT_VERSION
+  assert decode(payload) == context
+  #interned keys and values, well below the json size
+  assert len(payload) * 3 < len(codec_bench.json_dumps(context))
+
+
+def test_compression():
+  obj = [f"unique string number {idx}" for idx in range(200)]
+  payload = encode(obj, 'zlib')
+  assert payload[3] == context_codec.COMPRESSIONS['zlib']
+  assert len(payload) < len(encode(obj, 'none'))
+  assert decode(payload) == obj
+  #small payloads are not compressed
+  assert encode([1], 'zlib')[3] == context_codec.COMPRESSIONS['none']
+
+
+def test_version_check():
+  payload = bytearray(encode(get_context(), 'none'))
+  with pytest.raises(ValueError, match='Not a tuna'):
+    decode(b'{"json": 1}')
+  payload[2] = 99
+  with pytest.raises(ValueError, match='version 99'):
+    decode(bytes(payload))
+  with pytest.raises(ValueError, match='Trailing'):
+    decode(encode(1, 'none') + b'\x00')
+
+
+def test_published_versions():
+  context = get_context()
+  assert 'fdb_attr' not in context
+  #version 1 payloads, as sent by earlier enqueuers, still decode
+  encoder = context_codec.Encoder(1)
+  encoder.write(dict(context, fdb_attr=['id', 'valid']))
+  payload = MAGIC + bytes(
+      (1, context_codec.COMPRESSIONS['none'])) + bytes(encoder.out)
+  assert decode(payload) == dict(context, fdb_attr=['id', 'valid'])
+
+
+def test_celery_serializer():
+  register_codec()
+  context = get_context()
+  content_type, encoding, data = dumps(context, serializer=CODEC_NAME)
+  assert content_type == CONTENT_TYPE
+  assert loads(data, content_type, encoding, accept=[CONTENT_TYPE]) == context
+
+  app = make_app()
+  app.conf.accept_content = ['json', CODEC_NAME]
+  app.bench_task.apply_async((context,), serializer=CODEC_NAME, queue=Q_NAME)
+  with app.connection_for_read() as conn:
+    queue = conn.SimpleQueue(Q_NAME)
+    message = queue.get(timeout=1)
+    assert message.content_type == CONTENT_TYPE
+    assert message.decode()[0] == [context]
+    message.ack()
+    queue.close()
+
+
+def test_codec_bench():
+  results = codec_bench.run(num_contexts=20)
+  for mix in codec_bench.MIXES:
+    assert all(res['identical'] for res in results[mix].values())
+    assert results[mix]['codec']['size_ratio'] < 0.5
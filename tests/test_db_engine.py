@@ -0,0 +1,137 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import multiprocessing
+
+from tuna import db_engine
+from tuna.db_engine import DbPool, TimedQueuePool
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.sql import DbCursor
+
+POOL_ARGS = {
+    'pool_size': 2,
+    'max_overflow': 1,
+    'pool_timeout': 5,
+    'pool_recycle': 3600,
+    'pool_pre_ping': True
+}
+
+
+def get_pool(tmp_path):
+  db_pool = DbPool(f"sqlite:///{tmp_path}/engine.db", POOL_ARGS)
+  with db_pool.engine.connect() as conn:
+    conn.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY)")
+  return db_pool
+
+
+def test_pool_config(tmp_path):
+  db_pool = get_pool(tmp_path)
+  pool = db_pool.engine.pool
+  assert isinstance(pool, TimedQueuePool)
+  assert pool.size() == 2
+  assert pool._max_overflow == 1
+  assert pool._pre_ping
+
+  #connections are reused, not re-established
+  with db_pool.engine.connect() as conn:
+    first = conn.connection.connection
+  with db_pool.engine.connect() as conn:
+    assert conn.connection.connection is first
+
+
+def test_checkout_stats(tmp_path):
+  db_pool = get_pool(tmp_path)
+  for _ in range(10):
+    session = db_pool.session()
+    session.execute("SELECT 1")
+    session.close()
+
+  stats = db_pool.get_stats()
+  assert stats['count'] >= 10
+  assert stats['p50_ms'] <= stats['p99_ms'] <= stats['max_ms']
+  assert stats['checked_out'] == 0
+
+
+def test_fork_reset(tmp_path, monkeypatch):
+  db_pool = get_pool(tmp_path)
+  with db_pool.engine.connect() as conn:
+    parent_conn = conn.connection.connection
+  old_pool = db_pool.engine.pool
+
+  #pretend we are running in a forked child
+  monkeypatch.setattr(db_pool, 'pid', os.getpid() + 1)
+  assert db_pool.check_fork()
+  assert db_pool.engine.pool is not old_pool
+  assert db_pool.get_stats()['fork_resets'] == 1
+  with db_pool.engine.connect() as conn:
+    assert conn.connection.connection is not parent_conn
+    assert conn.execute("SELECT 1").scalar() == 1
+  assert not db_pool.check_fork()
+
+
+def test_inherited_connection_refused(tmp_path):
+  db_pool = get_pool(tmp_path)
+  with db_pool.engine.connect() as conn:
+    parent_conn = conn.connection.connection
+    conn.connection._connection_record.info['pid'] = os.getpid() + 1
+
+  #engine bound users that bypass check_fork() still get a fresh connection
+  with db_pool._engine.connect() as conn:
+    assert conn.connection.connection is not parent_conn
+    assert conn.execute("SELECT 1").scalar() == 1
+
+
+def child_query(db_pool, queue):
+  with db_pool.engine.connect() as conn:
+    queue.put((db_pool.pid, conn.execute("SELECT count(*) FROM t").scalar()))
+
+
+def test_real_fork(tmp_path):
+  db_pool = get_pool(tmp_path)
+  with db_pool.engine.connect() as conn:
+    conn.execute("INSERT INTO t (id) VALUES (1)")
+
+  ctx = multiprocessing.get_context('fork')
+  queue = ctx.Queue()
+  proc = ctx.Process(target=child_query, args=(db_pool, queue))
+  proc.start()
+  child_pid, count = queue.get(timeout=30)
+  proc.join()
+  assert child_pid == proc.pid
+  assert count == 1
+  assert db_pool.pid == os.getpid()
+
+
+def test_shared_factory(tmp_path, monkeypatch):
+  db_pool = get_pool(tmp_path)
+  monkeypatch.setattr(db_engine, 'DB_POOL', db_pool)
+
+  with DbCursor() as cur:
+    cur.execute("INSERT INTO t (id) VALUES (2)")
+  with DbSession() as session:
+    assert session.execute("SELECT id FROM t").scalar() == 2
+  assert db_pool.get_stats()['count'] >= 3
@@ -0,0 +1,217 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import base64
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import pytest
+
+from tuna.benchmarks.pipeline_bench import make_workload
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionConfig, ConvolutionFindDB
+from tuna.miopen.db.tables import ConvolutionKernelCache, ConvolutionGolden
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.miopen.subcmd import export_db
+from tuna.miopen.utils.delta_export import patch_text_db, read_watermark
+from tuna.miopen.utils.delta_export import write_watermark
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import SimpleDict
+
+LOGGER = setup_logger('test_delta_export')
+NUM_SOLVERS = 6
+START_TS = datetime(2024, 1, 1)
+
+
+def find_row(rand, config, solver, group, update_ts):
+  return {
+      'session': 1,
+      'config': config,
+      'fdb_key': f"key-{config:04d}",
+      'solver': solver,
+      'kernel_time': round(rand.uniform(1, 100), 3),
+      'workspace_sz': 0,
+      'alg_lib': 'Test_alg',
+      'kernel_group': group,
+      'opencl': 0,
+      'params': '',
+      'update_ts': update_ts
+  }
+
+
+def kernel_rows(rand, group, update_ts):
+  rows = []
+  for idx in range(2):
+    #a few kernels are shared by several groups
+    name = f"shared_{group % 3}" if idx else f"kernel_{group}"
+    blob = rand.randbytes(32)
+    rows.append({
+        'kernel_group': group,
+        'kernel_name': name,
+        'kernel_args': f"-DG={group % 3 if idx else group}",
+        'kernel_blob': base64.b64encode(blob),
+        'kernel_hash': f"{group}-{blob.hex()[:8]}",
+        'uncompressed_size': len(blob),
+        'update_ts': update_ts
+    })
+  return rows
+
+
+def get_args(**kwargs):
+  args = argparse.Namespace(src_table=ConvolutionFindDB,
+                            session_id=1,
+                            golden_v=None,
+                            arch='gfx90a',
+                            num_cu=104,
+                            opencl=False,
+                            config_tag=None,
+                            filename=None,
+                            find_db=False,
+                            kern_db=False)
+  vars(args).update(kwargs)
+  return args
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 4,
+      'max_overflow': 4
+  })
+  create_sqlite_tables(pool.engine, [
+      ConvolutionConfig.__table__, ConvolutionFindDB.__table__,
+      ConvolutionKernelCache.__table__
+  ])
+  prev_pool = set_db_pool(pool)
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(export_db, 'ID_SOLVER_MAP',
+                      {idx: f"Solver{idx}" for idx in range(NUM_SOLVERS)})
+  yield pool
+  set_db_pool(prev_pool)
+  pool.dispose()
+
+
+def test_delta_export(sqlite_db, monkeypatch):
+  rand = random.Random(3)
+  dbt = SimpleDict(config_table=ConvolutionConfig,
+                   find_db_table=ConvolutionFindDB,
+                   kernel_cache=ConvolutionKernelCache,
+                   golden_table=ConvolutionGolden,
+                   job_table=ConvolutionJob,
+                   session=SimpleDict(id=1, rocm_v='test', miopen_v='test'))
+  find_rows = []
+  cache_rows = []
+  for config in range(1, 41):
+    for solver in rand.sample(range(NUM_SOLVERS), 3):
+      group = config * 10 + solver
+      find_rows.append(find_row(rand, config, solver, group, START_TS))
+      cache_rows.extend(kernel_rows(rand, group, START_TS))
+  find_tbl = ConvolutionFindDB.__table__
+  cache_tbl = ConvolutionKernelCache.__table__
+  with sqlite_db.engine.begin() as conn:
+    conn.execute(ConvolutionConfig.__table__.insert(),
+                 make_workload(rand, 50, NUM_SOLVERS)['config'])
+    conn.execute(find_tbl.insert(), find_rows)
+    conn.execute(cache_tbl.insert(), cache_rows)
+
+  fdb_args = get_args(find_db=True)
+  kdb_args = get_args(kern_db=True)
+  fdb_file = export_db.export_fdb_delta(dbt, fdb_args, LOGGER)
+  kdb_file = export_db.export_kdb_delta(dbt, kdb_args, LOGGER)
+  assert os.path.isfile(f"{fdb_file}.watermark.json")
+  with open(fdb_file, encoding='utf-8') as fdb_fp:
+    first_fdb = fdb_fp.read()
+
+  #faster, slower and invalidated solvers, a dropped key, new keys and
+  #rebuilt kernels
+  later = START_TS + timedelta(hours=1)
+  with sqlite_db.engine.begin() as conn:
+    for row_id in range(1, 40, 4):
+      conn.execute(find_tbl.update().where(find_tbl.c.id == row_id).values(
+          kernel_time=rand.uniform(0.1, 200), update_ts=later))
+    conn.execute(find_tbl.update().where(find_tbl.c.id.in_([6, 17])).values(
+        valid=0, update_ts=later))
+    conn.execute(find_tbl.update().where(find_tbl.c.config == 9).values(
+        valid=0, update_ts=later))
+    new_rows = [
+        find_row(rand, config, solver, config * 10 + solver, later)
+        for config in range(41, 46)
+        for solver in range(2)
+    ]
+    conn.execute(find_tbl.insert(), new_rows)
+    conn.execute(cache_tbl.insert(), [
+        kern for row in new_rows
+        for kern in kernel_rows(rand, row['kernel_group'], later)
+    ])
+    conn.execute(cache_tbl.update().where(cache_tbl.c.id.in_([3, 8])).values(
+        kernel_blob=base64.b64encode(b'rebuilt'),
+        kernel_hash='rebuilt',
+        uncompressed_size=7,
+        update_ts=later))
+
+  #the second export must patch, not export again
+  def no_full_export(*args, **kwargs):
+    raise AssertionError('full export')
+
+  monkeypatch.setattr(export_db, 'export_fdb', no_full_export)
+  monkeypatch.setattr(export_db, 'export_kdb', no_full_export)
+  assert export_db.export_fdb_delta(dbt, fdb_args, LOGGER) == fdb_file
+  assert export_db.export_kdb_delta(dbt, kdb_args, LOGGER) == kdb_file
+  with open(fdb_file, encoding='utf-8') as fdb_fp:
+    patched_fdb = fdb_fp.read()
+  assert patched_fdb != first_fdb
+  assert 'key-0009=' not in patched_fdb
+  assert 'key-0045=' in patched_fdb
+
+  export_db.check_delta_export(dbt, fdb_args, LOGGER, fdb_file)
+  export_db.check_delta_export(dbt, kdb_args, LOGGER, kdb_file)
+
+  #a mismatch is reported
+  with open(fdb_file, 'a', encoding='utf-8') as fdb_fp:
+    fdb_fp.write('key-9999=Solver1:1.0,0,Test_alg\n')
+  with pytest.raises(ValueError):
+    export_db.check_delta_export(dbt, fdb_args, LOGGER, fdb_file)
+
+
+def test_watermark(tmp_path):
+  db_file = str(tmp_path / 'test.fdb.txt')
+  filters = {'arch': 'gfx90a', 'num_cu': 104}
+  marks = {'conv_find_db': {'update_ts': START_TS.isoformat(), 'id': 7}}
+  with open(db_file, 'w', encoding='utf-8') as db_fp:
+    db_fp.write('a=1\nc=3\nd=4\nf=6\n')
+  assert read_watermark(db_file, filters) is None
+  write_watermark(db_file, marks, filters)
+  assert read_watermark(db_file, filters) == marks
+  assert read_watermark(db_file, dict(filters, num_cu=110)) is None
+
+  lines = iter([('b', 'b=2\n'), ('c', 'c=33\n'), ('g', 'g=7\n')])
+  assert patch_text_db(db_file, {'b', 'c', 'd', 'g'}, lines) == 5
+  with open(db_file, encoding='utf-8') as db_fp:
+    assert db_fp.read() == 'a=1\nb=2\nc=33\nf=6\ng=7\n'
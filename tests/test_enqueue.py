@@ -0,0 +1,125 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+from collections import defaultdict
+
+import pytest
+from amqp.exceptions import MessageNacked
+
+from tuna.celery_app.enqueue import BatchEnqueuer, PublishConfirms
+from tuna.celery_app.enqueue import get_args_repr
+from tuna.celery_app.enqueue import get_enqueue_fan_out, ENQUEUE_FAN_OUT
+from tuna.celery_app.result_collector import get_task_prefix
+from tuna.benchmarks import enqueue_bench
+
+
+class FakeChannel():
+  """amqp channel stand-in, each wait() delivers one queued confirm"""
+
+  def __init__(self):
+    self.events = defaultdict(set)
+    self.selected = False
+    self.confirms = []
+    self.waits = 0
+
+  def confirm_select(self):
+    self.selected = True
+
+  def wait(self, methods, timeout=None):  #pylint: disable=unused-argument
+    self.waits += 1
+    event, tag, multiple = self.confirms.pop(0)
+    for callback in self.events[event]:
+      callback(tag, multiple)
+
+
+def drain(app, q_name):
+  """pop every message published to q_name"""
+  messages = []
+  with app.connection_for_read() as conn:
+    queue = conn.SimpleQueue(q_name)
+    while queue.qsize():
+      msg = queue.get(timeout=1)
+      messages.append(msg)
+      msg.ack()
+    queue.close()
+  return messages
+
+
+def test_enqueue():
+  app = enqueue_bench.make_app()
+  contexts = enqueue_bench.make_contexts(25)
+  prefix = 'd_tuna_sess_1_miopen_find_compile'
+  enqueuer = BatchEnqueuer(app.bench_task, 'test_enqueue_q', prefix, fan_out=10)
+
+  task_ids = enqueuer.enqueue(contexts)
+  assert len(set(task_ids)) == 25
+  assert all(get_task_prefix(task_id) == prefix for task_id in task_ids)
+
+  messages = drain(app, 'test_enqueue_q')
+  assert [msg.headers['id'] for msg in messages] == task_ids
+  assert messages[3].headers['argsrepr'] == '(job 3,)'
+  args, _, _ = messages[3].payload
+  assert args[0] == contexts[3]
+
+
+def test_publish_confirms():
+  channel = FakeChannel()
+  confirms = PublishConfirms(channel)
+  assert channel.selected
+
+  #one wait per broker ack, not per message
+  confirms.add(10)
+  channel.confirms = [('basic_ack', 3, False), ('basic_ack', 10, True)]
+  confirms.wait()
+  assert channel.waits == 2
+  assert not confirms.unconfirmed
+
+  confirms.add(5)
+  channel.confirms = [('basic_nack', 12, False), ('basic_ack', 15, True)]
+  with pytest.raises(MessageNacked):
+    confirms.wait()
+  assert not confirms.unconfirmed and confirms.nacked == 0
+
+  #the in-memory broker has no confirms
+  app = enqueue_bench.make_app()
+  assert BatchEnqueuer(app.bench_task, 'q', confirm=False).enqueue([{}])
+
+
+def test_fan_out(monkeypatch):
+  assert get_enqueue_fan_out() == ENQUEUE_FAN_OUT
+  monkeypatch.setenv('TUNA_ENQUEUE_FAN_OUT', '7')
+  assert get_enqueue_fan_out() == 7
+  app = enqueue_bench.make_app()
+  assert BatchEnqueuer(app.bench_task, 'q').fan_out == 7
+  assert BatchEnqueuer(app.bench_task, 'q', fan_out=3).fan_out == 3
+  assert get_args_repr({'config': {}}) == '(context,)'
+
+
+def test_enqueue_bench():
+  results = enqueue_bench.run(num_jobs=200, fan_out=50)
+  assert results['legacy']['queued'] == 200
+  assert results['batched']['queued'] == 200
+  assert results['speedup'] > 0
@@ -0,0 +1,108 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+from tuna.benchmarks.enqueue_bench import make_app
+from tuna.benchmarks.scheduler_bench import run as run_simulation
+from tuna.celery_app.enqueue import BatchEnqueuer
+from tuna.celery_app.enqueue_scheduler import CeleryBroker, EnqueueScheduler
+
+Q_NAME = 'scheduler_test_q'
+
+
+def test_cold_start():
+  """first rounds fill the queue up to initial_batch and poll quickly"""
+  scheduler = EnqueueScheduler(100, target_seconds=60)
+  plan = scheduler.plan(0, 0.0)
+  assert plan.batch == 100
+  assert plan.interval == scheduler.min_interval
+  scheduler.record_enqueued(plan.batch)
+
+  #nothing consumed yet, no rate and no refill above the low watermark
+  plan = scheduler.plan(100, 1.0)
+  assert scheduler.rate is None
+  assert plan.batch == 0
+
+
+def test_refill_to_high_watermark():
+  """the window follows the measured rate, refills go up to the high mark"""
+  scheduler = EnqueueScheduler(100, target_seconds=10)
+  scheduler.record_enqueued(scheduler.plan(0, 0.0).batch)
+  #100 tasks in the queue, 20 left after 10s: 8 tasks/s, window of 80
+  plan = scheduler.plan(20, 10.0)
+  assert scheduler.rate == 8.0
+  assert scheduler.get_window() == 80
+  assert plan.batch == 120 - 20
+  #next look when the backlog reaches the low mark: (120 - 40) / 8
+  assert plan.interval == 10.0
+
+  scheduler.record_enqueued(plan.batch)
+  plan = scheduler.plan(100, 12.5)
+  assert scheduler.rate == 8.0
+  assert plan.batch == 0
+
+
+def test_rate_follows_slowdown():
+  """a slower consumer shrinks the window, a dry queue never lowers the rate"""
+  scheduler = EnqueueScheduler(100, target_seconds=10, max_interval=1000)
+  scheduler.record_enqueued(scheduler.plan(0, 0.0).batch)
+  scheduler.plan(20, 10.0)
+  scheduler.record_enqueued(100)
+  #the queue ran dry after fewer tasks than it could have taken
+  scheduler.plan(0, 100.0)
+  assert scheduler.rate == 8.0
+
+  scheduler.plan(100, 110.0)
+  for now in range(120, 400, 10):
+    scheduler.plan(100 - (now - 110) // 10, float(now))
+  assert scheduler.rate < 0.5
+  assert scheduler.get_window() == scheduler.min_window
+
+
+def test_celery_broker_depth():
+  """queue depth read through a passive declare on the in-memory broker"""
+  app = make_app()
+  broker = CeleryBroker(app)
+  enqueuer = BatchEnqueuer(app.bench_task, Q_NAME, prefix='test')
+  enqueuer.enqueue([{'job': {'id': idx}} for idx in range(7)])
+  try:
+    assert broker.depth(Q_NAME) == 7
+  finally:
+    with app.connection_for_write() as conn:
+      conn.default_channel.queue_purge(Q_NAME)
+  assert broker.depth(Q_NAME) == 0
+  assert broker.depth('scheduler_missing_q') is None
+
+
+def test_simulation():
+  """the scheduler keeps the workers busy without flooding the queue"""
+  res = run_simulation(workers=8, duration=1800)
+  small = res['fixed_20']
+  large = res['fixed_1000']
+  adaptive = res['adaptive']
+  assert adaptive['idle_fraction'] < small['idle_fraction'] / 4
+  assert adaptive['max_depth'] < large['max_depth'] / 10
+  assert adaptive['mean_wait_s'] < small['mean_wait_s']
+  assert adaptive['mean_wait_s'] < large['mean_wait_s']
@@ -0,0 +1,138 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import random
+from datetime import datetime, timedelta
+
+from tuna.miopen.db.tables import ConvolutionFindDB, ConvolutionGolden
+from tuna.miopen.utils.fdb_export import FdbExporter
+
+SOLVERS = {idx: f"Solver{idx % 7}_{idx}" for idx in range(1, 13)}
+START_TS = datetime(2024, 1, 1)
+
+
+def make_rows(rand, num_keys, num_cus=(0,)):
+  """several rows per key and solver (duplicate configs share a key), only
+  the newest one counts"""
+  rows = []
+  for key_idx in range(num_keys):
+    key = f"{rand.choice([16, 64])}-{key_idx}-28-3x3-64-28-28-1-1x1-1x1-1x1-"\
+          f"0-NCHW-{rand.choice(['FP32', 'FP16'])}-F"
+    for num_cu in num_cus:
+      for solver in rand.sample(list(SOLVERS), rand.randint(1, 8)):
+        for age in range(rand.randint(1, 3)):
+          rows.append({
+              'fdb_key': key,
+              'solver': solver,
+              'config': key_idx * 10 + age,
+              'session': 1,
+              'kernel_time': rand.choice([0.5, 1.0, rand.random()]),
+              'workspace_sz': rand.randint(0, 1024),
+              'alg_lib': 'miopenConvolutionFwdAlgoDirect',
+              'kernel_group': len(rows) + 1,
+              'opencl': False,
+              'params': '',
+              'num_cu': num_cu,
+              'update_ts': START_TS - timedelta(days=age)
+          })
+  rand.shuffle(rows)
+  return rows
+
+
+def reference_fdb(rows, skews=False):
+  """find db built the way export_db did: full sort, dedup, top 4"""
+  find_db = {}
+  for row in sorted(rows, key=lambda row: row['update_ts'], reverse=True):
+    key = f"{row['fdb_key']}_cu{row['num_cu']}" if skews else row['fdb_key']
+    solvers = find_db.setdefault(key, {})
+    solvers.setdefault(row['solver'], row)
+  ranked = {}
+  for key, solvers in find_db.items():
+    ranked[key] = sorted(solvers.values(),
+                         key=lambda row:
+                         (row['kernel_time'], SOLVERS[row['solver']]))[:4]
+  return ranked
+
+
+def insert(session, table, rows):
+  cols = set(table.__table__.c.keys())
+  session.execute(table.__table__.insert(), [{
+      key: val for key, val in row.items() if key in cols
+  } for row in rows])
+  session.commit()
+
+
+def test_fdb_export_write(tmp_path, sqlite_session):
+  session = sqlite_session([ConvolutionFindDB])
+  rows = make_rows(random.Random(3), 60)
+  insert(session, ConvolutionFindDB, rows)
+  query = session.query(ConvolutionFindDB).filter(ConvolutionFindDB.valid == 1)
+
+  exporter = FdbExporter(SOLVERS, fetch_size=16)
+  file_name = str(tmp_path / 'gfx90a68.HIP.fdb.txt')
+  assert exporter.write(query, file_name) == 60
+  assert exporter.num_rows == len(rows)
+
+  expected = []
+  for key, entries in sorted(reference_fdb(rows).items()):
+    vals = [
+        f"{SOLVERS[row['solver']]}:{row['kernel_time']},"
+        f"{row['workspace_sz']},{row['alg_lib']}" for row in entries
+    ]
+    expected.append(f"{key}={';'.join(vals)}\n")
+  with open(file_name, encoding='utf-8') as in_fp:
+    assert in_fp.readlines() == expected
+
+  #keys are ranked while the rows stream in, not after the whole query
+  entries = FdbExporter(SOLVERS, fetch_size=16)
+  key, _ = next(entries.iter_entries(query))
+  assert key == expected[0].split('=')[0]
+  assert entries.num_rows < len(rows) / 2
+
+
+def test_fdb_export_skews(sqlite_session):
+  session = sqlite_session([ConvolutionGolden])
+  rows = make_rows(random.Random(5), 20, num_cus=(64, 104, 120))
+  for row in rows:
+    row.update(golden_miopen_v=1, arch='gfx90a')
+  insert(session, ConvolutionGolden, rows)
+  query = session.query(ConvolutionGolden)
+
+  find_db = FdbExporter(SOLVERS).build(query, skews=True)
+  expected = reference_fdb(rows, skews=True)
+  assert len(find_db) == 60
+  assert list(find_db) == [
+      key for _, key in sorted((int(key.rsplit('_cu', 1)[1]), key)
+                               for key in expected)
+  ]
+  for key, entries in find_db.items():
+    assert [(row.solver, row.config, row.kernel_group) for row in entries
+           ] == [(row['solver'], row['config'], row['kernel_group'])
+                 for row in expected[key]]
+
+  #without skews the newest row of a solver wins across num_cu
+  find_db = FdbExporter(SOLVERS).build(query)
+  assert len(find_db) == 20
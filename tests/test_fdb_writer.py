@@ -0,0 +1,175 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+from sqlalchemy import event
+
+from tuna.miopen.db.tables import ConvolutionFindDB, ConvolutionKernelCache
+from tuna.miopen.utils.fdb_writer import FdbWriter
+from tuna.miopen.utils.json_to_sql import compose_fdb_rows
+from tuna.utils.utility import SimpleDict
+
+FDB_KEY = '64-28-28-3x3-64-28-28-16-1x1-1x1-1x1-0-NCHW-FP32-F'
+
+TABLES = [ConvolutionFindDB, ConvolutionKernelCache]
+
+
+def fdb_row(solver, params='params', config=1):
+  return {
+      'session': 1,
+      'config': config,
+      'solver': solver,
+      'opencl': False,
+      'fdb_key': FDB_KEY,
+      'alg_lib': 'miopenConvolutionFwdAlgoDirect',
+      'params': params,
+      'workspace_sz': 0,
+      'kernel_time': 0.5,
+      'valid': True
+  }
+
+
+def kernel_row(name):
+  return {
+      'kernel_name': name,
+      'kernel_args': '-DMIOPEN=1',
+      'kernel_blob': b'blob',
+      'kernel_hash': 'md5',
+      'uncompressed_size': 4
+  }
+
+
+def test_fdb_writer(sqlite_session):
+  session = sqlite_session(TABLES)
+  engine = session.bind
+  statements = []
+  event.listen(engine, 'before_cursor_execute',
+               lambda conn, cursor, stmt, *args: statements.append(stmt))
+
+  writer = FdbWriter(ConvolutionFindDB, ConvolutionKernelCache)
+  for solver in range(1, 21):
+    writer.add(fdb_row(solver),
+               [kernel_row(f"k{solver}_{i}") for i in range(3)])
+  ids = writer.flush(session)
+  session.commit()
+  assert not writer
+  #upsert, id select, kernel_group update, kernel insert
+  assert len(statements) == 4
+  assert len(ids) == 20
+
+  fdbs = session.query(ConvolutionFindDB).all()
+  assert len(fdbs) == 20
+  assert all(fdb.kernel_group == fdb.id for fdb in fdbs)
+  assert session.query(ConvolutionKernelCache).count() == 60
+
+  #update 2 rows (one without kernels), add one
+  statements.clear()
+  writer.add(fdb_row(1, 'new_params'), [kernel_row('k1_new')])
+  writer.add(fdb_row(2, 'new_params'))
+  writer.add(fdb_row(5, config=2), [kernel_row('k5_c2')])
+  ids2 = writer.flush(session)
+  session.commit()
+  assert len(statements) == 5
+  assert ids2[(1, 1, 0, 1)] == ids[(1, 1, 0, 1)]
+  assert ids2[(1, 2, 0, 1)] == ids[(1, 2, 0, 1)]
+
+  assert session.query(ConvolutionFindDB).count() == 21
+  fdb1 = session.query(ConvolutionFindDB).filter_by(solver=1, config=1).one()
+  assert fdb1.params == 'new_params'
+  kernels = session.query(ConvolutionKernelCache).filter_by(
+      kernel_group=fdb1.id).all()
+  assert {(k.kernel_name, k.valid) for k in kernels} == {('k1_0', 0),
+                                                         ('k1_1', 0),
+                                                         ('k1_2', 0),
+                                                         ('k1_new', 1)}
+  fdb2 = session.query(ConvolutionFindDB).filter_by(solver=2, config=1).one()
+  assert not session.query(ConvolutionKernelCache).filter_by(
+      kernel_group=fdb2.id, valid=1).count()
+  fdb3 = session.query(ConvolutionFindDB).filter_by(solver=5, config=2).one()
+  assert fdb3.kernel_group == fdb3.id
+  assert not FdbWriter(ConvolutionFindDB, ConvolutionKernelCache).flush(session)
+
+
+def test_compose_fdb_rows(sqlite_session):
+  kernel = {
+      'kernel_file': 'conv.s',
+      'comp_options': '-O3',
+      'blob': 'abc',
+      'md5_sum': 'md5',
+      'uncompressed_size': 3
+  }
+  fin_json = {
+      'db_key':
+          FDB_KEY,
+      'config_tuna_id':
+          1,
+      'miopen_find_compile_result': [{
+          'solver_name': 'ConvDirect',
+          'find_compiled': True,
+          'reason': 'Success',
+          'algorithm': 'miopenConvolutionFwdAlgoDirect',
+          'params': 'p',
+          'workspace': 16,
+          'kernel_objects': [kernel, kernel]
+      }, {
+          'solver_name': 'ConvGemm',
+          'find_compiled': True,
+          'reason': 'Not applicable',
+          'algorithm': 'miopenConvolutionFwdAlgoGEMM',
+          'params': 'p',
+          'workspace': 0,
+          'kernel_objects': []
+      }, {
+          'solver_name': 'ConvWino',
+          'find_compiled': False,
+          'reason': 'Failed',
+          'kernel_objects': []
+      }]
+  }
+  solver_id_map = {'ConvDirect': 1, 'ConvGemm': 2, 'ConvWino': 3}
+  writer = FdbWriter(ConvolutionFindDB, ConvolutionKernelCache)
+  config = SimpleDict(id=7, out_layout='NCHW')
+
+  status = compose_fdb_rows(writer, fin_json, config, 1, solver_id_map)
+  assert len(status) == 3
+  assert len(writer) == 2
+  row = writer.rows[(7, 1, 0, 1)]
+  assert row['kernel_time'] == -1 and row['workspace_sz'] == 16
+  assert row['valid']
+  assert len(writer.kernels[(7, 1, 0, 1)]) == 2
+  assert writer.kernels[(7, 1, 0, 1)][0]['kernel_blob'] == b'abc'
+  assert not writer.kernels[(7, 2, 0, 1)]
+
+  #fdb key layout differs from the config layout
+  writer = FdbWriter(ConvolutionFindDB, ConvolutionKernelCache)
+  config = SimpleDict(id=7, out_layout='NHWC')
+  status = compose_fdb_rows(writer, fin_json, config, 1, solver_id_map)
+  assert not status[0]['success']
+  assert not writer.rows[(7, 1, 0, 1)]['valid']
+
+  session = sqlite_session(TABLES)
+  writer.flush(session)
+  session.commit()
+  assert session.query(ConvolutionFindDB).filter_by(valid=0).count() == 2
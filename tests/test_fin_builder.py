@@ -25,7 +25,6 @@
 ###############################################################################
 
 import copy
-from sqlalchemy.inspection import inspect
 
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.miopen.db.tables import MIOpenDBTables
@@ -72,9 +71,6 @@ def test_fin_builder():
 
   f_vals = miopen.get_f_vals(Machine(local_machine=True), range(0))
   kwargs = miopen.get_kwargs(0, f_vals, tuning=True)
-  fdb_attr = [column.name for column in inspect(miopen.dbt.find_db_table).c]
-  fdb_attr.remove("insert_ts")
-  fdb_attr.remove("update_ts")
 
   res_set = []
   for elem in job_config_rows:
@@ -85,8 +81,7 @@ def test_fin_builder():
         'operation': miopen.operation,
         'arch': miopen.dbt.session.arch,
         'num_cu': miopen.dbt.session.num_cu,
-        'kwargs': kwargs,
-        'fdb_attr': fdb_attr
+        'kwargs': kwargs
     }
 
     worker = prep_worker(copy.deepcopy(context))
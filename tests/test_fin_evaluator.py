@@ -28,7 +28,6 @@ import json
 import os
 import sys
 import copy
-from sqlalchemy.inspection import inspect
 
 from utils import CfgImportArgs, LdJobArgs, GoFishArgs
 from utils import get_worker_args, add_test_session
@@ -179,9 +178,6 @@ def test_fin_evaluator():
   kwargs = miopen.get_kwargs(0, f_vals, tuning=True)
 
   kwargs['avail_gpus'] = 1
-  fdb_attr = [column.name for column in inspect(miopen.dbt.find_db_table).c]
-  fdb_attr.remove("insert_ts")
-  fdb_attr.remove("update_ts")
 
   res_set = []
   for elem in job_config_rows:
@@ -192,8 +188,7 @@ def test_fin_evaluator():
         'operation': miopen.operation,
         'arch': miopen.dbt.session.arch,
         'num_cu': miopen.dbt.session.num_cu,
-        'kwargs': kwargs,
-        'fdb_attr': fdb_attr
+        'kwargs': kwargs
     }
 
     worker = prep_worker(copy.deepcopy(context))
@@ -0,0 +1,127 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+from sqlalchemy import event
+
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.job_claim import JobClaimer, JobEntry
+from tuna.benchmarks import claim_bench
+
+
+def job_rows(num_jobs):
+  return {
+      ConvolutionJob: [{
+          'session': 1,
+          'config': num_jobs - idx,
+          'reason': 'pytest' if idx % 2 else 'other',
+          'fin_step': 'miopen_find_compile'
+      } for idx in range(num_jobs)]
+  }
+
+
+def get_conds():
+  return [
+      ConvolutionJob.session == 1, ConvolutionJob.valid == 1,
+      ConvolutionJob.reason == 'pytest', ConvolutionJob.retries < 10,
+      ConvolutionJob.state.in_(['new', 'compiled']),
+      ConvolutionJob.fin_step.like('%miopen_find_compile%')
+  ]
+
+
+def test_claim(sqlite_session):
+  session = sqlite_session(rows=job_rows(100))
+  claimer = JobClaimer(ConvolutionJob, batch_size=8)
+
+  jobs = claimer.claim(session,
+                       get_conds(),
+                       'compile_start',
+                       claim_num=30,
+                       order_by=[ConvolutionJob.retries, ConvolutionJob.config])
+  assert len(jobs) == 30
+  assert all(isinstance(job, JobEntry) for job in jobs)
+  assert all(job.state == 'compile_start' for job in jobs)
+  assert all(job.reason == 'pytest' for job in jobs)
+  configs = [job.config for job in jobs]
+  assert configs == sorted(configs)
+  #serializable like the textual select rows
+  assert isinstance(jobs[0].to_dict()['fin_step'], str)
+
+  rows = session.execute(
+      "SELECT id FROM conv_job WHERE state='compile_start'").fetchall()
+  assert {row[0] for row in rows} == {job.id for job in jobs}
+
+  #the remaining 20 matching jobs, nothing is claimed twice
+  jobs2 = claimer.claim(session, get_conds(), 'compile_start', claim_num=30)
+  assert len(jobs2) == 20
+  assert not {job.id for job in jobs} & {job.id for job in jobs2}
+  assert not claimer.claim(session, get_conds(), 'compile_start')
+
+
+def test_statement_count(sqlite_session):
+  session = sqlite_session(rows=job_rows(1000))
+  engine = session.bind
+  claimer = JobClaimer(ConvolutionJob, batch_size=250)
+  statements = []
+
+  def count(conn, cursor, statement, *args):
+    statements.append(statement)
+
+  event.listen(engine, 'before_cursor_execute', count)
+  jobs = claimer.claim(session, get_conds(), 'compile_start', claim_num=1000)
+  assert len(jobs) == 500
+  #one select and one UPDATE per batch of 250 ids
+  assert len([s for s in statements if s.startswith('SELECT')]) == 1
+  updates = [s for s in statements if s.startswith('UPDATE')]
+  assert len(updates) == 2
+  assert all('?' in s for s in updates)
+
+
+def test_claim_budget(sql_budget, sqlite_session):
+  session = sqlite_session(rows=job_rows(1000))
+  engine = session.bind
+  claimer = JobClaimer(ConvolutionJob, batch_size=100)
+  #one select and an UPDATE per batch
+  with sql_budget(6, engine):
+    assert len(
+        claimer.claim(session, get_conds(), 'compile_start',
+                      claim_num=500)) == 500
+
+
+def test_no_update(sqlite_session):
+  session = sqlite_session(rows=job_rows(10))
+  claimer = JobClaimer(ConvolutionJob)
+  jobs = claimer.fetch(session, get_conds())
+  assert len(jobs) == 5
+  assert claimer.update_state(session, [], 'compile_start') == 0
+  session.rollback()
+  assert len(claimer.fetch(session, get_conds())) == 5
+
+
+def test_claim_bench():
+  results = claim_bench.run(num_jobs=500, claim_num=100)
+  assert results['legacy']['jobs'] == 500
+  assert results['batched']['jobs'] == 500
+  assert results['speedup'] > 0
@@ -0,0 +1,115 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import random
+
+import pytest
+
+from tuna.benchmarks.pipeline_bench import make_workload
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionConfig, TensorTable
+from tuna.miopen.utils.job_configs import compose_job_configs, get_config_rel
+from tuna.miopen.utils.job_configs import RelationLoader, serialize_job_configs
+from tuna.utils.db_utility import gen_select_objs
+from tuna.utils.utility import SimpleDict, serialize_chunk
+
+NUM_CONFIGS = 120
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 2,
+      'max_overflow': 2
+  })
+  create_sqlite_tables(pool.engine,
+                       [TensorTable.__table__, ConvolutionConfig.__table__])
+  workload = make_workload(random.Random(7), NUM_CONFIGS, 1)
+  with pool.engine.begin() as conn:
+    conn.execute(TensorTable.__table__.insert(), workload['tensor'])
+    conn.execute(ConvolutionConfig.__table__.insert(), workload['config'])
+  prev_pool = set_db_pool(pool)
+  yield pool
+  set_db_pool(prev_pool)
+  pool.dispose()
+
+
+def get_jobs(num_jobs):
+  return [SimpleDict(id=idx, config=idx + 1) for idx in range(num_jobs)]
+
+
+def test_compose_job_configs(sqlite_db, sql_budget):
+  cfg_rel = get_config_rel(ConvolutionConfig)
+  tensor_attr = [column.name for column in TensorTable.__table__.c]
+  with DbSession() as session:
+    counts = []
+    for num_jobs in (10, NUM_CONFIGS):
+      with sql_budget(1 + len(cfg_rel), sqlite_db.engine) as profiler:
+        ret = compose_job_configs(session, get_jobs(num_jobs),
+                                  ConvolutionConfig)
+      assert len(ret) == num_jobs
+      counts.append(profiler.count())
+    #one config query and one query per relationship, whatever the batch size
+    assert counts == [1 + len(cfg_rel)] * 2
+
+    for job, cfg in ret:
+      assert cfg.id == job.config
+      for key, val in cfg_rel.items():
+        expected = gen_select_objs(session, tensor_attr, 'tensor',
+                                   f"where id={getattr(cfg, val['key'])}")[0]
+        assert getattr(cfg, key).to_dict() == expected.to_dict()
+
+
+def test_relation_loader(sqlite_db, sql_budget):
+  with DbSession() as session:
+    loader = RelationLoader(session)
+    jobs = get_jobs(NUM_CONFIGS)
+    compose_job_configs(session, jobs[:50], ConvolutionConfig, loader)
+    #tensors are served from the identity map
+    with sql_budget(1, sqlite_db.engine) as profiler:
+      ret = compose_job_configs(session, jobs[:50], ConvolutionConfig, loader)
+    assert profiler.count() == 1
+    #weight tensors are shared by configs, so are the attached objects
+    weights = {}
+    for _, cfg in ret:
+      assert weights.setdefault(cfg.weight_tensor, cfg.weight_t) is cfg.weight_t
+    assert len(weights) < len(ret)
+
+    rows = loader.load('tensor', 'id', [1, None, 1, 10**6])
+    assert 1 in rows and 10**6 not in rows and None not in rows
+
+
+def test_serialize_job_configs(sqlite_db):
+  jobs = get_jobs(NUM_CONFIGS)
+  #several jobs per config, as with one job per solver
+  jobs += get_jobs(10)
+  with DbSession() as session:
+    expected = serialize_chunk(
+        compose_job_configs(session, jobs, ConvolutionConfig))
+    assert serialize_job_configs(session, jobs, ConvolutionConfig) == expected
+    assert serialize_job_configs(session, [], ConvolutionConfig) == []
@@ -0,0 +1,282 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import pytest
+
+from tuna.db.tuna_tables import RECLAIM_STATES
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.job_claim import JobClaimer
+from tuna.utils.job_lease import LeaseKeeper, LeaseReaper, lease_values
+from tuna.utils.job_state import JobStateService, check_transition
+from tuna.utils.utility import SimpleDict
+
+TABLE = ConvolutionJob.__tablename__
+TTL = 60
+SKEW = 30
+
+
+class FakeClock():
+
+  def __init__(self, now=1000.0):
+    self.now = now
+
+  def __call__(self):
+    return self.now
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 2,
+      'max_overflow': 2
+  })
+  create_sqlite_tables(pool.engine, [ConvolutionJob.__table__])
+  prev_pool = set_db_pool(pool)
+  yield pool
+  set_db_pool(prev_pool)
+  pool.dispose()
+
+
+def add_jobs(num_jobs, state='compile_start', retries=0, **lease):
+  with DbSession() as session:
+    session.execute(ConvolutionJob.__table__.insert(), [
+        dict(session=1,
+             config=idx,
+             state=state,
+             retries=retries,
+             reason='pytest',
+             fin_step='miopen_find_compile',
+             **lease) for idx in range(num_jobs)
+    ])
+    session.commit()
+
+
+def get_rows():
+  with DbSession() as session:
+    rows = session.execute(
+        f"SELECT id, state, retries, lease_owner, lease_expiry FROM {TABLE}"
+        " ORDER BY id").fetchall()
+  return [tuple(row) for row in rows]
+
+
+def test_reclaim_states():
+  for from_state, to_state in RECLAIM_STATES.items():
+    check_transition(from_state, to_state)
+    check_transition(from_state, 'errored')
+
+
+def test_killed_worker(sqlite_db):
+  clock = FakeClock()
+  add_jobs(3, **lease_values('host:1', TTL, clock))
+  with DbSession() as session:
+    session.execute(f"UPDATE {TABLE} SET state='evaluating' WHERE id=3")
+    session.commit()
+  reaper = LeaseReaper(TABLE, skew=SKEW, clock=clock)
+
+  #expired, but still within the clock skew margin
+  clock.now += TTL + SKEW - 1
+  with DbSession() as session:
+    assert not reaper.reap(session)
+
+  clock.now += 2
+  with DbSession() as session:
+    jobs = reaper.reap(session)
+  assert [(job.id, job.from_state, job.to_state) for job in jobs
+         ] == [(1, 'compile_start', 'new'), (2, 'compile_start', 'new'),
+               (3, 'evaluating', 'compiled')]
+  assert get_rows() == [(1, 'new', 1, None, None), (2, 'new', 1, None, None),
+                        (3, 'compiled', 1, None, None)]
+
+
+def test_retries_exhausted(sqlite_db):
+  clock = FakeClock()
+  add_jobs(2, retries=1, **lease_values('host:1', TTL, clock))
+  with DbSession() as session:
+    session.execute(f"UPDATE {TABLE} SET retries=2 WHERE id=2")
+    session.commit()
+  clock.now += TTL + SKEW + 1
+  with DbSession() as session:
+    jobs = LeaseReaper(TABLE, max_retries=3, skew=SKEW,
+                       clock=clock).reap(session)
+  assert [(job.id, job.to_state, job.retries) for job in jobs
+         ] == [(1, 'new', 2), (2, 'errored', 2)]
+  assert [row[:3] for row in get_rows()] == [(1, 'new', 2), (2, 'errored', 2)]
+
+
+def test_heartbeat_clock_skew(sqlite_db):
+  reaper_clock = FakeClock()
+  #the worker's clock runs TTL / 2 behind the reaper's
+  worker_clock = FakeClock(reaper_clock.now - TTL / 2)
+  add_jobs(4, state='new')
+  keeper = LeaseKeeper(TABLE,
+                       owner='host:2',
+                       ttl=TTL,
+                       interval=3600,
+                       clock=worker_clock)
+  reaper = LeaseReaper(TABLE, skew=SKEW, clock=reaper_clock)
+  try:
+    with DbSession() as session:
+      claimed = JobClaimer(ConvolutionJob).claim(session, [], 'compile_start',
+                                                 4)
+      session.commit()
+    #the job left the queue lease behind and was claimed, not yet in flight
+    assert keeper.acquire(5) is False
+    for job in claimed[:3]:
+      assert keeper.acquire(job.id)
+    keeper.release(5)
+
+    for _ in range(10):
+      reaper_clock.now += TTL / 3
+      worker_clock.now += TTL / 3
+      assert keeper.renew() == 3
+      with DbSession() as session:
+        assert not reaper.reap(session)
+
+    #killed: no heartbeat any more
+    reaper_clock.now += TTL / 2 + SKEW + 1
+    with DbSession() as session:
+      assert [job.id for job in reaper.reap(session)] == [1, 2, 3]
+    #job 4 was claimed without a lease and is never reaped
+    assert get_rows()[3] == (4, 'compile_start', 0, None, None)
+    #the leases are gone, the worker can not renew them
+    assert keeper.renew() == 0
+  finally:
+    keeper.close()
+
+
+def test_concurrent_reapers(sqlite_db):
+  clock = FakeClock()
+  add_jobs(10, **lease_values('host:1', TTL, clock))
+  clock.now += TTL + SKEW + 1
+  reapers = [LeaseReaper(TABLE, skew=SKEW, clock=clock) for _ in range(2)]
+  with DbSession() as first, DbSession() as second:
+    jobs = reapers[0].reap(first) + reapers[1].reap(second)
+  assert sorted(job.id for job in jobs) == list(range(1, 11))
+  assert {row[1:3] for row in get_rows()} == {('new', 1)}
+
+
+def test_state_change_clears_lease(sqlite_db):
+  clock = FakeClock()
+  add_jobs(2, **lease_values('host:1', TTL, clock))
+  with JobStateService(TABLE, flush_size=1) as job_states:
+    for job_id, state in ((1, 'compiling'), (2, 'compiled')):
+      job = SimpleDict(id=job_id, state='compile_start', gpu_id=0, retries=0)
+      job_states.set_state(job, state)
+    job_states.flush()
+  rows = get_rows()
+  assert rows[0][1] == 'compiling' and rows[0][3] == 'host:1'
+  assert rows[1] == (2, 'compiled', 0, None, None)
+
+
+def test_reclaimed_task(sqlite_db):
+  clock = FakeClock()
+  add_jobs(1, **lease_values('host:1:queue:a', TTL, clock))
+  lost = LeaseKeeper(TABLE, owner='host:2', ttl=TTL, interval=3600, clock=clock)
+  copy = LeaseKeeper(TABLE, owner='host:3', ttl=TTL, interval=3600, clock=clock)
+  reaper = LeaseReaper(TABLE, skew=SKEW, clock=clock)
+  try:
+    assert lost.acquire(1, 'host:1:queue:a')
+    #the worker hangs, its lease runs out and the job is claimed again
+    clock.now += TTL + SKEW + 1
+    with DbSession() as session:
+      assert [job.id for job in reaper.reap(session)] == [1]
+      claimer = JobClaimer(ConvolutionJob)
+      claimer.update_state(session, claimer.fetch(session, [], 1),
+                           'compile_start',
+                           lease_values('host:1:queue:b', TTL, clock))
+      session.commit()
+    #a queued duplicate of the first task does not run
+    assert not copy.acquire(1, 'host:1:queue:a')
+    assert copy.acquire(1, 'host:1:queue:b')
+    #the late result of the lost task is dropped, the copy's counts
+    assert not lost.release(1)
+    assert copy.release(1)
+    #done, the lease now waits for the result to be stored
+    assert get_rows()[0] == (1, 'compile_start', 1, 'host:3',
+                             clock.now + copy.result_ttl)
+  finally:
+    lost.close()
+    copy.close()
+
+
+def test_released_job(sqlite_db):
+  clock = FakeClock()
+  add_jobs(2, **lease_values('host:1:queue:a', TTL, clock))
+  keeper = LeaseKeeper(TABLE,
+                       owner='host:2',
+                       ttl=TTL,
+                       interval=3600,
+                       result_ttl=10 * TTL,
+                       clock=clock)
+  reaper = LeaseReaper(TABLE, skew=SKEW, clock=clock)
+  try:
+    for job_id in (1, 2):
+      assert keeper.acquire(job_id, 'host:1:queue:a')
+      assert keeper.release(job_id)
+    #the result of job 1 is stored, the one of job 2 is lost
+    with JobStateService(TABLE, flush_size=1) as job_states:
+      job = SimpleDict(id=1, state='compile_start', gpu_id=0, retries=0)
+      job_states.set_state(job, 'compiled')
+      job_states.flush()
+
+    clock.now += 10 * TTL
+    with DbSession() as session:
+      assert not reaper.reap(session)
+    clock.now += SKEW + 1
+    with DbSession() as session:
+      assert [(job.id, job.to_state) for job in reaper.reap(session)
+             ] == [(2, 'new')]
+    assert get_rows() == [(1, 'compiled', 0, None, None),
+                          (2, 'new', 1, None, None)]
+  finally:
+    keeper.close()
+
+
+def test_queue_lease_expired(sqlite_db):
+  clock = FakeClock()
+  add_jobs(2, retries=2, **lease_values('host:1:queue:a', TTL, clock))
+  keeper = LeaseKeeper(TABLE,
+                       owner='host:2',
+                       ttl=TTL,
+                       interval=3600,
+                       clock=clock)
+  try:
+    assert keeper.acquire(2, 'host:1:queue:a')
+    #workers are down, job 1 waits in the queue past its lease
+    clock.now += TTL + SKEW + 1
+    with DbSession() as session:
+      jobs = LeaseReaper(TABLE, max_retries=3, skew=SKEW,
+                         clock=clock).reap(session)
+    #only the job a worker took over is charged a retry
+    assert [(job.id, job.to_state, job.retries) for job in jobs
+           ] == [(1, 'new', 2), (2, 'errored', 2)]
+    assert get_rows() == [(1, 'new', 2, None, None),
+                          (2, 'errored', 2, None, None)]
+  finally:
+    keeper.close()
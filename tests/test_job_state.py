@@ -0,0 +1,216 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import json
+
+import pytest
+from sqlalchemy import event
+
+from tuna.benchmarks import state_bench
+from tuna.db.tuna_tables import JobEnum
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.job_state import IllegalTransition, JobStateService
+from tuna.utils.job_state import JsonlAudit, check_transition
+from tuna.utils.utility import SimpleDict
+
+TABLE = ConvolutionJob.__tablename__
+
+
+class FakeClock():
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+def job_rows(num_jobs, state='compile_start'):
+  return {
+      ConvolutionJob: [{
+          'session': 1,
+          'config': idx,
+          'state': state,
+          'reason': 'pytest',
+          'fin_step': 'miopen_find_compile'
+      } for idx in range(num_jobs)]
+  }
+
+
+def get_jobs(num_jobs, state='compile_start'):
+  return [
+      SimpleDict(id=idx + 1, state=state, gpu_id=idx % 4, retries=0)
+      for idx in range(num_jobs)
+  ]
+
+
+def get_states(session):
+  rows = session.execute(
+      f"SELECT id, state, result, retries FROM {TABLE} ORDER BY id").fetchall()
+  return [tuple(row) for row in rows]
+
+
+def test_check_transition():
+  check_transition('new', 'compile_start')
+  check_transition('compile_start', 'compiled')
+  check_transition('compiled', 'eval_start')
+  check_transition('eval_start', 'compiled')
+  check_transition(JobEnum.running, 'completed')
+  #resets and errors are allowed from anywhere, as is staying in a state
+  check_transition('evaluated', 'new')
+  check_transition('compiling', 'errored')
+  check_transition('evaluated', 'evaluated')
+  check_transition(None, 'compiled')
+
+  for from_state, to_state in (('new', 'evaluated'), ('evaluated', 'compiled'),
+                               ('compiled', 'compile_start'),
+                               ('completed', 'running'), ('new', 'bogus')):
+    with pytest.raises(IllegalTransition):
+      check_transition(from_state, to_state)
+
+
+def test_illegal_transition():
+  job_states = JobStateService(TABLE, audit=[])
+  job = get_jobs(1, 'new')[0]
+  with pytest.raises(IllegalTransition):
+    job_states.set_state(job, 'evaluated', result='skipped a step')
+  assert job.state == 'new'
+  assert not hasattr(job, 'result')
+  assert not job_states.pending
+
+
+def test_buffered_flush(sqlite_session):
+  session = sqlite_session([ConvolutionJob], job_rows(110))
+  engine = session.bind
+  clock = FakeClock()
+  job_states = JobStateService(TABLE,
+                               flush_size=60,
+                               flush_delay=2.0,
+                               audit=[],
+                               clock=clock)
+  statements = []
+  event.listen(engine, 'before_cursor_execute',
+               lambda *args: statements.append(args[2]))
+
+  jobs = get_jobs(110)
+  for job in jobs[:50]:
+    job_states.set_state(job, 'compiled', result=f"result {job.id}")
+  #a second change of a job is merged into its pending change
+  job_states.set_state(jobs[0], 'errored', increment_retries=True)
+  assert len(job_states.pending) == 50
+  assert not job_states.due()
+  assert not statements
+
+  clock.now = 2.0
+  assert job_states.due()
+  assert job_states.flush_if_due(session) == 50
+  #one UPDATE per set of columns, the distinct results go through CASE
+  assert len(statements) == 2
+  assert sum('CASE' in stmt for stmt in statements) == 1
+  rows = get_states(session)
+  assert rows[0] == (1, 'errored', 'result 1', 1)
+  assert rows[1:50] == [
+      (idx, 'compiled', f"result {idx}", 0) for idx in range(2, 51)
+  ]
+  assert all(row[1] == 'compile_start' for row in rows[50:])
+  assert not job_states.due()
+
+  for job in jobs[50:109]:
+    job_states.set_state(job, 'compiled')
+  assert not job_states.due()
+  #full before the delay ran out
+  job_states.set_state(jobs[109], 'compiled')
+  assert job_states.due()
+  assert job_states.flush(session) == 60
+  assert all(row[1] == 'compiled' for row in get_states(session)[50:])
+  assert job_states.flush(session) == 0
+
+
+def test_crash_safe_flush(monkeypatch, sqlite_session):
+  session = sqlite_session([ConvolutionJob], job_rows(30))
+  engine = session.bind
+  job_states = JobStateService(TABLE, audit=[])
+  monkeypatch.setattr('tuna.utils.job_state.UPDATE_BATCH_SIZE', 10)
+  jobs = get_jobs(30)
+  for job in jobs:
+    job_states.set_state(job, 'compiled', result=f"result {job.id}")
+
+  #the connection drops after the first statement of the flush
+  executed = []
+
+  def fail_second(*_args):
+    executed.append(1)
+    if len(executed) == 2:
+      raise ConnectionError('connection lost')
+
+  event.listen(engine, 'before_cursor_execute', fail_second)
+  with pytest.raises(ConnectionError):
+    job_states.flush(session)
+  event.remove(engine, 'before_cursor_execute', fail_second)
+
+  #nothing was written and nothing was lost
+  assert all(row[1] == 'compile_start' for row in get_states(session))
+  assert len(job_states.pending) == 30
+
+  assert job_states.flush(session) == 30
+  assert get_states(session) == [
+      (job.id, 'compiled', f"result {job.id}", 0) for job in jobs
+  ]
+
+
+def test_audit(tmp_path, sqlite_session):
+  session = sqlite_session([ConvolutionJob], job_rows(10))
+  audit_file = tmp_path / 'audit.jsonl'
+  job_states = JobStateService(TABLE, audit=[JsonlAudit(str(audit_file))])
+  jobs = get_jobs(10)
+  for job in jobs[:3]:
+    job_states.set_state(job, 'compiled', result='Success')
+  job_states.set_state(jobs[1], 'errored', increment_retries=True)
+  job_states.flush(session)
+
+  assert job_states.transition_where(session, 'compile_start', 'new',
+                                     {'session': 1}) == 7
+  assert [row[1] for row in get_states(session)
+         ] == ['compiled', 'errored', 'compiled'] + ['new'] * 7
+  with pytest.raises(IllegalTransition):
+    job_states.transition_where(session, 'new', 'evaluated', {'session': 1})
+
+  records = [json.loads(line) for line in audit_file.read_text().splitlines()]
+  assert [(rec['job'], rec['from'], rec['to']) for rec in records] == [
+      (1, 'compile_start', 'compiled'), (2, 'compile_start', 'errored'),
+      (3, 'compile_start', 'compiled'), (None, 'compile_start', 'new')
+  ]
+  assert records[1]['retries'] == 1
+  assert records[3]['count'] == 7
+  assert records[3]['where'] == {'session': 1}
+  assert all(rec['table'] == TABLE for rec in records)
+
+
+def test_state_bench():
+  res = state_bench.run(num_jobs=1000, flush_size=200)
+  assert res['legacy']['jobs'] == 1000
+  assert res['buffered']['jobs'] == 1000
+  assert res['speedup'] > 2
@@ -0,0 +1,102 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import base64
+import sqlite3
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.benchmarks import kdb_bench
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionKernelCache
+from tuna.miopen.utils.kdb_writer import KdbWriter, get_kdb_key
+from tuna.utils.utility import SimpleDict
+
+
+def get_kernel(group, name, args, blob):
+  return {
+      'kernel_group': group,
+      'kernel_name': name,
+      'kernel_args': args,
+      'kernel_blob': base64.b64encode(blob),
+      'kernel_hash': name,
+      'uncompressed_size': len(blob),
+      'valid': 1
+  }
+
+
+def test_kdb_key():
+  assert get_kdb_key('conv', '-DX', 'gfx90a') == ('conv.o', '-DX -mcpu=gfx90a')
+  assert get_kdb_key('conv.o', '-mcpu=gfx908',
+                     'gfx90a') == ('conv.o', '-mcpu=gfx908')
+  assert get_kdb_key('conv.mlir', '-DX', 'gfx90a') == ('conv.mlir.o', '-DX')
+
+
+def test_kdb_writer(tmp_path):
+  engine = create_engine(f"sqlite:///{tmp_path / 'tuna.db'}")
+  create_sqlite_tables(engine, [ConvolutionKernelCache.__table__])
+  session = sessionmaker(bind=engine)()
+  session.execute(ConvolutionKernelCache.__table__.insert(), [
+      get_kernel(1, 'a', '-DA', b'a1'),
+      get_kernel(2, 'b', '-DB', b'b2'),
+      get_kernel(2, 'a.o', '-DA', b'a2'),
+      get_kernel(3, 'c', '-DC', b'c3'),
+      dict(get_kernel(2, 'd', '-DD', b'd2'), valid=0)
+  ])
+  session.commit()
+
+  #slowest entry of key_x points at group 1, group 2 goes first
+  find_db = {
+      'key_y': [SimpleDict(kernel_time='2.0', kernel_group=2)],
+      'key_x': [
+          SimpleDict(kernel_time='9.0', kernel_group=1),
+          SimpleDict(kernel_time='3.0', kernel_group=3)
+      ],
+      'key_z': [SimpleDict(kernel_time='1.0', kernel_group=1)]
+  }
+  file_name = str(tmp_path / 'test.kdb')
+  writer = KdbWriter('gfx90a', workers=2, fetch_batch=2)
+  assert writer.export(session, ConvolutionKernelCache, find_db, file_name) == 3
+  assert writer.counts == {'kernels': 4, 'duplicates': 1, 'written': 3}
+
+  cnx = sqlite3.connect(file_name)
+  rows = cnx.execute(
+      'SELECT kernel_name, kernel_args, kernel_blob FROM kern_db '
+      'ORDER BY id').fetchall()
+  index = cnx.execute("SELECT name FROM sqlite_master WHERE type='index' "
+                      "AND tbl_name='kern_db'").fetchall()
+  cnx.close()
+  assert rows == [('b.o', '-DB -mcpu=gfx90a', b'b2'),
+                  ('a.o', '-DA -mcpu=gfx90a', b'a2'),
+                  ('c.o', '-DC -mcpu=gfx90a', b'c3')]
+  assert ('idx_kern_db',) in index
+
+
+def test_kdb_bench():
+  results = kdb_bench.run(num_kernels=400, per_key=3, workers=2)
+  assert results['identical']
+  assert results['batched']['kernels'] == results['legacy']['kernels']
@@ -0,0 +1,204 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import multiprocessing
+import urllib.request
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import generate_latest, values
+from prometheus_client.multiprocess import mark_process_dead
+from sqlalchemy import create_engine
+
+from tuna.utils import metrics
+from tuna.utils.metrics import FunctionGauge, get_registry
+from tuna.utils.sql_profiler import SqlProfiler
+
+NUM_PROCS = 3
+
+
+def make_metrics(registry):
+  return {
+      'claimed':
+          Counter('test_jobs_claimed',
+                  'Jobs claimed', ['table'],
+                  registry=registry),
+      'busy':
+          Gauge('test_busy',
+                'Busy workers',
+                registry=registry,
+                multiprocess_mode='liveall'),
+      'step':
+          Histogram('test_step_seconds',
+                    'Step time',
+                    registry=registry,
+                    buckets=(0.1, 1.0))
+  }
+
+
+def get_samples(registry):
+  samples = {}
+  for line in generate_latest(registry).decode('utf-8').splitlines():
+    if line and not line.startswith('#'):
+      name, value = line.rsplit(' ', 1)
+      samples[name] = float(value)
+  return samples
+
+
+@pytest.fixture
+def multiprocess_dir(tmp_path, monkeypatch):
+  """metrics created in the test keep their values in tmp_path"""
+  monkeypatch.setenv(metrics.METRICS_DIR_ENV, str(tmp_path))
+  monkeypatch.setattr(values, 'ValueClass', values.MultiProcessValue())
+  return str(tmp_path)
+
+
+def test_metrics():
+  registry = CollectorRegistry()
+  mets = make_metrics(registry)
+  mets['claimed'].labels('conv_job').inc(3)
+  mets['claimed'].labels(table='conv_job').inc()
+  for value in (0.05, 0.5, 0.5, 2):
+    mets['step'].observe(value)
+
+  samples = get_samples(registry)
+  assert samples['test_jobs_claimed_total{table="conv_job"}'] == 4
+  assert samples['test_step_seconds_bucket{le="0.1"}'] == 1
+  assert samples['test_step_seconds_bucket{le="1.0"}'] == 3
+  assert samples['test_step_seconds_bucket{le="+Inf"}'] == 4
+  assert samples['test_step_seconds_sum'] == 3.05
+
+  depth = FunctionGauge('test_queue_depth', 'Queue depth', registry)
+  assert 'test_queue_depth' not in get_samples(registry)
+  depth.set_function(lambda: 11)
+  assert get_samples(registry)['test_queue_depth'] == 11
+  depth.set_function(None)
+  assert 'test_queue_depth' not in get_samples(registry)
+
+
+def child_work(mets, idx):
+  mets['claimed'].labels('conv_job').inc(10)
+  mets['busy'].set(idx)
+  with mets['step'].time():
+    pass
+
+
+def test_multiprocess(multiprocess_dir):
+  mets = make_metrics(CollectorRegistry())
+  mets['claimed'].labels('conv_job').inc(1)
+
+  ctx = multiprocessing.get_context('fork')
+  procs = [
+      ctx.Process(target=child_work, args=(mets, idx))
+      for idx in range(NUM_PROCS)
+  ]
+  for proc in procs:
+    proc.start()
+  for proc in procs:
+    proc.join()
+    assert proc.exitcode == 0
+
+  registry = get_registry(multiprocess_dir)
+  samples = get_samples(registry)
+  assert samples['test_jobs_claimed_total{table="conv_job"}'] == \
+      1 + 10 * NUM_PROCS
+  assert samples['test_step_seconds_count'] == NUM_PROCS
+  busy = {
+      name: value
+      for name, value in samples.items()
+      if name.startswith('test_busy')
+  }
+  #the gauge of this process is created with the metric
+  assert busy.pop(f'test_busy{{pid="{os.getpid()}"}}') == 0
+  assert sorted(busy.values()) == list(range(NUM_PROCS))
+  assert f'test_busy{{pid="{procs[0].pid}"}}' in busy
+
+  #counters of finished processes are kept, their gauges dropped
+  mark_process_dead(procs[0].pid, multiprocess_dir)
+  samples = get_samples(registry)
+  assert f'test_busy{{pid="{procs[0].pid}"}}' not in samples
+  assert samples['test_jobs_claimed_total{table="conv_job"}'] == \
+      1 + 10 * NUM_PROCS
+
+  #function gauges of the exporting process are merged in
+  metrics.QUEUE_DEPTH.set_function(lambda: 7)
+  try:
+    assert get_samples(registry)['tuna_queue_depth'] == 7
+  finally:
+    metrics.QUEUE_DEPTH.set_function(None)
+
+
+def test_exporters(tmp_path, monkeypatch):
+  textfile = tmp_path / 'tuna.prom'
+  monkeypatch.delenv(metrics.METRICS_DIR_ENV, raising=False)
+  monkeypatch.setenv(metrics.METRICS_PORT_ENV, '0')
+  monkeypatch.setenv(metrics.TEXTFILE_ENV, str(textfile))
+  monkeypatch.setattr(values, 'ValueClass', values.ValueClass)
+  monkeypatch.setattr(metrics, 'OWNED_DIR', metrics.init_metrics_dir())
+  metrics_dir = metrics.OWNED_DIR
+  assert os.environ[metrics.METRICS_DIR_ENV] == metrics_dir
+
+  claimed = make_metrics(CollectorRegistry())['claimed']
+  claimed.labels('conv_job').inc(2)
+  exporters = metrics.start_exporters()
+  try:
+    addr, port = exporters[0].server_address
+    with urllib.request.urlopen(f"http://{addr}:{port}/metrics",
+                                timeout=10) as resp:
+      assert resp.status == 200
+      body = resp.read().decode('utf-8')
+  finally:
+    metrics.stop_exporters(exporters)
+  assert 'test_jobs_claimed_total{table="conv_job"} 2.0\n' in body
+  assert 'test_jobs_claimed_total{table="conv_job"} 2.0\n' in \
+      textfile.read_text()
+
+  #the multiprocess dir goes with the exporters
+  assert not os.path.exists(metrics_dir)
+  assert metrics.METRICS_DIR_ENV not in os.environ
+  assert values.ValueClass is values.MutexValue
+
+
+def test_db_statement_time():
+  engine = create_engine('sqlite://')
+  metrics.attach_db_metrics(engine)
+  profiler = SqlProfiler()
+  profiler.attach(engine)
+  name = 'tuna_db_statement_seconds_count'
+  before = metrics.REGISTRY.get_sample_value(name)
+  with engine.connect() as conn:
+    for _ in range(5):
+      conn.execute('SELECT 1')
+  assert metrics.REGISTRY.get_sample_value(name) == before + 5
+  assert profiler.count() == 5
+
+  #both share one listener pair, which outlives the profiler
+  profiler.detach()
+  with engine.connect() as conn:
+    conn.execute('SELECT 1')
+  assert metrics.REGISTRY.get_sample_value(name) == before + 6
+  assert profiler.count() == 5
@@ -0,0 +1,85 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import copy
+import json
+
+from tuna.db_engine import get_db_pool
+from tuna.benchmarks import compare, pipeline_bench
+
+
+def test_pipeline_bench(tmp_path):
+  prev_pool = get_db_pool()
+  cwd = os.getcwd()
+  args = pipeline_bench.get_parser().parse_args(
+      ['--num_jobs', '30', '--claim_num', '8', '--num_kernels', '20'])
+  results = pipeline_bench.run(args)
+  #the process wide pool and working directory are restored
+  assert get_db_pool() is prev_pool
+  assert os.getcwd() == cwd
+
+  stages = results['stages']
+  assert list(stages) == [
+      'get_jobs', 'serialize_jobs', 'enqueue', 'compile_results',
+      'eval_results', 'export_fdb', 'export_kdb', 'merge_db'
+  ]
+  for stage in ('get_jobs', 'serialize_jobs', 'enqueue', 'compile_results',
+                'eval_results', 'export_fdb'):
+    assert stages[stage]['items'] == 30
+  #4 claimed batches and the empty one that ends the loop
+  assert stages['get_jobs']['count'] == 5
+  assert stages['enqueue']['queued'] == 30
+  assert stages['compile_results']['count'] == 30
+  assert stages['export_kdb']['items'] > 0
+  #every master key, plus merge_factor new keys per master key
+  assert stages['merge_db']['items'] == 30 * (1 + args.merge_factor)
+  for vals in stages.values():
+    assert vals['p50_ms'] <= vals['p90_ms'] <= vals['p99_ms'] <= vals['max_ms']
+    assert vals['peak_mem_kb'] > 0
+  assert results['meta']['num_jobs'] == 30
+
+  #a run compared with itself has no regressions
+  base_file = tmp_path / 'base.json'
+  base_file.write_text(json.dumps(results))
+  assert compare.main([str(base_file), str(base_file)]) == 0
+
+  slower = copy.deepcopy(results)
+  slower['stages']['compile_results']['items_per_sec'] /= 2
+  slower['stages']['merge_db']['peak_mem_kb'] *= 1.05
+  rows = compare.compare_results(results, slower)
+  assert {(row['stage'], row['metric']) for row in rows if row['regression']
+         } == {('compile_results', 'items_per_sec')}
+  rows = compare.compare_results(results, slower, threshold=0.01)
+  assert {
+      (row['stage'], row['metric']) for row in rows if row['regression']
+  } == {('compile_results', 'items_per_sec'), ('merge_db', 'peak_mem_kb')}
+  new_file = tmp_path / 'new.json'
+  new_file.write_text(json.dumps(slower))
+  assert compare.main([str(base_file), str(new_file)]) == 1
+  assert compare.main(
+      [str(base_file),
+       str(new_file), '--metrics', 'p50_ms', 'peak_mem_kb']) == 0
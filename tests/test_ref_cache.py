@@ -0,0 +1,234 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import pytest
+
+from tuna.db.ref_version import RefVersion
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.machine import Machine
+from tuna.miopen.db.solver import Solver, get_id_solvers, get_solver_ids
+from tuna.miopen.db.tensortable import TensorTable
+from tuna.miopen.driver.convolution import DriverConvolution
+from tuna.utils import ref_cache
+from tuna.utils.ref_cache import RefCache, get_version
+from tuna.utils.utility import check_qts
+
+TTL = 10
+
+
+class Clock():
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class Loader():
+
+  def __init__(self):
+    self.calls = 0
+
+  def __call__(self):
+    self.calls += 1
+    return {'calls': self.calls}
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 2,
+      'max_overflow': 2
+  })
+  create_sqlite_tables(
+      pool.engine, [RefVersion.__table__, Solver.__table__, Machine.__table__])
+  prev_pool = set_db_pool(pool)
+  yield pool
+  set_db_pool(prev_pool)
+  pool.dispose()
+
+
+@pytest.fixture
+def process_cache(monkeypatch):
+  cache = RefCache(ttl=TTL, snapshot_dir='')
+  monkeypatch.setattr(ref_cache, '_REF_CACHE', cache)
+  return cache
+
+
+def test_ttl_and_version(sqlite_db, sql_budget):
+  clock = Clock()
+  cache = RefCache(ttl=TTL, clock=clock)
+  other = RefCache(ttl=TTL, clock=clock)
+  loader = Loader()
+
+  assert cache.get('solver', loader) == {'calls': 1}
+  with sql_budget(0, sqlite_db.engine):
+    assert cache.get('solver', loader) == {'calls': 1}
+
+  #expired, one version query and the entry is kept
+  clock.now += TTL
+  with sql_budget(1, sqlite_db.engine) as profiler:
+    assert cache.get('solver', loader) == {'calls': 1}
+  assert profiler.count() == 1
+
+  #another worker wrote the table, reloaded on expiry only
+  other.bump('solver')
+  other.bump('solver')
+  with DbSession() as session:
+    assert get_version(session, 'solver') == 2
+  assert cache.get('solver', loader) == {'calls': 1}
+  clock.now += TTL
+  assert cache.get('solver', loader) == {'calls': 2}
+  assert loader.calls == 2
+
+  stats = cache.stats()
+  assert stats['solver'] == {
+      'hits': 2,
+      'revalidated': 1,
+      'snapshot': 0,
+      'loads': 2,
+      'hit_rate': 0.6
+  }
+  assert stats['total'] == stats['solver']
+
+
+def test_snapshot(sqlite_db, tmp_path):
+  snap_dir = str(tmp_path / 'snapshots')
+  writer = RefCache(ttl=TTL, snapshot_dir=snap_dir)
+  writer.get('machine', Loader())
+
+  #a new worker starts warm from the snapshot
+  reader = RefCache(ttl=TTL, snapshot_dir=snap_dir)
+  loader = Loader()
+  assert reader.get('machine', loader) == {'calls': 1}
+  assert not loader.calls
+  assert reader.stats()['machine']['snapshot'] == 1
+
+  #bumped versions make the snapshot stale
+  writer.bump('machine')
+  cold = RefCache(ttl=TTL, snapshot_dir=snap_dir)
+  assert cold.get('machine', loader) == {'calls': 1}
+  assert loader.calls == 1
+
+
+def test_no_version_table(tmp_path):
+  pool = DbPool(f"sqlite:///{tmp_path / 'empty.db'}", {
+      'pool_size': 1,
+      'max_overflow': 1
+  })
+  prev_pool = set_db_pool(pool)
+  try:
+    clock = Clock()
+    cache = RefCache(ttl=TTL, clock=clock)
+    loader = Loader()
+    cache.get('tensor', loader)
+    cache.get('tensor', loader)
+    clock.now += TTL
+    #without counters an entry is reloaded every TTL
+    cache.get('tensor', loader)
+    assert loader.calls == 2
+  finally:
+    set_db_pool(prev_pool)
+    pool.dispose()
+
+
+def test_solver_maps(sqlite_db, process_cache, sql_budget):
+  with sqlite_db.engine.begin() as conn:
+    conn.execute(Solver.__table__.insert(), [{
+        'id': 1,
+        'solver': 'ConvDirectNaiveConvFwd'
+    }, {
+        'id': 2,
+        'solver': 'GemmFwd1x1_0_1, int8'
+    }])
+    conn.execute(Solver.__table__.insert(), [{
+        'id': 3,
+        'solver': 'ConvOldSolver',
+        'valid': 0
+    }])
+
+  solver_ids = get_solver_ids()
+  assert solver_ids == {
+      'ConvDirectNaiveConvFwd': 1,
+      'GemmFwd1x1_0_1, int8': 2,
+      'GemmFwd1x1_0_1-int8': 2
+  }
+  with sql_budget(0, sqlite_db.engine):
+    id_solver_c, id_solver_h = get_id_solvers()
+    #callers get copies of the cached maps
+    get_solver_ids().clear()
+    assert get_solver_ids() == solver_ids
+  assert id_solver_c == {1: 'ConvDirectNaiveConvFwd', 2: 'GemmFwd1x1_0_1, int8'}
+  assert id_solver_h == {1: 'ConvDirectNaiveConvFwd', 2: 'GemmFwd1x1_0_1-int8'}
+
+  with sqlite_db.engine.begin() as conn:
+    conn.execute(Solver.__table__.insert(), [{'id': 4, 'solver': 'ConvNew'}])
+  process_cache.bump(Solver.__tablename__)
+  assert get_solver_ids()['ConvNew'] == 4
+
+
+def test_check_qts(sqlite_db, process_cache):
+  machine = {'port': 22, 'user': 'tuna', 'password': '', 'avail_gpus': ''}
+  with sqlite_db.engine.begin() as conn:
+    conn.execute(Machine.__table__.insert(), [
+        dict(machine,
+             hostname='inner',
+             local_ip='10.0.0.1',
+             remarks=None,
+             arch='gfx90a'),
+        dict(machine,
+             hostname='outer',
+             local_ip=None,
+             remarks='lab',
+             arch='gfx908')
+    ])
+
+  assert check_qts('192.168.0.7')
+  assert check_qts('inner')
+  assert check_qts('10.0.0.1')
+  assert not check_qts('outer')
+  assert not check_qts('lab')
+  assert not check_qts('unknown')
+  assert process_cache.stats()['machine']['loads'] == 1
+
+
+def test_tensor_ids(sqlite_db, process_cache, sql_budget):
+  create_sqlite_tables(sqlite_db.engine, [TensorTable.__table__])
+  cmd = './bin/MIOpenDriver conv -n 128 -c 1024 -H 14 -W 14 -k 2048 -y 1'\
+        ' -x 1 -p 0 -q 0 -u 2 -v 2 -l 1 -j 1 -m conv -g 1 -F 1 -t 1'
+  driver = DriverConvolution(cmd)
+  input_id = driver.get_input_t_id()
+  weight_id = driver.get_weight_t_id()
+  assert input_id != weight_id
+
+  #tensors known to the cache need no query
+  with sql_budget(0, sqlite_db.engine):
+    assert DriverConvolution(cmd).get_input_t_id() == input_id
+    assert DriverConvolution(cmd).get_weight_t_id() == weight_id
+  assert process_cache.stats()['tensor']['loads'] == 1
@@ -0,0 +1,260 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from multiprocessing import Value, Lock
+
+from tuna.celery_app.result_collector import LEASE_LOST_KEY, ResultCollector
+from tuna.celery_app.result_collector import get_dead_letter_list
+from tuna.celery_app.result_collector import get_processing_list
+from tuna.celery_app.result_collector import get_result_list
+from tuna.celery_app.result_collector import get_task_prefix, push_result_key
+from tuna.celery_app.result_collector import get_result_lag
+
+UUID = '0c5a6a5e-3a4f-4b5c-9a4e-6f1c2b3d4e5f'
+
+
+class MemPipeline():
+  """buffers commands and runs them on execute, like a MULTI/EXEC"""
+
+  def __init__(self, client, transaction):
+    self.client = client
+    self.transaction = transaction
+    self.cmds = []
+
+  def __getattr__(self, name):
+
+    def buffer(*args, **kwargs):
+      self.cmds.append((name, args, kwargs))
+      return self
+
+    return buffer
+
+  async def execute(self):
+    self.client.transactions += self.transaction
+    return [
+        getattr(self.client, name)(*args, **kwargs)
+        for name, args, kwargs in self.cmds
+    ]
+
+
+class MemRedis():
+  """in-memory stand in for the subset of the redis client used"""
+
+  def __init__(self):
+    self.data = {}
+    self.lists = {}
+    self.transactions = 0
+
+  def rpush(self, name, *values):
+    self.lists.setdefault(name, []).extend(values)
+
+  async def lrange(self, name, start, end):
+    values = self.lists.get(name, [])
+    return values[start:] if end == -1 else values[start:end + 1]
+
+  def lrem(self, name, count, value):
+    values = self.lists.get(name, [])
+    for _ in range(count):
+      if value in values:
+        values.remove(value)
+
+  def lmove(self, src, dst):
+    if not self.lists.get(src):
+      return None
+    value = self.lists[src].pop(0)
+    self.rpush(dst, value)
+    return value
+
+  async def blmove(self, src, dst, timeout):
+    if not self.lists.get(src):
+      await asyncio.sleep(timeout / 100)
+    return self.lmove(src, dst)
+
+  def execute_command(self, name, src, dst, *args):
+    assert args[:2] == ('LEFT', 'RIGHT')
+    if name == 'BLMOVE':
+      return self.blmove(src, dst, args[2])
+    return self.lmove(src, dst)
+
+  def delete(self, *keys):
+    for key in keys:
+      self.data.pop(key, None)
+
+  def pipeline(self, transaction=True):
+    return MemPipeline(self, transaction)
+
+  async def mget(self, keys):
+    return [self.data.get(key) for key in keys]
+
+
+class MemBackend():
+  """backend key naming of celery's redis backend"""
+
+  def get_key_for_task(self, task_id):
+    return f"celery-task-meta-{task_id}".encode()
+
+
+def store(client, prefix, idx):
+  task_id = f"{prefix}-{UUID}" if prefix else UUID
+  key = MemBackend().get_key_for_task(task_id + str(idx))
+  client.data[key] = json.dumps({'result': {'ret': idx}}).encode()
+  client.rpush(get_result_list(prefix), key)
+  return key
+
+
+def test_task_prefix():
+  prefix = 'd_tuna_sess_1_miopen_find_compile'
+  assert get_task_prefix(f"{prefix}-{UUID}") == prefix
+  assert get_task_prefix(UUID) is None
+  assert get_task_prefix(None) is None
+  assert get_result_list(prefix) == f"tuna-results-{prefix}"
+  assert get_result_list(None) == 'tuna-results'
+
+  client = MemRedis()
+  assert push_result_key(client, MemBackend(),
+                         f"{prefix}-{UUID}") == get_result_list(prefix)
+  assert client.lists[get_result_list(prefix)] == [
+      f"celery-task-meta-{prefix}-{UUID}".encode()
+  ]
+
+
+def test_collect():
+  client = MemRedis()
+  num_results = 25
+  for idx in range(num_results):
+    store(client, 'pfx', idx)
+  store(client, 'other', 0)
+
+  parsed = []
+  collector = ResultCollector(client,
+                              'pfx',
+                              lambda data: parsed.append(json.loads(data)),
+                              batch_size=10,
+                              max_workers=4)
+  job_counter = Value('i', num_results)
+  assert asyncio.run(collector.run(job_counter, Lock()))
+
+  assert job_counter.value == 0
+  assert sorted(res['result']['ret'] for res in parsed) == list(
+      range(num_results))
+  #only the other prefix is left, acked after 3 drains of 10 keys
+  assert len(client.data) == 1
+  assert client.lists[get_result_list('other')]
+  assert not client.lists[get_result_list('pfx')]
+  assert not client.lists[get_processing_list('pfx')]
+  assert client.transactions == 3
+
+
+def test_failed_parse():
+  client = MemRedis()
+  keys = [store(client, None, idx) for idx in range(4)]
+  client.data.pop(keys[3])
+
+  def handler(data):
+    if json.loads(data)['result']['ret'] == 1:
+      raise ValueError('bad result')
+    return True
+
+  collector = ResultCollector(client, None, handler, batch_size=10)
+  job_counter = Value('i', 3)
+  assert asyncio.run(collector.run(job_counter, Lock()))
+  assert job_counter.value == 0
+  #failed results are kept and dead lettered, missing results are not counted
+  assert list(client.data.keys()) == [keys[1]]
+  assert client.lists[get_dead_letter_list()] == [keys[1]]
+  assert not client.lists[get_processing_list()]
+
+
+def test_result_lag():
+  now = datetime(2024, 5, 1, 12, 0, 30, tzinfo=timezone.utc)
+  data = json.dumps({
+      'status': 'SUCCESS',
+      'result': {
+          'ret': 1
+      },
+      'date_done': '2024-05-01T12:00:00.500000'
+  })
+  assert get_result_lag(data, now) == 29.5
+  aware = data.replace('12:00:00.500000', '12:00:10+00:00')
+  assert get_result_lag(aware, now) == 20
+  assert get_result_lag(json.dumps({'result': {'ret': 1}}), now) is None
+  assert get_result_lag('{"date_done": "yesterday"}', now) is None
+
+
+def test_lease_lost():
+  client = MemRedis()
+  keys = [store(client, None, idx) for idx in range(3)]
+  client.data[keys[1]] = json.dumps({
+      'result': {
+          'ret': 1,
+          LEASE_LOST_KEY: True
+      }
+  }).encode()
+  parsed = []
+  collector = ResultCollector(client, None,
+                              lambda data: parsed.append(json.loads(data)))
+  job_counter = Value('i', 2)
+  assert asyncio.run(collector.run(job_counter, Lock()))
+  #the stale result is acked but neither parsed nor counted
+  assert job_counter.value == 0
+  assert sorted(res['result']['ret'] for res in parsed) == [0, 2]
+  assert not client.data
+
+
+def test_unacked_results():
+  client = MemRedis()
+  keys = [store(client, None, idx) for idx in range(6)]
+  parsed = []
+  collector = ResultCollector(client,
+                              None,
+                              lambda data: parsed.append(json.loads(data)),
+                              batch_size=4)
+  #the consumer dies between drain and ack
+  assert asyncio.run(collector.drain()) == keys[:4]
+  assert client.lists[get_processing_list()] == keys[:4]
+
+  #a failing ack keeps the keys of that pass too
+  fail = [True]
+  ack = collector.ack
+
+  async def flaky_ack(done, failed):
+    if fail:
+      fail.pop()
+      raise ConnectionError('redis went away')
+    await ack(done, failed)
+
+  collector.ack = flaky_ack
+  job_counter = Value('i', 6)
+  assert asyncio.run(collector.run(job_counter, Lock()))
+  assert job_counter.value == 0
+  #collected again until acked
+  assert sorted(res['result']['ret'] for res in parsed) == \
+      sorted([0, 1, 2, 3] * 2 + [4, 5])
+  assert not client.data
+  assert not client.lists[get_processing_list()]
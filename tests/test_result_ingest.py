@@ -0,0 +1,136 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import json
+import time
+
+import pytest
+
+from tuna.celery_app.result_ingest import ResultIngestor, BatchSession
+from tuna.celery_app.result_ingest import BatchAborted
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionJob
+
+NUM_JOBS = 300
+JOB_TABLE = ConvolutionJob.__table__
+
+
+def get_mode(job_id):
+  if job_id % 50 == 7:
+    return 'poison'
+  if job_id % 60 == 3:
+    return 'rollback'
+  return 'ok'
+
+
+def store_result(session, data):
+  """simulated process_compile_results: errors roll back and mark the job"""
+  result = json.loads(data)
+  job_id = result['job']
+  if result['mode'] == 'poison':
+    raise KeyError('ret')
+  session.execute(JOB_TABLE.update().where(JOB_TABLE.c.id == job_id).values(
+      state='compiled', result=f"writer result {job_id}"))
+  if result['mode'] == 'rollback':
+    session.rollback()
+    session.execute(JOB_TABLE.update().where(JOB_TABLE.c.id == job_id).values(
+        state='errored'))
+  session.commit()
+  time.sleep(0.001)
+
+
+def test_result_ingest(tmp_path):
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 2,
+      'max_overflow': 2
+  },
+                connect_args={'timeout': 60})
+  create_sqlite_tables(pool.engine, [JOB_TABLE])
+  with pool.engine.begin() as conn:
+    conn.execute(JOB_TABLE.insert(), [{
+        'id': idx,
+        'session': 1,
+        'config': idx,
+        'reason': 'test',
+        'fin_step': 'miopen_find_compile'
+    } for idx in range(1, NUM_JOBS + 1)])
+  prev_pool = set_db_pool(pool)
+
+  quarantine_file = tmp_path / 'quarantine.jsonl'
+  try:
+    ingestor = ResultIngestor(store_result,
+                              num_writers=3,
+                              queue_size=8,
+                              batch_size=16,
+                              max_attempts=2,
+                              quarantine_file=str(quarantine_file))
+    ingestor.start()
+    for idx in range(1, NUM_JOBS + 1):
+      assert ingestor.put(json.dumps({'job': idx, 'mode': get_mode(idx)}))
+    summary = ingestor.close()
+  finally:
+    set_db_pool(prev_pool)
+
+  with pool.engine.connect() as conn:
+    rows = conn.execute(JOB_TABLE.select().with_only_columns(
+        [JOB_TABLE.c.id, JOB_TABLE.c.state])).fetchall()
+  states = {job_id: state.name for job_id, state in rows}
+  pool.dispose()
+
+  expected = {'ok': 'compiled', 'rollback': 'errored', 'poison': 'new'}
+  assert states == {
+      idx: expected[get_mode(idx)] for idx in range(1, NUM_JOBS + 1)
+  }
+  num_poison = sum(get_mode(idx) == 'poison' for idx in range(1, NUM_JOBS + 1))
+  assert summary['counts']['stored'] == NUM_JOBS - num_poison
+  assert summary['counts']['quarantined'] == num_poison
+  assert summary['counts']['batches'] > 0
+  #every put is timed, writers time every attempt to store
+  assert summary['stages']['put']['count'] == NUM_JOBS
+  assert summary['stages']['store']['count'] >= NUM_JOBS
+  with open(quarantine_file, encoding='utf-8') as q_file:
+    quarantined = [
+        json.loads(json.loads(line)['result'])['job'] for line in q_file
+    ]
+  assert sorted(quarantined) == [
+      idx for idx in range(1, NUM_JOBS + 1) if get_mode(idx) == 'poison'
+  ]
+
+
+def test_batch_session():
+
+  class FakeSession():
+    flushed = 0
+
+    def flush(self):
+      self.flushed += 1
+
+  session = BatchSession(FakeSession())
+  session.commit()
+  assert session.flushed == 1
+  with pytest.raises(BatchAborted):
+    session.rollback()
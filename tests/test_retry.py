@@ -0,0 +1,205 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import random
+
+import pymysql
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from tuna.connection import Connection
+from tuna.utils.db_utility import get_db_key, session_retry
+from tuna.utils.retry import DEADLOCK, FATAL, RETRYABLE, CircuitBreaker
+from tuna.utils.retry import BREAKER_THRESHOLD, CircuitOpen, RetryPolicy
+from tuna.utils.retry import classify_db_error, get_breaker
+
+
+class FakeClock():
+
+  def __init__(self):
+    self.now = 0.0
+    self.sleeps = []
+
+  def __call__(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.sleeps.append(seconds)
+    self.now += seconds
+
+
+def get_policy(clock, **kwargs):
+  return RetryPolicy('pytest',
+                     clock=clock,
+                     sleep=clock.sleep,
+                     rng=random.Random(5),
+                     **kwargs)
+
+
+def flaky(errors):
+  errors = list(errors)
+
+  def func():
+    if errors:
+      raise errors.pop(0)
+    return 'done'
+
+  return func
+
+
+def op_error(code, msg='error'):
+  return OperationalError('SELECT 1', {},
+                          pymysql.err.OperationalError(code, msg))
+
+
+def test_classify_db_error():
+  assert classify_db_error(op_error(1213)) == DEADLOCK
+  assert classify_db_error(op_error(1205)) == DEADLOCK
+  assert classify_db_error(op_error(2013)) == RETRYABLE
+  assert classify_db_error(pymysql.err.OperationalError(2006, 'gone')) \
+      == RETRYABLE
+  assert classify_db_error(
+      OperationalError('UPDATE', {}, Exception('database is locked'))) \
+      == DEADLOCK
+  assert classify_db_error(IntegrityError('INSERT', {}, Exception())) == FATAL
+  assert classify_db_error(ValueError()) == FATAL
+
+
+def test_backoff():
+  clock = FakeClock()
+  policy = get_policy(clock, max_attempts=20, base=1.0, cap=10.0)
+  assert policy.call(flaky([op_error(2013)] * 12)) == 'done'
+  assert len(clock.sleeps) == 12
+  #decorrelated jitter: each sleep in [base, 3 * previous], capped
+  last = 0.0
+  for delay in clock.sleeps:
+    assert 1.0 <= delay <= min(10.0, max(last, 1.0) * 3)
+    last = delay
+  assert max(clock.sleeps) > 5.0
+
+  #deadlocks start an order of magnitude lower
+  clock.sleeps = []
+  policy.call(flaky([op_error(1213)]))
+  assert clock.sleeps[0] < 0.3
+
+
+def test_budgets():
+  clock = FakeClock()
+  policy = get_policy(clock, max_attempts=3)
+  with pytest.raises(OperationalError):
+    policy.call(flaky([op_error(2013)] * 3))
+  assert len(clock.sleeps) == 2
+
+  policy = get_policy(clock, max_attempts=100, budget=20.0, cap=30.0)
+  start = clock.now
+  with pytest.raises(OperationalError):
+    policy.call(flaky([op_error(1213)] * 100))
+  assert clock.now - start <= 20.0
+
+  #fatal errors are raised at once
+  clock.sleeps = []
+  with pytest.raises(IntegrityError):
+    policy.call(flaky([IntegrityError('INSERT', {}, Exception())]))
+  assert not clock.sleeps
+
+
+def test_circuit_breaker():
+  clock = FakeClock()
+  breaker = CircuitBreaker('pytest', threshold=3, reset=30.0, clock=clock)
+  policy = get_policy(clock, max_attempts=10, cap=1.0)
+  retry = policy.start(breaker=breaker)
+  with pytest.raises(OperationalError):
+    func = flaky([op_error(2003)] * 10)
+    while retry.allow():
+      try:
+        func()
+      except OperationalError as err:
+        if not retry.failed(classify_db_error(err), err):
+          raise
+  #the third failure opened the breaker and stopped the retries
+  assert retry.attempt == 3 and breaker.is_open
+  assert not breaker.allow()
+
+  #deadlocks do not count against the breaker
+  other = CircuitBreaker('pytest2', threshold=2, clock=clock)
+  retry = policy.start(breaker=other)
+  assert retry.failed(DEADLOCK) and retry.failed(DEADLOCK)
+  assert not other.is_open
+
+  #one probe after the reset period, a failed probe reopens
+  clock.now += 30.0
+  assert breaker.allow()
+  assert not breaker.allow()
+  breaker.record_failure()
+  assert not breaker.allow()
+  clock.now += 30.0
+  assert breaker.allow()
+  breaker.record_success()
+  assert not breaker.is_open and breaker.allow()
+
+
+def test_circuit_open():
+  clock = FakeClock()
+  breaker = get_breaker('db:pytest')
+  for _ in range(BREAKER_THRESHOLD):
+    breaker.record_failure()
+  policy = get_policy(clock)
+  with pytest.raises(CircuitOpen):
+    policy.call(flaky([]), key='db:pytest')
+  breaker.record_success()
+  assert policy.call(flaky([]), key='db:pytest') == 'done'
+
+
+def test_session_retry():
+  clock = FakeClock()
+  session = sessionmaker(bind=create_engine('sqlite://'))()
+  policy = get_policy(clock, max_attempts=5)
+  func = flaky([op_error(1213), op_error(2013)])
+  assert session_retry(session, func, lambda x: x(), policy=policy) == 'done'
+  assert len(clock.sleeps) == 2
+  assert not session_retry(session,
+                           flaky([IntegrityError('INSERT', {}, Exception())]),
+                           lambda x: x(),
+                           policy=policy)
+  policy = get_policy(clock, max_attempts=3)
+  assert not session_retry(
+      session, flaky([op_error(2013)] * 3), lambda x: x(), policy=policy)
+  assert not get_breaker(get_db_key()).is_open
+
+
+def test_exec_circuit_open():
+  conn = Connection(local_machine=True, hostname='pytest-host', port=22)
+  conn.local_machine = False
+  breaker = get_breaker(conn.get_host_key())
+  for _ in range(BREAKER_THRESHOLD):
+    breaker.record_failure()
+  try:
+    with pytest.raises(CircuitOpen):
+      conn.exec_command_unparsed('cd /tmp')
+  finally:
+    breaker.record_success()
@@ -0,0 +1,87 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import pickle
+from datetime import datetime
+
+import pytest
+
+from tuna.benchmarks import row_bench
+from tuna.utils.rows import get_row_class, rows_to_dicts, rows_to_objs
+from tuna.utils.utility import SimpleDict
+
+ATTRIBS = ['id', 'valid', 'md5', 'state', 'update_ts']
+ROWS = [(1, 1, 'abc', 'new', datetime(2024, 1, 1)),
+        (2, 0, 'def', 'compiled', None)]
+
+
+def as_simple_dict(row):
+  entry = SimpleDict()
+  for col, val in zip(ATTRIBS, row):
+    setattr(entry, col, val)
+  return entry
+
+
+def test_rows_to_objs():
+  objs = rows_to_objs(ROWS, ATTRIBS)
+  assert isinstance(objs[0], SimpleDict)
+  assert not hasattr(objs[0], '__dict__') or not vars(objs[0])
+  assert type(objs[0]) is get_row_class(tuple(ATTRIBS))
+  assert objs[1].state == 'compiled'
+  for obj, row in zip(objs, ROWS):
+    legacy = as_simple_dict(row)
+    for kwargs in ({}, {'ommit_ts': False}, {'ommit_valid': True}):
+      assert obj.to_dict(**kwargs) == legacy.to_dict(**kwargs)
+
+  #attached relations go to the instance dict
+  objs[0].input_t = SimpleDict(id=3)
+  objs[0].state = 'compile_start'
+  assert objs[0].to_dict()['state'] == 'compile_start'
+  copy = pickle.loads(pickle.dumps(objs[0]))
+  assert copy.to_dict()['input_t'].id == 3
+  assert copy.id == 1 and copy.state == 'compile_start'
+
+  with pytest.raises(ValueError):
+    get_row_class(('id', 'class'))
+  with pytest.raises(ValueError):
+    get_row_class(('id', 'id'))
+  assert rows_to_objs([(1,)], ['id'])[0].id == 1
+
+
+def test_rows_to_dicts():
+  for kwargs in ({}, {'ommit_ts': False}, {'ommit_valid': True}):
+    assert rows_to_dicts(ROWS, ATTRIBS, **kwargs) == [
+        as_simple_dict(row).to_dict(**kwargs) for row in ROWS
+    ]
+  assert rows_to_dicts([('x', 1)], ['md5', 'id']) == [{'id': 1}]
+  assert rows_to_dicts([('x',)], ['md5']) == [{}]
+
+
+def test_row_bench():
+  results = row_bench.run(num_rows=200, repeat=1)
+  assert results['identical']
+  assert results['objects']['slots']['rows_per_sec'] > 0
+  assert results['dicts']['direct']['bytes_per_row'] > 0
@@ -0,0 +1,126 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.sql import DbCursor
+from tuna.utils import sql_profiler
+from tuna.utils.sql_profiler import SqlProfiler, ProfiledCursor, fingerprint
+
+
+def test_fingerprint():
+  assert fingerprint("SELECT id FROM conv_job WHERE id IN (1, 2,3) "
+                     "AND reason='a''b'") == \
+      "SELECT id FROM conv_job WHERE id IN (...) AND reason=?"
+  assert fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')") == \
+      fingerprint("INSERT INTO t (a, b)\n VALUES (%s, %s)")
+  assert fingerprint("UPDATE conv_job SET state=:state WHERE id = 3.5") == \
+      "UPDATE conv_job SET state=? WHERE id = ?"
+  #digits in identifiers are kept
+  assert fingerprint("SELECT dim0 FROM tensor") == "SELECT dim0 FROM tensor"
+
+
+def test_profiler(tmp_path):
+  engine = create_engine('sqlite://')
+  profiler = SqlProfiler()
+  profiler.attach(engine)
+  with engine.begin() as conn:
+    conn.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+    for idx in range(10):
+      conn.execute(f"INSERT INTO t VALUES ({idx}, 'row{idx}')")
+    conn.execute("UPDATE t SET name='x' WHERE id < 4")
+  profiler.detach()
+  with engine.begin() as conn:
+    conn.execute("SELECT * FROM t")
+
+  assert profiler.count() == 12
+  report = profiler.report()
+  assert len(report) == 3
+  insert = [e for e in report if e['fingerprint'].startswith('INSERT')][0]
+  assert insert['count'] == 10
+  assert insert['rows'] == 10
+  assert insert['call_site'].startswith(__file__)
+  assert insert['p50_ms'] <= insert['p99_ms'] <= insert['max_ms']
+  update = [e for e in report if e['fingerprint'].startswith('UPDATE')][0]
+  assert update['rows'] == 4
+
+  report_file = tmp_path / 'sql_{pid}.json'
+  profiler.dump(str(report_file))
+  dumped = json.loads(next(tmp_path.glob('sql_*.json')).read_text())
+  assert [e['fingerprint'] for e in dumped
+         ] == [e['fingerprint'] for e in report]
+
+  assert profiler.check_budget(12) is None
+  assert 'budget is 5' in profiler.check_budget(5)
+  profiler.reset()
+  assert profiler.count() == 0
+
+
+def test_db_cursor(tmp_path, monkeypatch):
+  monkeypatch.setenv(sql_profiler.PROFILE_ENV, str(tmp_path / 'sql.json'))
+  monkeypatch.setattr(sql_profiler, '_PROFILER', SqlProfiler())
+  monkeypatch.setattr(sql_profiler, 'install', lambda *args: None)
+  pool = DbPool(f"sqlite:///{tmp_path / 'tuna.db'}", {
+      'pool_size': 1,
+      'max_overflow': 0
+  })
+  prev_pool = set_db_pool(pool)
+  try:
+    with DbCursor() as cur:
+      assert isinstance(cur, ProfiledCursor)
+      cur.execute("CREATE TABLE t (id INTEGER)")
+      cur.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+      cur.execute("SELECT id FROM t WHERE id = ?", (2,))
+      assert cur.fetchall() == [(2,)]
+    with pool.engine.begin() as conn:
+      conn.execute("SELECT count(*) FROM t")
+  finally:
+    set_db_pool(prev_pool)
+    pool.dispose()
+
+  report = sql_profiler.get_profiler().report()
+  assert {e['fingerprint'] for e in report} == {
+      'CREATE TABLE t (id INTEGER)', 'INSERT INTO t VALUES (?)',
+      'SELECT id FROM t WHERE id = ?', 'SELECT count(*) FROM t'
+  }
+  assert sql_profiler.get_profiler().count() == 4
+
+
+def test_sql_budget(sql_budget):
+  engine = create_engine('sqlite://')
+  with sql_budget(2, engine) as profiler:
+    engine.execute("SELECT 1")
+    engine.execute("SELECT 2")
+  assert profiler.count() == 2
+
+  with pytest.raises(pytest.fail.Exception, match='3 SQL statements'):
+    with sql_budget(2, engine):
+      for idx in range(3):
+        engine.execute(f"SELECT {idx}")
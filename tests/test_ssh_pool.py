@@ -0,0 +1,189 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import socket
+import threading
+
+import paramiko
+import pytest
+
+from tuna.ssh_pool import ChannelPool, get_channel_pool, close_channel_pools
+
+HOST_KEY = paramiko.RSAKey.generate(1024)
+
+
+class StubHandle(paramiko.SFTPHandle):
+  """file handle backed by a local file"""
+
+  def stat(self):
+    return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class StubSFTPServer(paramiko.SFTPServerInterface):
+  """serves the local file system"""
+
+  def open(self, path, flags, attr):
+    try:
+      fd = os.open(path, flags, 0o644)
+    except OSError as err:
+      return paramiko.SFTPServer.convert_errno(err.errno)
+    mode = 'wb' if flags & (os.O_WRONLY | os.O_RDWR) else 'rb'
+    handle = StubHandle(flags)
+    handle.readfile = handle.writefile = os.fdopen(fd, mode)
+    return handle
+
+  def stat(self, path):
+    try:
+      return paramiko.SFTPAttributes.from_stat(os.stat(path))
+    except OSError as err:
+      return paramiko.SFTPServer.convert_errno(err.errno)
+
+  lstat = stat
+
+
+class StubServer(paramiko.ServerInterface):
+  """password auth, session channels only"""
+
+  def __init__(self, stats):
+    self.stats = stats
+
+  def get_allowed_auths(self, username):
+    return 'password'
+
+  def check_auth_password(self, username, password):
+    if password == 'secret':
+      return paramiko.AUTH_SUCCESSFUL
+    return paramiko.AUTH_FAILED
+
+  def check_channel_request(self, kind, chanid):
+    self.stats['channels'] += 1
+    return paramiko.OPEN_SUCCEEDED
+
+
+class SSHStub():
+  """in-process ssh/sftp server on localhost"""
+
+  def __init__(self):
+    self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.sock.bind(('127.0.0.1', 0))
+    self.sock.listen(8)
+    self.port = self.sock.getsockname()[1]
+    self.transports = []
+    self.stats = {'connections': 0, 'channels': 0}
+    threading.Thread(target=self.serve, daemon=True).start()
+
+  def serve(self):
+    while True:
+      try:
+        conn, _ = self.sock.accept()
+      except OSError:
+        return
+      self.stats['connections'] += 1
+      transport = paramiko.Transport(conn)
+      transport.add_server_key(HOST_KEY)
+      transport.set_subsystem_handler('sftp', paramiko.SFTPServer,
+                                      StubSFTPServer)
+      transport.start_server(server=StubServer(self.stats))
+      self.transports.append(transport)
+
+  def drop_connections(self):
+    for transport in self.transports:
+      transport.close()
+
+  def close(self):
+    self.drop_connections()
+    self.sock.close()
+
+
+@pytest.fixture
+def ssh_stub():
+  stub = SSHStub()
+  yield stub
+  stub.close()
+
+
+def test_channel_pool(ssh_stub, tmp_path):
+  pool = ChannelPool('127.0.0.1',
+                     ssh_stub.port,
+                     'tuna',
+                     'secret',
+                     max_channels=2)
+  for idx in range(10):
+    filename = str(tmp_path / f"file{idx}.txt")
+    pool.write_file(filename, f"contents {idx}".encode())
+    assert pool.read_file(filename) == f"contents {idx}".encode()
+  #one transport, one multiplexed sftp channel for all 20 transfers
+  assert ssh_stub.stats == {'connections': 1, 'channels': 1}
+
+  local_file = tmp_path / 'local.json'
+  local_file.write_text('{"fin": 1}')
+  pool.put_file(str(local_file), str(tmp_path / 'remote.json'))
+  assert (tmp_path / 'remote.json').read_text() == '{"fin": 1}'
+
+  #file errors do not drop the transport
+  with pytest.raises(FileNotFoundError):
+    pool.read_file(str(tmp_path / 'missing.txt'))
+  assert pool.is_healthy()
+
+  #concurrent readers share at most max_channels channels
+  errors = []
+
+  def read():
+    try:
+      assert pool.read_file(str(tmp_path / 'file3.txt')) == b'contents 3'
+    except Exception as err:  # pylint: disable=broad-except
+      errors.append(err)
+
+  threads = [threading.Thread(target=read) for _ in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert not errors
+  assert ssh_stub.stats['connections'] == 1
+  assert ssh_stub.stats['channels'] <= 2
+  pool.close()
+
+
+def test_channel_pool_reconnect(ssh_stub, tmp_path):
+  filename = str(tmp_path / 'file.txt')
+  pool = ChannelPool('127.0.0.1', ssh_stub.port, 'tuna', 'secret')
+  pool.write_file(filename, b'before')
+
+  ssh_stub.drop_connections()
+  assert pool.read_file(filename) == b'before'
+  assert ssh_stub.stats['connections'] == 2
+  pool.close()
+
+
+def test_get_channel_pool():
+  pool = get_channel_pool('127.0.0.1', 1, 'tuna', 'secret')
+  assert get_channel_pool('127.0.0.1', 1, 'tuna') is pool
+  assert get_channel_pool('127.0.0.1', 2, 'tuna') is not pool
+  close_channel_pools()
+  assert get_channel_pool('127.0.0.1', 1, 'tuna') is not pool
+  close_channel_pools()
@@ -0,0 +1,97 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+from tuna.benchmarks import statement_bench
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.statements import insert_objs, update_objs, select_objs
+from tuna.utils.statements import update_statement, select_statement
+from tuna.utils.utility import SimpleDict
+
+TABLE = ConvolutionJob.__tablename__
+ATTR = ['id', 'session', 'config', 'reason', 'state', 'retries']
+
+
+def make_jobs(num_jobs):
+  return [
+      SimpleDict(id=idx + 1,
+                 session=1 + idx % 2,
+                 config=idx,
+                 reason='pytest',
+                 state='new',
+                 retries=0) for idx in range(num_jobs)
+  ]
+
+
+def test_statements(sql_budget, sqlite_session):
+  session = sqlite_session([ConvolutionJob])
+  engine = session.bind
+  jobs = make_jobs(20)
+  #one executemany per call
+  with sql_budget(2, engine):
+    assert insert_objs(session, jobs, ATTR, TABLE) == 20
+    for job in jobs[:5]:
+      job.state = 'compile_start'
+      job.reason = "it's'; DROP TABLE conv_job; --"
+    assert update_objs(session, jobs[:5], ['state', 'reason'], TABLE) == 5
+  session.commit()
+
+  rows = select_objs(session,
+                     ATTR,
+                     TABLE, {'state': 'compile_start'},
+                     order_by=['id'])
+  assert [row.id for row in rows] == [1, 2, 3, 4, 5]
+  #raw values like a textual select, quotes are stored verbatim
+  assert rows[0].state == 'compile_start'
+  assert rows[0].reason == jobs[0].reason
+
+  where = {'session': 2, 'id': [2, 3, 4, 5]}
+  rows = select_objs(session, ['id'], TABLE, where, order_by=['id'], limit=1)
+  assert [row.id for row in rows] == [2]
+  assert select_objs(session, ['id'], TABLE, {'id': []}) == []
+  assert len(select_objs(session, ['id'], TABLE)) == 20
+
+  #update matching on where values instead of id
+  where = {'session': 1, 'state': 'compile_start'}
+  count = update_objs(session, [SimpleDict(state='new')], ['state'], TABLE,
+                      where)
+  session.commit()
+  assert count == 3
+  assert len(select_objs(session, ['id'], TABLE, {'state': 'new'})) == 18
+
+
+def test_statement_cache():
+  query = update_statement(TABLE, ('state',))
+  assert update_statement(TABLE, ('state',)) is query
+  assert select_statement(TABLE, ('id',), (('id', True),)) is not \
+      select_statement(TABLE, ('id',), (('id', False),))
+
+
+def test_statement_bench():
+  results = statement_bench.run(num_rows=300)
+  assert results['identical']
+  for stage in ('insert', 'update', 'select'):
+    assert results['bound'][stage]['statements'] == 300
+    assert results['speedup'][stage] > 0
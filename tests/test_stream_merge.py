@@ -0,0 +1,120 @@
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import os
+import random
+import filecmp
+
+import pytest
+
+from tuna.miopen.subcmd.merge_db import load_master_list, update_master_list
+from tuna.miopen.subcmd.merge_db import write_merge_results
+from tuna.miopen.utils.stream_merge import TextDbMerger, atomic_write
+from tuna.miopen.utils.stream_merge import format_db_line, parse_db_params
+from tuna.benchmarks import merge_bench
+
+
+def write_fdb(path, num_lines, num_keys, seed):
+  rand = random.Random(seed)
+  with open(path, 'w', encoding='utf-8') as out_fp:
+    for _ in range(num_lines):
+      out_fp.write(merge_bench.fdb_line(rand, rand.randrange(num_keys)))
+
+
+@pytest.mark.parametrize('keep_keys', [False, True])
+def test_stream_merge(tmp_path, keep_keys):
+  master = str(tmp_path / 'master.fdb.txt')
+  target = str(tmp_path / 'target.fdb.txt')
+  #duplicate keys inside and across both files
+  write_fdb(master, 500, 300, 1)
+  write_fdb(target, 200, 300, 2)
+
+  master_list = load_master_list(master)
+  update_master_list(master_list, [target], [-1], keep_keys)
+  legacy = str(tmp_path / 'legacy.fdb.txt')
+  write_merge_results(master_list, legacy, [])
+
+  #37 lines per run, 3 runs merged per pass
+  merger = TextDbMerger(keep_keys, run_size=37, fan_in=3, tmp_dir=tmp_path)
+  out = str(tmp_path / 'out.fdb.txt')
+  copy = str(tmp_path / 'copy.fdb.txt')
+  count = merger.merge(master, [target], out, [copy])
+
+  assert count == len(master_list)
+  assert filecmp.cmp(legacy, out, shallow=False)
+  assert filecmp.cmp(out, copy, shallow=False)
+  #only the inputs and outputs are left behind
+  assert sorted(os.listdir(tmp_path)) == sorted([
+      'master.fdb.txt', 'target.fdb.txt', 'legacy.fdb.txt', 'out.fdb.txt',
+      'copy.fdb.txt'
+  ])
+
+
+def test_target_order(tmp_path):
+  master = tmp_path / 'master.fdb.txt'
+  targets = [tmp_path / 'target1.fdb.txt', tmp_path / 'target2.fdb.txt']
+  master.write_text('k1=a:s1,0.3,0,a,x;b:s2,0.1,0,b,x\n')
+  targets[0].write_text('k1=a:s3,0.2,0,a,x\nk2=c:s4,0.5,0,c,x\n')
+  targets[1].write_text('k1=c:s5,0.05,0,c,x\n\n')
+  out = tmp_path / 'out.fdb.txt'
+
+  TextDbMerger(keep_keys=True).merge(str(master), [str(t) for t in targets],
+                                     str(out))
+  assert out.read_text().splitlines() == [
+      'k1=c:s5,0.05,0,c,x;b:s2,0.1,0,b,x;a:s3,0.2,0,a,x', 'k2=c:s4,0.5,0,c,x'
+  ]
+
+  TextDbMerger(keep_keys=False).merge(str(master), [str(t) for t in targets],
+                                      str(out))
+  assert out.read_text().splitlines() == [
+      'k1=c:s5,0.05,0,c,x', 'k2=c:s4,0.5,0,c,x'
+  ]
+
+
+def test_atomic_write(tmp_path):
+  out = tmp_path / 'out.fdb.txt'
+  out.write_text('old\n')
+
+  def lines():
+    yield 'new'
+    raise ValueError('interrupted')
+
+  with pytest.raises(ValueError):
+    atomic_write(lines(), str(out))
+  assert out.read_text() == 'old\n'
+  assert os.listdir(tmp_path) == ['out.fdb.txt']
+
+
+def test_format_db_line():
+  #solver indexed pdb lines sort on idx 0
+  solvers = parse_db_params('ConvB:2.5,x;ConvA:1.5,y;ConvC:1.5,z')
+  assert format_db_line('k', solvers) == 'k=ConvA:1.5,y;ConvC:1.5,z;ConvB:2.5,x'
+
+
+def test_merge_bench(tmp_path):
+  results = merge_bench.run(size_mb=1, run_size=1000, tmp_dir=str(tmp_path))
+  assert results['identical']
+  assert results['stream']['peak_rss_mb'] > 0
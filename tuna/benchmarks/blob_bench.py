@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Kernel blob storage: inline kernel_blob (legacy) vs content addressed
+BlobStore. Writes a synthetic set of find db rows whose kernels are drawn from
+a smaller pool of distinct kernels, then reports the dedup ratio, stored bytes
+and write time of both paths, e.g.
+  python3 -m tuna.benchmarks.blob_bench --jobs 2000 --distinct 300"""
+
+import os
+import time
+import json
+import base64
+import random
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.kernel_blob import KernelBlob
+from tuna.miopen.db.tables import ConvolutionFindDB, ConvolutionKernelCache
+from tuna.miopen.utils.blob_store import BlobStore, LocalBlobBackend
+from tuna.miopen.utils.fdb_writer import FdbWriter, LOGGER as WRITER_LOGGER
+
+
+def make_kernels(rand: random.Random, distinct: int,
+                 blob_kb: int) -> List[Dict[str, Any]]:
+  """distinct kernel objects as fin reports them, blobs are base64 text"""
+  kernels = []
+  for idx in range(distinct):
+    blob = rand.randbytes(
+        rand.randint(max(blob_kb // 2, 1), blob_kb * 3 // 2) * 1024)
+    kernels.append({
+        'kernel_name': f"kernel_{idx}.o",
+        'kernel_args': f"-DMIOPEN_KERNEL={idx} -mcpu=gfx90a",
+        'kernel_blob': base64.b64encode(blob),
+        'kernel_hash': f"{idx:032x}",
+        'uncompressed_size': len(blob)
+    })
+  return kernels
+
+
+def make_jobs(rand: random.Random, jobs: int, per_job: int,
+              kernels: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+  """kernels of each job, popular kernels are reused more (pareto)"""
+  picks = []
+  for _ in range(jobs):
+    picks.append([
+        kernels[min(int(rand.paretovariate(1.2)) - 1,
+                    len(kernels) -
+                    1)] if rand.random() < 0.7 else rand.choice(kernels)
+        for _ in range(per_job)
+    ])
+  return picks
+
+
+def fdb_row(config: int, solver: int) -> Dict[str, Any]:
+  """find db row of a job"""
+  return {
+      'session': 1,
+      'config': config,
+      'solver': solver,
+      'opencl': False,
+      'fdb_key': f"fdb_key_{config}",
+      'alg_lib': 'miopenConvolutionFwdAlgoDirect',
+      'params': 'params',
+      'workspace_sz': 0,
+      'kernel_time': 0.5,
+      'valid': True
+  }
+
+
+def dir_size(path: str) -> int:
+  """bytes of the files below path"""
+  total = 0
+  for root, _, files in os.walk(path):
+    total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+  return total
+
+
+def write_jobs(tmp_dir: str, name: str, picks: List[List[Dict[str, Any]]],
+               store: Optional[BlobStore]) -> Dict[str, Any]:
+  """Write every job through an FdbWriter into a fresh SQLite db"""
+  db_file = os.path.join(tmp_dir, f"{name}.db")
+  engine = create_engine(f"sqlite:///{db_file}")
+  create_sqlite_tables(engine, [
+      ConvolutionFindDB.__table__, ConvolutionKernelCache.__table__,
+      KernelBlob.__table__
+  ])
+  session = sessionmaker(bind=engine)()
+  writer = FdbWriter(ConvolutionFindDB, ConvolutionKernelCache, None, store)
+  start = time.perf_counter()
+  for idx, kernels in enumerate(picks):
+    writer.add(fdb_row(idx, 1), [dict(kernel) for kernel in kernels])
+    if len(writer) == 100:
+      writer.flush(session)
+      session.commit()
+  writer.flush(session)
+  session.commit()
+  elapsed = time.perf_counter() - start
+  session.close()
+
+  stored = os.path.getsize(db_file)
+  if store:
+    stored += dir_size(store.backend.root)
+  return {'seconds': elapsed, 'stored_bytes': stored}
+
+
+def run(jobs: int = 500,
+        per_job: int = 4,
+        distinct: int = 100,
+        blob_kb: int = 16,
+        seed: int = 7) -> Dict[str, Any]:
+  """Write the same synthetic kernels inline and through the blob store"""
+  rand = random.Random(seed)
+  picks = make_jobs(rand, jobs, per_job, make_kernels(rand, distinct, blob_kb))
+  log_level = WRITER_LOGGER.level
+  WRITER_LOGGER.setLevel(logging.WARNING)
+  try:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      results = {'inline': write_jobs(tmp_dir, 'inline', picks, None)}
+      store = BlobStore(LocalBlobBackend(os.path.join(tmp_dir, 'blobs')))
+      results['blob_store'] = write_jobs(tmp_dir, 'blob_store', picks, store)
+  finally:
+    WRITER_LOGGER.setLevel(log_level)
+
+  stats = store.stats
+  results['kernels'] = stats['blobs']
+  results['unique_kernels'] = stats['unique_blobs']
+  results['dedup_ratio'] = stats['blobs'] / max(stats['unique_blobs'], 1)
+  results['bytes_in'] = stats['bytes_in']
+  results['bytes_written'] = stats['bytes_written']
+  results['io_savings'] = 1 - stats['bytes_written'] / max(stats['bytes_in'], 1)
+  results['storage_savings'] = 1 - results['blob_store'][
+      'stored_bytes'] / results['inline']['stored_bytes']
+  results['speedup'] = results['inline']['seconds'] / max(
+      results['blob_store']['seconds'], 1e-9)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Kernel blob store dedup')
+  parser.add_argument('--jobs', type=int, default=500)
+  parser.add_argument('--per_job', type=int, default=4)
+  parser.add_argument('--distinct', type=int, default=100)
+  parser.add_argument('--blob_kb', type=int, default=16)
+  args = parser.parse_args()
+  print(
+      json.dumps(run(args.jobs, args.per_job, args.distinct, args.blob_kb),
+                 indent=2))
+
+
+if __name__ == '__main__':
+  main()
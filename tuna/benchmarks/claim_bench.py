@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Job claim throughput: per-job UPDATE (legacy) vs set based JobClaimer.
+Runs against a local SQLite file, e.g.
+  python3 -m tuna.benchmarks.claim_bench --num_jobs 20000 --claim_num 1000"""
+
+import os
+import time
+import json
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+#tables imports every table ConvolutionJob refers to
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.db_utility import gen_update_query, LOGGER as DB_LOGGER
+from tuna.utils.job_claim import JobClaimer
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('claim_bench')
+
+
+def make_session(db_file: str, num_jobs: int):
+  """Create a SQLite db holding num_jobs new conv jobs"""
+  engine = create_engine(f"sqlite:///{db_file}")
+  create_sqlite_tables(engine)
+  table = ConvolutionJob.__table__
+  with engine.begin() as conn:
+    conn.execute(table.insert(), [{
+        'session': 1,
+        'config': idx,
+        'reason': 'bench',
+        'fin_step': 'miopen_find_compile'
+    } for idx in range(num_jobs)])
+  return sessionmaker(bind=engine)()
+
+
+def get_conds():
+  """conditions used by MIOpen.get_job_objs"""
+  # pylint: disable=comparison-with-callable
+  return [
+      ConvolutionJob.session == 1, ConvolutionJob.valid == 1,
+      ConvolutionJob.reason == 'bench', ConvolutionJob.retries < 10,
+      ConvolutionJob.state.in_(['new']),
+      ConvolutionJob.fin_step.like('%miopen_find_compile%')
+  ]
+
+
+def claim_legacy(session, claimer: JobClaimer, claim_num: int) -> int:
+  """select, then one UPDATE statement per job"""
+  jobs = claimer.fetch(session, get_conds(), claim_num)
+  for job in jobs:
+    job.state = 'compile_start'
+    session.execute(
+        gen_update_query(job, ['state'], ConvolutionJob.__tablename__))
+  session.commit()
+  return len(jobs)
+
+
+def claim_batched(session, claimer: JobClaimer, claim_num: int) -> int:
+  """select, then one UPDATE ... WHERE id IN (...) per batch"""
+  return len(claimer.claim(session, get_conds(), 'compile_start', claim_num))
+
+
+def run_claim(session, claim_func, claim_num: int) -> Dict[str, Any]:
+  """Claim until no new jobs are left"""
+  claimer = JobClaimer(ConvolutionJob, logger=LOGGER)
+  total = 0
+  start = time.perf_counter()
+  while True:
+    count = claim_func(session, claimer, claim_num)
+    if not count:
+      break
+    total += count
+  elapsed = time.perf_counter() - start
+  return {
+      'jobs': total,
+      'seconds': elapsed,
+      'jobs_per_sec': total / elapsed if elapsed else 0.0
+  }
+
+
+def run(num_jobs: int = 10000, claim_num: int = 1000) -> Dict[str, Any]:
+  """Run both claim paths on fresh databases, return the results"""
+  #gen_update_query logs every statement
+  db_log_level = DB_LOGGER.level
+  DB_LOGGER.setLevel(logging.WARNING)
+  LOGGER.setLevel(logging.WARNING)
+  results = {}
+  try:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      for name, func in (('legacy', claim_legacy), ('batched', claim_batched)):
+        session = make_session(os.path.join(tmp_dir, f"{name}.db"), num_jobs)
+        results[name] = run_claim(session, func, claim_num)
+        session.close()
+  finally:
+    DB_LOGGER.setLevel(db_log_level)
+    LOGGER.setLevel(logging.INFO)
+
+  results['speedup'] = results['batched']['jobs_per_sec'] / max(
+      results['legacy']['jobs_per_sec'], 1e-9)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Job claim throughput')
+  parser.add_argument('--num_jobs', type=int, default=10000)
+  parser.add_argument('--claim_num', type=int, default=1000)
+  args = parser.parse_args()
+  print(json.dumps(run(args.num_jobs, args.claim_num), indent=2))
+
+
+if __name__ == '__main__':
+  main()
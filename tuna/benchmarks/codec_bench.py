@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Celery job context payloads: kombu json vs the tuna context codec, bytes
+and encode/decode time per task message for a few config mixes, e.g.
+  python3 -m tuna.benchmarks.codec_bench --num_contexts 2000"""
+
+import json
+import time
+import random
+import argparse
+from typing import Any, Callable, Dict, List, Tuple
+
+from kombu.utils.json import dumps as json_dumps, loads as json_loads
+
+from tuna.celery_app import context_codec
+from tuna.miopen.db.tables import ConvolutionConfig
+from tuna.miopen.db.tables import ConvolutionJob, TensorTable
+from tuna.utils.utility import filter_row_dict
+
+#column names of the serialized rows
+JOB_ATTR = [col.name for col in ConvolutionJob.__table__.c]
+CFG_ATTR = [col.name for col in ConvolutionConfig.__table__.c]
+TENSOR_ATTR = [col.name for col in TensorTable.__table__.c]
+#embed part of a celery protocol 2 message body
+EMBED = {'callbacks': None, 'errbacks': None, 'chain': None, 'chord': None}
+#layouts and precisions drawn by each mix
+MIXES = {
+    'nchw_fp32': (['NCHW'], ['FP32'], ['F']),
+    'mixed_2d': (['NCHW', 'NHWC'], ['FP32', 'FP16', 'BF16'], ['F', 'B', 'W']),
+    'mixed_3d': (['NCDHW', 'NDHWC'], ['FP32', 'FP16'], ['F', 'B', 'W'])
+}
+CHANNELS = [3, 16, 32, 64, 128, 256, 512, 1024]
+
+
+def make_tensor(rand: random.Random, idx: int, layout: str, precision: str,
+                dims: List[int]) -> Dict[str, Any]:
+  """serialized tensor row"""
+  row = dict.fromkeys(TENSOR_ATTR)
+  row.update(id=idx, valid=1, layout=layout, data_type=precision)
+  row.update(num_dims=len(layout) - 2, dim0=rand.choice([1, 16, 64]))
+  for pos, dim in enumerate(dims, 1):
+    row[f"dim{pos}"] = dim
+  return filter_row_dict(row)
+
+
+def make_context(rand: random.Random, idx: int, mix: str) -> Dict[str, Any]:
+  """context shaped like MIOpen.build_context for one random config"""
+  layouts, precisions, directions = MIXES[mix]
+  layout, precision = rand.choice(layouts), rand.choice(precisions)
+  spatial = [rand.choice([7, 14, 28, 56, 112, 224])] * (len(layout) - 3)
+  in_c, out_c = rand.choice(CHANNELS), rand.choice(CHANNELS)
+
+  config = dict.fromkeys(CFG_ATTR)
+  config.update(id=idx,
+                valid=1,
+                batchsize=rand.choice([1, 16, 32, 128, 256]),
+                spatial_dim=len(spatial),
+                pad_h=1,
+                pad_w=1,
+                pad_d=0,
+                conv_stride_h=rand.choice([1, 2]),
+                conv_stride_w=1,
+                conv_stride_d=1,
+                dilation_h=1,
+                dilation_w=1,
+                dilation_d=1,
+                group_count=1,
+                mode='conv',
+                pad_mode='default',
+                trans_output_pad_h=0,
+                trans_output_pad_w=0,
+                trans_output_pad_d=0,
+                direction=rand.choice(directions),
+                out_layout=layout,
+                md5=f"{rand.getrandbits(128):032x}",
+                driver=0)
+  config = filter_row_dict(config)
+  config['input_t'] = make_tensor(rand, 2 * idx, layout, precision,
+                                  [in_c] + spatial)
+  config['weight_t'] = make_tensor(rand, 2 * idx + 1, layout, precision,
+                                   [out_c] + [3] * len(spatial))
+
+  job = dict.fromkeys(JOB_ATTR)
+  job.update(id=idx,
+             valid=1,
+             reason='tuning',
+             state='compile_start',
+             retries=0,
+             cache_loc=f"~/.cache/miopen_{rand.getrandbits(40):010x}",
+             fin_step='miopen_find_compile',
+             config=idx,
+             session=1)
+  return {
+      'job': filter_row_dict(job),
+      'config': config,
+      'operation': 'compile',
+      'arch': 'gfx90a',
+      'num_cu': 104,
+      'kwargs': {
+          'gpu_id': 0,
+          'envmt': [
+              'MIOPEN_LOG_LEVEL=4', 'MIOPEN_SQLITE_KERN_CACHE=ON',
+              'MIOPEN_DEBUG_IMPLICIT_GEMM_FIND_ALL_SOLUTIONS=1'
+          ],
+          'label': 'bench_label',
+          'docker_name': 'miopentuna',
+          'session_id': 1
+      }
+  }
+
+
+def make_bodies(num_contexts: int, mix: str) -> List[Tuple[Any, ...]]:
+  """celery message bodies, (args, kwargs, embed) with the context as arg"""
+  rand = random.Random(num_contexts)
+  return [((make_context(rand, idx, mix),), {}, EMBED)
+          for idx in range(num_contexts)]
+
+
+def get_codecs() -> Dict[str, Tuple[Callable, Callable]]:
+  """encoder and decoder of every compared format"""
+  codecs = {
+      'json': (json_dumps, json_loads),
+      'codec': (lambda body: context_codec.encode(body, 'none'),
+                context_codec.decode),
+      'codec_zlib': (lambda body: context_codec.encode(body, 'zlib'),
+                     context_codec.decode)
+  }
+  if context_codec.zstandard is not None:
+    codecs['codec_zstd'] = (lambda body: context_codec.encode(body, 'zstd'),
+                            context_codec.decode)
+  return codecs
+
+
+def measure(bodies: List[Tuple[Any, ...]], encoder: Callable,
+            decoder: Callable) -> Dict[str, Any]:
+  """bytes and times per message"""
+  start = time.perf_counter()
+  payloads = [encoder(body) for body in bodies]
+  encode_s = time.perf_counter() - start
+  start = time.perf_counter()
+  decoded = [decoder(payload) for payload in payloads]
+  decode_s = time.perf_counter() - start
+  #tuples come back as lists, compare the json shape
+  expected = json.loads(json.dumps(bodies))
+  return {
+      'bytes': sum(len(payload) for payload in payloads) / len(bodies),
+      'encode_us': encode_s / len(bodies) * 1e6,
+      'decode_us': decode_s / len(bodies) * 1e6,
+      'identical': json.loads(json.dumps(decoded)) == expected
+  }
+
+
+def run(num_contexts: int = 1000) -> Dict[str, Any]:
+  """Every codec on every mix"""
+  results: Dict[str, Any] = {}
+  for mix in MIXES:
+    bodies = make_bodies(num_contexts, mix)
+    results[mix] = {
+        name: measure(bodies, encoder, decoder)
+        for name, (encoder, decoder) in get_codecs().items()
+    }
+    for name, res in results[mix].items():
+      res['size_ratio'] = res['bytes'] / results[mix]['json']['bytes']
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Celery context codecs')
+  parser.add_argument('--num_contexts', type=int, default=1000)
+  args = parser.parse_args()
+  print(json.dumps(run(args.num_contexts), indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Compare two pipeline_bench result files and flag the stage metrics that
+regressed by more than a threshold, exits with 1 if any did, e.g.
+  python3 -m tuna.benchmarks.compare base.json new.json --threshold 0.1"""
+
+import sys
+import json
+import argparse
+from typing import Any, Dict, List
+
+#metric -> True if higher is better
+METRICS = {
+    'items_per_sec': True,
+    'p50_ms': False,
+    'p90_ms': False,
+    'p99_ms': False,
+    'peak_mem_kb': False
+}
+#relative change that counts as a regression
+REGRESSION_THRESHOLD = 0.1
+
+
+def load_results(path: str) -> Dict[str, Any]:
+  """read a pipeline_bench json file"""
+  with open(path, encoding='utf-8') as in_fp:
+    return json.load(in_fp)
+
+
+def compare_results(base: Dict[str, Any],
+                    new: Dict[str, Any],
+                    threshold: float = REGRESSION_THRESHOLD,
+                    metrics: Dict[str, bool] = None) -> List[Dict[str, Any]]:
+  """one row per stage metric present in both runs, change is relative to
+  base and positive when new is worse"""
+  if metrics is None:
+    metrics = METRICS
+  rows = []
+  for stage, base_vals in base['stages'].items():
+    new_vals = new['stages'].get(stage)
+    if new_vals is None:
+      continue
+    for metric, higher_better in metrics.items():
+      if metric not in base_vals or metric not in new_vals:
+        continue
+      base_val, new_val = base_vals[metric], new_vals[metric]
+      change = 0.0
+      if base_val:
+        change = (new_val - base_val) / base_val
+        if higher_better:
+          change = -change
+      rows.append({
+          'stage': stage,
+          'metric': metric,
+          'base': base_val,
+          'new': new_val,
+          'change': change,
+          'regression': change > threshold
+      })
+  return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+  """text table of the comparison"""
+  lines = [
+      f"{'stage':<16}{'metric':<15}{'base':>14}{'new':>14}{'worse by':>10}"
+  ]
+  for row in rows:
+    flag = '  REGRESSION' if row['regression'] else ''
+    lines.append(f"{row['stage']:<16}{row['metric']:<15}{row['base']:>14.2f}"
+                 f"{row['new']:>14.2f}{row['change']:>10.1%}{flag}")
+  return '\n'.join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+  """Main function, returns the exit code"""
+  parser = argparse.ArgumentParser(description='Compare pipeline_bench runs')
+  parser.add_argument('base', type=str, help='baseline results json')
+  parser.add_argument('new', type=str, help='results json to check')
+  parser.add_argument('--threshold',
+                      type=float,
+                      default=REGRESSION_THRESHOLD,
+                      help='relative change flagged as a regression')
+  parser.add_argument('--metrics',
+                      nargs='+',
+                      choices=list(METRICS),
+                      default=list(METRICS),
+                      help='metrics to compare')
+  args = parser.parse_args(argv)
+
+  rows = compare_results(load_results(args.base), load_results(args.new),
+                         args.threshold,
+                         {metric: METRICS[metric] for metric in args.metrics})
+  print(format_rows(rows))
+  regressions = [row for row in rows if row['regression']]
+  if regressions:
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Enqueue throughput: one apply_async per job (legacy) vs BatchEnqueuer.
+Publishes to celery's in-memory broker, no worker is needed, e.g.
+  python3 -m tuna.benchmarks.enqueue_bench --num_jobs 20000 --fan_out 100"""
+
+import time
+import json
+import logging
+import argparse
+from typing import Any, Callable, Dict, List
+
+from celery import Celery
+from kombu.utils.uuid import uuid
+
+from tuna.celery_app.enqueue import BatchEnqueuer, LOGGER as ENQUEUE_LOGGER
+
+Q_NAME = 'enqueue_bench_q'
+PREFIX = 'd_bench_sess_1_miopen_find_compile'
+
+
+def make_app() -> Celery:
+  """Celery app on the in-memory broker"""
+  app = Celery('enqueue_bench',
+               broker_url='memory://',
+               result_backend='cache+memory://')
+
+  @app.task(name='enqueue_bench.celery_enqueue')
+  def celery_enqueue(context):
+    return context
+
+  app.bench_task = celery_enqueue
+  return app
+
+
+def make_contexts(num_jobs: int) -> List[dict]:
+  """Job contexts shaped like the ones built by MIOpen.build_context"""
+  return [{
+      'job': {
+          'id': idx,
+          'session': 1,
+          'state': 'compile_start',
+          'fin_step': ['miopen_find_compile']
+      },
+      'config': {
+          'id': idx,
+          'batchsize': 128,
+          'in_channels': 64,
+          'out_channels': 64
+      },
+      'operation': 'compile',
+      'arch': 'gfx90a',
+      'num_cu': 104,
+      'kwargs': {
+          'session_id': 1
+      }
+  } for idx in range(num_jobs)]
+
+
+def enqueue_legacy(app: Celery, contexts: List[dict], _fan_out: int) -> int:
+  """One apply_async per job, each acquires its own producer"""
+  for context in contexts:
+    app.bench_task.apply_async((context,),
+                               task_id=('-').join([PREFIX, uuid()]),
+                               queue=Q_NAME,
+                               reply_to=Q_NAME)
+  return len(contexts)
+
+
+def enqueue_batched(app: Celery, contexts: List[dict], fan_out: int) -> int:
+  """Groups of fan_out tasks on one producer"""
+  enqueuer = BatchEnqueuer(app.bench_task, Q_NAME, PREFIX, fan_out=fan_out)
+  return len(enqueuer.enqueue(contexts))
+
+
+def run_enqueue(func: Callable, num_jobs: int, fan_out: int) -> Dict[str, Any]:
+  """Time func on a fresh app, checks every job reached the queue"""
+  app = make_app()
+  contexts = make_contexts(num_jobs)
+  start = time.perf_counter()
+  total = func(app, contexts, fan_out)
+  elapsed = time.perf_counter() - start
+  with app.connection_for_read() as conn:
+    #the memory transport is shared by every app of the process
+    queued = conn.default_channel.queue_purge(Q_NAME)
+  return {
+      'jobs': total,
+      'queued': queued,
+      'seconds': elapsed,
+      'jobs_per_sec': total / elapsed if elapsed else 0.0
+  }
+
+
+def run(num_jobs: int = 10000, fan_out: int = 100) -> Dict[str, Any]:
+  """Run both enqueue paths, return the results"""
+  log_level = ENQUEUE_LOGGER.level
+  ENQUEUE_LOGGER.setLevel(logging.WARNING)
+  try:
+    results = {
+        'legacy': run_enqueue(enqueue_legacy, num_jobs, fan_out),
+        'batched': run_enqueue(enqueue_batched, num_jobs, fan_out)
+    }
+  finally:
+    ENQUEUE_LOGGER.setLevel(log_level)
+
+  results['speedup'] = results['batched']['jobs_per_sec'] / max(
+      results['legacy']['jobs_per_sec'], 1e-9)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Celery enqueue throughput')
+  parser.add_argument('--num_jobs', type=int, default=10000)
+  parser.add_argument('--fan_out', type=int, default=100)
+  args = parser.parse_args()
+  print(json.dumps(run(args.num_jobs, args.fan_out), indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Kernel db export: per key queries, list dedup and row by row inserts
+(legacy) vs KdbWriter. Both paths export the same synthetic kernel cache from
+a SQLite db and the resulting kdb files are compared, e.g.
+  python3 -m tuna.benchmarks.kdb_bench --num_kernels 100000 --workers 4"""
+
+import os
+import time
+import json
+import base64
+import random
+import logging
+import argparse
+import sqlite3
+import tempfile
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionKernelCache
+from tuna.miopen.utils.kdb_writer import KdbWriter, KDB_WORKERS, LOGGER as KDB_LOGGER
+from tuna.utils.utility import SimpleDict
+
+ARCH = 'gfx90a'
+
+
+def make_kernel_cache(session, rand: random.Random, num_kernels: int,
+                      per_key: int, blob_kb: int) -> Dict[str, List[Any]]:
+  """insert num_kernels kernels, per_key per kernel group, about a fifth
+  reuse the name and args of an earlier kernel. Returns the find db"""
+  rows = []
+  for idx in range(num_kernels):
+    name_idx = rand.randrange(idx) if idx and rand.random() < 0.2 else idx
+    blob = rand.randbytes(rand.randint(blob_kb * 512, blob_kb * 1536))
+    rows.append({
+        'kernel_group': idx // per_key + 1,
+        'kernel_name': f"kernel_{name_idx}",
+        'kernel_args': f"-DBENCH={name_idx}",
+        'kernel_blob': base64.b64encode(blob),
+        'kernel_hash': f"{idx:032x}",
+        'uncompressed_size': len(blob),
+        'valid': 1
+    })
+  table = ConvolutionKernelCache.__table__
+  for start in range(0, len(rows), 10000):
+    session.execute(table.insert(), rows[start:start + 10000])
+  session.commit()
+
+  num_groups = (num_kernels + per_key - 1) // per_key
+  return {
+      f"key_{group}": [SimpleDict(kernel_time=1.0, kernel_group=group)]
+      for group in range(1, num_groups + 1)
+  }
+
+
+def export_legacy(session, find_db: Dict[str, List[Any]],
+                  file_name: str) -> int:
+  """one query per key, list membership dedup, one INSERT per kernel"""
+  kern_db = []
+  for entries in find_db.values():
+    query = session.query(ConvolutionKernelCache)\
+        .filter(ConvolutionKernelCache.kernel_group == entries[0].kernel_group)\
+        .filter(ConvolutionKernelCache.valid == 1)
+    kern_db.extend(query.all())
+
+  conn = sqlite3.connect(file_name)
+  cur = conn.cursor()
+  cur.execute(
+      "CREATE TABLE `kern_db` (`id` INTEGER PRIMARY KEY ASC,`kernel_name` TEXT NOT NULL,"
+      "`kernel_args` TEXT NOT NULL,`kernel_blob` BLOB NOT NULL,`kernel_hash` TEXT NOT NULL,"
+      "`uncompressed_size` INT NOT NULL);")
+  cur.execute(
+      "CREATE UNIQUE INDEX `idx_kern_db` ON kern_db(kernel_name, kernel_args);")
+  ins_list = []
+  for kern in kern_db:
+    name = kern.kernel_name
+    args = kern.kernel_args
+    if not name.endswith('.o'):
+      name += ".o"
+    if not "-mcpu=" in args:
+      if not name.endswith('.mlir.o'):
+        args += f" -mcpu={ARCH}"
+    ins_key = (name, args)
+    if ins_key not in ins_list:
+      ins_list.append(ins_key)
+      cur.execute(
+          "INSERT INTO kern_db (kernel_name, kernel_args, kernel_blob, kernel_hash, "
+          "uncompressed_size) VALUES(?, ?, ?, ?, ?);",
+          (name, args, base64.b64decode(
+              kern.kernel_blob), kern.kernel_hash, kern.uncompressed_size))
+  conn.commit()
+  cur.close()
+  conn.close()
+  return len(ins_list)
+
+
+def export_batched(session, find_db: Dict[str, List[Any]], file_name: str,
+                   workers: int) -> int:
+  """KdbWriter: keyed batch queries, set dedup, pooled decode, executemany"""
+  writer = KdbWriter(ARCH, workers=workers)
+  return writer.export(session, ConvolutionKernelCache, find_db, file_name)
+
+
+def read_kdb(file_name: str) -> List[tuple]:
+  """kdb rows in id order"""
+  cnx = sqlite3.connect(file_name)
+  try:
+    return cnx.execute('SELECT kernel_name, kernel_args, kernel_blob, '
+                       'kernel_hash, uncompressed_size FROM kern_db '
+                       'ORDER BY id').fetchall()
+  finally:
+    cnx.close()
+
+
+def time_export(func, *args) -> Dict[str, Any]:
+  """run an export, returns kernels written, time and throughput"""
+  start = time.perf_counter()
+  count = func(*args)
+  elapsed = time.perf_counter() - start
+  return {
+      'kernels': count,
+      'seconds': elapsed,
+      'kernels_per_sec': count / elapsed if elapsed else 0.0
+  }
+
+
+def run(num_kernels: int = 100000,
+        per_key: int = 4,
+        blob_kb: int = 1,
+        workers: int = KDB_WORKERS,
+        legacy: bool = True,
+        seed: int = 7) -> Dict[str, Any]:
+  """Export the same kernel cache through both paths"""
+  rand = random.Random(seed)
+  log_level = KDB_LOGGER.level
+  KDB_LOGGER.setLevel(logging.ERROR)
+  results: Dict[str, Any] = {'num_kernels': num_kernels}
+  try:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'tuna.db')}")
+      create_sqlite_tables(engine, [ConvolutionKernelCache.__table__])
+      session = sessionmaker(bind=engine)()
+      find_db = make_kernel_cache(session, rand, num_kernels, per_key, blob_kb)
+
+      new_file = os.path.join(tmp_dir, 'batched.kdb')
+      results['batched'] = time_export(export_batched, session, find_db,
+                                       new_file, workers)
+      if legacy:
+        old_file = os.path.join(tmp_dir, 'legacy.kdb')
+        results['legacy'] = time_export(export_legacy, session, find_db,
+                                        old_file)
+        results['identical'] = read_kdb(old_file) == read_kdb(new_file)
+        results['speedup'] = results['legacy']['seconds'] / max(
+            results['batched']['seconds'], 1e-9)
+      session.close()
+  finally:
+    KDB_LOGGER.setLevel(log_level)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Kernel db export throughput')
+  parser.add_argument('--num_kernels', type=int, default=100000)
+  parser.add_argument('--per_key', type=int, default=4)
+  parser.add_argument('--blob_kb', type=int, default=1)
+  parser.add_argument('--workers', type=int, default=KDB_WORKERS)
+  parser.add_argument('--no_legacy',
+                      action='store_true',
+                      help='skip the legacy path, it is quadratic in kernels')
+  args = parser.parse_args()
+  print(
+      json.dumps(run(args.num_kernels, args.per_key, args.blob_kb, args.workers,
+                     not args.no_legacy),
+                 indent=2))
+
+
+if __name__ == '__main__':
+  main()
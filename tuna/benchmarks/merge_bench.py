@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Text find db merge: in-memory dict merge (legacy) vs streaming TextDbMerger.
+Generates a master and a target fdb, merges them in a fresh process per mode
+and reports time, throughput and peak RSS, e.g.
+  python3 -m tuna.benchmarks.merge_bench --size_mb 2048 --run_size 200000"""
+
+import os
+import time
+import json
+import random
+import logging
+import argparse
+import resource
+import tempfile
+import filecmp
+from multiprocessing import Process, Queue
+from typing import Any, Dict
+
+from tuna.miopen.subcmd.merge_db import load_master_list, update_master_list
+from tuna.miopen.subcmd.merge_db import write_merge_results, LOGGER as MERGE_LOGGER
+from tuna.miopen.utils.stream_merge import TextDbMerger, MERGE_RUN_SIZE
+from tuna.miopen.utils.stream_merge import LOGGER as STREAM_LOGGER
+
+ALGS = [('miopenConvolutionFwdAlgoImplicitGEMM',
+         'ConvHipImplicitGemmFwdXdlops'),
+        ('miopenConvolutionFwdAlgoWinograd', 'ConvBinWinogradRxSf2x3g1'),
+        ('miopenConvolutionFwdAlgoDirect', 'ConvOclDirectFwdGen'),
+        ('miopenConvolutionFwdAlgoGEMM', 'GemmFwdRest')]
+
+
+def fdb_line(rand: random.Random, idx: int) -> str:
+  """random find db line, idx makes the key unique"""
+  key = f"{rand.choice([1, 16, 64, 256])}-{idx}-{rand.randint(7, 700)}-3x3-"\
+        f"{rand.choice([64, 128, 256])}-{rand.randint(7, 700)}-"\
+        f"{rand.randint(7, 700)}-{rand.choice([1, 2, 4])}-1x1-1x1-1x1-0-"\
+        f"NCHW-{rand.choice(['FP32', 'FP16', 'BF16'])}-{rand.choice('FBW')}"
+  vals = ';'.join(
+      f"{alg}:{slv},{rand.random():.5f},{rand.randint(0, 1 << 20)},{alg},"\
+      "not used" for alg, slv in rand.sample(ALGS, rand.randint(1, len(ALGS))))
+  return f"{key}={vals}\n"
+
+
+def make_fdb(path: str, size_mb: int, num_keys: int, seed: int) -> int:
+  """write about size_mb of lines with keys drawn from num_keys"""
+  rand = random.Random(seed)
+  size = 0
+  lines = 0
+  with open(path, 'w', encoding='utf-8') as out_fp:
+    while size < size_mb << 20:
+      line = fdb_line(rand, rand.randrange(num_keys))
+      out_fp.write(line)
+      size += len(line)
+      lines += 1
+  return lines
+
+
+def merge_legacy(master: str, target: str, out: str, keep_keys: bool, _: int):
+  """load_master_list + update_master_list + write_merge_results"""
+  master_list = load_master_list(master)
+  update_master_list(master_list, [target], [-1], keep_keys)
+  write_merge_results(master_list, out, [])
+
+
+def merge_stream(master: str, target: str, out: str, keep_keys: bool,
+                 run_size: int):
+  """TextDbMerger with run_size lines per run"""
+  TextDbMerger(keep_keys, run_size=run_size).merge(master, [target], out)
+
+
+def run_mode(func, args, queue: Queue):
+  """child process body: run func, report time and peak RSS"""
+  MERGE_LOGGER.setLevel(logging.WARNING)
+  STREAM_LOGGER.setLevel(logging.WARNING)
+  start = time.perf_counter()
+  func(*args)
+  elapsed = time.perf_counter() - start
+  queue.put({
+      'seconds': elapsed,
+      'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+  })
+
+
+def spawn_mode(func, args) -> Dict[str, Any]:
+  """run func in a fresh process so its peak RSS is its own"""
+  queue: Queue = Queue()
+  proc = Process(target=run_mode, args=(func, args, queue))
+  proc.start()
+  res = queue.get()
+  proc.join()
+  return res
+
+
+def run(size_mb: int = 64,
+        run_size: int = MERGE_RUN_SIZE,
+        keep_keys: bool = False,
+        tmp_dir: str = None) -> Dict[str, Any]:
+  """generate inputs, run both modes, return the results"""
+  results: Dict[str, Any] = {}
+  with tempfile.TemporaryDirectory(dir=tmp_dir) as work_dir:
+    master = os.path.join(work_dir, 'master.fdb.txt')
+    target = os.path.join(work_dir, 'target.fdb.txt')
+    #about one key per 200 bytes, the target overwrites part of the master
+    num_keys = max((size_mb << 20) // 200, 1)
+    make_fdb(master, size_mb, num_keys, 1)
+    make_fdb(target, max(size_mb // 4, 1), num_keys, 2)
+    input_mb = (os.path.getsize(master) + os.path.getsize(target)) / (1 << 20)
+
+    outputs = {}
+    for name, func in (('legacy', merge_legacy), ('stream', merge_stream)):
+      outputs[name] = os.path.join(work_dir, f'{name}.fdb.txt')
+      res = spawn_mode(func,
+                       (master, target, outputs[name], keep_keys, run_size))
+      res['mb_per_sec'] = input_mb / res['seconds'] if res['seconds'] else 0.0
+      results[name] = res
+
+    results['input_mb'] = input_mb
+    results['identical'] = filecmp.cmp(outputs['legacy'],
+                                       outputs['stream'],
+                                       shallow=False)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Text find db merge benchmark')
+  parser.add_argument('--size_mb', type=int, default=64)
+  parser.add_argument('--run_size', type=int, default=MERGE_RUN_SIZE)
+  parser.add_argument('--keep_keys', action='store_true', default=False)
+  parser.add_argument('--tmp_dir', type=str, default=None)
+  args = parser.parse_args()
+  print(
+      json.dumps(run(args.size_mb, args.run_size, args.keep_keys, args.tmp_dir),
+                 indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""End to end benchmark of the tuning pipeline hot paths, without a MySQL
+server, GPU or celery worker. A synthetic workload of configs, jobs and fin
+results is loaded into a SQLite db that DbSession is pointed at, then the
+get_jobs (JobClaimer), serialize_jobs, celery enqueue (in-memory broker),
+compile/eval result parsing, export_db and merge_db code paths run stage by
+stage. Throughput, latency percentiles and peak memory of every stage are
+written to a json file, compare two of them with tuna.benchmarks.compare, e.g.
+  python3 -m tuna.benchmarks.pipeline_bench --num_jobs 2000 -o base.json"""
+
+import os
+import sys
+import copy
+import json
+import time
+import base64
+import random
+import sqlite3
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List
+
+from tuna.benchmarks.enqueue_bench import make_app, Q_NAME, PREFIX
+from tuna.celery_app.enqueue import BatchEnqueuer
+from tuna.db_engine import DbPool, set_db_pool
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionConfig, ConvolutionJob
+from tuna.miopen.db.tables import ConvolutionFindDB, ConvolutionKernelCache
+from tuna.miopen.db.tables import ConvolutionGolden, Solver, TensorTable
+from tuna.miopen.subcmd.export_db import export_fdb, export_kdb
+from tuna.miopen.subcmd.merge_db import merge_text_file
+from tuna.miopen.utils.helper import set_job_state
+from tuna.miopen.utils.job_configs import serialize_job_configs
+from tuna.miopen.utils.json_to_sql import process_fdb_w_kernels
+from tuna.miopen.worker.fin_utils import get_fin_result
+from tuna.utils.job_claim import JobClaimer
+from tuna.utils.logger import setup_logger
+from tuna.utils.stats import LatencyStats, percentile
+from tuna.utils.utility import SimpleDict
+
+LOGGER = setup_logger('pipeline_bench')
+
+#loggers of the benchmarked code paths, quieted while the stages run
+QUIET_LOGGERS = [
+    'pipeline_bench', 'job_claim', 'celery_enqueue', 'parse_results',
+    'fdb_writer', 'helper', 'db_utility', 'miopen_db_utility', 'merge_pdb',
+    'stream_merge'
+]
+#latency samples kept per stage, enough for every operation of a run
+BENCH_WINDOW = 1 << 20
+ARCH = 'gfx90a'
+NUM_CU = 104
+CHANNELS = [16, 32, 64, 128, 256]
+BATCH_SIZES = [1, 16, 64, 256]
+ALGORITHMS = [
+    'miopenConvolutionFwdAlgoDirect', 'miopenConvolutionFwdAlgoGEMM',
+    'miopenConvolutionFwdAlgoWinograd', 'miopenConvolutionFwdAlgoImplicitGEMM'
+]
+COMPILE_RESULT = ('miopen_find_compile_result', 'find_compiled', 'compiled')
+EVAL_RESULT = ('miopen_find_eval_result', 'evaluated', 'evaluated')
+
+
+@contextmanager
+def quiet_loggers(names: List[str]) -> Iterator[None]:
+  """raise the level of the named loggers to ERROR, several stages warn per
+  job or per percent of progress"""
+  levels = {name: logging.getLogger(name).level for name in names}
+  for name in names:
+    logging.getLogger(name).setLevel(logging.ERROR)
+  try:
+    yield
+  finally:
+    for name, level in levels.items():
+      logging.getLogger(name).setLevel(level)
+
+
+class StageRecorder():
+  """Latency, throughput and peak memory of one pipeline stage"""
+
+  def __init__(self, name: str):
+    self.name: str = name
+    self.latency: LatencyStats = LatencyStats(BENCH_WINDOW)
+    self.items: int = 0
+    self.seconds: float = 0.0
+    self.peak_mem_kb: float = 0.0
+    self.extra: Dict[str, Any] = {}
+
+  @contextmanager
+  def measure(self, items: int = 1) -> Iterator[None]:
+    """time one operation that handles items"""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    self.latency.record(elapsed)
+    self.items += items
+    self.seconds += elapsed
+
+  def summary(self) -> Dict[str, Any]:
+    """stage results, latencies in ms"""
+    result = self.latency.summary()
+    samples = list(self.latency.samples)
+    result['p90_ms'] = percentile(samples, 90) * 1000
+    result['items'] = self.items
+    result['seconds'] = self.seconds
+    result['items_per_sec'] = self.items / self.seconds if self.seconds else 0.0
+    result['peak_mem_kb'] = self.peak_mem_kb
+    result.update(self.extra)
+    return result
+
+
+def make_kernel_objs(rand: random.Random, num: int,
+                     blob_kb: int) -> List[Dict[str, Any]]:
+  """kernel objects as reported by fin, blobs are base64 text"""
+  kernels = []
+  for idx in range(num):
+    blob = rand.randbytes(blob_kb * 1024)
+    kernels.append({
+        'kernel_file': f"bench_kernel_{idx}.o",
+        'comp_options': f"-DMIOPEN_BENCH={idx} -mcpu={ARCH}",
+        'blob': base64.b64encode(blob).decode('utf-8'),
+        'md5_sum': f"{idx:032x}",
+        'uncompressed_size': len(blob)
+    })
+  return kernels
+
+
+def make_workload(rand: random.Random, num_jobs: int,
+                  num_solvers: int) -> Dict[str, List[Dict[str, Any]]]:
+  """solver, tensor, config and job rows of one conv session, one new job
+  and a unique fdb key per config"""
+  rows: Dict[str, List[Dict[str, Any]]] = {
+      'solver': [{
+          'id': idx + 1,
+          'solver': f"ConvBenchSolver{idx}",
+          'tunable': 1,
+          'valid': 1
+      } for idx in range(num_solvers)],
+      'tensor': [],
+      'config': [],
+      'job': [],
+      'fdb_key': []
+  }
+  weights: Dict[tuple, int] = {}
+  for idx in range(num_jobs):
+    in_c, out_c = rand.choice(CHANNELS), rand.choice(CHANNELS)
+    batch = rand.choice(BATCH_SIZES)
+    #unique spatial size, keeps configs and input tensors distinct
+    height = 7 + idx
+    rows['tensor'].append({
+        'id': len(rows['tensor']) + 1,
+        'dim0': 1,
+        'dim1': in_c,
+        'dim2': 1,
+        'dim3': height,
+        'dim4': height,
+        'layout': 'NCHW',
+        'num_dims': 2,
+        'data_type': 'FP32'
+    })
+    in_id = len(rows['tensor'])
+    if (in_c, out_c) not in weights:
+      rows['tensor'].append({
+          'id': len(rows['tensor']) + 1,
+          'dim0': out_c,
+          'dim1': in_c,
+          'dim2': 1,
+          'dim3': 3,
+          'dim4': 3,
+          'layout': 'NCHW',
+          'num_dims': 2,
+          'data_type': 'FP32'
+      })
+      weights[(in_c, out_c)] = len(rows['tensor'])
+    rows['config'].append({
+        'id': idx + 1,
+        'batchsize': batch,
+        'pad_h': 1,
+        'pad_w': 1,
+        'direction': 'F',
+        'input_tensor': in_id,
+        'weight_tensor': weights[(in_c, out_c)],
+        'out_layout': 'NCHW',
+        'md5': f"{idx:032x}",
+        'valid': 1
+    })
+    rows['job'].append({
+        'id': idx + 1,
+        'session': 1,
+        'config': idx + 1,
+        'state': 'new',
+        'reason': 'bench',
+        'fin_step': 'miopen_find_compile',
+        'valid': 1
+    })
+    rows['fdb_key'].append(
+        f"{in_c}-{height}-{height}-3x3-{out_c}-{height}-{height}-{batch}-"
+        "1x1-1x1-1x1-0-NCHW-FP32-F")
+  return rows
+
+
+def make_fin_json(rand: random.Random, fdb_key: str, config_id: int,
+                  solvers: List[str], kernels: List[Dict[str, Any]],
+                  result: tuple) -> Dict[str, Any]:
+  """fin output of one job, a few solvers fail without kernels"""
+  result_str, check_str, _ = result
+  entries = []
+  for solver in solvers:
+    success = rand.random() > 0.05
+    entries.append({
+        'solver_name':
+            solver,
+        check_str:
+            success,
+        'reason':
+            'Success' if success else 'Failed to compile',
+        'algorithm':
+            rand.choice(ALGORITHMS),
+        'params':
+            f"params_{rand.randint(0, 1 << 16)}",
+        'workspace':
+            rand.choice([0, 1024, 1 << 20]),
+        'time':
+            round(rand.uniform(0.01, 5.0), 5),
+        'kernel_objects':
+            rand.sample(kernels, rand.randint(1, 3)) if success else []
+    })
+  return {'db_key': fdb_key, 'config_tuna_id': config_id, result_str: entries}
+
+
+def count_lines(path: str) -> int:
+  """number of lines of a text file"""
+  with open(path, encoding='utf-8') as in_fp:
+    return sum(1 for _ in in_fp)
+
+
+def count_kernels(path: str) -> int:
+  """number of kernels in an exported kernel db"""
+  cnx = sqlite3.connect(path)
+  try:
+    return cnx.execute('SELECT COUNT(*) FROM kern_db').fetchone()[0]
+  finally:
+    cnx.close()
+
+
+def make_target_fdb(master_file: str, target_file: str, factor: int) -> int:
+  """target fdb for merge_db: every other master line is replaced and factor
+  group count variants of each key are added"""
+  count = 0
+  with open(master_file, encoding='utf-8') as in_fp, \
+      open(target_file, 'w', encoding='utf-8') as out_fp:
+    for idx, line in enumerate(in_fp):
+      key, rhs = line.strip().split('=')
+      lines = [f"{key}_g{grp}={rhs}\n" for grp in range(2, factor + 2)]
+      if idx % 2 == 0:
+        lines.append(f"{key}={rhs}\n")
+      out_fp.writelines(lines)
+      count += len(lines)
+  return count
+
+
+# pylint: disable=too-many-instance-attributes
+class PipelineBench():
+  """Runs the pipeline stages in work_dir, against the db DbSession is
+  pointed at"""
+
+  def __init__(self, args: argparse.Namespace, work_dir: str):
+    self.args: argparse.Namespace = args
+    self.work_dir: str = work_dir
+    self.rand: random.Random = random.Random(args.seed)
+    self.stages: Dict[str, Dict[str, Any]] = {}
+    self.workload = make_workload(self.rand, args.num_jobs, args.num_solvers)
+    self.kernels = make_kernel_objs(self.rand, args.num_kernels, args.blob_kb)
+    self.dbt = SimpleDict(job_table=ConvolutionJob,
+                          config_table=ConvolutionConfig,
+                          find_db_table=ConvolutionFindDB,
+                          kernel_cache=ConvolutionKernelCache,
+                          golden_table=ConvolutionGolden,
+                          session=SimpleDict(id=1,
+                                             arch=ARCH,
+                                             num_cu=NUM_CU,
+                                             rocm_v='bench',
+                                             miopen_v='bench'))
+
+  def load_workload(self, pool: DbPool) -> None:
+    """create the tables and insert the workload rows"""
+    create_sqlite_tables(pool.engine)
+    with pool.engine.begin() as conn:
+      for table, key in ((Solver, 'solver'), (TensorTable, 'tensor'),
+                         (ConvolutionConfig, 'config'), (ConvolutionJob,
+                                                         'job')):
+        conn.execute(table.__table__.insert(), self.workload[key])
+
+  def run_stage(self, name: str, func: Callable, *args) -> Any:
+    """run func(recorder, *args), records its peak traced memory"""
+    recorder = StageRecorder(name)
+    start_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    ret = func(recorder, *args)
+    recorder.peak_mem_kb = (tracemalloc.get_traced_memory()[1] -
+                            start_mem) / 1024
+    self.stages[name] = recorder.summary()
+    return ret
+
+  def get_jobs(self, recorder: StageRecorder) -> List[List[SimpleDict]]:
+    """claim all new jobs in batches of claim_num, as MIOpen.get_jobs"""
+    job_table = ConvolutionJob
+    # pylint: disable=comparison-with-callable
+    conds = [
+        job_table.session == 1, job_table.valid == 1,
+        job_table.reason == 'bench', job_table.retries < 10,
+        job_table.state.in_(['new']),
+        job_table.fin_step.like('%miopen_find_compile%')
+    ]
+    claimer = JobClaimer(job_table, logger=LOGGER)
+    batches = []
+    with DbSession() as session:
+      while True:
+        with recorder.measure(0):
+          jobs = claimer.claim(session,
+                               conds,
+                               'compile_start',
+                               self.args.claim_num,
+                               order_by=[job_table.retries, job_table.config])
+        if not jobs:
+          break
+        recorder.items += len(jobs)
+        batches.append(jobs)
+    return batches
+
+  def serialize_jobs(self, recorder: StageRecorder,
+                     batches: List[List[SimpleDict]]) -> List[List[dict]]:
+    """fetch configs + tensors and build the celery contexts per batch"""
+    kwargs = {'session_id': 1, 'arch': ARCH, 'num_cu': NUM_CU}
+    context_batches = []
+    with DbSession() as session:
+      for batch in batches:
+        with recorder.measure(len(batch)):
+          serialized = serialize_job_configs(session, batch, ConvolutionConfig)
+          context_batches.append([{
+              'job': job,
+              'config': config,
+              'operation': 'compile',
+              'arch': ARCH,
+              'num_cu': NUM_CU,
+              'kwargs': kwargs
+          } for job, config in serialized])
+    return context_batches
+
+  def enqueue(self, recorder: StageRecorder,
+              context_batches: List[List[dict]]) -> None:
+    """publish every batch to the in-memory broker"""
+    app = make_app()
+    enqueuer = BatchEnqueuer(app.bench_task,
+                             Q_NAME,
+                             PREFIX,
+                             fan_out=self.args.fan_out,
+                             logger=LOGGER)
+    for contexts in context_batches:
+      with recorder.measure(len(contexts)):
+        enqueuer.enqueue(contexts)
+    with app.connection_for_read() as conn:
+      recorder.extra['queued'] = conn.default_channel.queue_purge(Q_NAME)
+
+  def make_results(self, contexts: List[dict], result: tuple) -> List[str]:
+    """celery result messages carrying fake fin output"""
+    messages = []
+    solver_names = [row['solver'] for row in self.workload['solver']]
+    for context in contexts:
+      cfg_id = context['config']['id']
+      fin_json = make_fin_json(
+          self.rand, self.workload['fdb_key'][cfg_id - 1], cfg_id,
+          self.rand.sample(solver_names, self.args.solvers_per_job),
+          self.kernels, result)
+      messages.append(
+          json.dumps({'result': {
+              'ret': fin_json,
+              'context': context
+          }}))
+    return messages
+
+  def store_results(self, recorder: StageRecorder, messages: List[str],
+                    result: tuple) -> None:
+    """parse each result as MIOpen.store_result and process_*_results do"""
+    result_str, check_str, state = result
+    for message in messages:
+      with recorder.measure():
+        data = json.loads(message)
+        with DbSession() as session:
+          fin_json = data['result']['ret']
+          context = data['result']['context']
+          status = process_fdb_w_kernels(session,
+                                         fin_json,
+                                         copy.deepcopy(context),
+                                         self.dbt,
+                                         result_str=result_str,
+                                         check_str=check_str)
+          success, result_msg = get_fin_result(status)
+          set_job_state(session,
+                        SimpleDict(**context['job']),
+                        self.dbt,
+                        state if success else 'errored',
+                        result=result_msg)
+
+  def export_db(self, recorder: StageRecorder, export_func: Callable,
+                count_func: Callable) -> str:
+    """export the session find db (or kernel db) to a file, count_func
+    returns the number of exported entries"""
+    args = argparse.Namespace(src_table=ConvolutionFindDB,
+                              golden_v=None,
+                              arch=ARCH,
+                              num_cu=NUM_CU,
+                              opencl=False,
+                              config_tag=None,
+                              filename=None)
+    with recorder.measure(0):
+      filename = export_func(self.dbt, args, LOGGER)
+    recorder.items = count_func(filename)
+    recorder.extra['bytes'] = os.path.getsize(filename)
+    return filename
+
+  def merge_db(self, recorder: StageRecorder, master_file: str) -> str:
+    """merge a generated target fdb into the exported one"""
+    target_file = os.path.join(self.work_dir, 'target.fdb.txt')
+    recorder.extra['target_lines'] = make_target_fdb(master_file, target_file,
+                                                     self.args.merge_factor)
+    with recorder.measure(0):
+      final_file = merge_text_file(master_file, False, False, target_file)
+    recorder.items = count_lines(final_file)
+    return final_file
+
+  def run(self) -> Dict[str, Dict[str, Any]]:
+    """run all stages in order, returns the stage results"""
+    batches = self.run_stage('get_jobs', self.get_jobs)
+    context_batches = self.run_stage('serialize_jobs', self.serialize_jobs,
+                                     batches)
+    self.run_stage('enqueue', self.enqueue, context_batches)
+
+    contexts = [ctx for batch in context_batches for ctx in batch]
+    messages = self.make_results(contexts, COMPILE_RESULT)
+    self.run_stage('compile_results', self.store_results, messages,
+                   COMPILE_RESULT)
+    #the eval workers claim the compiled jobs
+    for ctx in contexts:
+      ctx['job']['state'] = 'eval_start'
+    messages = self.make_results(contexts, EVAL_RESULT)
+    self.run_stage('eval_results', self.store_results, messages, EVAL_RESULT)
+    del messages
+
+    fdb_file = self.run_stage('export_fdb', self.export_db, export_fdb,
+                              count_lines)
+    self.run_stage('export_kdb', self.export_db, export_kdb, count_kernels)
+    self.run_stage('merge_db', self.merge_db, fdb_file)
+    return self.stages
+
+
+def get_meta(args: argparse.Namespace) -> Dict[str, Any]:
+  """workload parameters and host details of a run"""
+  meta = dict(vars(args))
+  meta.pop('output', None)
+  meta['timestamp'] = datetime.now().isoformat(timespec='seconds')
+  meta['python'] = platform.python_version()
+  meta['platform'] = platform.platform()
+  meta['cpus'] = os.cpu_count()
+  return meta
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+  """Run the pipeline on a fresh SQLite db, returns meta, stages and the
+  peak RSS of the process"""
+  cwd = os.getcwd()
+  tracing = tracemalloc.is_tracing()
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    pool = DbPool(f"sqlite:///{os.path.join(tmp_dir, 'tuna.db')}", {
+        'pool_size': 4,
+        'max_overflow': 4
+    })
+    prev_pool = set_db_pool(pool)
+    #export_db and merge_db write relative to the working directory
+    os.chdir(tmp_dir)
+    if not tracing:
+      tracemalloc.start()
+    try:
+      with quiet_loggers(QUIET_LOGGERS):
+        bench = PipelineBench(args, tmp_dir)
+        bench.load_workload(pool)
+        stages = bench.run()
+    finally:
+      if not tracing:
+        tracemalloc.stop()
+      os.chdir(cwd)
+      set_db_pool(prev_pool)
+      pool.dispose()
+
+  return {
+      'meta': get_meta(args),
+      'stages': stages,
+      'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  }
+
+
+def get_parser() -> argparse.ArgumentParser:
+  """benchmark arguments, the defaults are a quick run"""
+  parser = argparse.ArgumentParser(description='Tuning pipeline benchmark')
+  parser.add_argument('--num_jobs', type=int, default=1000)
+  parser.add_argument('--num_solvers', type=int, default=40)
+  parser.add_argument('--solvers_per_job', type=int, default=8)
+  parser.add_argument('--num_kernels', type=int, default=200)
+  parser.add_argument('--blob_kb', type=int, default=4)
+  parser.add_argument('--claim_num', type=int, default=100)
+  parser.add_argument('--fan_out', type=int, default=100)
+  parser.add_argument('--merge_factor', type=int, default=4)
+  parser.add_argument('--seed', type=int, default=7)
+  parser.add_argument('-o',
+                      '--output',
+                      type=str,
+                      default=None,
+                      help='json file the results are written to')
+  return parser
+
+
+def main():
+  """Main function"""
+  args = get_parser().parse_args()
+  if args.solvers_per_job > args.num_solvers:
+    sys.exit('solvers_per_job must not exceed num_solvers')
+  results = run(args)
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as out_fp:
+      json.dump(results, out_fp, indent=2)
+  print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Row materialization: SimpleDict per row (legacy db_rows_to_obj) vs the
+generated slot classes and direct dict conversion of tuna.utils.rows, e.g.
+  python3 -m tuna.benchmarks.row_bench --num_rows 100000"""
+
+import gc
+import time
+import json
+import random
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from tuna.benchmarks.pipeline_bench import make_workload
+from tuna.miopen.db.tables import ConvolutionConfig
+from tuna.utils.rows import rows_to_dicts, rows_to_objs
+from tuna.utils.utility import SimpleDict
+
+#columns of the materialized rows
+ATTRIBS = [col.name for col in ConvolutionConfig.__table__.c]
+
+
+def make_rows(num_rows: int) -> List[Tuple[Any, ...]]:
+  """conv_config rows as the DB driver returns them"""
+  configs = make_workload(random.Random(0), num_rows, 1)['config']
+  return [tuple(cfg.get(attr) for attr in ATTRIBS) for cfg in configs]
+
+
+def legacy_objs(rows: List[Tuple[Any, ...]]) -> List[SimpleDict]:
+  """the former db_rows_to_obj: a SimpleDict and a setattr per column"""
+  entries = []
+  for row in rows:
+    entry = SimpleDict()
+    for i, col in enumerate(ATTRIBS):
+      setattr(entry, col, row[i])
+    entries.append(entry)
+  return entries
+
+
+def legacy_dicts(rows: List[Tuple[Any, ...]]) -> List[dict]:
+  """SimpleDict objects, then to_dict as serialize_chunk does"""
+  return [entry.to_dict() for entry in legacy_objs(rows)]
+
+
+def slot_objs(rows: List[Tuple[Any, ...]]) -> List[Any]:
+  """generated slot class per column set"""
+  return rows_to_objs(rows, ATTRIBS)
+
+
+def slot_dicts(rows: List[Tuple[Any, ...]]) -> List[dict]:
+  """to_dict shape straight from the rows"""
+  return rows_to_dicts(rows, ATTRIBS)
+
+
+def measure(func: Callable, rows: List[Tuple[Any, ...]],
+            repeat: int) -> Dict[str, float]:
+  """best rows/sec of repeat runs, and the bytes per row held by the result"""
+  best = float('inf')
+  for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    func(rows)
+    best = min(best, time.perf_counter() - start)
+
+  gc.collect()
+  tracemalloc.start()
+  result = func(rows)
+  held = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del result
+  return {
+      'rows_per_sec': len(rows) / best if best else 0.0,
+      'bytes_per_row': held / len(rows)
+  }
+
+
+def run(num_rows: int = 20000, repeat: int = 3) -> Dict[str, Any]:
+  """Run every materialization path on the same rows"""
+  rows = make_rows(num_rows)
+  results: Dict[str, Any] = {
+      'objects': {
+          'simple_dict': measure(legacy_objs, rows, repeat),
+          'slots': measure(slot_objs, rows, repeat)
+      },
+      'dicts': {
+          'simple_dict': measure(legacy_dicts, rows, repeat),
+          'direct': measure(slot_dicts, rows, repeat)
+      }
+  }
+  results['identical'] = legacy_dicts(rows) == slot_dicts(rows) == [
+      obj.to_dict() for obj in slot_objs(rows)
+  ]
+  for name, new in (('objects', 'slots'), ('dicts', 'direct')):
+    results[name]['speedup'] = results[name][new]['rows_per_sec'] / max(
+        results[name]['simple_dict']['rows_per_sec'], 1e-9)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Row materialization')
+  parser.add_argument('--num_rows', type=int, default=20000)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+  print(json.dumps(run(args.num_rows, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+  main()
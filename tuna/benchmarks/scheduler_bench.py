@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Enqueue scheduling simulation: a fake broker drained by synthetic workers
+whose speed changes over time, fed by the legacy fixed loop (a fixed batch
+every 10 seconds) or by EnqueueScheduler. Reports worker idle time and how
+long tasks wait in the queue, e.g.
+  python3 -m tuna.benchmarks.scheduler_bench --workers 8 --duration 1800"""
+
+import json
+import random
+import logging
+import argparse
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+from tuna.celery_app.enqueue_scheduler import EnqueuePlan, EnqueueScheduler
+from tuna.celery_app.enqueue_scheduler import LOGGER as SCHED_LOGGER
+from tuna.utils.stats import percentile
+
+#(start second, mean seconds per task) phases of the synthetic workers
+PHASES = ((0, 2.0), (600, 20.0), (1200, 5.0))
+#simulation time step in seconds
+TICK = 0.1
+#interval of the legacy enqueue loop
+LEGACY_INTERVAL = 10.0
+
+
+class FakeBroker():
+  """In memory queue recording when every task was published"""
+
+  def __init__(self):
+    self.queue: deque = deque()
+
+  def depth(self, _q_name: str) -> int:
+    """tasks waiting in the queue"""
+    return len(self.queue)
+
+  def publish(self, count: int, now: float) -> None:
+    """add count tasks"""
+    self.queue.extend([now] * count)
+
+  def pop(self) -> float:
+    """take the oldest task, returns its publish time"""
+    return self.queue.popleft()
+
+
+def get_task_time(now: float, phases: Tuple = PHASES) -> float:
+  """mean seconds per task of the phase now falls in"""
+  mean = phases[0][1]
+  for start, phase_mean in phases:
+    if now >= start:
+      mean = phase_mean
+  return mean
+
+
+def fixed_policy(batch: int) -> Callable[[int, float], EnqueuePlan]:
+  """legacy loop, batch jobs every LEGACY_INTERVAL seconds"""
+  return lambda _backlog, _now: EnqueuePlan(batch, LEGACY_INTERVAL)
+
+
+def adaptive_policy(initial_batch: int) -> Tuple[Callable, EnqueueScheduler]:
+  """EnqueueScheduler driven by the broker depth"""
+  scheduler = EnqueueScheduler(initial_batch, logger=SCHED_LOGGER)
+  return scheduler.plan, scheduler
+
+
+#pylint: disable=too-many-locals
+def simulate(policy: Callable[[int, float], EnqueuePlan],
+             scheduler: Any = None,
+             workers: int = 8,
+             duration: float = 1800.0,
+             seed: int = 1) -> Dict[str, Any]:
+  """run policy against the synthetic workers for duration seconds"""
+  rand = random.Random(seed)
+  broker = FakeBroker()
+  busy_until: List[float] = [0.0] * workers
+  waits: List[float] = []
+  depths: List[int] = []
+  idle = 0.0
+  next_round = 0.0
+  rounds = 0
+  now = 0.0
+  while now < duration:
+    if now >= next_round:
+      plan = policy(broker.depth('sim'), now)
+      broker.publish(plan.batch, now)
+      if scheduler:
+        scheduler.record_enqueued(plan.batch)
+      next_round = now + plan.interval
+      rounds += 1
+    for idx in range(workers):
+      if busy_until[idx] > now:
+        continue
+      if not broker.queue:
+        idle += TICK
+        continue
+      waits.append(now - broker.pop())
+      busy_until[idx] = now + rand.expovariate(1 / get_task_time(now))
+    depths.append(len(broker.queue))
+    now += TICK
+
+  return {
+      'tasks': len(waits),
+      'rounds': rounds,
+      'idle_fraction': idle / (workers * duration),
+      'mean_wait_s': sum(waits) / len(waits) if waits else 0.0,
+      'p95_wait_s': percentile(waits, 95),
+      'mean_depth': sum(depths) / len(depths),
+      'max_depth': max(depths),
+      'final_depth': depths[-1]
+  }
+
+
+def run(workers: int = 8,
+        duration: float = 1800.0,
+        fixed_batch: int = 20,
+        job_batch_size: int = 1000) -> Dict[str, Any]:
+  """simulate the fixed loop with a small and a large batch and the
+  scheduler, return the results"""
+  log_level = SCHED_LOGGER.level
+  SCHED_LOGGER.setLevel(logging.WARNING)
+  try:
+    results = {
+        f"fixed_{fixed_batch}":
+            simulate(fixed_policy(fixed_batch), None, workers, duration),
+        f"fixed_{job_batch_size}":
+            simulate(fixed_policy(job_batch_size), None, workers, duration)
+    }
+    policy, scheduler = adaptive_policy(job_batch_size)
+    results['adaptive'] = simulate(policy, scheduler, workers, duration)
+  finally:
+    SCHED_LOGGER.setLevel(log_level)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Enqueue scheduling simulation')
+  parser.add_argument('--workers', type=int, default=8)
+  parser.add_argument('--duration', type=float, default=1800.0)
+  parser.add_argument('--fixed_batch', type=int, default=20)
+  parser.add_argument('--job_batch_size', type=int, default=1000)
+  args = parser.parse_args()
+  print(
+      json.dumps(run(args.workers, args.duration, args.fixed_batch,
+                     args.job_batch_size),
+                 indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Job state transition throughput: one UPDATE and commit per job (legacy
+set_job_state) vs the buffered JobStateService. Runs against a local SQLite
+file, e.g.
+  python3 -m tuna.benchmarks.state_bench --num_jobs 20000 --flush_size 500"""
+
+import os
+import time
+import json
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.job_state import JobStateService, LOGGER as STATE_LOGGER
+from tuna.utils.statements import update_objs
+from tuna.utils.utility import SimpleDict
+
+TABLE = ConvolutionJob.__tablename__
+
+
+def make_session(db_file: str, num_jobs: int):
+  """Create a SQLite db holding num_jobs conv jobs in compile_start"""
+  engine = create_engine(f"sqlite:///{db_file}")
+  create_sqlite_tables(engine, [ConvolutionJob.__table__])
+  with engine.begin() as conn:
+    conn.execute(ConvolutionJob.__table__.insert(), [{
+        'session': 1,
+        'config': idx,
+        'state': 'compile_start',
+        'reason': 'bench',
+        'fin_step': 'miopen_find_compile'
+    } for idx in range(num_jobs)])
+  return sessionmaker(bind=engine)()
+
+
+def make_jobs(num_jobs: int) -> List[SimpleDict]:
+  """job contexts as the result parsers see them"""
+  return [
+      SimpleDict(id=idx + 1, state='compile_start', gpu_id=idx % 8, retries=0)
+      for idx in range(num_jobs)
+  ]
+
+
+def get_result(idx: int) -> str:
+  """fin result string, most jobs share one"""
+  return 'Success' if idx % 10 else f"Failed solver {idx}"
+
+
+def transition_legacy(session, jobs: List[SimpleDict]) -> None:
+  """legacy set_job_state: one UPDATE and commit per job"""
+  for idx, job in enumerate(jobs):
+    job.state = 'compiled'
+    job.result = get_result(idx)
+    update_objs(session, [job], ['state', 'gpu_id', 'result'], TABLE)
+    session.commit()
+
+
+def transition_buffered(session, jobs: List[SimpleDict],
+                        flush_size: int) -> None:
+  """buffered changes, flushed as grouped UPDATEs"""
+  job_states = JobStateService(TABLE, flush_size=flush_size, audit=[])
+  for idx, job in enumerate(jobs):
+    job_states.set_state(job, 'compiled', result=get_result(idx))
+    job_states.flush_if_due(session)
+  job_states.flush(session)
+
+
+def run(num_jobs: int = 5000, flush_size: int = 500) -> Dict[str, Any]:
+  """Run both paths on fresh databases, return the results"""
+  log_level = STATE_LOGGER.level
+  STATE_LOGGER.setLevel(logging.WARNING)
+  results = {}
+  try:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      for name in ('legacy', 'buffered'):
+        session = make_session(os.path.join(tmp_dir, f"{name}.db"), num_jobs)
+        jobs = make_jobs(num_jobs)
+        start = time.perf_counter()
+        if name == 'legacy':
+          transition_legacy(session, jobs)
+        else:
+          transition_buffered(session, jobs, flush_size)
+        elapsed = time.perf_counter() - start
+        moved = session.execute(
+            f"SELECT COUNT(*) FROM {TABLE} WHERE state = 'compiled'").scalar()
+        session.close()
+        results[name] = {
+            'jobs': moved,
+            'seconds': elapsed,
+            'jobs_per_sec': moved / elapsed if elapsed else 0.0
+        }
+  finally:
+    STATE_LOGGER.setLevel(log_level)
+
+  results['speedup'] = results['buffered']['jobs_per_sec'] / max(
+      results['legacy']['jobs_per_sec'], 1e-9)
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(description='Job state throughput')
+  parser.add_argument('--num_jobs', type=int, default=5000)
+  parser.add_argument('--flush_size', type=int, default=500)
+  args = parser.parse_args()
+  print(json.dumps(run(args.num_jobs, args.flush_size), indent=2))
+
+
+if __name__ == '__main__':
+  main()
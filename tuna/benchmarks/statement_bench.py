@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Statements per second: string formatted gen_*_query (legacy) vs cached
+statements with bound parameters. Runs against a local SQLite file, e.g.
+  python3 -m tuna.benchmarks.statement_bench --num_rows 20000"""
+
+import os
+import time
+import json
+import logging
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tuna.dbBase.sqlite_compat import create_sqlite_tables
+#tables imports every table ConvolutionJob refers to
+from tuna.miopen.db.tables import ConvolutionJob
+from tuna.utils.db_utility import gen_insert_query, gen_update_query
+from tuna.utils.db_utility import gen_select_objs, LOGGER as DB_LOGGER
+from tuna.utils.logger import setup_logger
+from tuna.utils.statements import insert_objs, update_objs, select_objs
+from tuna.utils.statements import LOGGER as STMT_LOGGER
+from tuna.utils.utility import SimpleDict
+
+LOGGER = setup_logger('statement_bench')
+
+#job columns written by the benchmark
+INSERT_ATTR = ['id', 'session', 'config', 'reason', 'fin_step', 'retries']
+UPDATE_ATTR = ['state', 'retries', 'cache_loc']
+SELECT_ATTR = ['id', 'session', 'config', 'state', 'retries', 'cache_loc']
+TABLE = ConvolutionJob.__tablename__
+
+
+def make_jobs(num_rows: int) -> List[SimpleDict]:
+  """job objects, ids are assigned by the insert"""
+  return [
+      SimpleDict(id=idx + 1,
+                 session=1,
+                 config=idx,
+                 reason='bench',
+                 fin_step='miopen_find_compile',
+                 retries=0) for idx in range(num_rows)
+  ]
+
+
+def set_states(jobs: List[SimpleDict]) -> None:
+  """values written by the update stage"""
+  for job in jobs:
+    job.state = 'compile_start'
+    job.retries += 1
+    job.cache_loc = f"~/.cache/miopen_{job.id}"
+
+
+def legacy_insert(session, jobs: List[SimpleDict]) -> None:
+  """one INSERT text per row"""
+  for job in jobs:
+    session.execute(gen_insert_query(job, INSERT_ATTR, TABLE))
+
+
+def legacy_update(session, jobs: List[SimpleDict]) -> None:
+  """one UPDATE text per row"""
+  for job in jobs:
+    session.execute(gen_update_query(job, UPDATE_ATTR, TABLE))
+
+
+def legacy_select(session, jobs: List[SimpleDict]) -> None:
+  """one SELECT text per row"""
+  for job in jobs:
+    gen_select_objs(session, SELECT_ATTR, TABLE, f"WHERE id={job.id}")
+
+
+def bound_insert(session, jobs: List[SimpleDict]) -> None:
+  """executemany of the cached INSERT"""
+  insert_objs(session, jobs, INSERT_ATTR, TABLE)
+
+
+def bound_update(session, jobs: List[SimpleDict]) -> None:
+  """executemany of the cached UPDATE"""
+  update_objs(session, jobs, UPDATE_ATTR, TABLE)
+
+
+def bound_select(session, jobs: List[SimpleDict]) -> None:
+  """the cached SELECT, executed per row"""
+  for job in jobs:
+    select_objs(session, SELECT_ATTR, TABLE, {'id': job.id})
+
+
+def timed(func: Callable, *args) -> float:
+  """seconds taken by func(*args)"""
+  start = time.perf_counter()
+  func(*args)
+  return time.perf_counter() - start
+
+
+def run_path(db_file: str, num_rows: int,
+             funcs: Dict[str, Callable]) -> Dict[str, Any]:
+  """insert, update and select num_rows jobs with funcs on a fresh db"""
+  engine = create_engine(f"sqlite:///{db_file}")
+  create_sqlite_tables(engine)
+  session = sessionmaker(bind=engine)()
+  jobs = make_jobs(num_rows)
+  results: Dict[str, Any] = {}
+  try:
+    for stage in ('insert', 'update', 'select'):
+      if stage == 'update':
+        set_states(jobs)
+      elapsed = timed(funcs[stage], session, jobs)
+      session.commit()
+      results[stage] = {
+          'statements': num_rows,
+          'seconds': elapsed,
+          'statements_per_sec': num_rows / elapsed if elapsed else 0.0
+      }
+    results['rows'] = session.execute(
+        f"SELECT id, state, retries, cache_loc FROM {TABLE} ORDER BY id"
+    ).fetchall()
+  finally:
+    session.close()
+    engine.dispose()
+  return results
+
+
+def run(num_rows: int = 5000) -> Dict[str, Any]:
+  """Run both paths on fresh databases, return the results"""
+  paths = {
+      'legacy': {
+          'insert': legacy_insert,
+          'update': legacy_update,
+          'select': legacy_select
+      },
+      'bound': {
+          'insert': bound_insert,
+          'update': bound_update,
+          'select': bound_select
+      }
+  }
+  #the legacy builders log every statement
+  log_levels = {log: log.level for log in (DB_LOGGER, STMT_LOGGER)}
+  for log in log_levels:
+    log.setLevel(logging.WARNING)
+  results: Dict[str, Any] = {}
+  try:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      for name, funcs in paths.items():
+        results[name] = run_path(os.path.join(tmp_dir, f"{name}.db"), num_rows,
+                                 funcs)
+  finally:
+    for log, level in log_levels.items():
+      log.setLevel(level)
+
+  #both paths must leave the same rows behind
+  results['identical'] = results['legacy'].pop('rows') == results['bound'].pop(
+      'rows')
+  results['speedup'] = {
+      stage:
+          results['bound'][stage]['statements_per_sec'] /
+          max(results['legacy'][stage]['statements_per_sec'], 1e-9)
+      for stage in ('insert', 'update', 'select')
+  }
+  return results
+
+
+def main():
+  """Main function"""
+  parser = argparse.ArgumentParser(
+      description='String vs bound statement throughput')
+  parser.add_argument('--num_rows', type=int, default=5000)
+  args = parser.parse_args()
+  print(json.dumps(run(args.num_rows), indent=2))
+
+
+if __name__ == '__main__':
+  main()
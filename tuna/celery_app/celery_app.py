@@ -28,8 +28,12 @@
 import os
 import subprocess
 from celery import Celery
+from celery.signals import task_success, task_failure
 from celery.utils.log import get_task_logger
 from tuna.custom_errors import CustomError
+from tuna.celery_app.result_collector import push_result_key
+from tuna.celery_app.context_codec import CODEC_NAME, register_codec
+from tuna.celery_app.context_codec import get_task_serializer
 
 LOGGER = get_task_logger("celery_app")
 
@@ -80,6 +84,8 @@ TUNA_CELERY_BROKER_HOST, TUNA_CELERY_BROKER_PORT, TUNA_CELERY_BROKER_USER, TUNA_
 
 TUNA_CELERY_BACKEND_PORT, TUNA_CELERY_BACKEND_HOST = get_backend_env()
 
+register_codec()
+
 #ampq borker & redis backend
 app = Celery(
     'celery_app',
@@ -88,12 +94,36 @@ app = Celery(
     result_backend=
     f"redis://{TUNA_CELERY_BACKEND_HOST}:{TUNA_CELERY_BACKEND_PORT}/15",
     broker_transport_options={"heartbeat": 60},
+    #job contexts are json unless TUNA_CELERY_SERIALIZER selects the compact
+    #codec, workers accept both
+    task_serializer=get_task_serializer(),
+    accept_content=['json', CODEC_NAME],
     include=[
         'tuna.miopen.celery_tuning.celery_tasks',
         'tuna.example.celery_tuning.celery_tasks'
     ])
 
 
+def notify_result(task, task_id):
+  """Push the backend key of a finished task to its result list"""
+  try:
+    push_result_key(task.backend.client, task.backend, task_id)
+  except Exception as err:  #pylint: disable=broad-exception-caught
+    LOGGER.warning('Could not push result key for task %s: %s', task_id, err)
+
+
+@task_success.connect
+def on_task_success(sender=None, **kwargs):  #pylint: disable=unused-argument
+  """Results are stored by the backend before task_success is sent"""
+  notify_result(sender, sender.request.id)
+
+
+@task_failure.connect
+def on_task_failure(sender=None, task_id=None, **kwargs):  #pylint: disable=unused-argument
+  """Failed tasks are consumed too so the job counter can reach 0"""
+  notify_result(sender, task_id)
+
+
 def stop_active_workers():
   """Shutdown active workers"""
 
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Compact binary codec for celery job contexts. Values are written in a
+tagged binary schema: repeated strings and dict key sets are interned, the
+string table is seeded with the column names and values every context
+carries. The body is optionally zlib or zstd compressed. A 4 byte header
+holds the magic, the format version and the compression"""
+
+import os
+import zlib
+import struct
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from kombu.serialization import register
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+from tuna.custom_errors import CustomError
+
+#celery serializer name and content type of the codec
+CODEC_NAME = 'tuna_context'
+CONTENT_TYPE = 'application/x-tuna-context'
+#env vars selecting the task serializer and the codec compression
+SERIALIZER_ENV = 'TUNA_CELERY_SERIALIZER'
+COMPRESSION_ENV = 'TUNA_CONTEXT_COMPRESSION'
+MAGIC = b'TC'
+FORMAT_VERSION = 2
+#compression byte of the header
+COMPRESSIONS = {'none': 0, 'zlib': 1, 'zstd': 2}
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+#bodies shorter than this are not worth compressing
+COMPRESS_MIN = 512
+#longer strings are written inline, never interned
+INTERN_MAX_LEN = 64
+
+#value tags, tags from SMALL_INT up hold the ints 0 .. 255 - SMALL_INT
+T_NONE, T_TRUE, T_FALSE, T_INT, T_FLOAT, T_STR, T_STR_REF, T_STR_RAW = range(8)
+T_BYTES, T_LIST, T_DICT, T_DICT_REF, T_DATETIME = range(8, 13)
+SMALL_INT = 32
+FLOAT = struct.Struct('<d')
+
+#strings every string table starts with: context keys, job, config, tensor
+#and find db columns, frequent values and the celery message embed keys.
+#Never change a published version, add a new one
+SEED_STRINGS: Dict[int, Tuple[str, ...]] = {
+    1: ('job', 'config', 'operation', 'arch', 'num_cu', 'kwargs', 'fdb_attr',
+        'id', 'valid', 'reason', 'state', 'retries', 'result', 'gpu_id',
+        'machine_id', 'cache_loc', 'compile_start', 'compile_end', 'eval_start',
+        'eval_end', 'solver', 'eval_mid', 'fin_step', 'session', 'batchsize',
+        'spatial_dim', 'pad_h', 'pad_w', 'pad_d', 'conv_stride_h',
+        'conv_stride_w', 'conv_stride_d', 'dilation_h', 'dilation_w',
+        'dilation_d', 'group_count', 'mode', 'pad_mode', 'trans_output_pad_h',
+        'trans_output_pad_w', 'trans_output_pad_d', 'direction', 'out_layout',
+        'driver', 'input_t', 'weight_t', 'dim0', 'dim1', 'dim2', 'dim3', 'dim4',
+        'layout', 'num_dims', 'data_type', 'fdb_key', 'params', 'kernel_time',
+        'workspace_sz', 'alg_lib', 'opencl', 'kernel_group', 'envmt', 'label',
+        'docker_name', 'session_id', 'NCHW', 'NHWC', 'NCDHW', 'NDHWC', 'FP32',
+        'FP16', 'BF16', 'INT8', 'F', 'B', 'W', 'conv', 'default', 'new',
+        'compile', 'eval', 'miopen_find_compile', 'miopen_find_eval',
+        'miopen_perf_compile', 'miopen_perf_eval', 'not_fin', 'gfx90a',
+        'gfx908', 'gfx942', 'gfx1030', 'gfx1100', 'MIOPEN_LOG_LEVEL=4',
+        'MIOPEN_SQLITE_KERN_CACHE=ON',
+        'MIOPEN_DEBUG_IMPLICIT_GEMM_FIND_ALL_SOLUTIONS=1', 'callbacks',
+        'errbacks', 'chain', 'chord')
+}
+#version 2: contexts no longer carry fdb_attr
+SEED_STRINGS[2] = tuple(val for val in SEED_STRINGS[1] if val != 'fdb_attr')
+
+#string -> index of the seeded strings, per version
+SEED_INDEX: Dict[int, Dict[str, int]] = {
+    version: {
+        val: idx for idx, val in enumerate(strings)
+    } for version, strings in SEED_STRINGS.items()
+}
+
+
+def get_compression() -> str:
+  """compression of encoded contexts, from TUNA_CONTEXT_COMPRESSION"""
+  compression = os.environ.get(COMPRESSION_ENV, 'zlib').lower()
+  if compression not in COMPRESSIONS:
+    raise CustomError(f"{COMPRESSION_ENV} must be one of {list(COMPRESSIONS)}")
+  if compression == 'zstd' and zstandard is None:
+    raise CustomError('zstd compression requires the zstandard package')
+  return compression
+
+
+class Encoder():
+  """Writes one value, strings and key sets are interned as they are seen"""
+
+  def __init__(self, version: int = FORMAT_VERSION):
+    self.out: bytearray = bytearray()
+    self.strings: Dict[str, int] = dict(SEED_INDEX[version])
+    self.shapes: Dict[Tuple[Any, ...], int] = {}
+    self.writers: Dict[type, Callable[[Any], None]] = {
+        type(None): self.write_none,
+        bool: self.write_bool,
+        int: self.write_int,
+        float: self.write_float,
+        str: self.write_str,
+        bytes: self.write_bytes,
+        list: self.write_list,
+        tuple: self.write_list,
+        dict: self.write_dict,
+        datetime: self.write_datetime
+    }
+
+  def write_varint(self, val: int) -> None:
+    """unsigned LEB128"""
+    while val > 0x7f:
+      self.out.append((val & 0x7f) | 0x80)
+      val >>= 7
+    self.out.append(val)
+
+  def write(self, val: Any) -> None:
+    """write any supported value"""
+    writer = self.writers.get(type(val))
+    if writer is None:
+      for val_type, type_writer in self.writers.items():
+        if isinstance(val, val_type):
+          writer = type_writer
+          break
+      else:
+        raise TypeError(f"Cannot encode {type(val).__name__}: {val!r}")
+    writer(val)
+
+  def write_none(self, _val: None) -> None:
+    """None"""
+    self.out.append(T_NONE)
+
+  def write_bool(self, val: bool) -> None:
+    """True or False"""
+    self.out.append(T_TRUE if val else T_FALSE)
+
+  def write_int(self, val: int) -> None:
+    """small ints are a single tag byte, others zigzag varints"""
+    if 0 <= val < 256 - SMALL_INT:
+      self.out.append(SMALL_INT + val)
+    else:
+      self.out.append(T_INT)
+      self.write_varint(val * 2 if val >= 0 else -val * 2 - 1)
+
+  def write_float(self, val: float) -> None:
+    """8 byte double"""
+    self.out.append(T_FLOAT)
+    self.out += FLOAT.pack(val)
+
+  def write_str(self, val: str) -> None:
+    """reference to an interned string, or the string itself"""
+    idx = self.strings.get(val)
+    if idx is not None:
+      self.out.append(T_STR_REF)
+      self.write_varint(idx)
+      return
+    data = val.encode('utf-8')
+    if len(val) <= INTERN_MAX_LEN:
+      self.strings[val] = len(self.strings)
+      self.out.append(T_STR)
+    else:
+      self.out.append(T_STR_RAW)
+    self.write_varint(len(data))
+    self.out += data
+
+  def write_bytes(self, val: bytes) -> None:
+    """raw bytes"""
+    self.out.append(T_BYTES)
+    self.write_varint(len(val))
+    self.out += val
+
+  def write_list(self, val: List[Any]) -> None:
+    """lists and tuples, decoded as lists like json does"""
+    self.out.append(T_LIST)
+    self.write_varint(len(val))
+    for item in val:
+      self.write(item)
+
+  def write_dict(self, val: Dict[Any, Any]) -> None:
+    """key set (interned) followed by the values"""
+    keys = tuple(val)
+    idx = self.shapes.get(keys)
+    if idx is None:
+      self.shapes[keys] = len(self.shapes)
+      self.out.append(T_DICT)
+      self.write_varint(len(keys))
+      for key in keys:
+        self.write(key)
+    else:
+      self.out.append(T_DICT_REF)
+      self.write_varint(idx)
+    for item in val.values():
+      self.write(item)
+
+  def write_datetime(self, val: datetime) -> None:
+    """iso format string"""
+    self.out.append(T_DATETIME)
+    self.write_str(val.isoformat())
+
+
+class Decoder():
+  """Reads one value written by Encoder"""
+
+  def __init__(self, data: bytes, version: int = FORMAT_VERSION):
+    self.data: bytes = data
+    self.pos: int = 0
+    self.strings: List[str] = list(SEED_STRINGS[version])
+    self.shapes: List[Tuple[Any, ...]] = []
+    self.readers: Dict[int, Callable[[], Any]] = {
+        T_TRUE: lambda: True,
+        T_FALSE: lambda: False,
+        T_INT: self.read_int,
+        T_FLOAT: self.read_float,
+        T_STR: self.read_str,
+        T_STR_RAW: self.read_raw_str,
+        T_BYTES: self.read_bytes,
+        T_LIST: self.read_list,
+        T_DICT: self.read_dict,
+        T_DICT_REF: lambda: self.read_values(self.shapes[self.read_varint()]),
+        T_DATETIME: lambda: datetime.fromisoformat(self.read())
+    }
+
+  def read_varint(self) -> int:
+    """unsigned LEB128"""
+    data = self.data
+    byte = data[self.pos]
+    self.pos += 1
+    if byte < 0x80:
+      return byte
+    ret = byte & 0x7f
+    shift = 7
+    while True:
+      byte = data[self.pos]
+      self.pos += 1
+      ret |= (byte & 0x7f) << shift
+      if byte < 0x80:
+        return ret
+      shift += 7
+
+  def read(self) -> Any:
+    """read any value, the frequent tags are tested first"""
+    tag = self.data[self.pos]
+    self.pos += 1
+    if tag >= SMALL_INT:
+      return tag - SMALL_INT
+    if tag == T_STR_REF:
+      return self.strings[self.read_varint()]
+    if tag == T_NONE:
+      return None
+    try:
+      return self.readers[tag]()
+    except KeyError as err:
+      raise ValueError(f"Unknown tag {tag} at {self.pos - 1}") from err
+
+  def read_int(self) -> int:
+    """zigzag varint"""
+    val = self.read_varint()
+    return val >> 1 if not val & 1 else -((val + 1) >> 1)
+
+  def read_float(self) -> float:
+    """8 byte double"""
+    val = FLOAT.unpack_from(self.data, self.pos)[0]
+    self.pos += FLOAT.size
+    return val
+
+  def read_raw(self) -> bytes:
+    """length prefixed bytes"""
+    size = self.read_varint()
+    val = self.data[self.pos:self.pos + size]
+    self.pos += size
+    return bytes(val)
+
+  def read_str(self) -> str:
+    """new interned string"""
+    val = self.read_raw().decode('utf-8')
+    self.strings.append(val)
+    return val
+
+  def read_raw_str(self) -> str:
+    """string which is not interned"""
+    return self.read_raw().decode('utf-8')
+
+  def read_bytes(self) -> bytes:
+    """raw bytes"""
+    return self.read_raw()
+
+  def read_list(self) -> List[Any]:
+    """list of values"""
+    return [self.read() for _ in range(self.read_varint())]
+
+  def read_dict(self) -> Dict[Any, Any]:
+    """new key set and its values"""
+    keys = tuple(self.read() for _ in range(self.read_varint()))
+    self.shapes.append(keys)
+    return self.read_values(keys)
+
+  def read_values(self, keys: Tuple[Any, ...]) -> Dict[Any, Any]:
+    """values of the key set keys"""
+    return {key: self.read() for key in keys}
+
+
+def encode(obj: Any, compression: Optional[str] = None) -> bytes:
+  """header and body of obj, compression defaults to get_compression()"""
+  encoder = Encoder()
+  encoder.write(obj)
+  body = bytes(encoder.out)
+  compression = compression if compression else get_compression()
+  if compression != 'none' and len(body) >= COMPRESS_MIN:
+    if compression == 'zstd':
+      packed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    else:
+      packed = zlib.compress(body, ZLIB_LEVEL)
+    if len(packed) < len(body):
+      return MAGIC + bytes((FORMAT_VERSION, COMPRESSIONS[compression])) + packed
+  return MAGIC + bytes((FORMAT_VERSION, COMPRESSIONS['none'])) + body
+
+
+def decode(data: bytes) -> Any:
+  """obj encoded by encode, of any known format version"""
+  data = bytes(data)
+  if data[:2] != MAGIC or len(data) < 4:
+    raise ValueError('Not a tuna context payload')
+  version, compression = data[2], data[3]
+  if version not in SEED_STRINGS:
+    raise ValueError(f"Unsupported context format version {version}")
+  body = data[4:]
+  if compression == COMPRESSIONS['zlib']:
+    body = zlib.decompress(body)
+  elif compression == COMPRESSIONS['zstd']:
+    if zstandard is None:
+      raise ValueError('zstd payload, the zstandard package is not installed')
+    body = zstandard.ZstdDecompressor().decompress(body)
+  elif compression != COMPRESSIONS['none']:
+    raise ValueError(f"Unknown context compression {compression}")
+  decoder = Decoder(body, version)
+  obj = decoder.read()
+  if decoder.pos != len(body):
+    raise ValueError('Trailing data after context payload')
+  return obj
+
+
+def register_codec() -> None:
+  """make the codec available to kombu/celery as CODEC_NAME"""
+  register(CODEC_NAME,
+           encode,
+           decode,
+           content_type=CONTENT_TYPE,
+           content_encoding='binary')
+
+
+def get_task_serializer() -> str:
+  """task serializer from TUNA_CELERY_SERIALIZER, json by default"""
+  return os.environ.get(SERIALIZER_ENV, 'json')
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Batched enqueue of celery tasks: job contexts are published in batches of
+fan_out tasks over a single producer on its own channel, every job keeps its
+own '<prefix>-<uuid>' task id so results are still collected per job. On amqp
+the channel is in confirm mode and each batch waits for the broker's acks"""
+
+import os
+import logging
+from typing import Any, List, Optional, Set
+
+from amqp import spec
+from amqp.exceptions import MessageNacked
+from kombu import Queue
+from kombu.utils.uuid import uuid
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import split_packets
+
+LOGGER = setup_logger('celery_enqueue')
+
+#default number of tasks published per producer checkout
+ENQUEUE_FAN_OUT = 100
+
+
+def get_enqueue_fan_out() -> int:
+  """Number of tasks published per batch, TUNA_ENQUEUE_FAN_OUT overrides"""
+  if 'TUNA_ENQUEUE_FAN_OUT' in os.environ:
+    return max(int(os.environ['TUNA_ENQUEUE_FAN_OUT']), 1)
+  return ENQUEUE_FAN_OUT
+
+
+def get_task_id(prefix: Optional[str] = None) -> str:
+  """Task id used as the redis result key, '<prefix>-<uuid>' with a prefix"""
+  if prefix:
+    return ('-').join([prefix, uuid()])
+  return uuid()
+
+
+def get_args_repr(context: dict) -> str:
+  """Short task args repr, celery would otherwise saferepr the whole context
+  into the message headers"""
+  job = context.get('job')
+  if isinstance(job, dict) and 'id' in job:
+    return f"(job {job['id']},)"
+  return '(context,)'
+
+
+class PublishConfirms():
+  """Publisher confirms of a channel only the enqueuer publishes on, a batch
+  is published without waiting on the broker and wait() then blocks until
+  the broker confirmed every message of it"""
+
+  def __init__(self, channel: Any, timeout: Optional[float] = None):
+    self.channel = channel
+    self.timeout: Optional[float] = timeout
+    self.published: int = 0
+    self.unconfirmed: Set[int] = set()
+    self.nacked: int = 0
+    channel.events['basic_ack'].add(self.on_ack)
+    channel.events['basic_nack'].add(self.on_nack)
+    channel.confirm_select()
+
+  def add(self, count: int) -> None:
+    """count more messages were published, delivery tags count up from 1"""
+    self.unconfirmed.update(
+        range(self.published + 1, self.published + count + 1))
+    self.published += count
+
+  def confirm(self, delivery_tag: int, multiple: bool) -> int:
+    """Drop the confirmed delivery tags, returns how many there were"""
+    if multiple:
+      tags = {tag for tag in self.unconfirmed if tag <= delivery_tag}
+    else:
+      tags = {delivery_tag} & self.unconfirmed
+    self.unconfirmed -= tags
+    return len(tags)
+
+  def on_ack(self, delivery_tag: int, multiple: bool) -> None:
+    """basic_ack listener"""
+    self.confirm(delivery_tag, multiple)
+
+  def on_nack(self, delivery_tag: int, multiple: bool) -> None:
+    """basic_nack listener"""
+    self.nacked += self.confirm(delivery_tag, multiple)
+
+  def wait(self) -> None:
+    """Block until all published messages are confirmed, raises
+    MessageNacked if the broker rejected any of them"""
+    while self.unconfirmed:
+      self.channel.wait([spec.Basic.Ack, spec.Basic.Nack], timeout=self.timeout)
+    if self.nacked:
+      nacked, self.nacked = self.nacked, 0
+      raise MessageNacked(f'{nacked} messages nacked by the broker')
+
+
+class BatchEnqueuer():
+  """Publishes one task per job context for task on queue q_name, reusing a
+  single producer and queue declaration for every task of a batch. confirm
+  selects publisher confirms, default: where the transport is amqp"""
+
+  def __init__(self,
+               task: Any,
+               q_name: str,
+               prefix: Optional[str] = None,
+               fan_out: Optional[int] = None,
+               confirm: Optional[bool] = None,
+               logger: Optional[logging.Logger] = None):
+    self.task = task
+    self.q_name: str = q_name
+    self.queue: Queue = Queue(q_name)
+    self.prefix: Optional[str] = prefix
+    self.fan_out: int = max(fan_out, 1) if fan_out else get_enqueue_fan_out()
+    self.confirm: Optional[bool] = confirm
+    self.logger: logging.Logger = logger if logger else LOGGER
+
+  def publish(self, contexts: List[dict], producer: Any) -> List[str]:
+    """Publish contexts with producer, returns the task ids"""
+    task_ids = []
+    for context in contexts:
+      task_id = get_task_id(self.prefix)
+      self.task.apply_async((context,),
+                            task_id=task_id,
+                            queue=self.queue,
+                            reply_to=self.q_name,
+                            producer=producer,
+                            argsrepr=get_args_repr(context),
+                            kwargsrepr='{}')
+      task_ids.append(task_id)
+    return task_ids
+
+  def enqueue(self, contexts: List[dict]) -> List[str]:
+    """Publish all contexts in batches of fan_out, returns the task ids in
+    the order of contexts"""
+    task_ids = []
+    with self.task.app.pool.acquire(block=True) as conn:
+      #a channel of its own, confirm mode does not leak to other publishers
+      channel = conn.channel()
+      try:
+        confirm = self.confirm
+        if confirm is None:
+          confirm = conn.transport.driver_type == 'amqp'
+        confirms = PublishConfirms(channel) if confirm else None
+        producer = self.task.app.amqp.Producer(channel)
+        for batch in split_packets(contexts, self.fan_out):
+          task_ids.extend(self.publish(batch, producer))
+          if confirms:
+            confirms.add(len(batch))
+            confirms.wait()
+      finally:
+        channel.close()
+    self.logger.info('Enqueued %s tasks to %s', len(task_ids), self.q_name)
+    return task_ids
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Feedback driven enqueue scheduling. The backlog of a celery queue is kept
+between a low and a high watermark around a target window, the window holds
+target_seconds of work at the worker consumption rate measured from the
+broker. Each round returns how many jobs to enqueue and when to look again"""
+
+import os
+import math
+import logging
+from typing import Any, NamedTuple, Optional, Tuple
+
+from kombu.exceptions import ChannelError, OperationalError
+
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('enqueue_scheduler')
+
+#seconds of work the backlog should hold, TUNA_ENQUEUE_TARGET_SECONDS overrides
+TARGET_SECONDS = 60.0
+#refill when the backlog is below LOW_WATERMARK * window, up to HIGH_WATERMARK
+#* window
+LOW_WATERMARK = 0.5
+HIGH_WATERMARK = 1.5
+#bounds of the window in tasks
+MIN_WINDOW = 4
+MAX_WINDOW = 10000
+#bounds of the wait between two rounds in seconds
+MIN_INTERVAL = 1.0
+MAX_INTERVAL = 30.0
+#wait between rounds once the job table has no jobs left
+IDLE_INTERVAL = 10.0
+#weight of the newest rate sample in the moving average
+RATE_ALPHA = 0.3
+
+
+def get_target_seconds() -> float:
+  """Seconds of work kept in the queue, TUNA_ENQUEUE_TARGET_SECONDS overrides"""
+  if 'TUNA_ENQUEUE_TARGET_SECONDS' in os.environ:
+    return max(float(os.environ['TUNA_ENQUEUE_TARGET_SECONDS']), 1.0)
+  return TARGET_SECONDS
+
+
+class EnqueuePlan(NamedTuple):
+  """Jobs to enqueue now and seconds until the next round"""
+  batch: int
+  interval: float
+
+
+#pylint: disable=too-few-public-methods
+class CeleryBroker():
+  """Queue depth through the broker connection of a celery app"""
+
+  def __init__(self, app: Any, logger: Optional[logging.Logger] = None):
+    self.app = app
+    self.logger: logging.Logger = logger if logger else LOGGER
+
+  def depth(self, q_name: str) -> Optional[int]:
+    """Messages waiting in q_name, None if the broker can not tell"""
+    try:
+      with self.app.connection_for_read() as conn:
+        _, count, _ = conn.default_channel.queue_declare(queue=q_name,
+                                                         passive=True)
+      return count
+    except (ChannelError, OperationalError, OSError) as err:
+      self.logger.warning('No depth for queue %s: %s', q_name, err)
+      return None
+
+
+#pylint: disable=too-many-instance-attributes
+class EnqueueScheduler():
+  """Sizes enqueue rounds from the backlog and the consumption rate. Call
+  plan with the current backlog, enqueue plan.batch jobs, report them with
+  record_enqueued and wait plan.interval seconds"""
+
+  def __init__(self,
+               initial_batch: int,
+               target_seconds: Optional[float] = None,
+               min_window: int = MIN_WINDOW,
+               max_window: int = MAX_WINDOW,
+               min_interval: float = MIN_INTERVAL,
+               max_interval: float = MAX_INTERVAL,
+               logger: Optional[logging.Logger] = None):
+    self.initial_batch: int = max(initial_batch, 1)
+    self.target_seconds: float = target_seconds if target_seconds \
+        else get_target_seconds()
+    self.min_window: int = min_window
+    self.max_window: int = max_window
+    self.min_interval: float = min_interval
+    self.max_interval: float = max_interval
+    self.logger: logging.Logger = logger if logger else LOGGER
+    #tasks per second taken off the queue, None until measured
+    self.rate: Optional[float] = None
+    self.last_time: Optional[float] = None
+    self.last_backlog: int = 0
+    self.enqueued: int = 0
+
+  def get_window(self) -> int:
+    """Target backlog in tasks"""
+    if self.rate is None:
+      window = math.ceil(self.initial_batch / HIGH_WATERMARK)
+    else:
+      window = math.ceil(self.rate * self.target_seconds)
+    return min(max(window, self.min_window), self.max_window)
+
+  def get_watermarks(self) -> Tuple[int, int]:
+    """Backlog below which to refill and backlog to refill up to"""
+    window = self.get_window()
+    high = math.ceil(window * HIGH_WATERMARK)
+    if self.rate is None:
+      #the first rounds fill up to initial_batch
+      high = self.initial_batch
+    return math.ceil(window * LOW_WATERMARK), high
+
+  def update_rate(self, backlog: int, now: float) -> None:
+    """Fold the tasks consumed since the last round into the rate"""
+    if self.last_time is None or now <= self.last_time:
+      return
+    consumed = max(self.last_backlog + self.enqueued - backlog, 0)
+    sample = consumed / (now - self.last_time)
+    if self.rate is None:
+      if consumed:
+        self.rate = sample
+    elif not backlog:
+      #the queue ran dry, the workers could have taken more
+      self.rate = max(self.rate, sample)
+    else:
+      self.rate += RATE_ALPHA * (sample - self.rate)
+
+  def plan(self, backlog: int, now: float) -> EnqueuePlan:
+    """Batch to enqueue and interval to wait given the current backlog"""
+    self.update_rate(backlog, now)
+    self.last_time = now
+    self.last_backlog = backlog
+    self.enqueued = 0
+
+    low, high = self.get_watermarks()
+    batch = high - backlog if backlog < low else 0
+    if self.rate:
+      interval = (backlog + batch - low) / self.rate
+    else:
+      interval = self.min_interval
+    interval = min(max(interval, self.min_interval), self.max_interval)
+    self.logger.info(
+        'Backlog %s, rate %.2f/s, watermarks %s-%s: enqueue %s, next in'
+        ' %.1fs', backlog, self.rate or 0.0, low, high, batch, interval)
+    return EnqueuePlan(batch, interval)
+
+  def record_enqueued(self, count: int) -> None:
+    """Jobs actually enqueued since the last plan"""
+    self.enqueued += count
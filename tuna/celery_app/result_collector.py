@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Event driven collection of celery results: workers push the backend key of
+every finished task onto a per prefix redis list, the consumer blocks on that
+list and moves the keys in pipelined batches to its processing list. A key
+leaves the processing list when its result is acked, or for the dead letter
+list when it could not be parsed. Keys left by a failed pass are collected
+again. BLMOVE/LMOVE go through execute_command, aioredis 2.0 has no wrapper
+for them"""
+
+import re
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Tuple
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.metrics import RESULT_LAG
+
+LOGGER = setup_logger('result_collector')
+
+#name of the redis list holding keys of finished tasks
+RESULT_LIST = 'tuna-results'
+#suffix of the list holding the keys a consumer is processing
+PROCESSING_SUFFIX = 'processing'
+#suffix of the list holding the keys of results that could not be parsed
+DEAD_LETTER_SUFFIX = 'dead'
+#consumer name of the processing list, one consumer per prefix
+CONSUMER = 'consumer'
+#length of the kombu uuid appended to the task id prefix
+UUID_LEN = 36
+#max number of results drained from the list in one pass
+COLLECT_BATCH_SIZE = 500
+#max number of results parsed concurrently
+COLLECT_WORKERS = 8
+#seconds to block waiting for a new result
+BLOCK_TIMEOUT = 1
+#completion time of a result stored by the celery redis backend
+DATE_DONE_RE = re.compile(r'"date_done":\s*"([^"]+)"')
+#result key of tasks whose job lease was lost, the job was reclaimed and its
+#new copy delivers the result that counts
+LEASE_LOST_KEY = 'lease_lost'
+LEASE_LOST_RE = re.compile(rf'"{LEASE_LOST_KEY}":\s*true')
+
+
+def get_result_list(prefix: Optional[str] = None) -> str:
+  """Name of the redis list collecting the results of tasks with prefix"""
+  if prefix:
+    return f"{RESULT_LIST}-{prefix}"
+  return RESULT_LIST
+
+
+def get_processing_list(prefix: Optional[str] = None,
+                        consumer: str = CONSUMER) -> str:
+  """Name of the redis list of keys consumer is processing"""
+  return f"{get_result_list(prefix)}-{PROCESSING_SUFFIX}-{consumer}"
+
+
+def get_dead_letter_list(prefix: Optional[str] = None) -> str:
+  """Name of the redis list of keys whose result could not be parsed"""
+  return f"{get_result_list(prefix)}-{DEAD_LETTER_SUFFIX}"
+
+
+def get_task_prefix(task_id: Optional[str]) -> Optional[str]:
+  """Recover the redis key prefix from a '<prefix>-<uuid>' task id"""
+  if task_id and len(task_id) > UUID_LEN + 1:
+    return task_id[:-(UUID_LEN + 1)]
+  return None
+
+
+def get_result_lag(data: str,
+                   now: Optional[datetime] = None) -> Optional[float]:
+  """Seconds since the task of a stored result finished, None if the result
+  has no date_done"""
+  match = DATE_DONE_RE.search(data)
+  if not match:
+    return None
+  try:
+    done = datetime.fromisoformat(match.group(1))
+  except ValueError:
+    return None
+  if done.tzinfo is None:
+    #celery stores utc
+    done = done.replace(tzinfo=timezone.utc)
+  if now is None:
+    now = datetime.now(timezone.utc)
+  return max((now - done).total_seconds(), 0.0)
+
+
+def is_lease_lost(data: Any) -> bool:
+  """True for the result of a task that lost its job lease"""
+  if isinstance(data, bytes):
+    data = data.decode('utf-8')
+  return bool(LEASE_LOST_RE.search(data))
+
+
+def push_result_key(client: Any, backend: Any, task_id: str) -> str:
+  """Notify the consumer that the result of task_id has been stored,
+  called by the worker from the task_success/task_failure signals"""
+  key = backend.get_key_for_task(task_id)
+  list_name = get_result_list(get_task_prefix(task_id))
+  client.rpush(list_name, key)
+  return list_name
+
+
+#pylint: disable=too-many-instance-attributes
+class ResultCollector():
+  """Drains the result list of a prefix and hands every result to handler,
+  client is an async redis client (aioredis or redis.asyncio compatible)"""
+
+  def __init__(self,
+               client: Any,
+               prefix: Optional[str],
+               handler: Callable[[str], Any],
+               batch_size: int = COLLECT_BATCH_SIZE,
+               max_workers: int = COLLECT_WORKERS,
+               block_timeout: int = BLOCK_TIMEOUT,
+               logger: Optional[logging.Logger] = None):
+    self.client = client
+    self.list_name: str = get_result_list(prefix)
+    self.processing: str = get_processing_list(prefix)
+    self.dead_letter: str = get_dead_letter_list(prefix)
+    self.handler = handler
+    self.batch_size: int = max(batch_size, 1)
+    self.max_workers: int = max(max_workers, 1)
+    self.block_timeout: int = block_timeout
+    self.logger: logging.Logger = logger if logger else LOGGER
+
+  async def drain(self) -> List[bytes]:
+    """Block for the next result key then move up to batch_size keys to the
+    processing list"""
+    first = await self.client.execute_command('BLMOVE', self.list_name,
+                                              self.processing, 'LEFT', 'RIGHT',
+                                              self.block_timeout)
+    if not first:
+      return []
+    keys = [first]
+    if self.batch_size > 1:
+      pipe = self.client.pipeline(transaction=False)
+      for _ in range(self.batch_size - 1):
+        pipe.execute_command('LMOVE', self.list_name, self.processing, 'LEFT',
+                             'RIGHT')
+      keys.extend(key for key in await pipe.execute() if key)
+    return keys
+
+  async def pending(self) -> List[bytes]:
+    """Keys left in the processing list by a pass that did not finish"""
+    return await self.client.lrange(self.processing, 0, -1)
+
+  async def fetch(self, keys: List[bytes]) -> List[Tuple[bytes, Any]]:
+    """Get the stored results for keys with a single MGET"""
+    if not keys:
+      return []
+    values = await self.client.mget(keys)
+    return list(zip(keys, values))
+
+  async def ack(self, keys: List[bytes], failed: List[bytes]) -> None:
+    """Delete the results of keys and move the failed keys to the dead letter
+    list, in a single transaction. Both leave the processing list"""
+    if not keys and not failed:
+      return
+    pipe = self.client.pipeline(transaction=True)
+    if keys:
+      pipe.delete(*keys)
+    if failed:
+      pipe.rpush(self.dead_letter, *failed)
+    for key in keys + failed:
+      pipe.lrem(self.processing, 1, key)
+    await pipe.execute()
+
+  def handle(self, data: Any) -> Any:
+    """Run handler on a single stored result"""
+    if isinstance(data, bytes):
+      data = data.decode('utf-8')
+    lag = get_result_lag(data)
+    if lag is not None:
+      RESULT_LAG.observe(lag)
+    return self.handler(data)
+
+  async def process(
+      self, results: List[Tuple[bytes, Any]],
+      executor: ThreadPoolExecutor) -> Tuple[List[bytes], List[bytes], int]:
+    """Run handler on results in the worker pool, returns the keys to ack, the
+    failed keys and the number of results consumed. Results of tasks that lost
+    their lease are acked, not consumed"""
+    loop = asyncio.get_running_loop()
+    found = []
+    stale = []
+    for key, data in results:
+      if not data:
+        self.logger.warning('No result stored for %s', key)
+        stale.append(key)
+      elif is_lease_lost(data):
+        self.logger.warning('Dropping result %s, its job was reclaimed', key)
+        stale.append(key)
+      else:
+        found.append((key, data))
+
+    outcomes = await asyncio.gather(*[
+        loop.run_in_executor(executor, self.handle, data) for _, data in found
+    ],
+                                    return_exceptions=True)
+
+    done = stale
+    failed = []
+    for (key, _), ret in zip(found, outcomes):
+      if isinstance(ret, Exception):
+        #counted, the result is kept in redis for inspection
+        self.logger.error('Failed to parse result %s: %s', key, ret)
+        failed.append(key)
+      else:
+        done.append(key)
+
+    return done, failed, len(found)
+
+  async def collect(self,
+                    executor: ThreadPoolExecutor,
+                    keys: Optional[List[bytes]] = None) -> int:
+    """One drain/fetch/process/ack pass, or a fetch/process/ack pass over
+    keys. Returns the number of results"""
+    if keys is None:
+      keys = await self.drain()
+    if not keys:
+      return 0
+    results = await self.fetch(keys)
+    done, failed, count = await self.process(results, executor)
+    await self.ack(done, failed)
+    self.logger.info('Collected %s results', count)
+    return count
+
+  async def run(self, job_counter: Any, lock: Any) -> bool:
+    """Collect results until job_counter reaches 0, starting with the keys a
+    previous pass left in the processing list"""
+    recover = True
+    with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+      while job_counter.value > 0:
+        try:
+          keys = None
+          if recover:
+            keys = await self.pending()
+            if keys:
+              self.logger.warning('Collecting %s unacked results', len(keys))
+            recover = False
+          count = await self.collect(executor, keys)
+        except Exception as err:  #pylint: disable=broad-exception-caught
+          self.logger.error('Error collecting results: %s', err)
+          recover = True
+          await asyncio.sleep(self.block_timeout)
+          continue
+        if count:
+          with lock:
+            job_counter.value = job_counter.value - count
+
+    return True
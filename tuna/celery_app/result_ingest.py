@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Parallel ingestion of fin results. The result collector puts every result
+on a bounded queue, blocking while the writers are behind, and a pool of
+writer processes stores them. A writer keeps one DB session and stores a batch
+of results per transaction; a batch that fails is replayed one result per
+transaction and results that keep failing are quarantined"""
+
+import os
+import json
+import time
+import queue
+import logging
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from tuna.custom_errors import CustomError
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.utils.logger import setup_logger
+from tuna.utils.stats import LatencyStats
+
+LOGGER = setup_logger('result_ingest')
+
+#results waiting for a writer, put blocks once the queue is full
+INGEST_QUEUE_SIZE = 1000
+INGEST_WRITERS = 4
+#results stored in one transaction
+INGEST_BATCH_SIZE = 32
+#seconds a writer waits to fill a batch before storing what it has
+INGEST_FLUSH_INTERVAL = 0.5
+#tries of a single result before it is quarantined
+INGEST_MAX_ATTEMPTS = 3
+#put: collector blocked on a full queue, wait: writer idle, store: handler
+#run per result, commit: per batch
+INGEST_STAGES = ('put', 'wait', 'store', 'commit')
+#seconds between liveness checks of the writers while blocked
+INGEST_POLL = 1
+
+#handler(session, data) stores one result
+ResultHandler = Callable[[Any, str], Any]
+
+
+class BatchAborted(Exception):
+  """A result handler rolled back while its batch was open"""
+
+
+class BatchSession():
+  """Session handed to the result handlers while a batch is open. Their
+  commits only flush to the batch transaction and a rollback aborts the
+  batch, which is then replayed one result at a time"""
+
+  def __init__(self, session: DbSession):
+    self.session: DbSession = session
+
+  def commit(self) -> None:
+    """flush, the writer commits the batch"""
+    self.session.flush()
+
+  def rollback(self) -> None:
+    """abort the batch"""
+    raise BatchAborted('rollback inside an ingestion batch')
+
+  def __getattr__(self, name: str) -> Any:
+    return getattr(self.session, name)
+
+
+def new_stage_stats() -> Dict[str, LatencyStats]:
+  """latency accumulator per ingestion stage"""
+  return {stage: LatencyStats() for stage in INGEST_STAGES}
+
+
+@contextmanager
+def measure(stats: Dict[str, LatencyStats], stage: str) -> Iterator[None]:
+  """record the time spent in the block for stage"""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    stats[stage].record(time.perf_counter() - start)
+
+
+# pylint: disable=too-many-instance-attributes
+class ResultWriter():
+  """Writer process body, stores results from the queue until it reads the
+  stop sentinel (None) and reports its counts and stage timings"""
+
+  def __init__(self, writer_id: int, handler: ResultHandler,
+               results: multiprocessing.Queue, reports: multiprocessing.Queue,
+               config: Dict[str, Any], logger: logging.Logger):
+    self.writer_id: int = writer_id
+    self.handler: ResultHandler = handler
+    self.results: multiprocessing.Queue = results
+    self.reports: multiprocessing.Queue = reports
+    self.batch_size: int = config['batch_size']
+    self.flush_interval: float = config['flush_interval']
+    self.max_attempts: int = config['max_attempts']
+    self.quarantine_file: Optional[str] = config['quarantine_file']
+    self.logger: logging.Logger = logger
+    self.counts: Dict[str, int] = {
+        'stored': 0,
+        'batches': 0,
+        'replayed': 0,
+        'quarantined': 0
+    }
+    self.stats: Dict[str, LatencyStats] = new_stage_stats()
+
+  def next_batch(self) -> Tuple[List[str], bool]:
+    """block for a result, then take more until the batch is full or the
+    flush interval has passed. Returns the batch and whether to stop"""
+    with measure(self.stats, 'wait'):
+      data = self.results.get()
+    if data is None:
+      return [], True
+
+    batch = [data]
+    deadline = time.monotonic() + self.flush_interval
+    while len(batch) < self.batch_size:
+      timeout = deadline - time.monotonic()
+      if timeout <= 0:
+        break
+      try:
+        data = self.results.get(timeout=timeout)
+      except queue.Empty:
+        break
+      if data is None:
+        return batch, True
+      batch.append(data)
+    return batch, False
+
+  def store_batch(self, session: DbSession, batch: List[str]) -> None:
+    """store batch in one transaction, one by one if that fails"""
+    batch_session = BatchSession(session)
+    try:
+      for data in batch:
+        with measure(self.stats, 'store'):
+          self.handler(batch_session, data)
+      with measure(self.stats, 'commit'):
+        session.commit()
+    except Exception as err:  #pylint: disable=broad-exception-caught
+      session.rollback()
+      self.logger.warning(
+          'Writer %s: batch of %s results failed (%s), '
+          'storing them one by one', self.writer_id, len(batch), err)
+      self.counts['replayed'] += len(batch)
+      for data in batch:
+        self.store_single(session, data)
+      return
+
+    self.counts['stored'] += len(batch)
+    self.counts['batches'] += 1
+
+  def store_single(self, session: DbSession, data: str) -> bool:
+    """store a result in its own transaction, quarantine it once every
+    attempt failed"""
+    error: Optional[Exception] = None
+    for _ in range(self.max_attempts):
+      try:
+        with measure(self.stats, 'store'):
+          self.handler(session, data)
+        with measure(self.stats, 'commit'):
+          session.commit()
+        self.counts['stored'] += 1
+        return True
+      except Exception as err:  #pylint: disable=broad-exception-caught
+        session.rollback()
+        error = err
+
+    self.quarantine(data, error)
+    return False
+
+  def quarantine(self, data: str, error: Optional[Exception]) -> None:
+    """set aside a result which can not be stored"""
+    self.counts['quarantined'] += 1
+    self.logger.error('Writer %s: quarantined result after %s attempts: %s',
+                      self.writer_id, self.max_attempts, error)
+    if self.quarantine_file:
+      record = {
+          'time': datetime.now().isoformat(timespec='seconds'),
+          'error': repr(error),
+          'result': data
+      }
+      os.makedirs(os.path.dirname(os.path.abspath(self.quarantine_file)),
+                  exist_ok=True)
+      with open(self.quarantine_file, 'a', encoding='utf-8') as q_file:
+        q_file.write(json.dumps(record) + '\n')
+
+  def run(self) -> None:
+    """process entry point"""
+    try:
+      with DbSession() as session:
+        stop = False
+        while not stop:
+          batch, stop = self.next_batch()
+          if batch:
+            self.store_batch(session, batch)
+    finally:
+      self.reports.put({
+          'writer': self.writer_id,
+          'counts': self.counts,
+          'stages': {
+              stage: stats.export() for stage, stats in self.stats.items()
+          }
+      })
+
+
+class ResultIngestor():
+  """Feeds results to num_writers writer processes through a bounded queue.
+  put returns once a result is queued, close waits for the writers to store
+  everything queued"""
+
+  def __init__(self,
+               handler: ResultHandler,
+               num_writers: int = INGEST_WRITERS,
+               queue_size: int = INGEST_QUEUE_SIZE,
+               batch_size: int = INGEST_BATCH_SIZE,
+               max_attempts: int = INGEST_MAX_ATTEMPTS,
+               quarantine_file: Optional[str] = None,
+               logger: Optional[logging.Logger] = None):
+    self.handler: ResultHandler = handler
+    self.num_writers: int = max(num_writers, 1)
+    self.queue_size: int = max(queue_size, 1)
+    self.config: Dict[str, Any] = {
+        'batch_size': max(batch_size, 1),
+        'flush_interval': INGEST_FLUSH_INTERVAL,
+        'max_attempts': max(max_attempts, 1),
+        'quarantine_file': quarantine_file
+    }
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.results: Optional[multiprocessing.Queue] = None
+    self.reports: Optional[multiprocessing.Queue] = None
+    self.writers: List[multiprocessing.Process] = []
+    self.stats: Dict[str, LatencyStats] = new_stage_stats()
+
+  def start(self) -> None:
+    """start the writer processes"""
+    self.results = multiprocessing.Queue(self.queue_size)
+    self.reports = multiprocessing.Queue()
+    for writer_id in range(self.num_writers):
+      writer = ResultWriter(writer_id, self.handler, self.results, self.reports,
+                            self.config, self.logger)
+      proc = multiprocessing.Process(target=writer.run,
+                                     name=f"result_writer_{writer_id}")
+      proc.start()
+      self.writers.append(proc)
+    self.logger.info('Started %s result writers', self.num_writers)
+
+  def put(self, data: str) -> bool:
+    """queue a result, blocks while the queue is full"""
+    with measure(self.stats, 'put'):
+      while True:
+        try:
+          self.results.put(data, timeout=INGEST_POLL)
+          return True
+        except queue.Full as err:
+          if not any(proc.is_alive() for proc in self.writers):
+            raise CustomError('No result writer is running') from err
+
+  def close(self) -> Dict[str, Any]:
+    """stop the writers once the queue is drained, returns the counts and
+    stage timings of all writers"""
+    for _ in self.writers:
+      self.results.put(None)
+
+    counts: Dict[str, int] = {}
+    pending = len(self.writers)
+    while pending:
+      try:
+        report = self.reports.get(timeout=INGEST_POLL)
+      except queue.Empty:
+        if not any(proc.is_alive() for proc in self.writers):
+          self.logger.error('%s result writers exited without a report',
+                            pending)
+          break
+        continue
+      pending -= 1
+      for name, val in report['counts'].items():
+        counts[name] = counts.get(name, 0) + val
+      for stage, state in report['stages'].items():
+        self.stats[stage].merge(state)
+
+    for proc in self.writers:
+      proc.join()
+    self.writers = []
+
+    summary = {
+        'counts': counts,
+        'stages': {
+            stage: stats.summary() for stage, stats in self.stats.items()
+        }
+    }
+    self.logger.info('Result ingestion: %s', summary)
+    return summary
+
+  def __enter__(self) -> 'ResultIngestor':
+    self.start()
+    return self
+
+  def __exit__(self, *exc: Any) -> None:
+    self.close()
@@ -28,9 +28,8 @@
 import socket
 import subprocess
 import logging
-from random import randrange
 from subprocess import Popen, PIPE, STDOUT
-from time import sleep
+from time import perf_counter
 from io import StringIO
 
 from typing import Set, Any, Optional, Union, TextIO, IO, Tuple, List, Callable
@@ -39,12 +38,29 @@ from paramiko import SSHClient
 import paramiko
 
 from tuna.utils.logger import setup_logger
+from tuna.utils.metrics import COMMAND_TIME
 from tuna.abort import chk_abort_file
+from tuna.utils.retry import FATAL, RETRYABLE, CircuitOpen, RetryPolicy
+from tuna.utils.retry import classify_any
 
 NUM_SSH_RETRIES = 40
 NUM_CMD_RETRIES = 30
 SSH_TIMEOUT = 60  # in seconds
 
+#ssh connection attempts to a machine, refused connections are retryable
+SSH_CONNECT_RETRY = RetryPolicy('ssh_connect',
+                                max_attempts=NUM_SSH_RETRIES,
+                                budget=1800,
+                                base=1.0,
+                                cap=SSH_TIMEOUT)
+#remote command starts, any failure is retried
+SSH_EXEC_RETRY = RetryPolicy('ssh_exec',
+                             max_attempts=NUM_CMD_RETRIES,
+                             budget=1800,
+                             base=1.0,
+                             cap=SSH_TIMEOUT,
+                             classify=classify_any)
+
 
 class Connection():
   """Connection class defined an ssh or ftp client connection. Instantiated by the machine class"""
@@ -162,6 +178,10 @@ class Connection():
     self.ssh.get_transport().is_active() #type: ignore
     return status
 
+  def get_host_key(self) -> str:
+    """circuit breaker key of the machine"""
+    return f"ssh:{self.hostname}:{self.port}"
+
   def connect(self, abort: Callable) -> None:
     """Establishing new connecion"""
     if not self.local_machine:
@@ -172,7 +192,8 @@ class Connection():
     if not self.is_connected():
       self.ssh = paramiko.SSHClient()
       self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-      for ssh_idx in range(NUM_SSH_RETRIES):
+      retry = SSH_CONNECT_RETRY.start(self.get_host_key())
+      while retry.allow():
         if abort is not None and chk_abort_file(self.id, self.logger):
           self.logger.warning('Machine %s aborted ssh connection', self.id)
           return False
@@ -187,14 +208,16 @@ class Connection():
         except paramiko.ssh_exception.BadHostKeyException:
           self.logger.error('Bad host exception which connecting to host: %s',
                             self.hostname)
-        except (paramiko.ssh_exception.SSHException, socket.error):
-          retry_interval = randrange((int(SSH_TIMEOUT)))
+          retry.failed(FATAL)
+          break
+        except (paramiko.ssh_exception.SSHException, socket.error) as err:
           self.logger.warning(
-              'Attempt %s to connect to machine %s (%s p%s) via ssh failed, \
-              sleeping for %s seconds', ssh_idx, self.id, self.hostname,
-              self.port, retry_interval)
-          sleep(retry_interval)
+              'Attempt %s to connect to machine %s (%s p%s) via ssh failed',
+              retry.attempt, self.id, self.hostname, self.port)
+          if not retry.failed(RETRYABLE, err):
+            break
         else:
+          retry.succeeded()
           self.logger.info(
               'SSH connection successfully established to machine %s', self.id)
           return True
@@ -206,7 +229,8 @@ class Connection():
   def exec_command_unparsed(self, cmd: str, timeout: int = SSH_TIMEOUT, \
   abort: Optional[bool]=None) -> Tuple[ChannelStdinFile, ChannelFile, ChannelStderrFile]:
     # pylint: disable-msg=too-many-locals
-    """Function to exec commands
+    """Function to exec commands. Raises CircuitOpen while the breaker of the
+    machine is open, ConnectionError once the retries are exhausted or aborted
 
     warning: leaky! client code responsible for closing the resources!
     """
@@ -232,12 +256,15 @@ class Connection():
       stdout, stderr = self.subp.stdout, self.subp.stderr
       return 0, stdout, stderr  #type: ignore
 
-    cmd_idx: int
     i_var: ChannelStdinFile
     o_var: ChannelFile
     e_var: ChannelStderrFile
 
-    for cmd_idx in range(NUM_CMD_RETRIES):
+    retry = SSH_EXEC_RETRY.start(self.get_host_key())
+    while True:
+      if not retry.allow():
+        raise CircuitOpen(
+            f'Machine {self.id}: circuit {self.get_host_key()} is open')
       try:
 
         self.ssh_connect()
@@ -246,21 +273,21 @@ class Connection():
         self.logger.warning('Machine %s failed to execute command: %s', self.id,
                             cmd)
         self.logger.warning('Exception occurred %s', exc)
-        self.logger.warning('Retrying ... %s', cmd_idx)
-        retry_interval = randrange(SSH_TIMEOUT)
-        self.logger.warning('sleeping for %s seconds', retry_interval)
-        sleep(retry_interval)
+        if not retry.failed(SSH_EXEC_RETRY.classify(exc), exc):
+          self.logger.error('cmd_exec retries exhausted, giving up')
+          raise ConnectionError(
+              f'Machine {self.id} failed to execute command after '
+              f'{retry.attempt} attempts: {cmd}') from exc
       else:
+        retry.succeeded()
         self.out_channel = o_var.channel
         return i_var, o_var, e_var
 
       if abort is not None and chk_abort_file(self.id, self.logger):
         self.logger.warning('Machine %s aborted command execution: %s', self.id,
                             cmd)
-        return i_var, o_var, e_var
-
-    self.logger.error('cmd_exec retries exhausted, giving up')
-    return i_var, o_var, e_var
+        raise ConnectionError(
+            f'Machine {self.id} aborted command execution: {cmd}')
 
   def exec_command(self, cmd: str, timeout: int = SSH_TIMEOUT, abort: Optional[bool]=None,\
   proc_line: Callable = None) -> Tuple[int, StringIO, StringIO]:
@@ -268,6 +295,7 @@ class Connection():
     """Function to exec commands"""
     o_var: ChannelFile
     e_var: ChannelStderrFile
+    start: float = perf_counter()
     _, o_var, e_var = self.exec_command_unparsed(cmd, timeout, abort)
     try:
 
@@ -305,6 +333,8 @@ class Connection():
         ret_out.seek(0)
       return ret_code, ret_out, ret_err
     finally:
+      COMMAND_TIME.labels('local' if self.local_machine else 'ssh').observe(
+          perf_counter() - start)
       if o_var and hasattr(o_var, "close"):
         o_var.close()
       if e_var and hasattr(e_var, "close"):
@@ -26,7 +26,7 @@
 ###############################################################################
 """ Module for creating DB tables"""
 import enum
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey
 from sqlalchemy import Text, Enum
 from sqlalchemy.ext.declarative import declared_attr
 
@@ -62,6 +62,61 @@ class JobEnum(enum.Enum):
   evaluated_pend = 24
 
 
+#states a job can move to from any state: reset for a retry, or give up
+ANY_STATE_TRANSITIONS = frozenset((JobEnum.new, JobEnum.errored))
+#legal job state changes, besides ANY_STATE_TRANSITIONS and staying in a state
+JOB_TRANSITIONS = {
+    JobEnum.new:
+        frozenset((JobEnum.compile_start, JobEnum.eval_start, JobEnum.started,
+                   JobEnum.running, JobEnum.not_applicable, JobEnum.not_tunable,
+                   JobEnum.bad_param, JobEnum.aborted)),
+    JobEnum.started:
+        frozenset((JobEnum.running, JobEnum.compiling, JobEnum.evaluating,
+                   JobEnum.timeout, JobEnum.error_status, JobEnum.no_update,
+                   JobEnum.transfer_error, JobEnum.aborted)),
+    JobEnum.running:
+        frozenset((JobEnum.completed, JobEnum.error, JobEnum.timeout,
+                   JobEnum.error_status, JobEnum.no_update,
+                   JobEnum.transfer_error, JobEnum.aborted)),
+    JobEnum.compile_start:
+        frozenset(
+            (JobEnum.compiling, JobEnum.compiled, JobEnum.compiled_pend,
+             JobEnum.compile_error, JobEnum.not_applicable, JobEnum.not_tunable,
+             JobEnum.bad_param, JobEnum.timeout, JobEnum.aborted)),
+    JobEnum.compiling:
+        frozenset(
+            (JobEnum.compiled, JobEnum.compiled_pend, JobEnum.compile_error,
+             JobEnum.not_applicable, JobEnum.not_tunable, JobEnum.bad_param,
+             JobEnum.timeout, JobEnum.aborted)),
+    JobEnum.compiled_pend:
+        frozenset((JobEnum.compiled, JobEnum.compile_error)),
+    JobEnum.compiled:
+        frozenset((JobEnum.eval_start,)),
+    JobEnum.eval_start:
+        frozenset((JobEnum.evaluating, JobEnum.evaluated,
+                   JobEnum.evaluated_pend, JobEnum.evaluate_error,
+                   JobEnum.compiled, JobEnum.timeout, JobEnum.aborted)),
+    JobEnum.evaluating:
+        frozenset(
+            (JobEnum.evaluated, JobEnum.evaluated_pend, JobEnum.evaluate_error,
+             JobEnum.compiled, JobEnum.timeout, JobEnum.aborted)),
+    JobEnum.evaluated_pend:
+        frozenset(
+            (JobEnum.evaluated, JobEnum.evaluate_error, JobEnum.compiled)),
+}
+
+#in flight states, mapped to the state a job goes back to when its worker is
+#lost
+RECLAIM_STATES = {
+    JobEnum.started: JobEnum.new,
+    JobEnum.running: JobEnum.new,
+    JobEnum.compile_start: JobEnum.new,
+    JobEnum.compiling: JobEnum.new,
+    JobEnum.eval_start: JobEnum.compiled,
+    JobEnum.evaluating: JobEnum.compiled,
+}
+
+
 class JobMixin():
   """Represents Mixin class for job tables"""
 
@@ -78,3 +133,6 @@ class JobMixin():
   gpu_id = Column(Integer, nullable=False, server_default="-1")
   machine_id = Column(Integer, nullable=False, server_default="-1")
   cache_loc = Column(Text)
+  #holder of an in flight job and the epoch second its lease runs out
+  lease_owner = Column(String(length=128), nullable=True)
+  lease_expiry = Column(BigInteger, nullable=True)
@@ -29,8 +29,7 @@
 from typing import Optional, Type
 from types import TracebackType
 from sqlalchemy.orm.session import Session
-from mysql.connector.cursor import MySQLCursor
-from tuna.db_engine import SESSION_FACTORY
+from tuna.db_engine import get_db_pool
 
 
 class DbConnection():
@@ -45,7 +44,7 @@ class DbConnection():
     if self.session is not None and self.session.is_active():
       return self.session
 
-    self.session = SESSION_FACTORY()
+    self.session = get_db_pool().session()
     return self.session
 
   def __enter__(self):
@@ -61,7 +60,6 @@ class DbSession():
   def __init__(self):
     self.cnx: DbConnection = None
     self.sql_session: Session = None
-    self.cur: MySQLCursor = None
 
   def __enter__(self) -> Session:
     self.cnx = DbConnection()
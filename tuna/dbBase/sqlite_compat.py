@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""SQLite rendering for the MySQL specific column types used by the Tuna tables.
+Lets the ORM tables be created in SQLite for offline tests and benchmarks."""
+
+from typing import List, Optional, Sequence
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn, Table
+from sqlalchemy.dialects.mysql import TINYINT, MEDIUMBLOB, LONGBLOB, SET
+from tuna.dbBase.base_class import BASE
+
+#pylint: disable=unused-argument
+
+
+@compiles(TINYINT, 'sqlite')
+def compile_tinyint(type_, compiler, **kw):
+  """TINYINT(1) -> INTEGER"""
+  return 'INTEGER'
+
+
+@compiles(MEDIUMBLOB, 'sqlite')
+@compiles(LONGBLOB, 'sqlite')
+def compile_blob(type_, compiler, **kw):
+  """MEDIUMBLOB/LONGBLOB -> BLOB"""
+  return 'BLOB'
+
+
+@compiles(SET, 'sqlite')
+def compile_set(type_, compiler, **kw):
+  """SET is stored as its comma separated string form"""
+  return 'VARCHAR(255)'
+
+
+@compiles(CreateColumn, 'sqlite')
+def compile_create_column(element, compiler, **kw):
+  """drop the MySQL only ON UPDATE clause from update_ts server defaults"""
+  return compiler.visit_create_column(element, **kw).replace(
+      ' ON UPDATE CURRENT_TIMESTAMP', '')
+
+
+def create_sqlite_tables(engine: Engine,
+                         tables: Optional[List[Table]] = None) -> bool:
+  """Create Tuna tables (default: all tables declared on BASE) in a SQLite db"""
+  if engine.dialect.name != 'sqlite':
+    raise ValueError(f'Expected a sqlite engine, got {engine.dialect.name}')
+  BASE.metadata.create_all(engine, tables=tables)
+  return True
+
+
+def sqlite_upsert(table: Table, columns: Sequence[str], key_cols: Sequence[str],
+                  update_cols: Sequence[str]):
+  """INSERT ... ON CONFLICT DO UPDATE, the SQLite (>= 3.24) counterpart of
+  MySQL's INSERT ... ON DUPLICATE KEY UPDATE, values bind by column name"""
+  col_str = ', '.join(columns)
+  val_str = ', '.join(f":{col}" for col in columns)
+  query = f"INSERT INTO {table.name} ({col_str}) VALUES ({val_str})"\
+          f" ON CONFLICT ({', '.join(key_cols)})"
+  if update_cols:
+    set_str = ', '.join(f"{col}=excluded.{col}" for col in update_cols)
+    query += f" DO UPDATE SET {set_str}"
+  else:
+    query += " DO NOTHING"
+  return text(query)
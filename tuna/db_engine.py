@@ -25,13 +25,191 @@
 #
 ###############################################################################
 """ Database resource manager """
-from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
-from tuna.utils.utility import get_env_vars
+from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
+from tuna.utils.logger import setup_logger
+from tuna.utils.stats import LatencyStats
+from tuna.utils.sql_profiler import get_profiler
+from tuna.utils.metrics import attach_db_metrics, metrics_enabled
+
+LOGGER = setup_logger('db_engine')
+
+
+class TimedQueuePool(QueuePool):
+  """QueuePool that records how long each connection checkout takes"""
+
+  def __init__(self, creator, **kwargs):
+    super().__init__(creator, **kwargs)
+    self.stats: LatencyStats = LatencyStats()
+
+  def recreate(self):
+    pool = super().recreate()
+    pool.stats = self.stats
+    return pool
+
+  def connect(self):
+    start = time.perf_counter()
+    try:
+      return super().connect()
+    finally:
+      self.stats.record(time.perf_counter() - start)
+
+  def unique_connection(self):
+    start = time.perf_counter()
+    try:
+      return super().unique_connection()
+    finally:
+      self.stats.record(time.perf_counter() - start)
+
+
+class DbPool():
+  """Process local owner of the pooled engine and the session factory.
+  Connections inherited through fork() are discarded, never shared."""
+
+  def __init__(self,
+               url: str,
+               pool_args: Optional[Dict[str, Any]] = None,
+               **engine_args):
+    if pool_args is None:
+      pool_args = get_db_pool_vars()
+    self.url: str = url
+    self.pool_args: Dict[str, Any] = pool_args
+    self.pid: int = os.getpid()
+    self.fork_resets: int = 0
+    self._engine: Engine = create_engine(url,
+                                         poolclass=TimedQueuePool,
+                                         **pool_args,
+                                         **engine_args)
+    event.listen(self._engine, 'connect', self._on_connect)
+    event.listen(self._engine, 'checkout', self._on_checkout)
+    profiler = get_profiler()
+    if profiler:
+      profiler.attach(self._engine)
+    if metrics_enabled():
+      attach_db_metrics(self._engine)
+    self.session_factory = sessionmaker(bind=self._engine)
+
+  @staticmethod
+  def _on_connect(dbapi_connection, connection_record) -> None:
+    """tag new DBAPI connections with the pid that created them"""
+    #pylint: disable=unused-argument
+    connection_record.info['pid'] = os.getpid()
+
+  def _on_checkout(self, dbapi_connection, connection_record,
+                   connection_proxy) -> None:
+    """refuse connections that were created in a parent process"""
+    #pylint: disable=unused-argument
+    pid = os.getpid()
+    if connection_record.info.get('pid', pid) != pid:
+      #drop the reference without closing, the socket belongs to the parent
+      connection_record.connection = connection_proxy.connection = None
+      raise exc.DisconnectionError(
+          f"Connection record belongs to pid {connection_record.info['pid']},"
+          f" attempting to check out in pid {pid}")
+
+  def check_fork(self) -> bool:
+    """Replace the pool if this process was forked from the pool owner"""
+    pid = os.getpid()
+    if pid == self.pid:
+      return False
+
+    LOGGER.info('Fork detected (pid %s -> %s), resetting connection pool',
+                self.pid, pid)
+    #recreate() without dispose(): closing would send COM_QUIT on sockets
+    #still in use by the parent process
+    self._engine.pool = self._engine.pool.recreate()
+    self.fork_resets += 1
+    self.pid = pid
+    return True
+
+  @property
+  def engine(self) -> Engine:
+    """Pooled engine, safe to use after fork"""
+    self.check_fork()
+    return self._engine
+
+  def session(self) -> Session:
+    """Return a new ORM session bound to the pooled engine"""
+    self.check_fork()
+    return self.session_factory()
+
+  def raw_connection(self):
+    """Return a pooled DBAPI connection, close() returns it to the pool"""
+    return self.engine.raw_connection()
+
+  def dispose(self) -> None:
+    """Close all pooled connections owned by this process"""
+    self.check_fork()
+    self._engine.dispose()
+
+  def get_stats(self) -> Dict[str, Any]:
+    """Checkout latency statistics and current pool occupancy"""
+    pool = self._engine.pool
+    stats = pool.stats.summary()
+    stats['fork_resets'] = self.fork_resets
+    stats['pool_size'] = pool.size()
+    stats['checked_out'] = pool.checkedout()
+    stats['overflow'] = pool.overflow()
+    return stats
+
+  def log_stats(self, logger=LOGGER) -> None:
+    """Write pool statistics to the logger"""
+    logger.info('DB pool stats: %s', self.get_stats())
+
+
+def get_db_env_vars() -> Dict[str, str]:
+  """DB credentials from the TUNA_DB_* env vars. Read here rather than through
+  tuna.utils.utility, which depends on this module via tuna.sql"""
+  return {
+      'user_name': os.environ.get('TUNA_DB_USER_NAME', ''),
+      'user_password': os.environ.get('TUNA_DB_USER_PASSWORD', ''),
+      'db_hostname': os.environ.get('TUNA_DB_HOSTNAME', 'localhost'),
+      'db_name': os.environ.get('TUNA_DB_NAME', '')
+  }
+
+
+def get_db_pool_vars() -> Dict[str, Any]:
+  """Connection pool settings from env vars"""
+  pool_vars: Dict[str, Any] = {}
+  pool_vars['pool_size'] = int(os.environ.get('TUNA_DB_POOL_SIZE', 5))
+  pool_vars['max_overflow'] = int(os.environ.get('TUNA_DB_MAX_OVERFLOW', 10))
+  pool_vars['pool_timeout'] = int(os.environ.get('TUNA_DB_POOL_TIMEOUT', 30))
+  pool_vars['pool_recycle'] = int(os.environ.get('TUNA_DB_POOL_RECYCLE', 3600))
+  pool_vars['pool_pre_ping'] = os.environ.get('TUNA_DB_POOL_PRE_PING',
+                                              'true').lower() == 'true'
+  return pool_vars
+
+
+def get_db_url(env_vars: Dict[str, Any]) -> str:
+  """Build the Tuna database url from env vars"""
+  return f"mysql+pymysql://{env_vars['user_name']}:{env_vars['user_password']}" \
+         f"@{env_vars['db_hostname']}:3306/{env_vars['db_name']}"
+
+
+def get_db_pool() -> DbPool:
+  """Return the process wide connection pool"""
+  return DB_POOL
+
+
+def set_db_pool(pool: DbPool) -> DbPool:
+  """Replace the process wide connection pool used by DbSession, returns the
+  previous one. ENGINE and SESSION_FACTORY keep the original pool"""
+  global DB_POOL  # pylint: disable=global-statement
+  prev_pool = DB_POOL
+  DB_POOL = pool
+  return prev_pool
+
 
-ENV_VARS = get_env_vars()
-ENGINE = create_engine(f"mysql+pymysql://{ENV_VARS['user_name']}:{ENV_VARS['user_password']}" \
-                       f"@{ENV_VARS['db_hostname']}:3306/{ENV_VARS['db_name']}",
-                       poolclass=NullPool)
-SESSION_FACTORY = sessionmaker(bind=ENGINE)
+ENV_VARS = get_db_env_vars()
+DB_POOL = DbPool(get_db_url(ENV_VARS), encoding="utf8")
+#kept for modules that bind directly to the engine, the engine object survives
+#a fork, only its pool is replaced
+ENGINE = DB_POOL.engine
+SESSION_FACTORY = DB_POOL.session_factory
@@ -65,7 +65,7 @@ class Example(MITunaInterface):
         TunaArgs.ARCH, TunaArgs.NUM_CU, TunaArgs.VERSION, TunaArgs.SESSION_ID,
         TunaArgs.MACHINES, TunaArgs.REMOTE_MACHINE, TunaArgs.LABEL,
         TunaArgs.RESTART_MACHINE, TunaArgs.DOCKER_NAME, TunaArgs.ENQUEUE_ONLY,
-        TunaArgs.SHUTDOWN_WORKERS
+        TunaArgs.SHUTDOWN_WORKERS, TunaArgs.RESULT_WRITERS
     ])
     group: argparse._MutuallyExclusiveGroup = parser.add_mutually_exclusive_group(
     )
@@ -236,16 +236,24 @@ class Example(MITunaInterface):
 
     return context_list
 
+  def get_celery_task(self, q_name):
+    """! Return the celery task for queue:q_name
+    @param q_name Name of custom Celery queue
+    """
+    Q_NAME = q_name  #pylint: disable=import-outside-toplevel,unused-variable,invalid-name,redefined-outer-name
+    from tuna.example.celery_tuning.celery_tasks import celery_enqueue  #pylint: disable=import-outside-toplevel
+
+    return celery_enqueue
+
   def celery_enqueue_call(self, context, q_name, task_id=False):
     """! Wrapper function for celery enqueue func
     @param context serialized context for Celery job
     @param q_name Name of custom Celery queue
     @param task_id custom task ID for redis Key
     """
-    Q_NAME = q_name  #pylint: disable=import-outside-toplevel,unused-variable,invalid-name,redefined-outer-name
-    from tuna.example.celery_tuning.celery_tasks import celery_enqueue  #pylint: disable=import-outside-toplevel
-
-    return celery_enqueue.apply_async((context,), queue=q_name, reply_to=q_name)
+    return self.get_celery_task(q_name).apply_async((context,),
+                                                    queue=q_name,
+                                                    reply_to=q_name)
 
   def process_compile_results(self, session, fin_json, context):
     """! Process result from fin_build worker
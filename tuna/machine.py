@@ -30,7 +30,6 @@ import os
 from os import statvfs_result
 import socket
 from time import sleep
-from io import BytesIO
 from io import StringIO
 import tempfile
 from subprocess import Popen, PIPE
@@ -45,6 +44,7 @@ import paramiko
 from tuna.machine_management_interface import MachineManagementInterface
 from tuna.utils.logger import setup_logger
 from tuna.connection import Connection
+from tuna.ssh_pool import ChannelPool, get_channel_pool
 from tuna.dbBase.base_class import BASE
 from tuna.abort import chk_abort_file
 from tuna.utils.utility import check_qts
@@ -186,6 +186,10 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
 
     return connection
 
+  def get_channel_pool(self) -> ChannelPool:
+    """pooled SFTP channels to this machine for the current process"""
+    return get_channel_pool(self.hostname, self.port, self.user, self.password)
+
   def get_num_cpus(self) -> int:
     """return number of available cpus"""
     stdout: TextIO
@@ -323,9 +327,6 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
     """
     Write a file to this machine containing contents
     """
-    cnx: Connection
-    ftp: Optional[paramiko.sftp_client.SFTPClient] = None
-
     if is_temp:
       assert filename is None
       _, filename = tempfile.mkstemp()
@@ -337,11 +338,7 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
         fout.write(contents)
         fout.flush()
     else:
-      cnx = self.connect()
-      ftp = cnx.ssh.open_sftp()
-      with ftp.open(filename, 'wb') as fout:  #type: ignore
-        fout.write(contents)
-        fout.flush()
+      self.get_channel_pool().write_file(filename, contents)
 
     return filename
 
@@ -352,20 +349,13 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
     Read a file from this machine and return the contents
     """
     ret: Union[str, bytes]
-    cnx: Connection
-    ftp: paramiko.sftp_client.SFTPClient
-    content_io: BytesIO
 
     if self.local_machine:  # pylint: disable=no-member ; false alarm
       # pylint: disable-next=unspecified-encoding
       with open(filename, 'rb' if byteread else 'r') as rfile:
         return rfile.read()
     else:
-      cnx = self.connect()
-      ftp = cnx.ssh.open_sftp()
-      content_io = BytesIO()
-      ftp.getfo(filename, content_io)
-      ret = content_io.getvalue()
+      ret = self.get_channel_pool().read_file(filename)
       if not byteread:
         ret = ret.decode()
       return ret
@@ -35,6 +35,8 @@ from tuna.machine import Machine
 from tuna.miopen.utils.lib_helper import get_worker
 from tuna.utils.utility import SimpleDict
 from tuna.utils.celery_utils import prep_default_kwargs, get_cached_worker
+from tuna.utils.job_lease import get_lease_keeper
+from tuna.celery_app.result_collector import LEASE_LOST_KEY
 from tuna.miopen.miopen_lib import Q_NAME
 
 logger = get_task_logger(__name__)
@@ -90,5 +92,15 @@ def celery_enqueue(context):
     logger.info("Enqueueing worker %s: job %s", app.worker_name, context['job'])
 
   worker = prep_worker(copy.deepcopy(context))
-  ret = worker.run()
+  keeper = get_lease_keeper(worker.dbt.job_table.__tablename__, logger=logger)
+  job_id = context['job']['id']
+  if not keeper.acquire(job_id, context['job'].get('lease_owner')):
+    #reclaimed while queued, a new copy of the job is on its way
+    return {"ret": None, "context": context, LEASE_LOST_KEY: True}
+  try:
+    ret = worker.run()
+  finally:
+    owned = keeper.release(job_id)
+  if not owned:
+    return {"ret": ret, "context": context, LEASE_LOST_KEY: True}
   return {"ret": ret, "context": context}
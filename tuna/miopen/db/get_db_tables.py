@@ -27,11 +27,13 @@
 """ Module for get/set/initialize DB - MIOpen/Conv/Fusion/Batchnorm tables"""
 
 from tuna.machine import Machine
+from tuna.db.ref_version import RefVersion
 from tuna.miopen.db.benchmark import Framework, Model
 from tuna.miopen.db.solver import Solver
 from tuna.miopen.db.batch_norm_tables import BNBenchmark
 from tuna.miopen.db.convolutionjob_tables import ConvolutionBenchmark
 from tuna.miopen.db.tensortable import TensorTable
+from tuna.miopen.db.kernel_blob import KernelBlob
 from tuna.miopen.db.miopen_tables import add_bn_tables
 from tuna.miopen.db.miopen_tables import add_conv_tables
 from tuna.miopen.db.miopen_tables import add_fusion_tables
@@ -48,6 +50,8 @@ def get_miopen_tables():
   miopen_tables.append(Model())
   miopen_tables.append(Machine(local_machine=True))
   miopen_tables.append(TensorTable())
+  miopen_tables.append(KernelBlob())
+  miopen_tables.append(RefVersion())
 
   miopen_tables = add_conv_tables(miopen_tables)
   miopen_tables = add_fusion_tables(miopen_tables)
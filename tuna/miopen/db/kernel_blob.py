@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+""" Module for the content addressed kernel blob table """
+
+from sqlalchemy import Column, Integer, String, UniqueConstraint
+from tuna.dbBase.base_class import BASE
+
+#pylint: disable=too-few-public-methods
+
+
+class KernelBlob(BASE):
+  """Kernel blobs kept in the blob store, one row per distinct blob.
+  ref_count is the number of kernel cache rows pointing at the blob"""
+  __tablename__ = "kernel_blob"
+  __table_args__ = (UniqueConstraint("blob_hash", name="uq_idx"),)
+
+  blob_hash = Column(String(length=64), nullable=False)
+  size = Column(Integer, nullable=False, server_default="0")
+  ref_count = Column(Integer, nullable=False, server_default="0")
@@ -107,6 +107,8 @@ class KernelCacheMixin():
   kernel_blob = Column(MEDIUMBLOB, nullable=False)
   kernel_hash = Column(String(length=128), nullable=False)
   uncompressed_size = Column(Integer, nullable=False)
+  #set when kernel_blob lives in the blob store, kernel_blob is then empty
+  blob_hash = Column(String(length=64), nullable=True, index=True)
 
 
 class GoldenMixin():
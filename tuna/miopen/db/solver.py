@@ -34,6 +34,7 @@ from tuna.dbBase.sql_alchemy import DbSession
 from tuna.miopen.utils.config_type import ConfigType
 from tuna.utils.db_utility import session_retry
 from tuna.utils.logger import setup_logger
+from tuna.utils.ref_cache import get_ref_cache
 
 LOGGER = setup_logger('miopen_db_utility')
 
@@ -52,8 +53,9 @@ class Solver(BASE):
   is_dynamic = Column(TINYINT(1), nullable=False, server_default="0")
 
 
-def get_id_solvers():
-  """DB solver id to name map"""
+def load_solver_maps():
+  """DB solver name to id map and id to name maps, see get_id_solvers"""
+  solver_id_map = {}
   solver_id_map_c = {}
   solver_id_map_h = {}
   with DbSession() as session:
@@ -62,21 +64,24 @@ def get_id_solvers():
     for slv, sid in res:
       solver_id_map_c[slv] = sid
       solver_id_map_h[slv.replace(', ', '-')] = sid
+      solver_id_map[slv] = sid
+      solver_id_map[slv.replace(', ', '-')] = sid
     id_solver_map_c = {val: key for key, val in solver_id_map_c.items()}
     id_solver_map_h = {val: key for key, val in solver_id_map_h.items()}
 
-  return id_solver_map_c, id_solver_map_h
+  return solver_id_map, id_solver_map_c, id_solver_map_h
+
+
+def get_id_solvers():
+  """DB solver id to name map"""
+  _, id_solver_map_c, id_solver_map_h = get_ref_cache().get(
+      Solver.__tablename__, load_solver_maps)
+  return dict(id_solver_map_c), dict(id_solver_map_h)
 
 
 def get_solver_ids():
   """DB solver name to id map"""
   # TODO: Get this info from the SQLAlchemy class  # pylint: disable=fixme
-  solver_id_map = {}
-  with DbSession() as session:
-    query = session.query(Solver.solver, Solver.id).filter(Solver.valid == 1)
-    res = session_retry(session, query.all, lambda x: x(), LOGGER)
-    for slv, sid in res:
-      solver_id_map[slv] = sid
-      solver_id_map[slv.replace(', ', '-')] = sid
-
-  return solver_id_map
+  solver_id_map, _, _ = get_ref_cache().get(Solver.__tablename__,
+                                            load_solver_maps)
+  return dict(solver_id_map)
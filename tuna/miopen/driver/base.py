@@ -35,6 +35,7 @@ from sqlalchemy.inspection import inspect
 from tuna.utils.logger import setup_logger
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.utils.db_utility import build_dict_val_key, get_session_val_map
+from tuna.utils.ref_cache import get_ref_cache
 from tuna.miopen.db.tensortable import TensorTable
 from tuna.miopen.db.convolutionjob_tables import ConvolutionConfig
 from tuna.miopen.utils.metadata import TENSOR_PRECISION
@@ -49,7 +50,6 @@ LOGGER = setup_logger('MIOpenDriver_driver_base')
 class MIOpenDriver(DriverBase):
   """Represents db tables based on ConfigType"""
   tensor_attr: List[str] = [column.name for column in inspect(TensorTable).c]
-  tensor_id_map: Dict[str, int] = {}
 
   def __init__(self, line: str = str(), db_obj: ConvolutionConfig = None):
     super().__init__(line, db_obj)
@@ -69,6 +69,11 @@ class MIOpenDriver(DriverBase):
     """Build weight_tensor"""
     raise NotImplementedError("Not implemented")
 
+  @abstractmethod
+  def compose_config_row(self) -> dict:
+    """Config table columns, without the tensor ids"""
+    raise NotImplementedError("Not implemented")
+
   @abstractmethod
   def parse_row(self, db_obj: ConvolutionConfig):
     """Abstract/Inference for Overwritting base class function for batch_norm"""
@@ -161,16 +166,20 @@ class MIOpenDriver(DriverBase):
     """Insert new row into tensor table and return primary key"""
     ret_id: int = -1
     session: Session
+    cache = get_ref_cache()
     with DbSession() as session:
+
+      def load_tensor_ids():
+        return get_session_val_map(session, TensorTable,
+                                   MIOpenDriver.tensor_attr)
+
       try:
         tid = TensorTable(**tensor_dict)
         tid.valid = 1
         key = build_dict_val_key(tid)
-        #cache the tensor table to avoid queries
-        if not MIOpenDriver.tensor_id_map:
-          MIOpenDriver.tensor_id_map = get_session_val_map(
-              session, TensorTable, MIOpenDriver.tensor_attr)
-        id_map = MIOpenDriver.tensor_id_map
+        #cache the tensor table to avoid queries, the map only grows so it is
+        #extended in place and a stale map is caught by the IntegrityError
+        id_map = cache.get(TensorTable.__tablename__, load_tensor_ids)
         if key in id_map:
           ret_id = id_map[key]
           LOGGER.info("Get Tensor: %s", ret_id)
@@ -184,8 +193,8 @@ class MIOpenDriver(DriverBase):
         LOGGER.warning(err)
         session.rollback()
         #update tensor table cache
-        MIOpenDriver.tensor_id_map = get_session_val_map(
-            session, TensorTable, MIOpenDriver.tensor_attr)
+        cache.invalidate(TensorTable.__tablename__)
+        cache.get(TensorTable.__tablename__, load_tensor_ids)
         ret_id = self.get_tensor_id(session, tensor_dict)
         LOGGER.info("Get Tensor: %s", ret_id)
     return ret_id
@@ -201,6 +210,11 @@ class MIOpenDriver(DriverBase):
 
     return ret_id
 
+  def compose_tensor_rows(self) -> Dict[str, dict]:
+    """Tensor rows referenced by this config, keyed by config column.
+       Does not touch the DB"""
+    return {'input_tensor': self.__compose_input_t()}
+
   def __compose_input_t(self) -> Dict[str, int]:
     """Build input_tensor"""
     i_dict: Dict[str, int] = {}
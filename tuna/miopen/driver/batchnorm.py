@@ -129,12 +129,17 @@ class DriverBatchNorm(MIOpenDriver):
 
   def get_bn_dict(self) -> dict:
     """Populate c_dict with conv table elems"""
+    c_dict = self.compose_config_row()
+    c_dict['input_tensor'] = super().get_input_t_id()
+
+    return c_dict
+
+  def compose_config_row(self) -> dict:
+    """bn table elems without the tensor ids"""
     c_dict = {}
     for key, val in self.to_dict().items():
       if key in BN_CONFIG_COLS:
         c_dict[key] = val
-
-    c_dict['input_tensor'] = super().get_input_t_id()
     c_dict['driver'] = str(self)
 
     return c_dict
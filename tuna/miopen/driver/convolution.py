@@ -190,19 +190,30 @@ class DriverConvolution(MIOpenDriver):
 
   def get_conv_dict(self) -> dict:
     """Populate c_dict with conv table elems"""
+    c_dict: Dict[str, Any] = self.compose_config_row()
+    c_dict['input_tensor'] = super().get_input_t_id()
+    c_dict['weight_tensor'] = super().get_weight_t_id()
+
+    return c_dict
+
+  def compose_config_row(self) -> dict:
+    """conv table elems without the tensor ids"""
     c_dict: Dict[str, Any] = {}
     key: str
     val: int
     for key, val in self.to_dict().items():
       if key in CONV_CONFIG_COLS:
         c_dict[key] = val
-
-    c_dict['input_tensor'] = super().get_input_t_id()
-    c_dict['weight_tensor'] = super().get_weight_t_id()
     c_dict['driver'] = str(self)
 
     return c_dict
 
+  def compose_tensor_rows(self) -> Dict[str, dict]:
+    """Input and weight tensor rows, keyed by config column"""
+    t_dict: Dict[str, dict] = super().compose_tensor_rows()
+    t_dict['weight_tensor'] = self.compose_weight_t()
+    return t_dict
+
   def config_set_defaults(self) -> None:
     """Setting config DB defaults to avoid duplicates through SELECT"""
     if self.spatial_dim == 3:
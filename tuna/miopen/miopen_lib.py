@@ -29,11 +29,9 @@
 import sys
 import copy
 from typing import List, Tuple, Any
-from functools import lru_cache
 from collections.abc import Iterable
 
 from kombu.utils.uuid import uuid
-from sqlalchemy.inspection import inspect
 from sqlalchemy.exc import OperationalError, DataError, IntegrityError
 from tuna.mituna_interface import MITunaInterface
 from tuna.miopen.utils.helper import print_solvers
@@ -41,9 +39,11 @@ from tuna.parse_args import TunaArgs, setup_arg_parser, args_check
 
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.tables_interface import DBTablesInterface
-from tuna.utils.utility import SimpleDict, serialize_chunk
+from tuna.utils.utility import SimpleDict
 from tuna.utils.machine_utility import load_machines
-from tuna.utils.db_utility import gen_select_objs, has_attr_set, get_class_by_tablename
+from tuna.utils.db_utility import has_attr_set
+from tuna.utils.job_claim import JobClaimer
+from tuna.utils.metadata import MAX_ERRORED_JOB_RETRIES
 from tuna.miopen.db.get_db_tables import get_miopen_tables
 from tuna.miopen.db.mixin_tables import FinStep
 from tuna.miopen.utils.metadata import MIOPEN_ALG_LIST
@@ -63,13 +63,14 @@ from tuna.miopen.db.tables import MIOpenDBTables
 #from tuna.miopen.celery_tuning.celery_tasks import celery_enqueue
 from tuna.miopen.utils.json_to_sql import process_fdb_w_kernels, process_pdb_compile
 from tuna.miopen.utils.json_to_sql import clean_cache_table
+from tuna.miopen.utils.job_configs import attach_tensors, compose_job_configs
+from tuna.miopen.utils.job_configs import serialize_job_configs
 from tuna.miopen.utils.helper import set_job_state
 from tuna.miopen.worker.fin_utils import get_fin_result
 from tuna.miopen.db.solver import get_solver_ids
 from tuna.libraries import Library, Operation
 from tuna.custom_errors import CustomError
 
-MAX_ERRORED_JOB_RETRIES = 3
 Q_NAME = None
 
 
@@ -92,7 +93,7 @@ class MIOpen(MITunaInterface):
             TunaArgs.CONFIG_TYPE, TunaArgs.SESSION_ID, TunaArgs.MACHINES,
             TunaArgs.REMOTE_MACHINE, TunaArgs.LABEL, TunaArgs.RESTART_MACHINE,
             TunaArgs.DOCKER_NAME, TunaArgs.SHUTDOWN_WORKERS,
-            TunaArgs.ENQUEUE_ONLY
+            TunaArgs.ENQUEUE_ONLY, TunaArgs.RESULT_WRITERS
         ])
     parser.add_argument(
         '--find_mode',
@@ -488,14 +489,17 @@ class MIOpen(MITunaInterface):
     @param fin_steps List of MIFin steps
     @return List of DB jobs
     """
-    entries: List[Tuple[SimpleDict, ...]]
-    conds: List[str] = [f"session={dbt.session.id}", "valid=1"]
+    entries: List[SimpleDict]
+    job_table = dbt.job_table
+    conds: List[Any] = [
+        job_table.session == dbt.session.id, job_table.valid == 1
+    ]
 
     if label:
-      conds.append(f"reason='{label}'")
+      conds.append(job_table.reason == label)
 
-    conds.append(f"retries<{self.max_job_retries}")
-    conds.append("state in (" + str(find_state).strip('{').strip('}') + ")")
+    conds.append(job_table.retries < self.max_job_retries)
+    conds.append(job_table.state.in_(list(find_state)))
 
     entries = self.compose_work_objs(session, conds, dbt, job_attr, claim_num,
                                      fin_steps)
@@ -503,37 +507,30 @@ class MIOpen(MITunaInterface):
 
   def compose_work_objs(self,
                         session: DbSession,
-                        conds: List[str],
+                        conds: List[Any],
                         dbt: DBTablesInterface,
                         job_attr: List[str],
                         claim_num: int = None,
                         fin_steps: List[str] = None) -> List[SimpleDict]:
     """! Query a job list for update
     @param session DB session
-    @param conds List of conditions for DB job WHERE clause
+    @param conds List of SQLAlchemy conditions for the DB job WHERE clause
     @param dbt Class representing all DB tables associated with this class
     @param job_attr List of DB job columns
     @param fin_steps List of MIFin steps
     @return List of MIFin work objects
     """
-    job_entries = []
+    job_table = dbt.job_table
     if fin_steps:
-      conds.append(f"fin_step like '%{fin_steps[0]}%'")
-    else:
-      conds.append("fin_step='not_fin'")
-
-    cond_str = ' AND '.join(conds)
-    if cond_str:
-      cond_str = f"WHERE {cond_str}"
-    if claim_num:
-      cond_str += f" ORDER BY retries,config ASC LIMIT {claim_num} FOR UPDATE SKIP LOCKED"
+      conds.append(job_table.fin_step.like(f"%{fin_steps[0]}%"))
     else:
-      cond_str += " ORDER BY retries,config ASC FOR UPDATE SKIP LOCKED"
+      conds.append(job_table.fin_step == 'not_fin')
 
-    job_entries = gen_select_objs(session, job_attr,
-                                  dbt.job_table.__tablename__, cond_str)
-
-    return job_entries
+    claimer = JobClaimer(job_table, job_attr, logger=self.logger)
+    return claimer.fetch(session,
+                         conds,
+                         claim_num,
+                         order_by=[job_table.retries, job_table.config])
 
   def compose_work_objs_fin(self, session, job_entries,
                             dbt) -> List[Tuple[SimpleDict, SimpleDict]]:
@@ -543,32 +540,7 @@ class MIOpen(MITunaInterface):
     @param dbt Class representing all DB tables associated with this class
     @return ret Job tuple
     """
-    ret = []
-
-    cfg_rel = {
-        key: {
-            'key': list(val.local_columns)[0].name,
-            'ftble': str(list(val.remote_side)[0]).split('.', maxsplit=1)[0],
-            'fkey': str(list(val.remote_side)[0]).split('.')[1]
-        } for key, val in inspect(dbt.config_table).relationships.items()
-    }
-
-    if job_entries:
-      id_str = ','.join({str(job.config) for job in job_entries})
-      cfg_cond_str = f"where valid=1 and id in ({id_str})"
-      cfg_attr = [column.name for column in inspect(dbt.config_table).c]
-      cfg_entries = gen_select_objs(session, cfg_attr,
-                                    dbt.config_table.__tablename__,
-                                    cfg_cond_str)
-
-      cfg_entries = self.attach_tensors(session, cfg_rel, cfg_entries)
-
-      cfg_map = {cfg.id: cfg for cfg in cfg_entries}
-
-      for job in job_entries:
-        ret.append((job, cfg_map[job.config]))
-
-    return ret
+    return compose_job_configs(session, job_entries, dbt.config_table)
 
   def attach_tensors(self, session, cfg_rel, cfg_entries):
     """! Attach tensor relationship information to config entries
@@ -578,22 +550,7 @@ class MIOpen(MITunaInterface):
     @return cfg_entries List of DB Config entries with attached tensors (foreign keys)
 
     """
-    for key, val in cfg_rel.items():
-      rel_attr = [
-          column.name
-          for column in inspect(get_class_by_tablename(val['ftble'])).c
-      ]
-      val['fattr'] = rel_attr
-
-    for cfg in cfg_entries:
-      for key, val in cfg_rel.items():
-        rel_val = getattr(cfg, val['key'])
-        rel_cond_str = f"where {val['fkey']}={rel_val}"
-        setattr(
-            cfg, key,
-            gen_select_objs(session, val['fattr'], val['ftble'],
-                            rel_cond_str)[0])
-    return cfg_entries
+    return attach_tensors(session, cfg_rel, cfg_entries)
 
   #deprecated
   def get_job_tables(self, job_rows: List[Tuple[SimpleDict, ...]],
@@ -643,32 +600,19 @@ class MIOpen(MITunaInterface):
     return self.args.fin_steps and any(
         s in self.args.fin_steps for s in MIOPEN_CELERY_STEPS)
 
-  @lru_cache(1)
-  def get_fdb_attr(self):
-    """! Get find_db table attrs
-    @return fdb_attr find_db table attributes without timestamps
-    """
-    fdb_attr = None
-    fdb_attr = [column.name for column in inspect(self.dbt.find_db_table).c]
-    fdb_attr.remove("insert_ts")
-    fdb_attr.remove("update_ts")
-    return fdb_attr
-
   def serialize_jobs(self, session: DbSession, batch_jobs: List[Any]):
     """! Return list of serialize jobs
     @param session DB session
     @param batch_jobs List of DB jobs
     @return DB jobs, serialized
     """
-    entries = self.compose_work_objs_fin(session, batch_jobs, self.dbt)
-    return serialize_chunk(entries)
+    return serialize_job_configs(session, batch_jobs, self.dbt.config_table)
 
   def build_context(
       self, serialized_jobs: Tuple[SimpleDict, SimpleDict]) -> List[dict]:
     """Build context list for enqueue job"""
     context_list = []
     kwargs = self.get_context_items()
-    fdb_attr = self.get_fdb_attr()
     for job, config in serialized_jobs:
       context = {
           'job': job,
@@ -676,18 +620,15 @@ class MIOpen(MITunaInterface):
           'operation': self.operation,
           'arch': self.dbt.session.arch,
           'num_cu': self.dbt.session.num_cu,
-          'kwargs': kwargs,
-          'fdb_attr': fdb_attr
+          'kwargs': kwargs
       }
       context_list.append(context)
 
     return context_list
 
-  def celery_enqueue_call(self, context: dict, q_name: str, task_id=False):
-    """! Enqueue job (context) for queue:q_name
-    @param context Context for Celery job
+  def get_celery_task(self, q_name: str):
+    """! Return the celery task for queue:q_name
     @param q_name Custom Celery queue name
-    @param task_id Custom Redis Key
     """
 
     #hacky way to get the Q_NAME to the task decorator for interpreter to decorate the
@@ -696,11 +637,20 @@ class MIOpen(MITunaInterface):
     Q_NAME = q_name  #pylint: disable=import-outside-toplevel,unused-variable,invalid-name,redefined-outer-name
     from tuna.miopen.celery_tuning.celery_tasks import celery_enqueue  #pylint: disable=import-outside-toplevel
 
-    return celery_enqueue.apply_async((context,),
-                                      task_id=('-').join([self.prefix,
-                                                          uuid()]),
-                                      queue=q_name,
-                                      reply_to=q_name)
+    return celery_enqueue
+
+  def celery_enqueue_call(self, context: dict, q_name: str, task_id=False):
+    """! Enqueue job (context) for queue:q_name
+    @param context Context for Celery job
+    @param q_name Custom Celery queue name
+    @param task_id Custom Redis Key
+    """
+
+    return self.get_celery_task(q_name).apply_async(
+        (context,),
+        task_id=('-').join([self.prefix, uuid()]),
+        queue=q_name,
+        reply_to=q_name)
 
   def process_compile_results(self, session, fin_json, context):
     """! Process result from fin_build worker
@@ -710,7 +660,7 @@ class MIOpen(MITunaInterface):
     @return Boolean value
     """
     job = SimpleDict(**context['job'])
-    pending = []
+    job_states = self.get_job_states()
     solver_id_map = get_solver_ids()
 
     failed_job = False
@@ -720,8 +670,7 @@ class MIOpen(MITunaInterface):
       if fin_json:
         if 'miopen_find_compile_result' in fin_json:
           status = process_fdb_w_kernels(session, fin_json,
-                                         copy.deepcopy(context), self.dbt,
-                                         context['fdb_attr'], pending)
+                                         copy.deepcopy(context), self.dbt)
 
         elif 'miopen_perf_compile_result' in fin_json:
           status = process_pdb_compile(session, fin_json, job, self.dbt,
@@ -741,14 +690,21 @@ class MIOpen(MITunaInterface):
       failed_job = True
 
     if failed_job:
-      set_job_state(session, job, self.dbt, 'errored', False, result=result_str)
+      set_job_state(session,
+                    job,
+                    self.dbt,
+                    'errored',
+                    False,
+                    result=result_str,
+                    job_states=job_states)
     else:
       set_job_state(session,
                     job,
                     self.dbt,
                     'compiled',
                     False,
-                    result=result_str)
+                    result=result_str,
+                    job_states=job_states)
 
     return True
 
@@ -760,9 +716,9 @@ class MIOpen(MITunaInterface):
     @return Boolean value
     """
     job = SimpleDict(**context['job'])
+    job_states = self.get_job_states()
     failed_job = True
     result_str = ''
-    pending = []
     orig_state = 'compiled'
 
     try:
@@ -772,8 +728,6 @@ class MIOpen(MITunaInterface):
                                          fin_json,
                                          copy.deepcopy(context),
                                          self.dbt,
-                                         context['fdb_attr'],
-                                         pending,
                                          result_str='miopen_find_eval_result',
                                          check_str='evaluated')
         elif 'miopen_perf_eval_result' in fin_json:
@@ -781,8 +735,6 @@ class MIOpen(MITunaInterface):
                                          fin_json,
                                          copy.deepcopy(context),
                                          self.dbt,
-                                         context['fdb_attr'],
-                                         pending,
                                          result_str='miopen_perf_eval_result',
                                          check_str='evaluated')
 
@@ -792,7 +744,12 @@ class MIOpen(MITunaInterface):
       if failed_job:
         if job.retries >= (MAX_ERRORED_JOB_RETRIES - 1):  #pylint: disable=no-member
           self.logger.warning('max job retries exhausted, setting to errored')
-          set_job_state(session, job, self.dbt, 'errored', result=result_str)
+          set_job_state(session,
+                        job,
+                        self.dbt,
+                        'errored',
+                        result=result_str,
+                        job_states=job_states)
         else:
           self.logger.warning('resetting job state to %s, incrementing retries',
                               orig_state)
@@ -801,14 +758,25 @@ class MIOpen(MITunaInterface):
                         self.dbt,
                         orig_state,
                         increment_retries=True,
-                        result=result_str)
+                        result=result_str,
+                        job_states=job_states)
       else:
         self.logger.info("\n\n Setting job state to evaluated")
-        set_job_state(session, job, self.dbt, 'evaluated', result=result_str)
+        set_job_state(session,
+                      job,
+                      self.dbt,
+                      'evaluated',
+                      result=result_str,
+                      job_states=job_states)
         clean_cache_table(self.dbt, job)
     except (OperationalError, IntegrityError) as err:
       self.logger.warning('FinBuild: Unable to update Database %s', err)
       session.rollback()
-      set_job_state(session, job, self.dbt, 'errored', result=result_str)
+      set_job_state(session,
+                    job,
+                    self.dbt,
+                    'errored',
+                    result=result_str,
+                    job_states=job_states)
 
     return True
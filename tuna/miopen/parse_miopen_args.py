@@ -256,6 +256,18 @@ def get_export_db_parser(with_yaml: bool = True) -> jsonargparse.ArgumentParser:
                       dest='filename',
                       help='Custom filename for DB dump',
                       default=None)
+  parser.add_argument(
+      '--incremental',
+      dest='incremental',
+      action='store_true',
+      help=
+      'Patch the existing DB dump with the rows changed since its watermark',
+      default=False)
+  parser.add_argument('--check_incremental',
+                      dest='check_incremental',
+                      action='store_true',
+                      help='Compare the incremental DB dump with a full export',
+                      default=False)
 
   group = parser.add_mutually_exclusive_group(required=True)
   group.add_argument('-k',
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Blob store maintenance: recount the kernel blob references from the kernel
+cache tables and collect the blobs nobody references, e.g.
+  python3 -m tuna.miopen.scripts.blob_gc --recount
+Best run while no tuning session writes kernels"""
+
+import json
+import argparse
+from typing import Any, Dict, List, Optional
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen.db.batch_norm_tables import BNFinJobCache, BNKernelCache
+from tuna.miopen.db.convolutionjob_tables import ConvFinJobCache
+from tuna.miopen.db.convolutionjob_tables import ConvolutionKernelCache
+from tuna.miopen.utils.blob_store import BLOB_STORE_ENV, ORPHAN_GRACE
+from tuna.miopen.utils.blob_store import BlobStore, get_blob_store
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('blob_gc')
+
+#tables whose rows reference blobs through blob_hash
+KERNEL_TABLES = [
+    ConvFinJobCache, ConvolutionKernelCache, BNFinJobCache, BNKernelCache
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+  """Function to parse arguments"""
+  parser = argparse.ArgumentParser(
+      'Recount kernel blob references and remove unreferenced blobs')
+  parser.add_argument('--blob_store',
+                      dest='blob_store',
+                      default=None,
+                      help=f'blob store root, default ${BLOB_STORE_ENV}')
+  parser.add_argument(
+      '--recount',
+      action='store_true',
+      default=False,
+      help='recompute the reference counts from the kernel cache tables first')
+  parser.add_argument(
+      '--min_age',
+      type=float,
+      default=ORPHAN_GRACE,
+      help='seconds a blob file without a kernel_blob row is kept')
+  return parser.parse_args(argv)
+
+
+def run_gc(session: DbSession,
+           store: BlobStore,
+           recount: bool = False,
+           min_age: float = ORPHAN_GRACE) -> Dict[str, Any]:
+  """Optionally recount, then collect garbage, returns what was done"""
+  if recount:
+    LOGGER.info('Recounting blob references')
+    store.recount(session, KERNEL_TABLES)
+    session.commit()
+  return {
+      'recounted': recount,
+      'collected': store.collect_garbage(session, min_age)
+  }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  """Main module function"""
+  args = parse_args(argv)
+  store = get_blob_store(args.blob_store)
+  if store is None:
+    LOGGER.error('No blob store configured, set %s or --blob_store',
+                 BLOB_STORE_ENV)
+    return 1
+  with DbSession() as session:
+    print(json.dumps(run_gc(session, store, args.recount, args.min_age)))
+  return 0
+
+
+if __name__ == '__main__':
+  main()
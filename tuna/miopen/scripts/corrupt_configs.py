@@ -27,9 +27,8 @@
 """Corrupt config module"""
 import sys
 import logging
-from typing import Optional, List, Tuple, Union, Dict
+from typing import Any, Optional, List, Tuple, Union, Dict
 from io import TextIOWrapper
-import mysql.connector
 from tuna.sql import DbCursor
 from tuna.miopen.utils.metadata import TABLE_COLS_FUSION_MAP
 from tuna.miopen.utils.metadata import TABLE_COLS_CONV_MAP
@@ -76,7 +75,7 @@ def main() -> None:
   }
 
   outfile: TextIOWrapper
-  cur: mysql.connector.cursor.MySQLCursor
+  cur: Any
   count: int = 0
   sub_cmd: str = ""
   row: List
@@ -86,7 +85,8 @@ def main() -> None:
           "select conv_config.* from job inner join conv_config on conv_config.id = \
           job.conv_config  where job.arch = %s and reason = 'corrupt';",
           (arch,))
-      sub_cmd_idx: int = cur.column_names.index('cmd')
+      column_names: List[str] = [x[0] for x in cur.description]
+      sub_cmd_idx: int = column_names.index('cmd')
       for row in cur:
         sub_cmd = row[sub_cmd_idx]
         bash_cmd: str = f'echo {row[0]}; ./bin/MIOpenDriver {sub_cmd} -V 0 '
@@ -94,14 +94,14 @@ def main() -> None:
         fds: str = ""
         arg_name: str = ""
         for idx, fds in enumerate(row):
-          if cur.column_names[idx] in ['id', 'cmd']:
+          if column_names[idx] in ['id', 'cmd']:
             continue
           if fds is not None:
             if sub_cmd in ['conv', 'convfp16']:
-              arg_name = table_cols_conv_invmap[cur.column_names[idx]]
+              arg_name = table_cols_conv_invmap[column_names[idx]]
               bash_cmd += ' -' + arg_name + ' ' + fds
             elif sub_cmd in ['CBAInfer', 'CBAInferfp16']:
-              arg_name = table_cols_fusion_invmap[cur.column_names[idx]]
+              arg_name = table_cols_fusion_invmap[column_names[idx]]
               bash_cmd += ' -' + arg_name + ' ' + fds
         outfile.write(bash_cmd + '\n')
         count += 1
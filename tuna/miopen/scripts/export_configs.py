@@ -82,21 +82,21 @@ def main():
 
       cur.execute(query, (args.arch,))
     # cur.execute("select * from config where valid = TRUE;")
-    sub_cmd_idx = cur.column_names.index('cmd')
+    sub_cmd_idx = [x[0] for x in cur.description].index('cmd')
 
     for row in cur:
       sub_cmd = row[sub_cmd_idx]
       bash_cmd = f'./bin/MIOpenDriver {sub_cmd} -V 0 '
       for idx, val in enumerate(row):
-        if cur.column_names[idx] in ['id', 'cmd', 'valid']:
+        if cur.description[idx][0] in ['id', 'cmd', 'valid']:
           continue
         if val is not None:
           if sub_cmd in ['conv', 'convfp16']:
-            arg_name = table_cols_conv_invmap[cur.column_names[idx]]
+            arg_name = table_cols_conv_invmap[cur.description[idx][0]]
           elif sub_cmd in ['CBAInfer', 'CBAInferfp16']:
-            if cur.column_names[idx] == 'direction':
+            if cur.description[idx][0] == 'direction':
               continue
-            arg_name = table_cols_fusion_invmap[cur.column_names[idx]]
+            arg_name = table_cols_fusion_invmap[cur.description[idx][0]]
           bash_cmd += ' -' + arg_name + ' ' + val
       outfile.write(bash_cmd + '\n')
       count += 1
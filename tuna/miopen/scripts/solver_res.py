@@ -39,7 +39,7 @@ def parse_row(row, count, cfg_cnt, prn_header):
   with DbCursor() as config_cur:
     config_cur.execute("select * from config where id = %s", (row[0],))
     config = config_cur.fetchall()
-    # config_cur.column_names has names of the columns
+    config_cols = [x[0] for x in config_cur.description]
 
   # get all the solver results for this config
   # pylint: disable-next=unspecified-encoding)
@@ -47,7 +47,7 @@ def parse_row(row, count, cfg_cnt, prn_header):
     solver_cur.execute("select * from solver_search where config = %s",
                        (row[0],))
     if prn_header:
-      header = config_cur.column_names + solver_cur.column_names
+      header = config_cols + [x[0] for x in solver_cur.description]
       header_str = ';'.join(header) + '\n'
       res_file.write(header_str)
       prn_header = False
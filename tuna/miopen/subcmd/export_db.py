@@ -30,8 +30,7 @@ import os
 import tempfile
 import json
 from collections import OrderedDict
-from typing import Dict, Any, Optional, Union, List, Tuple
-import base64
+from typing import Dict, Any, Optional, Union, Set
 import argparse
 import logging
 
@@ -49,6 +48,12 @@ from tuna.miopen.utils.config_type import ConfigType
 from tuna.miopen.utils.metadata import INVERS_DIR_MAP
 from tuna.miopen.parse_miopen_args import get_export_db_parser
 from tuna.miopen.worker.fin_utils import compose_config_obj
+from tuna.miopen.utils.fdb_export import FdbExporter
+from tuna.miopen.utils.kdb_writer import KdbWriter, get_fastest_groups
+from tuna.miopen.utils.kdb_writer import get_kdb_rows
+from tuna.miopen.utils.delta_export import changed_since, get_high_water
+from tuna.miopen.utils.delta_export import patch_text_db, read_watermark
+from tuna.miopen.utils.delta_export import same_text_db, write_watermark
 
 DIR_NAME: dict = {'F': 'Fwd', 'B': 'BwdData', 'W': 'BwdWeights'}
 
@@ -155,8 +160,10 @@ def fin_db_key(config_lst, logger):
   return db_key_dict
 
 
-def get_base_query(dbt: MIOpenDBTables, args: argparse.Namespace,
-                   logger: logging.Logger):
+def get_base_query(dbt: MIOpenDBTables,
+                   args: argparse.Namespace,
+                   logger: logging.Logger,
+                   valid_only: bool = True):
   """ general query for fdb/pdb results """
   with DbSession() as session:
     query = session.query(args.src_table, dbt.config_table)
@@ -172,8 +179,9 @@ def get_base_query(dbt: MIOpenDBTables, args: argparse.Namespace,
       logger.info("rocm_v : %s", dbt.session.rocm_v)
       logger.info("miopen_v : %s", dbt.session.miopen_v)
 
-    query = query.filter(args.src_table.valid == 1)\
-        .filter(args.src_table.opencl == args.opencl)\
+    if valid_only:
+      query = query.filter(args.src_table.valid == 1)
+    query = query.filter(args.src_table.opencl == args.opencl)\
         .filter(args.src_table.config == dbt.config_table.id)
 
     if args.config_tag:
@@ -236,29 +244,9 @@ def add_entry_to_solvers(fdb_entry: Union[GoldenMixin, FindDBMixin],
 
 
 def build_miopen_fdb(query, logger: logging.Logger) -> OrderedDict:
-  """return dict with key: fdb_key, val: list of fdb entries"""
-  find_db: OrderedDict = OrderedDict()
-  solvers: Dict[str, Dict[str, Any]] = {}
-  db_entries = query.all()
-  total_entries = len(db_entries)
-  logger.info("fdb query returned: %s", total_entries)
-
-  for fdb_entry, _ in db_entries:
-    if add_entry_to_solvers(fdb_entry, solvers, logger):
-      fdb_key = fdb_entry.fdb_key
-      lst = find_db.get(fdb_key)
-      if not lst:
-        find_db[fdb_key] = [fdb_entry]
-      else:
-        lst.append(fdb_entry)
-
+  """return dict with key: fdb_key, val: list of the fastest fdb entries"""
   require_id_solvers()
-  for _, entries in find_db.items():
-    entries.sort(key=lambda x: (float(x.kernel_time), ID_SOLVER_MAP[x.solver]))
-    while len(entries) > 4:
-      entries.pop()
-
-  return find_db
+  return FdbExporter(ID_SOLVER_MAP, logger=logger).build(query)
 
 
 def write_fdb(arch, num_cu, ocl, find_db, filename=None):
@@ -286,42 +274,30 @@ def write_fdb(arch, num_cu, ocl, find_db, filename=None):
 
 def export_fdb(dbt: MIOpenDBTables, args: argparse.Namespace,
                logger: logging.Logger):
-  """Function to export find_db to txt file
+  """Function to export find_db to txt file, streams the query result to
+  the file
   """
   query = get_fdb_query(dbt, args, logger)
-  miopen_fdb = build_miopen_fdb(query, logger)
+  file_name = get_filename(args.arch, args.num_cu, args.filename, args.opencl,
+                           DB_Type.FIND_DB)
 
+  require_id_solvers()
   logger.info("write fdb to file.")
-  return write_fdb(args.arch, args.num_cu, args.opencl, miopen_fdb,
-                   args.filename)
+  FdbExporter(ID_SOLVER_MAP, logger=logger).write(query, file_name)
+  return file_name
 
 
 def build_miopen_kdb(dbt: MIOpenDBTables, find_db, logger: logging.Logger):
   """ create miopen kernel db object for export
   """
-  num_fdb_entries = 0
-  num_kdb_blobs = 0
-  kern_db = []
+  writer = KdbWriter(None, logger=logger)
   with DbSession() as session:
-    total = len(find_db.items())
-    last_pcnt = 0
-    for _, entries in find_db.items():
-      num_fdb_entries += 1
-      entries.sort(key=lambda x: float(x.kernel_time))
-      fastest_slv = entries[0]
-      query = session.query(dbt.kernel_cache)\
-          .filter(dbt.kernel_cache.kernel_group == fastest_slv.kernel_group)\
-          .filter(dbt.kernel_cache.valid == 1)
-      for kinder in query.all():
-        num_kdb_blobs += 1
-        kern_db.append(kinder)
-      pcnt = int(num_fdb_entries * 100 / total)
-      if pcnt > last_pcnt:
-        logger.warning("Building db: %s%%, blobs: %s", pcnt, num_kdb_blobs)
-        last_pcnt = pcnt
-
-  logger.warning("Total FDB entries: %s, Total blobs: %s", num_fdb_entries,
-                 num_kdb_blobs)
+    kern_db = list(
+        writer.fetch_kernels(session, dbt.kernel_cache,
+                             get_fastest_groups(find_db)))
+
+  logger.warning("Total FDB entries: %s, Total blobs: %s", len(find_db),
+                 len(kern_db))
   return kern_db
 
 
@@ -330,67 +306,28 @@ def write_kdb(arch, num_cu, kern_db, logger: logging.Logger, filename=None):
   Write blob map to sqlite
   """
   file_name = get_filename(arch, num_cu, filename, False, DB_Type.KERN_DB)
-  if os.path.isfile(file_name):
-    os.remove(file_name)
-
-  conn = sqlite3.connect(file_name)
-  cur = conn.cursor()
-  cur.execute(
-      "CREATE TABLE `kern_db` (`id` INTEGER PRIMARY KEY ASC,`kernel_name` TEXT NOT NULL,"
-      "`kernel_args` TEXT NOT NULL,`kernel_blob` BLOB NOT NULL,`kernel_hash` TEXT NOT NULL,"
-      "`uncompressed_size` INT NOT NULL);")
-  cur.execute(
-      "CREATE UNIQUE INDEX `idx_kern_db` ON kern_db(kernel_name, kernel_args);")
-
-  ins_list: List[Tuple[str, str]] = []
-  for kern in kern_db:
-    name = kern.kernel_name
-    args = kern.kernel_args
-    #check if extensions should be added
-    if not name.endswith('.o'):
-      name += ".o"
-    if not "-mcpu=" in args:
-      if not name.endswith('.mlir.o'):
-        args += f" -mcpu={arch}"
-
-    ins_key = (name, args)
-    if ins_key not in ins_list:
-      ins_list.append(ins_key)
-      cur.execute(
-          "INSERT INTO kern_db (kernel_name, kernel_args, kernel_blob, kernel_hash, "
-          "uncompressed_size) VALUES(?, ?, ?, ?, ?);",
-          (name, args, base64.b64decode(
-              kern.kernel_blob), kern.kernel_hash, kern.uncompressed_size))
-
-  conn.commit()
-  cur.close()
-  conn.close()
-
-  logger.warning("Inserted blobs: %s", len(ins_list))
+  KdbWriter(arch, logger=logger).write(file_name, kern_db)
   return file_name
 
 
 def build_miopen_fdb_skews(args: argparse.Namespace, query,
                            logger: logging.Logger) -> OrderedDict:
-  """return dict with key: fdb_key + num_cu, val: list of fdb entries"""
-  miopen_fdb: OrderedDict = OrderedDict()
-  with DbSession() as session:
-    db_entries = query.all()
-    fdb_ids = []
-    for fdb_entry, _ in db_entries:
-      fdb_ids.append(fdb_entry.id)
-
-    skews = [int(x[0]) for x in session.query(args.src_table.num_cu).distinct()\
-              .filter(args.src_table.id.in_(fdb_ids)).all()]
-    logger.info("skews %s", skews)
+  """return dict with key: fdb_key + num_cu, val: list of fdb entries,
+  all num_cu are ranked in a single pass over the query"""
+  _ = args
+  require_id_solvers()
+  return FdbExporter(ID_SOLVER_MAP, logger=logger).build(query, skews=True)
 
-  for num_cu in skews:
-    cu_query = query.filter(args.src_table.num_cu == num_cu)
-    miopen_fdb_skew = build_miopen_fdb(cu_query, logger)
-    for key, value in miopen_fdb_skew.items():
-      miopen_fdb[f"{key}_cu{num_cu}"] = value
 
-  return miopen_fdb
+def get_kdb_find_db(dbt: MIOpenDBTables,
+                    args: argparse.Namespace,
+                    logger: logging.Logger,
+                    skew_fdbs=True) -> OrderedDict:
+  """find db the kernel db is built from"""
+  query = get_fdb_query(dbt, args, logger)
+  if skew_fdbs and not args.num_cu:
+    return build_miopen_fdb_skews(args, query, logger)
+  return build_miopen_fdb(query, logger)
 
 
 def export_kdb(dbt: MIOpenDBTables,
@@ -400,19 +337,122 @@ def export_kdb(dbt: MIOpenDBTables,
   """
   Function to export the kernel cache
   """
-  query = get_fdb_query(dbt, args, logger)
+  miopen_fdb = get_kdb_find_db(dbt, args, logger, skew_fdbs)
 
-  miopen_fdb: OrderedDict = OrderedDict()
-  if skew_fdbs and not args.num_cu:
-    miopen_fdb = build_miopen_fdb_skews(args, query, logger)
+  logger.info("Building kdb.")
+  file_name = get_filename(args.arch, args.num_cu, args.filename, False,
+                           DB_Type.KERN_DB)
+  with DbSession() as session:
+    KdbWriter(args.arch, logger=logger).export(session, dbt.kernel_cache,
+                                               miopen_fdb, file_name)
+  return file_name
+
+
+def get_export_filters(args: argparse.Namespace,
+                       db_type: DB_Type) -> Dict[str, Any]:
+  """export arguments stored with a watermark, the watermark is only used by
+  an export with the same arguments"""
+  return {
+      'db_type': db_type.name,
+      'src_table': args.src_table.__tablename__,
+      'session_id': args.session_id,
+      'golden_v': args.golden_v,
+      'arch': args.arch,
+      'num_cu': args.num_cu,
+      'opencl': args.opencl,
+      'config_tag': args.config_tag
+  }
+
+
+def get_dirty_keys(dbt: MIOpenDBTables, args: argparse.Namespace,
+                   logger: logging.Logger, mark: Dict[str, Any]) -> Set[str]:
+  """fdb keys with rows changed since mark, including invalidated rows"""
+  query = get_base_query(dbt, args, logger, valid_only=False)\
+      .filter(changed_since(args.src_table, mark))\
+      .with_entities(args.src_table.fdb_key).distinct()
+  dirty_keys = {row.fdb_key for row in query}
+  query.session.close()
+  return dirty_keys
+
+
+def export_fdb_delta(dbt: MIOpenDBTables, args: argparse.Namespace,
+                     logger: logging.Logger):
+  """Re-export the fdb keys changed since the watermark of the find db file
+  and merge them into it, the first export is a full one"""
+  file_name = get_filename(args.arch, args.num_cu, args.filename, args.opencl,
+                           DB_Type.FIND_DB)
+  filters = get_export_filters(args, DB_Type.FIND_DB)
+  with DbSession() as session:
+    marks = get_high_water(session, [args.src_table])
+
+  since = read_watermark(file_name, filters, logger)
+  if since is None:
+    export_fdb(dbt, args, logger)
+  else:
+    dirty_keys = get_dirty_keys(dbt, args, logger,
+                                since[args.src_table.__tablename__])
+    require_id_solvers()
+    exporter = FdbExporter(ID_SOLVER_MAP, logger=logger)
+    lines = exporter.iter_key_lines(get_fdb_query(dbt, args, logger),
+                                    sorted(dirty_keys))
+    count = patch_text_db(file_name, dirty_keys, lines)
+    logger.info("Re-exported %s changed fdb keys, %s has %s keys",
+                len(dirty_keys), file_name, count)
+
+  write_watermark(file_name, marks, filters)
+  return file_name
+
+
+def export_kdb_delta(dbt: MIOpenDBTables,
+                     args: argparse.Namespace,
+                     logger: logging.Logger,
+                     skew_fdbs=True):
+  """Patch the kernel db with the kernels changed since its watermark, the
+  first export is a full one"""
+  file_name = get_filename(args.arch, args.num_cu, args.filename, False,
+                           DB_Type.KERN_DB)
+  filters = get_export_filters(args, DB_Type.KERN_DB)
+  with DbSession() as session:
+    marks = get_high_water(session, [args.src_table, dbt.kernel_cache])
+
+  since = read_watermark(file_name, filters, logger)
+  if since is None:
+    export_kdb(dbt, args, logger, skew_fdbs)
   else:
-    miopen_fdb = build_miopen_fdb(query, logger)
+    miopen_fdb = get_kdb_find_db(dbt, args, logger, skew_fdbs)
+    with DbSession() as session:
+      KdbWriter(args.arch,
+                logger=logger).patch(session, dbt.kernel_cache, miopen_fdb,
+                                     file_name,
+                                     since[dbt.kernel_cache.__tablename__])
+
+  write_watermark(file_name, marks, filters)
+  return file_name
 
-  logger.info("Building kdb.")
-  kern_db = build_miopen_kdb(dbt, miopen_fdb, logger)
 
-  logger.info("write kdb to file.")
-  return write_kdb(args.arch, args.num_cu, kern_db, logger, args.filename)
+def check_delta_export(dbt: MIOpenDBTables, args: argparse.Namespace,
+                       logger: logging.Logger, file_name: str) -> None:
+  """Compare an incrementally exported db with a clean export: text dbs byte
+  for byte, kernel dbs by their (name, args) ordered rows"""
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    full_file = os.path.join(tmp_dir, os.path.basename(file_name))
+    if args.kern_db:
+      miopen_fdb = get_kdb_find_db(dbt, args, logger)
+      with DbSession() as session:
+        KdbWriter(args.arch, logger=logger).export(session, dbt.kernel_cache,
+                                                   miopen_fdb, full_file)
+      same = get_kdb_rows(full_file) == get_kdb_rows(file_name)
+    else:
+      require_id_solvers()
+      FdbExporter(ID_SOLVER_MAP,
+                  logger=logger).write(get_fdb_query(dbt, args, logger),
+                                       full_file)
+      same = same_text_db(full_file, file_name)
+
+  if not same:
+    raise ValueError(
+        f"Incremental export {file_name} does not match a full export")
+  logger.info("%s matches a full export", file_name)
 
 
 #deprecated
@@ -590,12 +630,23 @@ def run_export_db(args: argparse.Namespace, logger: logging.Logger):
     args.src_table = dbt.golden_table
 
   if args.find_db:
-    result_file = export_fdb(dbt, args, logger)
+    if args.incremental:
+      result_file = export_fdb_delta(dbt, args, logger)
+    else:
+      result_file = export_fdb(dbt, args, logger)
   elif args.kern_db:
-    result_file = export_kdb(dbt, args, logger)
+    if args.incremental:
+      result_file = export_kdb_delta(dbt, args, logger)
+    else:
+      result_file = export_kdb(dbt, args, logger)
   elif args.perf_db:
+    if args.incremental:
+      logger.warning("No incremental perf db export, exporting in full")
     result_file = export_pdb_txt(dbt, args, logger)
 
+  if args.incremental and args.check_incremental and not args.perf_db:
+    check_delta_export(dbt, args, logger, result_file)
+
   print(result_file)
 
 
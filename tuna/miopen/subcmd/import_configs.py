@@ -28,7 +28,7 @@
 import os
 import logging
 import argparse
-from typing import Any, Optional, Union, Tuple, List
+from typing import Any, Optional, Union, Tuple
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
@@ -42,6 +42,7 @@ from tuna.miopen.driver.base import DriverBase
 from tuna.miopen.driver.batchnorm import DriverBatchNorm
 from tuna.miopen.db.tables import MIOpenDBTables
 from tuna.miopen.db.benchmark import Framework, Model
+from tuna.miopen.utils.config_importer import ConfigImporter
 
 
 def create_query(tag: str, mark_recurrent: bool, config_id: int) -> dict:
@@ -160,23 +161,9 @@ def import_cfgs(args: argparse.Namespace, dbt: MIOpenDBTables,
   """import configs to mysql from file with driver invocations"""
   connect_db()
 
-  counts: dict = {}
-  counts['cnt_configs'] = 0
-  counts['cnt_tagged_configs'] = set()
-  unique_lines: List[str] = []
-  with open(os.path.expanduser(args.file_name), "r") as infile:  # pylint: disable=unspecified-encoding
-    line_cnt = 0
-    for line in infile:
-      line_cnt += 1
-      line = line.strip()
-      if not line in unique_lines:
-        unique_lines.append(line)
-        logger.info("parsed: %u, unique: %u", line_cnt, len(unique_lines))
-    for line in unique_lines:
-      try:
-        parse_line(args, line, counts, dbt, logger)
-      except ValueError as err:
-        logger.warning(err)
+  importer = ConfigImporter(args, dbt, logger=logger)
+  with DbSession() as session:
+    counts = importer.import_file(session, args.file_name)
 
   return counts
 
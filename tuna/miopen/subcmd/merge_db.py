@@ -35,6 +35,8 @@ from tuna.miopen.utils.analyze_parse_db import parse_pdb_filename, insert_solver
 from tuna.miopen.utils.analyze_parse_db import get_config_sqlite
 from tuna.miopen.utils.analyze_parse_db import get_sqlite_row, get_sqlite_table, get_sqlite_data
 from tuna.miopen.utils.helper import prune_cfg_dims
+from tuna.miopen.utils.stream_merge import TextDbMerger, format_db_line
+from tuna.miopen.utils.stream_merge import parse_db_params
 
 LOGGER = setup_logger('merge_pdb')
 
@@ -48,12 +50,7 @@ def parse_jobline(line):
   tmp = line.split('=')
   assert len(tmp) == 2
   lhs, rhs = tmp
-  vals = rhs.split(';')
-  params = {}
-  for val in vals:
-    solver_id, p_vec = val.split(':')
-    params[solver_id] = p_vec
-  return lhs, params
+  return lhs, parse_db_params(rhs)
 
 
 def parse_args():
@@ -226,15 +223,6 @@ def update_master_list(master_list, local_paths, mids, keep_keys):
           target_merge(master_list, key, vals, keep_keys)
 
 
-def is_float(num):
-  """Test if string can be interpreted as a float"""
-  try:
-    float(num)
-    return True
-  except ValueError:
-    return False
-
-
 def write_merge_results(master_list, final_file, copy_files):
   """write merge results to file"""
   # serialize the file out
@@ -242,22 +230,7 @@ def write_merge_results(master_list, final_file, copy_files):
   with open(final_file, "w") as out_file:  # pylint: disable=unspecified-encoding
     for perfdb_key, solvers in sorted(master_list.items(),
                                       key=lambda kv: kv[0]):
-
-      params = []
-      if is_float(list(solvers.values())[0].split(',')[0]):
-        #for solver indexed, idx 0 is time
-        sorted_slv = sorted(solvers.items(),
-                            key=lambda kv: (float(kv[1].split(',')[0]), kv[0]))
-      else:
-        #for alg indexed, idx 1 is time
-        sorted_slv = sorted(solvers.items(),
-                            key=lambda kv: (float(kv[1].split(',')[1]), kv[0]))
-
-      for solver_id, solver_params in sorted_slv:
-        params.append(f'{solver_id}:{solver_params}')
-      # pylint: disable-next=consider-using-f-string ; more readble
-      perf_line = '{}={}'.format(perfdb_key, ';'.join(params))
-      out_file.write(perf_line + '\n')
+      out_file.write(format_db_line(perfdb_key, solvers) + '\n')
   LOGGER.info('Finished writing to file: %s', final_file)
 
   for copy in copy_files:
@@ -275,18 +248,14 @@ def merge_text_file(master_file, copy_only, keep_keys, target_file=None):
   else:
     _, _, final_file, copy_files = parse_text_pdb_name(master_file)
 
-  master_list = load_master_list(master_file)
-
-  local_paths = [target_file]
-  mids = [-1]
-
   if copy_only:
     LOGGER.warning('Skipping file processing due to copy_only argument')
     return None
 
-  update_master_list(master_list, local_paths, mids, keep_keys)
-
-  write_merge_results(master_list, final_file, copy_files)
+  #streams master and target through sorted runs, memory use is bounded by
+  #the run size instead of the db size
+  merger = TextDbMerger(keep_keys, logger=LOGGER)
+  merger.merge(master_file, [target_file], final_file, copy_files)
 
   return final_file
 
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Content addressed store for kernel blobs.
+A blob is kept once, under the sha256 of its bytes, in a filesystem backend
+shared by the workers (TUNA_BLOB_STORE). The kernel_blob table counts the
+kernel cache rows referencing each blob; blobs nobody references are removed
+by collect_garbage"""
+
+import os
+import time
+import hashlib
+import logging
+import tempfile
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select, func
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen.db.kernel_blob import KernelBlob
+from tuna.utils.db_utility import bulk_upsert
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import split_packets
+
+LOGGER = setup_logger('blob_store')
+
+#root directory of the filesystem backend, unset disables the blob store
+BLOB_STORE_ENV = 'TUNA_BLOB_STORE'
+#max number of hashes bound into a single IN (...)
+BLOB_BATCH_SIZE = 1000
+#seconds a blob file without a kernel_blob row is kept: its writer's
+#transaction may still commit. Older ones were left by a rolled back batch
+ORPHAN_GRACE = 3600
+
+STORES: Dict[str, 'BlobStore'] = {}
+
+
+def get_blob_hash(blob: bytes) -> str:
+  """content address of a blob"""
+  return hashlib.sha256(blob).hexdigest()
+
+
+class LocalBlobBackend():
+  """Blobs as files <root>/<hash[:2]>/<hash>, written through a rename"""
+
+  def __init__(self, root: str):
+    self.root = os.path.expanduser(root)
+
+  def get_path(self, blob_hash: str) -> str:
+    """file holding a blob"""
+    return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+  def exists(self, blob_hash: str) -> bool:
+    """True if the blob is stored"""
+    return os.path.isfile(self.get_path(blob_hash))
+
+  def put(self, blob_hash: str, blob: bytes) -> None:
+    """Store a blob, concurrent writers of the same hash are harmless"""
+    path = self.get_path(blob_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile('wb',
+                                     dir=os.path.dirname(path),
+                                     prefix='.blob_',
+                                     delete=False) as out_fp:
+      try:
+        out_fp.write(blob)
+        out_fp.flush()
+        os.fsync(out_fp.fileno())
+      except BaseException:
+        os.unlink(out_fp.name)
+        raise
+    os.replace(out_fp.name, path)
+
+  def get(self, blob_hash: str) -> bytes:
+    """Read a blob"""
+    with open(self.get_path(blob_hash), 'rb') as in_fp:
+      return in_fp.read()
+
+  def get_mtime(self, blob_hash: str) -> float:
+    """modification time of a stored blob"""
+    return os.path.getmtime(self.get_path(blob_hash))
+
+  def delete(self, blob_hash: str) -> None:
+    """Remove a blob if present"""
+    try:
+      os.unlink(self.get_path(blob_hash))
+    except FileNotFoundError:
+      pass
+
+  def list_hashes(self) -> Iterator[str]:
+    """hashes of all stored blobs"""
+    if not os.path.isdir(self.root):
+      return
+    for sub_dir in os.listdir(self.root):
+      dir_path = os.path.join(self.root, sub_dir)
+      if os.path.isdir(dir_path):
+        yield from (
+            name for name in os.listdir(dir_path) if not name.startswith('.'))
+
+
+class BlobStore():
+  """Deduplicating blob store with DB reference counts.
+  put_many/release/collect_garbage work in the caller's transaction"""
+
+  def __init__(self,
+               backend: LocalBlobBackend,
+               logger: Optional[logging.Logger] = None):
+    self.backend = backend
+    self.table = KernelBlob.__table__
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.stats: Dict[str, int] = {
+        'blobs': 0,
+        'unique_blobs': 0,
+        'bytes_in': 0,
+        'bytes_written': 0
+    }
+
+  def select_known(self, session: DbSession,
+                   hashes: Iterable[str]) -> Dict[str, int]:
+    """hash -> ref_count of the blobs already in the table"""
+    known: Dict[str, int] = {}
+    for pack in split_packets(hashes, BLOB_BATCH_SIZE):
+      query = select([self.table.c.blob_hash, self.table.c.ref_count
+                     ]).where(self.table.c.blob_hash.in_(pack))
+      known.update({row[0]: row[1] for row in session.execute(query)})
+    return known
+
+  def add_refs(self, session: DbSession, counts: Dict[str, int]) -> None:
+    """ref_count += n, one executemany per distinct n"""
+    by_delta: Dict[int, List[str]] = {}
+    for blob_hash, delta in counts.items():
+      by_delta.setdefault(delta, []).append(blob_hash)
+    for delta, hashes in by_delta.items():
+      for pack in split_packets(hashes, BLOB_BATCH_SIZE):
+        session.execute(self.table.update().where(
+            self.table.c.blob_hash.in_(pack)).values(
+                ref_count=self.table.c.ref_count + delta))
+
+  def put_many(self, session: DbSession, blobs: List[bytes]) -> List[str]:
+    """Store blobs, returns their hashes. Only hashes missing from the
+    backend are written; every blob adds one reference"""
+    hashes = [get_blob_hash(blob) for blob in blobs]
+    unique = dict(zip(hashes, blobs))
+    known = self.select_known(session, unique.keys())
+
+    new_rows = [{
+        'blob_hash': blob_hash,
+        'size': len(blob),
+        'ref_count': 0
+    } for blob_hash, blob in unique.items() if blob_hash not in known]
+    if new_rows:
+      bulk_upsert(session, self.table, new_rows, ['blob_hash'], [])
+    self.add_refs(session, Counter(hashes))
+
+    #a known hash is only rewritten if its file went missing
+    for blob_hash, blob in unique.items():
+      if not self.backend.exists(blob_hash):
+        self.backend.put(blob_hash, blob)
+        self.stats['bytes_written'] += len(blob)
+
+    self.stats['blobs'] += len(blobs)
+    self.stats['unique_blobs'] += len(new_rows)
+    self.stats['bytes_in'] += sum(len(blob) for blob in blobs)
+    return hashes
+
+  def get(self, blob_hash: str) -> bytes:
+    """Read a blob by hash"""
+    return self.backend.get(blob_hash)
+
+  def release(self, session: DbSession, hashes: Iterable[Optional[str]]) -> int:
+    """Drop one reference per hash (None entries are ignored)"""
+    counts = Counter(blob_hash for blob_hash in hashes if blob_hash)
+    self.add_refs(session, {
+        blob_hash: -cnt for blob_hash, cnt in counts.items()
+    })
+    return sum(counts.values())
+
+  def release_rows(self, session: DbSession, query: Any, table: Any) -> int:
+    """Release the blobs referenced by the rows of an ORM query on a kernel
+    cache table, call before deleting those rows"""
+    rows = query.with_entities(table.blob_hash).filter(
+        table.blob_hash.isnot(None))
+    return self.release(session, (row[0] for row in rows))
+
+  def recount(self, session: DbSession, kernel_tables: List[Any]) -> None:
+    """Recompute ref_count from the kernel cache tables"""
+    counts: Counter = Counter()
+    for table in kernel_tables:
+      query = select([table.blob_hash, func.count()]).where(
+          table.blob_hash.isnot(None)).group_by(table.blob_hash)
+      counts.update({row[0]: row[1] for row in session.execute(query)})
+    session.execute(self.table.update().values(ref_count=0))
+    self.add_refs(session, dict(counts))
+
+  def collect_garbage(self,
+                      session: DbSession,
+                      min_age: float = ORPHAN_GRACE) -> int:
+    """Delete the blobs without references, from the table and the backend,
+    and the files older than min_age seconds that have no row at all.
+    Best run while no writers are active"""
+    query = select([self.table.c.blob_hash]).where(self.table.c.ref_count <= 0)
+    hashes = [row[0] for row in session.execute(query)]
+    for pack in split_packets(hashes, BLOB_BATCH_SIZE):
+      session.execute(self.table.delete().where(
+          self.table.c.blob_hash.in_(pack)).where(self.table.c.ref_count <= 0))
+    session.commit()
+    #a writer may have referenced a hash again meanwhile, keep its file
+    known = self.select_known(session, hashes)
+    hashes = [blob_hash for blob_hash in hashes if blob_hash not in known]
+    hashes.extend(self.find_orphans(session, min_age))
+    for blob_hash in hashes:
+      self.backend.delete(blob_hash)
+    self.logger.info('Collected %s unreferenced blobs', len(hashes))
+    return len(hashes)
+
+  def find_orphans(self, session: DbSession, min_age: float) -> List[str]:
+    """stored blobs older than min_age without a kernel_blob row, e.g.
+    written by a result batch that was rolled back"""
+    cutoff = time.time() - min_age
+    orphans = []
+    for pack in split_packets(self.backend.list_hashes(), BLOB_BATCH_SIZE):
+      known = self.select_known(session, pack)
+      orphans.extend(blob_hash for blob_hash in pack
+                     if blob_hash not in known and
+                     self.backend.get_mtime(blob_hash) < cutoff)
+    return orphans
+
+
+def get_blob_store(root: Optional[str] = None) -> Optional[BlobStore]:
+  """The blob store rooted at root (default: $TUNA_BLOB_STORE), None if no
+  root is configured"""
+  if root is None:
+    root = os.environ.get(BLOB_STORE_ENV)
+  if not root:
+    return None
+  if root not in STORES:
+    STORES[root] = BlobStore(LocalBlobBackend(root))
+  return STORES[root]
+
+
+def get_kernel_blob(kernel: Any, store: Optional[BlobStore] = None) -> bytes:
+  """kernel_blob of a kernel cache row, read from the blob store if needed"""
+  blob_hash = getattr(kernel, 'blob_hash', None)
+  if not blob_hash:
+    return kernel.kernel_blob
+  store = store if store else get_blob_store()
+  if store is None:
+    raise ValueError(
+        f'Kernel blob {blob_hash} is in the blob store, set {BLOB_STORE_ENV}')
+  return store.get(blob_hash)
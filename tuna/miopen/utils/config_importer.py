@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Bulk import pipeline for MIOpenDriver config files.
+Lines are deduplicated by hash, parsed in a process pool, then tensors and
+configs are resolved with set based selects and written as multi-row inserts,
+one transaction per chunk of configs"""
+
+import os
+import time
+import hashlib
+import logging
+import argparse
+from functools import partial
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, UniqueConstraint
+
+from tuna.utils.db_utility import bulk_upsert
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import split_packets
+from tuna.miopen.db.tables import MIOpenDBTables
+from tuna.miopen.db.tensortable import TensorTable
+from tuna.miopen.driver.convolution import DriverConvolution
+from tuna.miopen.driver.batchnorm import DriverBatchNorm
+from tuna.miopen.utils.config_type import ConfigType
+
+LOGGER = setup_logger('config_importer')
+
+#unique key (uq_idx) of the tensor table
+TENSOR_KEY_COLS = [
+    'dim0', 'dim1', 'dim2', 'dim3', 'dim4', 'layout', 'num_dims', 'data_type'
+]
+#columns hashed into conv_config.md5, in the order of the MySQL trigger
+CONV_MD5_COLS = [
+    'batchsize', 'spatial_dim', 'pad_h', 'pad_w', 'pad_d', 'conv_stride_h',
+    'conv_stride_w', 'conv_stride_d', 'dilation_h', 'dilation_w', 'dilation_d',
+    'group_count', 'mode', 'pad_mode', 'trans_output_pad_h',
+    'trans_output_pad_w', 'trans_output_pad_d', 'direction', 'input_tensor',
+    'weight_tensor', 'out_layout'
+]
+#configs written per transaction
+IMPORT_CHUNK_SIZE = 1000
+#lines handed to a parse worker at a time
+PARSE_CHUNK_SIZE = 256
+#parse worker processes
+PARSE_WORKERS = min(os.cpu_count() or 1, 8)
+
+TensorKey = Tuple[Any, ...]
+ParsedRow = Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]
+
+
+def read_unique_lines(file_name: str) -> Tuple[List[str], int]:
+  """Return the distinct non empty lines of file_name in input order and the
+  total number of lines read"""
+  line_cnt = 0
+  unique: Dict[str, None] = {}
+  with open(os.path.expanduser(file_name), "r") as infile:  # pylint: disable=unspecified-encoding
+    for line in infile:
+      line_cnt += 1
+      line = line.strip()
+      if line:
+        unique[line] = None
+  return list(unique), line_cnt
+
+
+def get_tensor_key(tensor: Dict[str, Any]) -> TensorKey:
+  """unique key of a tensor row"""
+  return tuple(tensor.get(col) for col in TENSOR_KEY_COLS)
+
+
+def get_config_md5(row: Dict[str, Any]) -> Optional[str]:
+  """Python counterpart of the conv_config md5 trigger, None where a column
+  is NULL as MySQL CONCAT yields NULL then"""
+  vals = [row[col] for col in CONV_MD5_COLS]
+  if any(val is None for val in vals):
+    return None
+  return hashlib.md5(''.join(
+      str(val) for val in vals).encode('utf-8')).hexdigest()
+
+
+def parse_config_line(line: str, config_type: ConfigType, command: str,
+                      batch_list: List[int]) -> Tuple[List[ParsedRow], str]:
+  """Parse one driver or fdb line into (config row, tensor rows) pairs, one per
+  batch size. Runs in the parse workers and does not touch the DB"""
+  try:
+    if config_type == ConfigType.batch_norm:
+      driver: Any = DriverBatchNorm(line, command)
+    else:
+      driver = DriverConvolution(line, command)
+    parsed: List[ParsedRow] = []
+    for bsz in batch_list or [None]:
+      if bsz is not None:
+        driver.batchsize = bsz
+      parsed.append((driver.compose_config_row(), driver.compose_tensor_rows()))
+  except ValueError as err:
+    return [], str(err)
+  return parsed, ''
+
+
+# pylint: disable=too-many-instance-attributes
+class ConfigImporter():
+  """Imports a file of driver lines into the config, tensor and config tags
+  tables. Honors tag, mark_recurrent, tag_only and batch_list from args"""
+
+  def __init__(self,
+               args: argparse.Namespace,
+               dbt: MIOpenDBTables,
+               workers: int = PARSE_WORKERS,
+               chunk_size: int = IMPORT_CHUNK_SIZE,
+               logger: logging.Logger = LOGGER):
+    self.args = args
+    self.config_table = dbt.config_table
+    self.tags_table = dbt.config_tags_table
+    self.workers = workers
+    self.chunk_size = chunk_size
+    self.logger = logger
+    self.use_md5 = hasattr(self.config_table, 'md5')
+    #identity of a config: every config column but driver
+    self.key_cols: Optional[List[str]] = None
+    self.tensor_ids: Dict[TensorKey, int] = {}
+    self.counts: Dict[str, Any] = {
+        'cnt_configs': 0,
+        'cnt_tagged_configs': set(),
+        'cnt_lines': 0,
+        'cnt_unique_lines': 0,
+        'cnt_errors': 0,
+        'lines_per_sec': 0.0
+    }
+
+  def parse_lines(self, lines: List[str]) -> Iterable[ParsedRow]:
+    """Parse lines, in a process pool when there is more than one worker"""
+    parse = partial(parse_config_line,
+                    config_type=self.args.config_type,
+                    command=self.args.command,
+                    batch_list=self.args.batch_list)
+    if self.workers > 1 and len(lines) > PARSE_CHUNK_SIZE:
+      with Pool(self.workers) as pool:
+        results = list(pool.imap(parse, lines, PARSE_CHUNK_SIZE))
+    else:
+      results = [parse(line) for line in lines]
+
+    for line, (parsed, err) in zip(lines, results):
+      if err:
+        self.counts['cnt_errors'] += 1
+        self.logger.warning('Skipping line %s: %s', line, err)
+      yield from parsed
+
+  def load_tensor_ids(self, session) -> None:
+    """(Re)load the tensor key -> id map"""
+    cols = [TensorTable.id
+           ] + [getattr(TensorTable, col) for col in TENSOR_KEY_COLS]
+    self.tensor_ids = {
+        tuple(row[1:]): row[0] for row in session.execute(select(cols))
+    }
+
+  def resolve_tensors(self, session, parsed: List[ParsedRow]) -> None:
+    """Insert the tensors missing from the table in one multi-row statement"""
+    self.load_tensor_ids(session)
+    missing: Dict[TensorKey, Dict[str, Any]] = {}
+    for _, tensors in parsed:
+      for tensor in tensors.values():
+        key = get_tensor_key(tensor)
+        if key not in self.tensor_ids and key not in missing:
+          missing[key] = dict(zip(TENSOR_KEY_COLS, key), valid=1)
+
+    if missing and not self.args.tag_only:
+      for rows in split_packets(missing.values(), self.chunk_size):
+        bulk_upsert(session, TensorTable, rows, TENSOR_KEY_COLS, [])
+      session.commit()
+      self.load_tensor_ids(session)
+      self.logger.info('Inserted %u tensors', len(missing))
+
+  def compose_config(self, row: Dict[str, Any],
+                     tensors: Dict[str, Dict[str, Any]]) -> Optional[dict]:
+    """config row with its tensor ids (and md5), None if a tensor is unknown"""
+    config = dict(row)
+    for col, tensor in tensors.items():
+      tensor_id = self.tensor_ids.get(get_tensor_key(tensor))
+      if tensor_id is None:
+        return None
+      config[col] = tensor_id
+    if self.key_cols is None:
+      self.key_cols = [col for col in config if col != 'driver']
+    if self.use_md5:
+      config['md5'] = get_config_md5(config)
+    return config
+
+  def get_config_key(self, config: Dict[str, Any]) -> Any:
+    """md5 where the table has one, otherwise the tuple of identity columns"""
+    if self.use_md5:
+      return config['md5']
+    return tuple(config[col] for col in self.key_cols)
+
+  def get_unique_cols(self) -> List[str]:
+    """columns of the unique key the config inserts collide on"""
+    if self.use_md5:
+      return ['md5']
+    for constraint in self.config_table.__table__.constraints:
+      if isinstance(constraint, UniqueConstraint):
+        return [col.name for col in constraint.columns]
+    raise ValueError(f'No unique key on {self.config_table.__tablename__}')
+
+  def select_ids(self, session, configs: List[Dict[str,
+                                                   Any]]) -> Dict[Any, int]:
+    """config key -> id of the configs already in the table"""
+    table = self.config_table
+    if self.use_md5:
+      query = select([table.id, table.md5]).where(
+          table.md5.in_([config['md5'] for config in configs]))
+      return {row[1]: row[0] for row in session.execute(query)}
+
+    query = select([table.id] +
+                   [getattr(table, col) for col in self.key_cols]).where(
+                       table.input_tensor.in_(
+                           {config['input_tensor'] for config in configs}))
+    return {tuple(row[1:]): row[0] for row in session.execute(query)}
+
+  def compose_tags(self, config_ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """config tags rows, see create_query"""
+    rows = []
+    for config_id in config_ids:
+      row = {'config': config_id}
+      if self.args.tag is not None:
+        row['tag'] = self.args.tag
+      if self.args.mark_recurrent:
+        row['recurrent'] = 1
+      rows.append(row)
+    return rows
+
+  def write_chunk(self, session, configs: List[Dict[str, Any]]) -> None:
+    """Insert the new configs of a chunk and tag all of them, one transaction"""
+    id_map = self.select_ids(session, configs)
+    if not self.args.tag_only:
+      new_rows = {}
+      for config in configs:
+        key = self.get_config_key(config)
+        if key not in id_map:
+          new_rows[key] = config
+      if new_rows:
+        bulk_upsert(session, self.config_table, list(new_rows.values()),
+                    self.get_unique_cols(), [])
+        id_map = self.select_ids(session, configs)
+        self.counts['cnt_configs'] += len(new_rows)
+    else:
+      for config in configs:
+        if self.get_config_key(config) not in id_map:
+          self.logger.warning('Config not present in the DB: %s',
+                              config['driver'])
+
+    if self.args.tag_only or self.args.tag or self.args.mark_recurrent:
+      keys = {self.get_config_key(config) for config in configs}
+      tags = self.compose_tags(id_map[key] for key in keys if key in id_map)
+      if tags:
+        bulk_upsert(session, self.tags_table, tags, ['config', 'tag'],
+                    ['recurrent'] if self.args.mark_recurrent else [])
+        self.counts['cnt_tagged_configs'].update(row['config'] for row in tags)
+    session.commit()
+
+  def import_lines(self, session, lines: List[str]) -> Dict[str, Any]:
+    """Parse, resolve and write lines, returns the counts"""
+    parsed = list(self.parse_lines(lines))
+    self.resolve_tensors(session, parsed)
+
+    configs: List[Dict[str, Any]] = []
+    for row, tensors in parsed:
+      config = self.compose_config(row, tensors)
+      if config is None:
+        self.logger.warning('Tensor not present in the DB: %s', row['driver'])
+      elif self.use_md5 and config['md5'] is None:
+        self.counts['cnt_errors'] += 1
+        self.logger.warning('NULL md5 column in config: %s', row['driver'])
+      else:
+        configs.append(config)
+
+    for chunk in split_packets(configs, self.chunk_size):
+      self.write_chunk(session, chunk)
+    return self.counts
+
+  def import_file(self, session, file_name: str) -> Dict[str, Any]:
+    """Import every distinct line of file_name, logs the throughput"""
+    start = time.perf_counter()
+    lines, self.counts['cnt_lines'] = read_unique_lines(file_name)
+    self.counts['cnt_unique_lines'] = len(lines)
+    self.logger.info('parsed: %u, unique: %u', self.counts['cnt_lines'],
+                     len(lines))
+    self.import_lines(session, lines)
+
+    elapsed = time.perf_counter() - start
+    self.counts['lines_per_sec'] = self.counts['cnt_lines'] / max(elapsed, 1e-9)
+    self.logger.info('Imported %u lines (%u unique) in %.2fs: %.0f lines/sec',
+                     self.counts['cnt_lines'], len(lines), elapsed,
+                     self.counts['lines_per_sec'])
+    return self.counts
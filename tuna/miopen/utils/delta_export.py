@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Incremental (delta) export support. Every exported db gets a watermark
+file next to it holding the id and update_ts high water marks of the source
+tables at export time and the filters the db was exported with. A later
+export only reads the rows changed since the marks and patches the db"""
+
+import os
+import json
+import heapq
+import filecmp
+import logging
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from sqlalchemy import func, or_
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen.utils.stream_merge import atomic_write
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('delta_export')
+
+WATERMARK_SUFFIX = '.watermark.json'
+
+#table name -> {'update_ts': iso timestamp or None, 'id': int}
+Marks = Dict[str, Dict[str, Any]]
+
+
+def get_watermark_file(file_name: str) -> str:
+  """watermark file of an exported db"""
+  return f"{file_name}{WATERMARK_SUFFIX}"
+
+
+def get_high_water(session: DbSession, tables: Iterable[Any]) -> Marks:
+  """current max id and update_ts of tables, read before exporting so rows
+  changing during the export are picked up by the next one"""
+  marks: Marks = {}
+  for table in tables:
+    max_ts, max_id = session.query(func.max(table.update_ts),
+                                   func.max(table.id)).one()
+    marks[table.__tablename__] = {
+        'update_ts': max_ts.isoformat() if max_ts else None,
+        'id': max_id or 0
+    }
+  return marks
+
+
+def changed_since(table: Any, mark: Dict[str, Any]) -> Any:
+  """condition for rows of table inserted or updated since mark. update_ts
+  only has second resolution, rows at the mark are read again"""
+  cond = table.id > mark['id']
+  if mark['update_ts']:
+    cond = or_(cond, table.update_ts
+               >= datetime.fromisoformat(mark['update_ts']))
+  return cond
+
+
+def read_watermark(file_name: str,
+                   filters: Dict[str, Any],
+                   logger: logging.Logger = LOGGER) -> Optional[Marks]:
+  """marks of the last export of file_name, None if the db has to be
+  exported in full: no db, no watermark or different export filters"""
+  wm_file = get_watermark_file(file_name)
+  if not os.path.isfile(file_name) or not os.path.isfile(wm_file):
+    logger.info('No watermark for %s, exporting in full', file_name)
+    return None
+  with open(wm_file, encoding='utf-8') as wm_fp:
+    watermark = json.load(wm_fp)
+  if watermark['filters'] != filters:
+    logger.warning('%s was exported with %s, exporting in full', file_name,
+                   watermark['filters'])
+    return None
+  return watermark['marks']
+
+
+def write_watermark(file_name: str, marks: Marks, filters: Dict[str,
+                                                                Any]) -> str:
+  """store the marks an export of file_name is current to"""
+  wm_file = get_watermark_file(file_name)
+  atomic_write(
+      iter([json.dumps({
+          'filters': filters,
+          'marks': marks
+      }, indent=2)]), wm_file)
+  return wm_file
+
+
+def get_db_key(line: str) -> str:
+  """key of a text db line"""
+  return line.split('=', 1)[0]
+
+
+def patch_text_db(file_name: str, dirty_keys: Set[str],
+                  lines: Iterator[Tuple[str, str]]) -> int:
+  """sorted merge of a key sorted text db with the re-exported (key, line)
+  pairs of dirty_keys, also key sorted. Lines of dirty keys which are not
+  re-exported are dropped. Returns the number of lines written"""
+  with open(file_name, encoding='utf-8') as db_fp:
+    kept = ((key, line.rstrip('\n'))
+            for key, line in ((get_db_key(line), line) for line in db_fp)
+            if key not in dirty_keys)
+    merged = heapq.merge(kept,
+                         ((key, line.rstrip('\n')) for key, line in lines),
+                         key=itemgetter(0))
+    return atomic_write((line for _, line in merged), file_name)
+
+
+def same_text_db(file_a: str, file_b: str) -> bool:
+  """byte for byte comparison of two text dbs"""
+  return filecmp.cmp(file_a, file_b, shallow=False)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Streaming find db export. The find db query is read through a server side
+cursor, only the columns the export needs are fetched, and the rows arrive
+ordered by fdb key so every key is ranked and written as soon as its rows
+are complete. Memory use is bounded by the rows of a single key"""
+
+import heapq
+import logging
+from collections import OrderedDict
+from itertools import groupby
+from operator import attrgetter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import cast
+from sqlalchemy.dialects.mysql import BINARY
+from sqlalchemy.orm import Query
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import split_packets
+
+LOGGER = setup_logger('fdb_export')
+
+#find db columns read by the export
+FDB_EXPORT_COLS = [
+    'fdb_key', 'solver', 'config', 'kernel_time', 'workspace_sz', 'alg_lib',
+    'kernel_group', 'update_ts'
+]
+#rows fetched per round trip from the server side cursor
+EXPORT_FETCH_SIZE = 10000
+#solvers kept per fdb key
+FDB_TOP_K = 4
+#fdb keys bound into one IN filter when exporting selected keys
+EXPORT_KEY_BATCH = 1000
+
+
+def get_key_order(column: Any, dialect_name: str) -> Any:
+  """order by the raw bytes of column, MySQL string collations are case
+  insensitive while the text dbs are sorted bytewise"""
+  if dialect_name == 'mysql':
+    return cast(column, BINARY)
+  return column
+
+
+class FdbExporter():
+  """Ranks the rows of a find db query per fdb key (or per fdb key and
+  num_cu with skews) and writes or collects the fastest top_k solvers.
+  id_solver_map maps solver ids to the names written to the db"""
+
+  def __init__(self,
+               id_solver_map: Dict[int, str],
+               fetch_size: int = EXPORT_FETCH_SIZE,
+               top_k: int = FDB_TOP_K,
+               logger: Optional[logging.Logger] = None):
+    self.id_solver_map: Dict[int, str] = id_solver_map
+    self.fetch_size: int = fetch_size
+    self.top_k: int = top_k
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.num_rows: int = 0
+    self.num_keys: int = 0
+
+  def stream_rows(self, query: Query, skews: bool = False) -> Iterator[Any]:
+    """export columns of query's find db rows, grouped by fdb key (by num_cu
+    then fdb key with skews), newest first within a key"""
+    src_table = query.column_descriptions[0]['entity']
+    dialect_name = query.session.get_bind().dialect.name
+    cols = [getattr(src_table, col) for col in FDB_EXPORT_COLS]
+    key_order = [get_key_order(src_table.fdb_key, dialect_name)]
+    tie_order = []
+    if hasattr(src_table, 'num_cu'):
+      cols.append(src_table.num_cu)
+      if skews:
+        key_order.insert(0, src_table.num_cu)
+      else:
+        tie_order.append(src_table.num_cu.asc())
+
+    query = query.with_entities(*cols).order_by(None).order_by(
+        *key_order, src_table.update_ts.desc(), *tie_order)
+    for row in query.yield_per(self.fetch_size):
+      self.num_rows += 1
+      yield row
+
+  def rank(self, rows: Iterator[Any]) -> List[Any]:
+    """fastest top_k solvers of one key, the newest row of a solver wins"""
+    solvers: Dict[int, Any] = {}
+    for row in rows:
+      solvers.setdefault(row.solver, row)
+    return heapq.nsmallest(
+        self.top_k,
+        solvers.values(),
+        key=lambda row:
+        (float(row.kernel_time), self.id_solver_map[row.solver]))
+
+  def iter_entries(self,
+                   query: Query,
+                   skews: bool = False) -> Iterator[Tuple[str, List[Any]]]:
+    """(fdb key, ranked rows) per key in query order, with skews the key is
+    suffixed by _cu<num_cu>"""
+    group_key = attrgetter('fdb_key',
+                           'num_cu') if skews else attrgetter('fdb_key')
+    for key, rows in groupby(self.stream_rows(query, skews), key=group_key):
+      self.num_keys += 1
+      if skews:
+        key = f"{key[0]}_cu{key[1]}"
+      yield key, self.rank(rows)
+
+  def format_line(self, key: str, entries: List[Any]) -> str:
+    """find db text line, e.g. key=solver:time,workspace,alg;..."""
+    vals = [
+        f"{self.id_solver_map[rec.solver]}:{rec.kernel_time},"
+        f"{rec.workspace_sz},{rec.alg_lib}" for rec in entries
+    ]
+    return f"{key}={';'.join(vals)}\n"
+
+  def iter_key_lines(self, query: Query,
+                     keys: List[str]) -> Iterator[Tuple[str, str]]:
+    """(fdb key, text line) of the keys which still have rows, keys must be
+    sorted"""
+    src_table = query.column_descriptions[0]['entity']
+    for batch in split_packets(keys, EXPORT_KEY_BATCH):
+      key_query = query.filter(src_table.fdb_key.in_(batch))
+      for key, entries in self.iter_entries(key_query):
+        yield key, self.format_line(key, entries)
+
+  def write(self, query: Query, file_name: str) -> int:
+    """write the find db text file as the keys stream in, returns the number
+    of lines written"""
+    count = 0
+    with open(file_name, 'w') as out:  # pylint: disable=unspecified-encoding
+      for key, entries in self.iter_entries(query):
+        out.write(self.format_line(key, entries))
+        count += 1
+    self.logger.info('Exported %s fdb keys from %s rows to %s', count,
+                     self.num_rows, file_name)
+    return count
+
+  def build(self, query: Query, skews: bool = False) -> OrderedDict:
+    """fdb key -> ranked rows, for consumers that need the whole find db"""
+    find_db: OrderedDict = OrderedDict(self.iter_entries(query, skews))
+    self.logger.info('fdb query returned: %s rows, %s keys', self.num_rows,
+                     len(find_db))
+    return find_db
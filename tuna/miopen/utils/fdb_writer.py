@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Set based writer for find db rows and their kernel cache entries.
+Rows of one or more jobs are gathered, then written with one upsert, one id
+select, two UPDATEs and one kernel executemany, independent of the number of
+solvers"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen.utils.blob_store import BlobStore
+from tuna.utils.db_utility import bulk_upsert
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import split_packets
+
+LOGGER = setup_logger('fdb_writer')
+
+#unique key (uq_idx) of the find db tables
+FDB_KEY_COLS = ['config', 'solver', 'opencl', 'session']
+#find db columns written from a fin result
+FDB_COLS = FDB_KEY_COLS + [
+    'fdb_key', 'alg_lib', 'params', 'workspace_sz', 'kernel_time', 'valid'
+]
+#max number of ids bound into a single IN (...)
+WRITE_BATCH_SIZE = 1000
+
+FdbKey = Tuple[int, int, int, int]
+
+
+def get_fdb_key(row: Dict[str, Any]) -> FdbKey:
+  """unique key of a find db row, opencl normalized to 0/1"""
+  return (int(row['config']), int(row['solver']), int(bool(row['opencl'])),
+          int(row['session']))
+
+
+class FdbWriter():
+  """Gathers find db rows and kernels, flush writes them in one transaction
+  (the caller commits). fdb_table/kernel_table are e.g. ConvolutionFindDB and
+  ConvolutionKernelCache, with a blob_store the kernel blobs are kept there"""
+
+  def __init__(self,
+               fdb_table: Any,
+               kernel_table: Any,
+               logger: Optional[logging.Logger] = None,
+               blob_store: Optional[BlobStore] = None):
+    self.fdb_table = fdb_table.__table__
+    self.kernel_table = kernel_table.__table__
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.blob_store = blob_store
+    self.rows: Dict[FdbKey, Dict[str, Any]] = {}
+    self.kernels: Dict[FdbKey, List[Dict[str, Any]]] = {}
+
+  def __len__(self) -> int:
+    return len(self.rows)
+
+  def add(self,
+          row: Dict[str, Any],
+          kernels: Optional[List[Dict[str, Any]]] = None) -> FdbKey:
+    """Queue a find db row (FDB_COLS) and the kernels of its kernel group,
+    a later row with the same key replaces the earlier one"""
+    key = get_fdb_key(row)
+    self.rows[key] = {col: row[col] for col in FDB_COLS}
+    self.kernels[key] = list(kernels) if kernels else []
+    return key
+
+  def select_ids(self, session: DbSession,
+                 keys: List[FdbKey]) -> Dict[FdbKey, Tuple[int, Any]]:
+    """Map keys to (id, kernel_group) with a single select"""
+    tbl = self.fdb_table
+    query = select([tbl.c.id, tbl.c.kernel_group] +
+                   [tbl.c[col] for col in FDB_KEY_COLS]).where(
+                       tbl.c.session.in_({key[3] for key in keys})).where(
+                           tbl.c.config.in_({key[0] for key in keys}))
+    wanted = set(keys)
+    ids = {}
+    for row in session.execute(query):
+      key = get_fdb_key(dict(zip(FDB_KEY_COLS, row[2:])))
+      if key in wanted:
+        ids[key] = (row[0], row[1])
+    return ids
+
+  def flush(self, session: DbSession) -> Dict[FdbKey, int]:
+    """Write the queued rows and kernels, returns the find db id per key"""
+    if not self.rows:
+      return {}
+    keys = list(self.rows.keys())
+    bulk_upsert(session, self.fdb_table, list(self.rows.values()), FDB_KEY_COLS)
+    ids = self.select_ids(session, keys)
+
+    #existing rows: the kernels of their kernel group are replaced
+    old_groups = [kgroup for _, kgroup in ids.values() if kgroup is not None]
+    for pack in split_packets(old_groups, WRITE_BATCH_SIZE):
+      session.execute(self.kernel_table.update().where(
+          self.kernel_table.c.valid == 1).where(
+              self.kernel_table.c.kernel_group.in_(pack)).values(valid=0))
+
+    #the kernel group of a find db row is its id
+    new_groups = [fdb_id for fdb_id, kgroup in ids.values() if kgroup != fdb_id]
+    for pack in split_packets(new_groups, WRITE_BATCH_SIZE):
+      session.execute(self.fdb_table.update().where(
+          self.fdb_table.c.id.in_(pack)).values(
+              kernel_group=self.fdb_table.c.id))
+
+    kernel_rows = []
+    for key in keys:
+      for kernel in self.kernels[key]:
+        kernel_rows.append(dict(kernel, kernel_group=ids[key][0]))
+    if kernel_rows and self.blob_store:
+      hashes = self.blob_store.put_many(
+          session, [row['kernel_blob'] for row in kernel_rows])
+      for row, blob_hash in zip(kernel_rows, hashes):
+        row['kernel_blob'] = b''
+        row['blob_hash'] = blob_hash
+    if kernel_rows:
+      session.execute(self.kernel_table.insert(), kernel_rows)
+
+    self.logger.info('Wrote %s find db rows, %s kernels', len(keys),
+                     len(kernel_rows))
+    self.rows = {}
+    self.kernels = {}
+    return {key: fdb_id for key, (fdb_id, _) in ids.items()}
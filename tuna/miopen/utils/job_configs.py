@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Fetch the configs of claimed jobs, with their tensors attached, for fin
+work and celery contexts"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.inspection import inspect
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.utils.db_utility import get_class_by_tablename
+from tuna.utils.rows import get_dict_converter
+from tuna.utils.statements import select_objs, select_rows
+from tuna.utils.utility import SimpleDict, split_packets
+
+#key values bound into one IN query
+LOAD_BATCH = 1000
+
+
+def get_config_rel(config_table: Any) -> Dict[str, Dict[str, Any]]:
+  """relationship name -> local key, foreign table and foreign key"""
+  return {
+      key: {
+          'key': list(val.local_columns)[0].name,
+          'ftble': str(list(val.remote_side)[0]).split('.', maxsplit=1)[0],
+          'fkey': str(list(val.remote_side)[0]).split('.')[1]
+      } for key, val in inspect(config_table).relationships.items()
+  }
+
+
+class RelationLoader():
+  """Identity map of related rows (e.g. tensors) keyed by table and key
+  value. Rows which are not mapped yet are fetched with one IN query per
+  table, however many configs refer to them"""
+
+  def __init__(self, session: DbSession):
+    self.session: DbSession = session
+    self.identity: Dict[Tuple[str, str], Dict[Any, SimpleDict]] = {}
+    self.attribs: Dict[str, List[str]] = {}
+
+  def get_attribs(self, tablename: str) -> List[str]:
+    """columns of tablename"""
+    if tablename not in self.attribs:
+      self.attribs[tablename] = [
+          column.name for column in inspect(get_class_by_tablename(tablename)).c
+      ]
+    return self.attribs[tablename]
+
+  def load(self, tablename: str, key: str,
+           values: Iterable[Any]) -> Dict[Any, SimpleDict]:
+    """rows of tablename by key for values, fetching the unmapped ones"""
+    rows = self.identity.setdefault((tablename, key), {})
+    missing = sorted({val for val in values if val is not None} - rows.keys())
+    for batch in split_packets(missing, LOAD_BATCH):
+      for row in select_objs(self.session, self.get_attribs(tablename),
+                             tablename, {key: batch}):
+        rows[getattr(row, key)] = row
+    return rows
+
+
+def attach_tensors(session: DbSession,
+                   cfg_rel: Dict[str, Dict[str, Any]],
+                   cfg_entries: List[SimpleDict],
+                   loader: Optional[RelationLoader] = None) -> List[SimpleDict]:
+  """Attach tensor relationship information (foreign keys) to config
+  entries, one query per relationship for all entries"""
+  loader = loader if loader else RelationLoader(session)
+  for key, val in cfg_rel.items():
+    rows = loader.load(val['ftble'], val['fkey'],
+                       (getattr(cfg, val['key']) for cfg in cfg_entries))
+    for cfg in cfg_entries:
+      setattr(cfg, key, rows.get(getattr(cfg, val['key'])))
+  return cfg_entries
+
+
+def compose_job_configs(
+    session: DbSession,
+    job_entries: List[SimpleDict],
+    config_table: Any,
+    loader: Optional[RelationLoader] = None
+) -> List[Tuple[SimpleDict, SimpleDict]]:
+  """Return (job, config) tuples for job_entries. The configs and every
+  relationship are fetched with one query each"""
+  ret = []
+  if job_entries:
+    cfg_attr = [column.name for column in inspect(config_table).c]
+    cfg_entries = select_objs(session, cfg_attr, config_table.__tablename__, {
+        'valid': 1,
+        'id': {job.config for job in job_entries}
+    })
+
+    cfg_entries = attach_tensors(session, get_config_rel(config_table),
+                                 cfg_entries, loader)
+
+    cfg_map = {cfg.id: cfg for cfg in cfg_entries}
+
+    for job in job_entries:
+      ret.append((job, cfg_map[job.config]))
+
+  return ret
+
+
+def load_relations(
+    loader: RelationLoader, config_table: Any, cfg_attr: List[str],
+    cfg_rows: List[Any]) -> List[Tuple[str, int, str, Dict[Any, SimpleDict]]]:
+  """(relationship, key column index, foreign table, rows by key) for each
+  relationship of config_table, loaded for cfg_rows"""
+  rels = []
+  for key, val in get_config_rel(config_table).items():
+    idx = cfg_attr.index(val['key'])
+    rows = loader.load(val['ftble'], val['fkey'],
+                       (row[idx] for row in cfg_rows))
+    rels.append((key, idx, val['ftble'], rows))
+  return rels
+
+
+def get_config_dicts(
+    cfg_attr: List[str], cfg_rows: List[Any],
+    rels: List[Tuple[str, int, str, Dict[Any, SimpleDict]]]) -> Dict[int, dict]:
+  """config id -> to_dict shape of the config with its relationships, see
+  load_relations"""
+  to_dict = get_dict_converter(tuple(cfg_attr))
+  id_idx = cfg_attr.index('id')
+  #each related row is converted once, however many configs share it
+  rel_dicts: Dict[Tuple[str, Any], Optional[dict]] = {}
+  cfg_map = {}
+  for row in cfg_rows:
+    cfg = cfg_map[row[id_idx]] = to_dict(row)
+    for key, idx, tablename, rows in rels:
+      if (tablename, row[idx]) not in rel_dicts:
+        rel = rows.get(row[idx])
+        rel_dicts[(tablename, row[idx])] = rel.to_dict() if rel else None
+      rel_dict = rel_dicts[(tablename, row[idx])]
+      cfg[key] = dict(rel_dict) if rel_dict is not None else None
+  return cfg_map
+
+
+def serialize_job_configs(
+    session: DbSession,
+    job_entries: List[SimpleDict],
+    config_table: Any,
+    loader: Optional[RelationLoader] = None) -> List[Tuple[dict, dict]]:
+  """serialize_chunk(compose_job_configs(...)), the config dicts are built
+  straight from the rows instead of from config objects"""
+  if not job_entries:
+    return []
+  cfg_attr = [column.name for column in inspect(config_table).c]
+  cfg_rows = select_rows(session, cfg_attr, config_table.__tablename__, {
+      'valid': 1,
+      'id': {job.config for job in job_entries}
+  })
+  rels = load_relations(loader if loader else RelationLoader(session),
+                        config_table, cfg_attr, cfg_rows)
+
+  cfg_map = get_config_dicts(cfg_attr, cfg_rows, rels)
+  return [(job.to_dict(), dict(cfg_map[job.config])) for job in job_entries]
@@ -31,69 +31,34 @@ from sqlalchemy.exc import OperationalError
 from tuna.utils.logger import setup_logger
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.utils.utility import SimpleDict
-from tuna.utils.db_utility import session_retry, gen_select_objs
-from tuna.utils.db_utility import gen_update_query, gen_insert_query
+from tuna.utils.db_utility import session_retry
 from tuna.miopen.worker.fin_utils import get_fin_slv_status
 from tuna.miopen.utils.parsing import parse_pdb_key
 from tuna.miopen.db.solver import get_solver_ids
+from tuna.miopen.utils.blob_store import get_blob_store
+from tuna.miopen.utils.fdb_writer import FdbWriter
 
 LOGGER = setup_logger('parse_results')
 
 
-def __update_fdb_w_kernels(  #pylint: disable=too-many-arguments,too-many-locals
+def __update_fdb_w_kernels(  #pylint: disable=too-many-arguments
     session: DbSession,
     fin_json,
     config,
     session_id,
     dbt,
     job,
-    fdb_attr,
-    pending,
     result_str: str = 'miopen_find_compile_result',
     check_str: str = 'find_compiled') -> list:
   """update find db + kernels from json results"""
   status = []
-  solver_id_map = get_solver_ids()
   if result_str in fin_json.keys():
-    for fdb_obj in fin_json.get(result_str):
-      slv_stat = get_fin_slv_status(fdb_obj, check_str)
-      status.append(slv_stat)
-
-      if fdb_obj[check_str]:
-        #returned entry is added to the table
-        fdb_entry = __compose_fdb_entry(session, fin_json, fdb_obj, session_id,
-                                        dbt, config, job, fdb_attr,
-                                        solver_id_map, pending)
-        __check_layout_mismatch(fdb_entry, slv_stat, config)
-        if not pending:
-          query = gen_update_query(fdb_entry, fdb_attr,
-                                   dbt.find_db_table.__tablename__)
-          session.execute(query)
-        else:
-          assert len(pending) == 1
-          pending.pop()
-          query = gen_insert_query(fdb_entry, fdb_attr,
-                                   dbt.find_db_table.__tablename__)
-          session.execute(query)
-
-          fdb_entry = __update_fdb_entry(session,
-                                         solver_id_map[fdb_obj['solver_name']],
-                                         session_id, dbt, config, job, fdb_attr,
-                                         pending)
-          fdb_entry.kernel_group = fdb_entry.id
-          query = gen_update_query(fdb_entry, ['kernel_group'],
-                                   dbt.find_db_table.__tablename__)
-          session.execute(query)
-
-        if fdb_obj['reason'] == 'Success':
-          __compose_kernel_entry(session, fdb_obj, fdb_entry, dbt)
-          LOGGER.info('Updating find Db(Build) for job_id=%s', job.id)
-        else:
-          # JD: add info about reason to the logs table
-          fdb_entry.valid = False
-      else:
-        LOGGER.warning("Failed find_db compile, cfg_id: %s, obj: %s",
-                       fin_json['config_tuna_id'], fdb_obj)
+    writer = FdbWriter(dbt.find_db_table, dbt.kernel_cache, LOGGER,
+                       get_blob_store())
+    status = compose_fdb_rows(writer, fin_json, config, session_id,
+                              get_solver_ids(), result_str, check_str)
+    writer.flush(session)
+    LOGGER.info('Updating find Db(Build) for job_id=%s', job.id)
   else:
     status = [{
         'solver': 'all',
@@ -106,6 +71,38 @@ def __update_fdb_w_kernels(  #pylint: disable=too-many-arguments,too-many-locals
   return status
 
 
+def compose_fdb_rows(  #pylint: disable=too-many-arguments
+    writer: FdbWriter,
+    fin_json,
+    config,
+    session_id,
+    solver_id_map,
+    result_str: str = 'miopen_find_compile_result',
+    check_str: str = 'find_compiled') -> list:
+  """queue the find db rows + kernels of a fin result in writer, returns the
+  per solver status"""
+  status = []
+  for fdb_obj in fin_json.get(result_str):
+    slv_stat = get_fin_slv_status(fdb_obj, check_str)
+    status.append(slv_stat)
+
+    if fdb_obj[check_str]:
+      #returned entry is added to the table
+      fdb_entry = __compose_fdb_entry(fin_json, fdb_obj, session_id, config,
+                                      solver_id_map)
+      __check_layout_mismatch(fdb_entry, slv_stat, config)
+      kernels = None
+      if fdb_obj['reason'] == 'Success':
+        kernels = [get_kernel_row(kern) for kern in fdb_obj['kernel_objects']]
+      # JD: add info about reason to the logs table
+      writer.add(fdb_entry, kernels)
+    else:
+      LOGGER.warning("Failed find_db compile, cfg_id: %s, obj: %s",
+                     fin_json['config_tuna_id'], fdb_obj)
+
+  return status
+
+
 def process_pdb_compile(session, fin_json, job, dbt, solver_id_map):
   """retrieve perf db compile json results"""
   status = []
@@ -138,33 +135,50 @@ def process_pdb_compile(session, fin_json, job, dbt, solver_id_map):
 
 def compose_job_cache_entrys(session, pdb_obj, dbt, job, solver_id_map):
   """Compose new pdb kernel cache entry from fin input"""
+  kernel_objs = []
   for kern_obj in pdb_obj['kernel_objects']:
     kernel_obj = dbt.fin_cache_table()
     populate_kernels(kern_obj, kernel_obj)
     kernel_obj.solver_id = solver_id_map[pdb_obj['solver_name']]
     kernel_obj.job_id = job.id
+    kernel_objs.append(kernel_obj)
 
-    session.add(kernel_obj)
+  blob_store = get_blob_store()
+  if blob_store and kernel_objs:
+    hashes = blob_store.put_many(session,
+                                 [obj.kernel_blob for obj in kernel_objs])
+    for kernel_obj, blob_hash in zip(kernel_objs, hashes):
+      kernel_obj.kernel_blob = b''
+      kernel_obj.blob_hash = blob_hash
+
+  session.add_all(kernel_objs)
   session.commit()
 
   return True
 
 
+def get_kernel_row(kern_obj):
+  """kernel cache columns from a fin kernel object"""
+  return {
+      'kernel_name': kern_obj['kernel_file'],
+      'kernel_args': kern_obj['comp_options'],
+      'kernel_blob': bytes(kern_obj['blob'], 'utf-8'),
+      'kernel_hash': kern_obj['md5_sum'],
+      'uncompressed_size': kern_obj['uncompressed_size']
+  }
+
+
 def populate_kernels(kern_obj, kernel_obj):
   """populate kernel object"""
-  kernel_obj.kernel_name = kern_obj['kernel_file']
-  kernel_obj.kernel_args = kern_obj['comp_options']
-  kernel_obj.kernel_blob = bytes(kern_obj['blob'], 'utf-8')
-  kernel_obj.kernel_hash = kern_obj['md5_sum']
-  kernel_obj.uncompressed_size = kern_obj['uncompressed_size']
+  for key, val in get_kernel_row(kern_obj).items():
+    setattr(kernel_obj, key, val)
   return kernel_obj
 
 
-def __check_layout_mismatch(fdb_entry: SimpleDict, status: dict,
-                            config) -> bool:
+def __check_layout_mismatch(fdb_entry: dict, status: dict, config) -> bool:
   """Check that the fdb key returned by fin matches the config being tuned,
   states to error if not"""
-  fdb_key = fdb_entry.fdb_key
+  fdb_key = fdb_entry['fdb_key']
   fds, vals, _, _ = parse_pdb_key(fdb_key)
   key_layout = vals[fds.index('out_layout')]
   cfg_layout = config.out_layout
@@ -173,101 +187,32 @@ def __check_layout_mismatch(fdb_entry: SimpleDict, status: dict,
     status['success'] = False
     status['result'] = f"fdb_key layout mismatch with config"\
                        f" {key_layout} != {cfg_layout}"
-    fdb_entry.valid = False
+    fdb_entry['valid'] = False
     return False
 
   return True
 
 
-def __compose_kernel_entry(session, fdb_obj, fdb_entry, dbt):
-  """Compose a new Kernel Cache entry from fin input"""
-  # Now we have the ID, lets add the binary cache objects
-  for kern_obj in fdb_obj['kernel_objects']:
-    kernel_obj = dbt.kernel_cache()
-    populate_kernels(kern_obj, kernel_obj)
-    kernel_obj.kernel_group = fdb_entry.kernel_group
-    session.add(kernel_obj)
-  return True
-
-
-def __update_fdb_entry(session, solver, session_id, dbt, config, job, fdb_attr,
-                       pending):
-  """ Add a new entry to fdb if there isnt one already """
-  obj, fdb_entry = get_fdb_entry(session, solver, session_id, dbt, config,
-                                 fdb_attr)
-  if obj:  # existing entry in db
-    # This can be removed if we implement the delete orphan cascade
-    fdb_entry = obj
-    if not fdb_entry.kernel_group is None:
-      LOGGER.info('Invalidate kernel_group %s', fdb_entry.kernel_group)
-      session.query(dbt.kernel_cache)\
-          .filter(dbt.kernel_cache.valid == 1)\
-          .filter(dbt.kernel_cache.kernel_group ==
-                                        fdb_entry.kernel_group)\
-          .update({'valid': 0})
-  else:
-    # Bundle Insert for later
-    pending.append((job, fdb_entry))
-  return fdb_entry
-
-
-def get_fdb_entry(session, solver, session_id, dbt, config, fdb_attr):
-  """ Get FindDb entry from db """
-  obj = None
-  fdb_entry = None
-
-  conds = [
-      f"session={session_id}", f"config={config.id}", f"solver={solver}",
-      "opencl=0"
-  ]
-  cond_str = f"where {' AND '.join(conds)}"
-  entries = gen_select_objs(session, fdb_attr, dbt.find_db_table.__tablename__,
-                            cond_str)
-
-  if entries:
-    assert len(entries) == 1
-    obj = entries[0]
-  else:
-    fdb_entry = SimpleDict()
-    for attr in fdb_attr:
-      setattr(fdb_entry, attr, None)
-    setattr(fdb_entry, 'session', session_id)
-    setattr(fdb_entry, 'config', config.id)
-    setattr(fdb_entry, 'solver', solver)
-    setattr(fdb_entry, 'opencl', False)
-    setattr(fdb_entry, 'logger', LOGGER)
-
-  return obj, fdb_entry
-
-
-def __compose_fdb_entry(  #pylint: disable=too-many-arguments
-    session, fin_json, fdb_obj, session_id, dbt, config, job, fdb_attr,
-    solver_id_map, pending):
-  """Compose a FindDB table entry from fin_output"""
-  solver = solver_id_map[fdb_obj['solver_name']]
-  fdb_entry = __update_fdb_entry(session, solver, session_id, dbt, config, job,
-                                 fdb_attr, pending)
-  fdb_entry.fdb_key = fin_json['db_key']
-  fdb_entry.alg_lib = fdb_obj['algorithm']
-  fdb_entry.params = fdb_obj['params']
-  fdb_entry.workspace_sz = fdb_obj['workspace']
-  fdb_entry.valid = True
-
-  fdb_entry.kernel_time = -1
-  if 'time' in fdb_obj:
-    fdb_entry.kernel_time = fdb_obj['time']
-
-  fdb_entry.kernel_group = fdb_entry.id
-
-  return fdb_entry
+def __compose_fdb_entry(fin_json, fdb_obj, session_id, config, solver_id_map):
+  """Compose a FindDB table row from fin_output"""
+  return {
+      'session': session_id,
+      'config': config.id,
+      'solver': solver_id_map[fdb_obj['solver_name']],
+      'opencl': False,
+      'fdb_key': fin_json['db_key'],
+      'alg_lib': fdb_obj['algorithm'],
+      'params': fdb_obj['params'],
+      'workspace_sz': fdb_obj['workspace'],
+      'kernel_time': fdb_obj.get('time', -1),
+      'valid': True
+  }
 
 
 def process_fdb_w_kernels(session,
                           fin_json,
                           context,
                           dbt,
-                          fdb_attr,
-                          pending,
                           result_str='miopen_find_compile_result',
                           check_str='find_compiled'):
   """initiate find db update"""
@@ -278,9 +223,8 @@ def process_fdb_w_kernels(session,
 
   callback = __update_fdb_w_kernels
   status = session_retry(
-      session, callback,
-      lambda x: x(session, fin_json, config, context['kwargs']['session_id'],
-                  dbt, job, fdb_attr, pending, result_str, check_str), LOGGER)
+      session, callback, lambda x: x(session, fin_json, config, context[
+          'kwargs']['session_id'], dbt, job, result_str, check_str), LOGGER)
 
   if not status:
     LOGGER.warning('Fin: Unable to update Database')
@@ -294,15 +238,20 @@ def process_fdb_w_kernels(session,
 
 
 def clean_cache_table(dbt, job):
-  """Remove the fin cache kernel entries for this job"""
+  """Remove the fin cache kernel entries for this job. Runs in its own
+  transaction: the table wide delete must not abort the caller's result"""
   with DbSession() as session:
     try:
       LOGGER.info('Delete kernel cache entries job(%s)', job.id)
       job_cache = session.query(dbt.fin_cache_table)\
           .filter(dbt.fin_cache_table.job_id == job.id)
-      job_cache.delete()
       invalid_fdb_cache = session.query(dbt.kernel_cache)\
           .filter(dbt.kernel_cache.valid == 0)
+      blob_store = get_blob_store()
+      if blob_store:
+        blob_store.release_rows(session, job_cache, dbt.fin_cache_table)
+        blob_store.release_rows(session, invalid_fdb_cache, dbt.kernel_cache)
+      job_cache.delete()
       invalid_fdb_cache.delete()
       session.commit()
     except OperationalError as err:
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Kernel db (kdb) export. Kernels of the fastest solver of every find db key
+are fetched with one keyed query per batch of kernel groups, deduplicated by
+(kernel_name, kernel_args) in a hash set, base64 decoded in a process pool
+and written to sqlite with executemany inside a single transaction. The
+unique index is built after the data is loaded. An existing kdb can be
+patched in place with keyed upserts instead"""
+
+import os
+import base64
+import logging
+import sqlite3
+from datetime import datetime
+from collections import OrderedDict
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from typing import Set, Tuple
+
+from sqlalchemy import select
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen.utils.blob_store import get_kernel_blob
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import iter_packets, split_packets
+
+LOGGER = setup_logger('kdb_writer')
+
+#kernel cache columns read for the kdb
+KDB_KERNEL_COLS = [
+    'id', 'kernel_group', 'kernel_name', 'kernel_args', 'kernel_blob',
+    'kernel_hash', 'uncompressed_size', 'blob_hash'
+]
+#kernel groups bound into one keyed query, bounds the blobs held in memory
+KDB_FETCH_BATCH = 200
+#rows per executemany
+KDB_INSERT_BATCH = 1000
+#kernels handed to a decode worker at once
+KDB_DECODE_CHUNK = 64
+KDB_WORKERS = min(os.cpu_count() or 1, 8)
+#kernel blobs span many pages at the 4k default page size, the kdb is
+#written once so no journal and no fsync are needed
+KDB_PRAGMAS = [
+    'PRAGMA page_size = 65536', 'PRAGMA journal_mode = OFF',
+    'PRAGMA synchronous = OFF', 'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA temp_store = MEMORY'
+]
+KDB_TABLE = "CREATE TABLE `kern_db` (`id` INTEGER PRIMARY KEY ASC,"\
+    "`kernel_name` TEXT NOT NULL,`kernel_args` TEXT NOT NULL,"\
+    "`kernel_blob` BLOB NOT NULL,`kernel_hash` TEXT NOT NULL,"\
+    "`uncompressed_size` INT NOT NULL);"
+KDB_INDEX = "CREATE UNIQUE INDEX `idx_kern_db` ON "\
+    "kern_db(kernel_name, kernel_args);"
+KDB_INSERT = "INSERT INTO kern_db (kernel_name, kernel_args, kernel_blob, "\
+    "kernel_hash, uncompressed_size) VALUES(?, ?, ?, ?, ?);"
+KDB_UPSERT = KDB_INSERT.rstrip(';') + " ON CONFLICT(kernel_name, kernel_args) "\
+    "DO UPDATE SET kernel_blob=excluded.kernel_blob, "\
+    "kernel_hash=excluded.kernel_hash, "\
+    "uncompressed_size=excluded.uncompressed_size;"
+KDB_DELETE = "DELETE FROM kern_db WHERE kernel_name = ? AND kernel_args = ?;"
+#kernel cache columns compared when patching a kdb, no blobs
+KDB_PATCH_COLS = [
+    'id', 'kernel_group', 'kernel_name', 'kernel_args', 'kernel_hash',
+    'uncompressed_size', 'update_ts'
+]
+
+KdbKey = Tuple[str, str]
+
+
+class KdbKernel(NamedTuple):
+  """a kernel to write, kernel_blob is still base64 encoded"""
+  kernel_name: str
+  kernel_args: str
+  kernel_blob: Any
+  kernel_hash: Any
+  uncompressed_size: int
+  blob_hash: Optional[str]
+
+
+def decode_kernel(kernel: KdbKernel) -> Tuple[str, str, bytes, Any, int]:
+  """kdb row of a kernel, the blob is read from the blob store if needed"""
+  return (kernel.kernel_name, kernel.kernel_args,
+          base64.b64decode(get_kernel_blob(kernel)), kernel.kernel_hash,
+          kernel.uncompressed_size)
+
+
+def get_kdb_key(kernel_name: str, kernel_args: str, arch: str) -> KdbKey:
+  """kernel name and args as stored in the kdb, with the .o extension and the
+  target arch added when missing"""
+  if not kernel_name.endswith('.o'):
+    kernel_name += ".o"
+  if "-mcpu=" not in kernel_args and not kernel_name.endswith('.mlir.o'):
+    kernel_args += f" -mcpu={arch}"
+  return kernel_name, kernel_args
+
+
+def get_fastest_groups(find_db: Dict[str, List[Any]]) -> List[int]:
+  """kernel group of the fastest entry of every key, in key order"""
+  return [
+      min(entries, key=lambda entry: float(entry.kernel_time)).kernel_group
+      for entries in find_db.values()
+      if entries
+  ]
+
+
+class KdbWriter():
+  """Writes the kernels of a find db (fdb key -> ranked entries) to a kdb
+  file for arch, arch is only needed for writing"""
+
+  def __init__(self,
+               arch: Optional[str],
+               workers: int = KDB_WORKERS,
+               fetch_batch: int = KDB_FETCH_BATCH,
+               logger: Optional[logging.Logger] = None):
+    self.arch: Optional[str] = arch
+    self.workers: int = max(workers, 1)
+    self.fetch_batch: int = max(fetch_batch, 1)
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.counts: Dict[str, int] = {'kernels': 0, 'duplicates': 0, 'written': 0}
+
+  def fetch_kernels(self,
+                    session: DbSession,
+                    kernel_table: Any,
+                    groups: List[int],
+                    columns: Optional[List[str]] = None) -> Iterator[Any]:
+    """valid kernels of groups, in the order of groups then by id"""
+    tbl = kernel_table.__table__
+    cols = [tbl.c[col] for col in columns or KDB_KERNEL_COLS if col in tbl.c]
+    for batch in split_packets(groups, self.fetch_batch):
+      query = select(cols).where(tbl.c.valid == 1).where(
+          tbl.c.kernel_group.in_(set(batch))).order_by(tbl.c.id)
+      by_group: Dict[int, List[Any]] = OrderedDict(
+          (group, []) for group in batch)
+      for row in session.execute(query):
+        by_group[row.kernel_group].append(row)
+      for group in batch:
+        yield from by_group[group]
+
+  def unique_kernels(self, rows: Iterable[Any]) -> Iterator[KdbKernel]:
+    """kernels with a new (name, args) kdb key, the first row wins"""
+    seen: Set[KdbKey] = set()
+    for row in rows:
+      self.counts['kernels'] += 1
+      key = get_kdb_key(row.kernel_name, row.kernel_args, self.arch)
+      if key in seen:
+        self.counts['duplicates'] += 1
+        continue
+      seen.add(key)
+      yield KdbKernel(key[0], key[1], row.kernel_blob, row.kernel_hash,
+                      row.uncompressed_size, getattr(row, 'blob_hash', None))
+
+  def write(self, file_name: str, rows: Iterable[Any]) -> int:
+    """write the kdb file from kernel cache rows, returns the number of
+    kernels written"""
+    if os.path.isfile(file_name):
+      os.remove(file_name)
+
+    cnx = sqlite3.connect(file_name)
+    try:
+      for pragma in KDB_PRAGMAS:
+        cnx.execute(pragma)
+      cnx.execute(KDB_TABLE)
+      kernels = self.unique_kernels(rows)
+      if self.workers > 1:
+        with Pool(self.workers) as pool:
+          self.insert(cnx, kernels, pool)
+      else:
+        self.insert(cnx, kernels)
+      cnx.execute(KDB_INDEX)
+      cnx.commit()
+    finally:
+      cnx.close()
+
+    self.logger.warning("Inserted blobs: %s (%s duplicates of %s kernels)",
+                        self.counts['written'], self.counts['duplicates'],
+                        self.counts['kernels'])
+    return self.counts['written']
+
+  def insert(self,
+             cnx: sqlite3.Connection,
+             kernels: Iterator[KdbKernel],
+             pool: Optional[Any] = None) -> None:
+    """decode and executemany in batches, all in the connection's open
+    transaction. kernels are pulled on the calling thread, the session
+    feeding them is not shared with the pool"""
+    for batch in iter_packets(kernels, KDB_INSERT_BATCH):
+      if pool:
+        kdb_rows = pool.map(decode_kernel, batch, KDB_DECODE_CHUNK)
+      else:
+        kdb_rows = [decode_kernel(kernel) for kernel in batch]
+      cnx.executemany(KDB_INSERT, kdb_rows)
+      self.counts['written'] += len(kdb_rows)
+
+  def export(self, session: DbSession, kernel_table: Any,
+             find_db: Dict[str, List[Any]], file_name: str) -> int:
+    """write the kernels of the fastest solver of every find db key"""
+    groups = get_fastest_groups(find_db)
+    self.logger.info('Exporting kernels of %s fdb keys', len(groups))
+    return self.write(file_name,
+                      self.fetch_kernels(session, kernel_table, groups))
+
+  def patch(self, session: DbSession, kernel_table: Any,
+            find_db: Dict[str, List[Any]], file_name: str,
+            since: Dict[str, Any]) -> Dict[str, int]:
+    """bring an existing kdb up to date with find_db. Kernels are compared
+    without their blobs, only the blobs of new kernels and of kernels changed
+    since the kernel cache mark are fetched and upserted by (name, args),
+    kernels no longer referenced are deleted"""
+    wanted = self.wanted_kernels(session, kernel_table, find_db)
+    cnx = sqlite3.connect(file_name)
+    try:
+      current = {
+          (name, args): (kern_hash, size) for name, args, kern_hash, size in
+          cnx.execute('SELECT kernel_name, kernel_args, kernel_hash, '
+                      'uncompressed_size FROM kern_db')
+      }
+      stale = [key for key in current if key not in wanted]
+      changed = get_changed(wanted, current, since)
+      cnx.executemany(KDB_DELETE, stale)
+      cnx.executemany(
+          KDB_UPSERT,
+          (changed[row.id] + decode_kernel(row)[2:]
+           for row in self.fetch_ids(session, kernel_table, list(changed))))
+      cnx.commit()
+    finally:
+      cnx.close()
+
+    counts = {
+        'kernels': len(wanted),
+        'upserted': len(changed),
+        'deleted': len(stale)
+    }
+    self.logger.warning('Patched %s: %s upserted, %s deleted of %s kernels',
+                        file_name, counts['upserted'], counts['deleted'],
+                        counts['kernels'])
+    return counts
+
+  def wanted_kernels(self, session: DbSession, kernel_table: Any,
+                     find_db: Dict[str, List[Any]]) -> Dict[KdbKey, Any]:
+    """kdb key -> kernel cache row (without blob) an export would write"""
+    wanted: Dict[KdbKey, Any] = {}
+    for row in self.fetch_kernels(session, kernel_table,
+                                  get_fastest_groups(find_db), KDB_PATCH_COLS):
+      key = get_kdb_key(row.kernel_name, row.kernel_args, self.arch)
+      wanted.setdefault(key, row)
+    return wanted
+
+  def fetch_ids(self, session: DbSession, kernel_table: Any,
+                ids: List[int]) -> Iterator[Any]:
+    """kernels by id, with their blobs"""
+    tbl = kernel_table.__table__
+    cols = [tbl.c[col] for col in KDB_KERNEL_COLS if col in tbl.c]
+    for batch in split_packets(ids, self.fetch_batch):
+      yield from session.execute(select(cols).where(tbl.c.id.in_(batch)))
+
+
+def get_changed(wanted: Dict[KdbKey, Any], current: Dict[KdbKey, tuple],
+                since: Dict[str, Any]) -> Dict[int, KdbKey]:
+  """kernel cache id -> kdb key of the wanted kernels which are missing from
+  the kdb, differ from it or were updated since the mark"""
+  since_ts = since['update_ts'] and datetime.fromisoformat(since['update_ts'])
+  return {
+      row.id: key
+      for key, row in wanted.items()
+      if current.get(key) != (row.kernel_hash, row.uncompressed_size) or
+      row.id > since['id'] or (since_ts and row.update_ts >= since_ts)
+  }
+
+
+def get_kdb_rows(file_name: str) -> List[Tuple[str, str, bytes, Any, int]]:
+  """kdb contents ordered by (name, args), MIOpen looks kernels up by name and
+  args so row ids are not part of the contents"""
+  cnx = sqlite3.connect(file_name)
+  try:
+    return cnx.execute('SELECT kernel_name, kernel_args, kernel_blob, '
+                       'kernel_hash, uncompressed_size FROM kern_db '
+                       'ORDER BY kernel_name, kernel_args').fetchall()
+  finally:
+    cnx.close()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Streaming merge of text find/perf dbs (key=id:params;id:params lines).
+Inputs are sorted externally in bounded runs, the runs are k-way merged with
+heapq and the merge precedence is applied while streaming to the output"""
+
+import os
+import heapq
+import logging
+import tempfile
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('stream_merge')
+
+#lines held in memory while sorting a run
+MERGE_RUN_SIZE = 200000
+#max number of runs merged at once, more runs are merged in several passes
+MERGE_FAN_IN = 64
+#input sources, master entries are replaced (or updated) by target entries,
+#target files are numbered from TARGET_SRC on in merge order
+MASTER_SRC = 0
+TARGET_SRC = 1
+
+#(key, source, seq, params), sorted by key then input order
+Record = Tuple[str, int, int, str]
+
+
+def parse_db_params(rhs: str) -> Dict[str, str]:
+  """parse the right hand side of a db line into {solver/alg: params}"""
+  params = {}
+  for val in rhs.strip().split(';'):
+    solver_id, p_vec = val.split(':')
+    params[solver_id] = p_vec
+  return params
+
+
+def format_db_line(key: str, solvers: Dict[str, str]) -> str:
+  """db line for key with solvers ordered by time then id"""
+  #for solver indexed, idx 0 is time, for alg indexed, idx 1 is time
+  time_idx = 0 if is_float(next(iter(solvers.values())).split(',')[0]) else 1
+  decorated = sorted((float(val.split(',')[time_idx]), slv, val)
+                     for slv, val in solvers.items())
+  params = ';'.join(f'{slv}:{val}' for _, slv, val in decorated)
+  return f'{key}={params}'
+
+
+def is_float(num: str) -> bool:
+  """Test if string can be interpreted as a float"""
+  try:
+    float(num)
+    return True
+  except ValueError:
+    return False
+
+
+def write_run(records: List[Record], tmp_dir: str) -> str:
+  """write sorted records to a run file"""
+  with tempfile.NamedTemporaryFile('w',
+                                   dir=tmp_dir,
+                                   suffix='.run',
+                                   delete=False,
+                                   encoding='utf-8') as run_fp:
+    for key, source, seq, rhs in records:
+      run_fp.write(f'{key}\t{source}\t{seq}\t{rhs}\n')
+  return run_fp.name
+
+
+def read_run(run_path: str) -> Iterator[Record]:
+  """stream the records of a run file"""
+  with open(run_path, encoding='utf-8') as run_fp:
+    for line in run_fp:
+      key, source, seq, rhs = line.rstrip('\n').split('\t', 3)
+      yield key, int(source), int(seq), rhs
+
+
+def atomic_write(lines: Iterator[str], final_file: str) -> int:
+  """write lines to a temp file next to final_file, then rename it in place"""
+  out_dir = os.path.dirname(os.path.abspath(final_file))
+  count = 0
+  with tempfile.NamedTemporaryFile('w',
+                                   dir=out_dir,
+                                   prefix='.merge_',
+                                   delete=False,
+                                   encoding='utf-8') as out_fp:
+    try:
+      for line in lines:
+        out_fp.write(line + '\n')
+        count += 1
+      out_fp.flush()
+      os.fsync(out_fp.fileno())
+    except BaseException:
+      os.unlink(out_fp.name)
+      raise
+  os.replace(out_fp.name, final_file)
+  return count
+
+
+def atomic_copy(src: str, dest: str) -> None:
+  """copy src to dest through a temp file and a rename"""
+  with open(src, encoding='utf-8') as src_fp:
+    atomic_write((line.rstrip('\n') for line in src_fp), dest)
+
+
+class TextDbMerger():
+  """Merges a master text db with target dbs using bounded memory.
+  keep_keys: keep the master solvers which are not replaced by the target"""
+
+  def __init__(self,
+               keep_keys: bool = False,
+               run_size: int = MERGE_RUN_SIZE,
+               fan_in: int = MERGE_FAN_IN,
+               tmp_dir: Optional[str] = None,
+               logger: Optional[logging.Logger] = None):
+    self.keep_keys: bool = keep_keys
+    self.run_size: int = max(run_size, 1)
+    self.fan_in: int = max(fan_in, 2)
+    self.tmp_dir: Optional[str] = tmp_dir
+    self.logger: logging.Logger = logger if logger else LOGGER
+
+  def sort_runs(self, path: str, source: int, tmp_dir: str) -> List[str]:
+    """split the file at path into sorted run files"""
+    runs = []
+    records: List[Record] = []
+    with open(path, encoding='utf-8') as in_fp:
+      for seq, line in enumerate(in_fp):
+        line = line.strip()
+        if not line:
+          continue
+        key, rhs = line.split('=')
+        records.append((key, source, seq, rhs))
+        if len(records) >= self.run_size:
+          records.sort()
+          runs.append(write_run(records, tmp_dir))
+          records = []
+    if records:
+      records.sort()
+      runs.append(write_run(records, tmp_dir))
+    self.logger.info('Sorted %s into %s runs', path, len(runs))
+    return runs
+
+  def reduce_runs(self, runs: List[str], tmp_dir: str) -> List[str]:
+    """merge runs in passes until at most fan_in runs are left"""
+    while len(runs) > self.fan_in:
+      merged = []
+      for idx in range(0, len(runs), self.fan_in):
+        group = runs[idx:idx + self.fan_in]
+        merged.append(
+            write_run(heapq.merge(*[read_run(run) for run in group]), tmp_dir))
+        for run in group:
+          os.unlink(run)
+      runs = merged
+    return runs
+
+  def merge_group(self, records: Iterator[Record]) -> Dict[str, str]:
+    """apply the merge precedence to all records of one key, in input order"""
+    solvers = None
+    for _, source, _, rhs in records:
+      vals = parse_db_params(rhs)
+      if solvers is None or source == MASTER_SRC or not self.keep_keys:
+        solvers = vals
+      else:
+        solvers.update(vals)
+    return solvers
+
+  def merged_lines(self, runs: List[str]) -> Iterator[str]:
+    """k-way merge of the runs into sorted, merged db lines"""
+    stream = heapq.merge(*[read_run(run) for run in runs])
+    for key, records in groupby(stream, key=lambda rec: rec[0]):
+      yield format_db_line(key, self.merge_group(records))
+
+  def merge(self,
+            master_file: Optional[str],
+            target_files: List[str],
+            final_file: str,
+            copy_files: Optional[List[str]] = None) -> int:
+    """merge target_files into master_file, writes final_file (and copies),
+    returns the number of lines written"""
+    with tempfile.TemporaryDirectory(dir=self.tmp_dir) as tmp_dir:
+      runs = []
+      if master_file is not None:
+        runs.extend(self.sort_runs(master_file, MASTER_SRC, tmp_dir))
+      for idx, target_file in enumerate(target_files):
+        runs.extend(self.sort_runs(target_file, TARGET_SRC + idx, tmp_dir))
+      runs = self.reduce_runs(runs, tmp_dir)
+
+      self.logger.info('Begin writing to file: %s', final_file)
+      count = atomic_write(self.merged_lines(runs), final_file)
+      self.logger.info('Finished writing %s lines to file: %s', count,
+                       final_file)
+
+    for copy in copy_files or []:
+      atomic_copy(final_file, copy)
+      self.logger.info('Finished writing to file: %s', copy)
+
+    return count
@@ -47,9 +47,12 @@ from tuna.miopen.utils.metadata import FIN_CACHE
 from tuna.miopen.utils.metadata import INVERS_DIR_MAP
 from tuna.miopen.worker.fin_utils import compose_config_obj
 from tuna.miopen.utils.config_type import ConfigType
+from tuna.miopen.utils.job_configs import attach_tensors
 from tuna.utils.db_utility import session_retry
 from tuna.miopen.db.solver import get_solver_ids, get_id_solvers
-from tuna.utils.db_utility import gen_select_objs, get_class_by_tablename
+from tuna.utils.ref_cache import get_ref_cache
+from tuna.utils.db_utility import get_class_by_tablename
+from tuna.utils.statements import select_objs
 from tuna.utils.utility import split_packets
 from tuna.utils.utility import SimpleDict
 
@@ -185,21 +188,14 @@ class FinClass(WorkerInterface):
     job_entries = super().compose_work_objs(session, conds)
 
     if job_entries:
-      id_str = ','.join([str(job[0].config) for job in job_entries])
-      cfg_cond_str = f"where valid=1 and id in ({id_str})"
-      cfg_entries = gen_select_objs(session, self.cfg_attr,
-                                    self.dbt.config_table.__tablename__,
-                                    cfg_cond_str)
+      cfg_entries = select_objs(
+          session, self.cfg_attr, self.dbt.config_table.__tablename__, {
+              'valid': 1,
+              'id': {job[0].config for job in job_entries}
+          })
 
       #attach tensor relationship information to config entries
-      for cfg in cfg_entries:
-        for key, val in self.cfg_rel.items():
-          rel_val = getattr(cfg, val['key'])
-          rel_cond_str = f"where {val['fkey']}={rel_val}"
-          setattr(
-              cfg, key,
-              gen_select_objs(session, val['fattr'], val['ftble'],
-                              rel_cond_str)[0])
+      cfg_entries = attach_tensors(session, self.cfg_rel, cfg_entries)
 
       cfg_map = {cfg.id: cfg for cfg in cfg_entries}
 
@@ -222,8 +218,7 @@ class FinClass(WorkerInterface):
       try:
         self.logger.info("Fin: copying local fin input_file: %s to remote %s",
                          self.local_file, fin_ifile)
-        # TODO: remove redundant file copies  # pylint: disable=fixme
-        self.cnx.ssh.open_sftp().put(self.local_file, fin_ifile)
+        self.machine.get_channel_pool().put_file(self.local_file, fin_ifile)
         self.logger.info("Fin: Successfully copied to remote")
       except paramiko.ssh_exception.SSHException:
         self.logger.warning('unable to connect to remote %s', fin_ifile)
@@ -272,14 +267,8 @@ class FinClass(WorkerInterface):
     result = None
     if not self.machine.local_machine:
       fin_outfile = FIN_CACHE + "/" + self.fin_outfile
-      # TODO: This should be copied back out using cat is bad # pylint: disable=fixme
-      _, ssh_stdout, _ = self.exec_command(f"cat {fin_outfile}")
-      result_json = []
-
-      for line in ssh_stdout:
-        result_json.append(line)
       try:
-        result = json.loads('\n'.join(result_json))
+        result = json.loads(self.machine.read_file(fin_outfile))
       except Exception as err:
         self.logger.warning('Err loading fin json: %s', err)
         return None
@@ -600,6 +589,8 @@ class FinClass(WorkerInterface):
       )
       self.logger.info("Current invalid solvers: %s", solver_ids_invalid)
 
+    #workers reload their solver maps
+    get_ref_cache().bump(self.dbt.solver_table.__tablename__)
     return True
 
   @staticmethod
@@ -34,6 +34,7 @@ from tuna.miopen.worker.fin_class import FinClass
 from tuna.miopen.worker.fin_utils import fin_job
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.utils.db_utility import session_retry
+from tuna.miopen.utils.blob_store import get_kernel_blob
 
 
 class FinEvaluator(FinClass):
@@ -94,7 +95,7 @@ class FinEvaluator(FinClass):
           compile_entry['perf_compiled'] = True
 
           compile_entry['kernel_objects'].append({
-              'blob': cache_entry.kernel_blob.decode('utf-8'),
+              'blob': get_kernel_blob(cache_entry).decode('utf-8'),
               'comp_options': cache_entry.kernel_args,
               'kernel_file': cache_entry.kernel_name,
               'md5_sum': cache_entry.kernel_hash,
@@ -159,7 +160,7 @@ class FinEvaluator(FinClass):
           res = session_retry(session, blobs.all, lambda x: x(), self.logger)
           for obj in res:
             compile_entry['kernel_objects'].append({
-                'blob': obj.kernel_blob.decode('utf-8'),
+                'blob': get_kernel_blob(obj).decode('utf-8'),
                 'comp_options': obj.kernel_args,
                 'kernel_file': obj.kernel_name,
                 'md5_sum': obj.kernel_hash,
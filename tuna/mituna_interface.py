@@ -26,7 +26,7 @@
 ###############################################################################
 """Interface class to set up and launch tuning functionality"""
 import os
-from multiprocessing import Value, Lock, Queue as mpQueue, Process
+from multiprocessing import Value, Lock, Queue as mpQueue, Process, Event
 from typing import Optional, Dict, Any, List
 from io import StringIO
 from functools import lru_cache
@@ -49,16 +49,32 @@ from tuna.machine import Machine
 from tuna.libraries import Library
 from tuna.utils.logger import setup_logger
 from tuna.utils.utility import get_env_vars, SimpleDict
+from tuna.utils.metadata import TUNA_LOG_DIR
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.celery_app.celery_app import stop_active_workers, stop_named_worker
 from tuna.celery_app.celery_app import get_backend_env, purge_queue
 from tuna.celery_app.utility import get_q_name
 from tuna.celery_app.celery_workers import launch_celery_worker
+from tuna.celery_app.result_collector import ResultCollector
+from tuna.celery_app.result_collector import get_processing_list
+from tuna.celery_app.result_collector import get_result_list
+from tuna.celery_app.result_ingest import ResultIngestor
+from tuna.celery_app.enqueue import BatchEnqueuer
+from tuna.celery_app.enqueue_scheduler import CeleryBroker, EnqueueScheduler
+from tuna.celery_app.enqueue_scheduler import IDLE_INTERVAL
 from tuna.libraries import Operation
 from tuna.custom_errors import CustomError
-from tuna.utils.db_utility import gen_update_query, session_retry
+from tuna.utils.db_utility import session_retry
+from tuna.utils.job_claim import JobClaimer
+from tuna.utils.job_state import JobStateService, close_job_states
+from tuna.utils.job_state import get_job_states
+from tuna.utils.job_lease import LeaseReaper, REAP_INTERVAL, get_queue_lease
+from tuna.utils.metrics import JOBS_CLAIMED, JOBS_ENQUEUED, PARSE_RESULT_TIME
+from tuna.utils.metrics import QUEUE_DEPTH, start_exporters, stop_exporters
 
 job_counter_lock = threading.Lock()
+#keys visited by one SCAN call of the redis result cleanup
+SCAN_COUNT = 1000
 
 
 class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-public-methods
@@ -257,8 +273,10 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
                set_state: str,
                session_id: int,
                claim_num: int = None,
-               no_update=False):
-    """Interface function to get jobs based on session and find_state"""
+               no_update=False,
+               lease=False):
+    """Interface function to get jobs based on session and find_state. With
+    lease the jobs get a queue lease, for jobs going to a celery queue"""
     #job_rows: List[SimpleDict]
     ids: list
     row: SimpleDict
@@ -275,19 +293,27 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
     ids = [row.id for row in job_list]
     self.logger.info("%s jobs %s", find_state, ids)
     self.logger.info('Updating job state to %s', set_state)
-    for job in job_list:
-      job.state = set_state
-      if self.dbt is not None:
-        query: str = gen_update_query(job, ['state'],
-                                      self.dbt.job_table.__tablename__)
-      else:
-        raise CustomError('DBTable must be set')
-      session.execute(query)
-
+    if self.dbt is None:
+      raise CustomError('DBTable must be set')
+    values = None
+    if lease:
+      values = get_queue_lease(self.dbt.job_table.__tablename__)
+    self.get_job_claimer().update_state(session, job_list, set_state, values)
     session.commit()
+    JOBS_CLAIMED.labels(self.dbt.job_table.__tablename__).inc(len(job_list))
 
     return job_list
 
+  def get_job_claimer(self) -> JobClaimer:
+    """Return the set based job claim engine for this library's job table"""
+    return JobClaimer(self.dbt.job_table,
+                      self.get_job_attr(),
+                      logger=self.logger)
+
+  def get_job_states(self) -> JobStateService:
+    """Return the buffered job state changes of this process"""
+    return get_job_states(self.dbt.job_table.__tablename__, self.logger)
+
   def shutdown_workers(self):
     """Shutdown all active celery workers regardless of queue"""
     return stop_active_workers()
@@ -329,62 +355,139 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
     """Wrapper function for celery enqueue func"""
     raise NotImplementedError('Not implemented')
 
+  def get_celery_task(self, q_name):
+    """Return the celery task jobs are enqueued to"""
+    raise NotImplementedError('Not implemented')
+
+  def celery_enqueue_batch(self, context_list, q_name):
+    """Enqueue a list of contexts over one producer, returns the task ids"""
+    enqueuer = BatchEnqueuer(self.get_celery_task(q_name),
+                             q_name,
+                             prefix=self.prefix,
+                             logger=self.logger)
+    return enqueuer.enqueue(context_list)
+
+  def enqueue_job_batch(self, session, job_counter, claim_num, job_batch_size,
+                        q_name):
+    """Claim up to claim_num jobs and enqueue them in chunks of job_batch_size,
+    returns the ids of the jobs enqueued"""
+    job_list = self.get_jobs(
+        session,
+        self.fetch_state,
+        self.set_state,  #pylint: disable=no-member
+        self.args.session_id,  #pylint: disable=no-member
+        claim_num,
+        lease=True)
+
+    with job_counter_lock:
+      job_counter.value = job_counter.value + len(job_list)
+
+    for i in range(0, len(job_list), job_batch_size):
+      batch_jobs = job_list[i:min(i + job_batch_size, len(job_list))]
+      context_list = self.get_context_list(session, batch_jobs)
+      #calling celery task, enqueuing to celery queue
+      self.celery_enqueue_batch(context_list, q_name)
+      JOBS_ENQUEUED.labels(q_name).inc(len(context_list))
+
+    self.logger.info('Job counter: %s', job_counter.value)
+    return [job.id for job in job_list]
+
   def enqueue_jobs(self, job_counter, job_batch_size, q_name):
     """Enqueue celery jobs"""
     self.logger.info('Starting enqueue')
     with DbSession() as session:
       while True:
-        job_list = []
         #get all the jobs from mySQL
-        job_list = self.get_jobs(
-            session,
-            self.fetch_state,
-            self.set_state,  #pylint: disable=no-member
-            self.args.session_id,  #pylint: disable=no-member
-            job_batch_size)
-
-        with job_counter_lock:
-          job_counter.value = job_counter.value + len(job_list)
-
-        for i in range(0, len(job_list), job_batch_size):
-          batch_jobs = job_list[i:min(i + job_batch_size, len(job_list))]
-          context_list = self.get_context_list(session, batch_jobs)
-          for context in context_list:
-            #calling celery task, enqueuing to celery queue
-            self.celery_enqueue_call(context, q_name=q_name)
-
-        self.logger.info('Job counter: %s', job_counter.value)
-        if not job_list:
+        if not self.enqueue_job_batch(session, job_counter, job_batch_size,
+                                      job_batch_size, q_name):
           self.logger.info('All tasks added to queue')
           break
 
+  def schedule_enqueue(self, job_counter, job_batch_size, q_name, stop):  #pylint: disable=too-many-locals
+    """Keep the celery queue filled to the EnqueueScheduler window until stop
+    is set. job_counter starts with a hold of 1 which is released once the
+    job table has no more jobs to give. Jobs whose lease expired are reclaimed
+    every REAP_INTERVAL, their results will not come"""
+    self.logger.info('Starting enqueue scheduler')
+    scheduler = EnqueueScheduler(job_batch_size, logger=self.logger)
+    broker = CeleryBroker(self.get_celery_task(q_name).app, logger=self.logger)
+    reaper = LeaseReaper(self.dbt.job_table.__tablename__, logger=self.logger)
+    #ids of the jobs enqueued by this run that have no result yet
+    pending = set()
+    next_reap = time.monotonic() + REAP_INTERVAL
+    hold = 1
+    while not stop.is_set():
+      if time.monotonic() >= next_reap:
+        next_reap = time.monotonic() + REAP_INTERVAL
+        self.reap_leases(reaper, pending, job_counter, hold)
+      backlog = broker.depth(q_name)
+      if backlog is None:
+        #results still pending, an upper bound of the queue depth
+        backlog = max(job_counter.value - hold, 0)
+      plan = scheduler.plan(backlog, time.monotonic())
+      wait = plan.interval
+      if plan.batch:
+        with DbSession() as session:
+          job_ids = self.enqueue_job_batch(session, job_counter, plan.batch,
+                                           job_batch_size, q_name)
+        pending.update(job_ids)
+        count = len(job_ids)
+        scheduler.record_enqueued(count)
+        if count < plan.batch:
+          #the job table is drained, poll it less often
+          wait = max(wait, IDLE_INTERVAL)
+          if hold:
+            self.logger.info('All tasks added to queue')
+            with job_counter_lock:
+              job_counter.value = job_counter.value - hold
+            hold = 0
+      stop.wait(wait)
+
+    if hold:
+      with job_counter_lock:
+        job_counter.value = job_counter.value - hold
+
+  def reap_leases(self, reaper, pending, job_counter, hold):
+    """Reclaim the jobs of this session whose lease expired. The ones in
+    pending were enqueued by this run, job_counter stops waiting for them: a
+    late result of the lost task is marked lease_lost and not counted, the
+    copy enqueued again is counted anew"""
+    with DbSession() as session:
+      jobs = reaper.reap(session, {'session': self.args.session_id})  #pylint: disable=no-member
+    reaped = {job.id for job in jobs} & pending
+    pending -= reaped
+    if reaped:
+      with job_counter_lock:
+        job_counter.value = max(job_counter.value - len(reaped), hold)
+
   async def cleanup_redis_results(self, prefix):
-    """Remove stale redis results by key"""
+    """Remove the redis results and result lists left by earlier runs of the
+    prefix, the session's prefix is the same for every run"""
     backend_port, backend_host = get_backend_env()
     redis = await aioredis.from_url(f"redis://{backend_host}:{backend_port}/15")
 
-    keys = []
-    cursor = "0"
-    if prefix:
-      #a prefix is necessary when the need to different results in redis based on operation
-      #withough a prefix the redis key defaults to: "celery-task-meta-<unique kombu hash>"
-      #with a prefix the key will look like: "celery-task-meta-<prefix>-<unique kombu hash>"
-      #the prefix can be applied when filtering the redis keys as bellow
-      cursor, results = await redis.scan(cursor, match=f"*{prefix}*")
-    else:
-      #no prefix, match any key
-      cursor, results = await redis.scan(cursor, match="*")
-    keys.extend(results)
-    self.logger.info('Found %s old results', len(results))
-    for key in keys:
-      try:
-        await redis.delete(key)
-      except aioredis.exceptions.ResponseError as red_err:
-        self.logger.error(red_err)
-        self.logger.info(key.decode('utf-8'))
-        continue
+    #a prefix is necessary when the need to different results in redis based on operation
+    #withough a prefix the redis key defaults to: "celery-task-meta-<unique kombu hash>"
+    #with a prefix the key will look like: "celery-task-meta-<prefix>-<unique kombu hash>"
+    #the prefix can be applied when filtering the redis keys as bellow
+    match = f"*{prefix}*" if prefix else "*"
+    #keys of an aborted run would be collected against the contexts of this one
+    stale_lists = [get_result_list(prefix), get_processing_list(prefix)]
+    count = await redis.delete(*stale_lists)
+    cursor = 0
+    while True:
+      cursor, keys = await redis.scan(cursor, match=match, count=SCAN_COUNT)
+      if keys:
+        try:
+          count += await redis.delete(*keys)
+        except aioredis.exceptions.ResponseError as red_err:
+          self.logger.error(red_err)
+      if int(cursor) == 0:
+        break
+    await redis.close()
 
-    self.logger.info('Done removing old redis results for prefix: %s', prefix)
+    self.logger.info('Removed %s old redis results for prefix: %s', count,
+                     prefix)
 
     return True
 
@@ -394,36 +497,31 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
     backend_port, backend_host = get_backend_env()
     redis = await aioredis.from_url(f"redis://{backend_host}:{backend_port}/15")
 
-    while job_counter.value > 0:
-      cursor = "0"
-      keys = []
-      while cursor != 0:
-        if prefix:
-          #a prefix is necessary when the need to different results in redis based on operation
-          #withough a prefix the redis key defaults to: "celery-task-meta-<unique kombu hash>"
-          #with a prefix the key will look like: "celery-task-meta-<prefix>-<unique kombu hash>"
-          #the prefix can be applied when filtering the redis keys as bellow
-          cursor, results = await redis.scan(cursor, match=f"*{prefix}*")
-        else:
-          #no prefix, match any key
-          cursor, results = await redis.scan(cursor, match="*")
-        keys.extend(results)
-      self.logger.info('Found %s results', len(results))
-      for key in keys:
-        try:
-          data = await redis.get(key)
-          if data:
-            _ = await self.parse_result(data.decode('utf-8'))
-            await redis.delete(key)
-            with job_counter_lock:
-              job_counter.value = job_counter.value - 1
-        except aioredis.exceptions.ResponseError as red_err:
-          self.logger.error(red_err)
-          self.logger.info(key.decode('utf-8'))
-
-      await asyncio.sleep(1)
+    #celery workers push the key of every finished task to the result list of
+    #its prefix, results are drained in batches and parsed in a worker pool,
+    #or handed to the result writer processes
+    ingestor = None
+    handler = self.store_result
+    if self.args.result_writers:
+      ingestor = ResultIngestor(self.ingest_result,
+                                self.args.result_writers,
+                                quarantine_file=os.path.join(
+                                    TUNA_LOG_DIR, f"{prefix}_quarantine.jsonl"),
+                                logger=self.logger)
+      ingestor.start()
+      handler = ingestor.put
+    else:
+      #state changes of the parsed results are written in batches
+      self.get_job_states().start()
+    collector = ResultCollector(redis, prefix, handler, logger=self.logger)
+    try:
+      await collector.run(job_counter, job_counter_lock)
+    finally:
+      await redis.close()
+      if ingestor:
+        ingestor.close()
+      close_job_states()
     self.logger.info('Job counter reached 0')
-    await redis.close()
 
     return True
 
@@ -455,7 +553,6 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
 
     return q_name, subp_list
 
-  #pylint: disable=too-many-locals
   def tune(self, job_batch_size=1000):
     """tuning loop to spin out celery tasks"""
 
@@ -464,6 +561,17 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
       stop_active_workers()
       return True
 
+    #the celery workers inherit the metrics dir of this process
+    exporters = start_exporters(self.logger)
+    try:
+      return self.run_tune(job_batch_size)
+    finally:
+      QUEUE_DEPTH.set_function(None)
+      stop_exporters(exporters)
+
+  #pylint: disable=too-many-locals
+  def run_tune(self, job_batch_size):
+    """launch the celery workers, or enqueue jobs and collect their results"""
     try:
       q_name, subp_list = self.prep_tuning()
     except CustomError as verr:
@@ -485,41 +593,34 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
 
     #set job count to 1 until first job fetch is finished
     job_counter = Value('i', 1)
+    QUEUE_DEPTH.set_function(lambda: job_counter.value)
+    stop_enqueue = Event()
     try:
-      enqueue_proc = Process(target=self.enqueue_jobs,
-                             args=[job_counter, job_batch_size, q_name])
-      #Start enqueue proc
-      enqueue_proc.start()
-
-      #cleanup old results
+      #cleanup old results, before any task of this run can report
       cleanup_proc = Process(target=self.async_wrap,
                              args=(self.cleanup_redis_results, self.prefix))
       cleanup_proc.start()
       cleanup_proc.join()
 
+      #the scheduler keeps the queue filled until the consumer is done
+      enqueue_proc = Process(
+          target=self.schedule_enqueue,
+          args=[job_counter, job_batch_size, q_name, stop_enqueue])
+      enqueue_proc.start()
+
       #start async consume thread, blocking
       consume_proc = Process(target=self.async_wrap,
                              args=(self.consume, job_counter, self.prefix))
       self.logger.info('Starting consume thread')
       consume_proc.start()
+      consume_proc.join()
 
+      stop_enqueue.set()
       enqueue_proc.join()
-      #enqueue finished first fetch, remove hold on job_counter
-      with job_counter_lock:
-        job_counter.value = job_counter.value - 1
-
-      #check for new jobs
-      while consume_proc.is_alive():
-        enqueue_proc = Process(target=self.enqueue_jobs,
-                               args=[job_counter, job_batch_size, q_name])
-        enqueue_proc.start()
-        enqueue_proc.join()
-        time.sleep(10)
-
-      consume_proc.join()
 
     except (KeyboardInterrupt, Exception) as exp:  #pylint: disable=broad-exception-caught
       self.logger.error('Error ocurred %s', exp)
+      stop_enqueue.set()
       purge_queue([q_name])
       self.cancel_consumer(q_name)
       self.reset_job_state_on_ctrl_c()
@@ -546,32 +647,23 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
 
   def reset_job_state_on_ctrl_c(self):
     """Reset job state for jobs in flight"""
-    temp_obj = SimpleDict()
-    temp_obj.session_id = self.args.session_id  #pylint: disable=invalid-name
-    attribs = ['state']
-    temp_obj.state = 1
-
     self.logger.info('Resetting job state in DB for in flight jobs')
 
     if self.operation == Operation.COMPILE:
-      state = 16
+      state = 'compile_start'
     elif self.operation == Operation.EVAL:
-      state = 12
+      state = 'eval_start'
 
-    query = gen_update_query(temp_obj, attribs,
-                             self.dbt.job_table.__tablename__,
-                             [('session', self.args.session_id),
-                              ('state', state)])
+    job_states = self.get_job_states()
     with DbSession() as session:
 
-      #pylint: disable=duplicate-code
       def callback() -> bool:
-        session.execute(query)
-        session.commit()
+        #results already parsed keep their state
+        job_states.flush(session)
+        job_states.transition_where(session, state, 'new',
+                                    {'session': self.args.session_id})
         return True
 
-      #pylint: enable=duplicate-code
-
       assert session_retry(session, callback, lambda x: x(), self.logger)
       self.logger.info('Sucessfully reset job state')
       return True
@@ -631,25 +723,47 @@ class MITunaInterface():  #pylint:disable=too-many-instance-attributes,too-many-
 
   async def parse_result(self, data):
     """Function callback for celery async jobs to store results"""
-    data = json.loads(data)
+    return self.store_result(data)
 
-    with DbSession() as session:
+  def store_result(self, data):
+    """Parse a celery result and store it in the DB"""
+    with PARSE_RESULT_TIME.time():
       try:
-        fin_json = data['result']['ret']
-        context = data['result']['context']
+        fin_json, context = self.load_result(data)
       except KeyError as kerr:
         self.logger.error(kerr)
         return False
 
-      self.logger.info('Parsing: %s', fin_json)
-      if self.operation == Operation.COMPILE:
-        self.process_compile_results(session, fin_json, context)
-      elif self.operation == Operation.EVAL:
-        self.process_eval_results(session, fin_json, context)
-      else:
-        raise CustomError('Unsupported tuning operation')
+      with DbSession() as session:
+        return self.process_result(session, fin_json, context)
+
+  def ingest_result(self, session, data):
+    """Parse a celery result and store it with session, used by the result
+    writers. Raises on results that can not be parsed"""
+    with PARSE_RESULT_TIME.time():
+      fin_json, context = self.load_result(data)
+      ret = self.process_result(session, fin_json, context)
+      #the job state goes into the same batch as the result
+      self.get_job_states().flush(session)
+      return ret
+
+  @staticmethod
+  def load_result(data):
+    """fin json and context of a celery result"""
+    data = json.loads(data)
+    return data['result']['ret'], data['result']['context']
 
-      return True
+  def process_result(self, session, fin_json, context):
+    """Store fin_json for the tuning operation"""
+    self.logger.info('Parsing: %s', fin_json)
+    if self.operation == Operation.COMPILE:
+      self.process_compile_results(session, fin_json, context)
+    elif self.operation == Operation.EVAL:
+      self.process_eval_results(session, fin_json, context)
+    else:
+      raise CustomError('Unsupported tuning operation')
+
+    return True
 
   def process_compile_results(self, session, fin_json, context):
     """Process result from fin_build worker"""
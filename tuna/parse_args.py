@@ -49,6 +49,7 @@ class TunaArgs(Enum):
   DOCKER_NAME: str = 'docker_name'
   SHUTDOWN_WORKERS: str = 'shutdown_workers'
   ENQUEUE_ONLY: str = 'enqueue_only'
+  RESULT_WRITERS: str = 'result_writers'
 
 
 # pylint: disable=too-many-branches
@@ -158,6 +159,15 @@ def setup_arg_parser(desc: str,
                           dest='enqueue_only',
                           help='Enqueue jobs to celery queue')
 
+    if TunaArgs.RESULT_WRITERS in arg_list:
+      parser.add_argument(
+          '--result_writers',
+          dest='result_writers',
+          type=int,
+          default=0,
+          help='Number of processes storing results, 0 stores them in the '
+          'result collector')
+
   return parser
 
 
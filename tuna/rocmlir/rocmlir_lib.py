@@ -217,7 +217,8 @@ class RocMLIR(MITunaInterface):
                set_state: str,
                session_id: int,
                claim_num: int = None,
-               no_update: bool = False):
+               no_update: bool = False,
+               lease: bool = False):
     """Get jobs based on find_state"""
     self.logger.info('Placeholder')
 
@@ -41,7 +41,8 @@ from tenacity import Retrying, stop_after_attempt, before_sleep_log, wait_random
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.worker_interface import WorkerInterface
 from tuna.rocmlir.rocmlir_tables import RocMLIRDBTables
-from tuna.utils.db_utility import session_retry, gen_insert_query
+from tuna.utils.db_utility import session_retry
+from tuna.utils.statements import insert_objs
 from tuna.rocmlir.config_type import ConfigType
 
 
@@ -92,9 +93,8 @@ class RocMLIRWorker(WorkerInterface):
     obj.kernel_tflops = tflops
 
     self.logger.info('Inserting results for job_id=%s', self.job.id)
-    query = gen_insert_query(obj, self.result_attr,
-                             self.dbt.results.__tablename__)
-    session.execute(query)
+    insert_objs(session, [obj], self.result_attr,
+                self.dbt.results.__tablename__)
     session.commit()
     return True
 
@@ -25,67 +25,33 @@
 #
 ###############################################################################
 """ Database resource manager """
-import mysql.connector  # pylint: disable=unused-import
-
-from mysql.connector.connection import MySQLConnection
-from mysql.connector.cursor import MySQLCursor
+from typing import Any
+from tuna.db_engine import get_db_pool
+from tuna.utils.sql_profiler import get_profiler
 
 
 class DbConnection():
   """ Resource manager class for a SQL connection """
 
   def __init__(self):
-    '''
-        Importing in a function may be a thorny subject.
-        Please see
-        http://stackoverflow.com/questions/477096/python-import-coding-style/4789963#4789963
-        for my reason to use this.
-        '''
-    import os  # pylint: disable=import-outside-toplevel
-
-    self.db_user_name: str
-    self.db_user_password: str
-    self.db_host_name: str
-    self.db_name: str
-
-    if 'TUNA_DB_USER_NAME' in os.environ:
-      self.db_user_name = os.environ['TUNA_DB_USER_NAME']
-    else:
-      self.db_user_name = ''
-    if 'TUNA_DB_USER_PASSWORD' in os.environ:
-      self.db_user_password = os.environ['TUNA_DB_USER_PASSWORD']
-    else:
-      self.db_user_password = ''
-    if 'TUNA_DB_HOSTNAME' in os.environ:
-      self.db_host_name = os.environ['TUNA_DB_HOSTNAME']
-    else:
-      self.db_host_name = 'localhost'
-    if 'TUNA_DB_NAME' in os.environ:
-      self.db_name = os.environ['TUNA_DB_NAME']
-    else:
-      self.db_name = ''
-
-    self.connection: MySQLConnection = None
+    self.connection: Any = None
 
-  def get_connection(self) -> MySQLConnection:
-    """ return a cached connection if one exists, else create a new one
-    and return that instead """
-    if self.connection is not None and self.connection.is_connected():
+  def get_connection(self) -> Any:
+    """ return a cached connection if one exists, else check one out of the
+    shared connection pool and return that instead """
+    if self.connection is not None:
       return self.connection
 
-    self.connection = mysql.connector.connect(user=self.db_user_name,
-                                              password=self.db_user_password,
-                                              host=self.db_host_name,
-                                              database=self.db_name)
-    self.connection.autocommit = False
-    if not self.connection.is_connected():
+    self.connection = get_db_pool().raw_connection()
+    if self.connection is None:
       raise ValueError('Could not connect to the DB instance')
     return self.connection
 
   def close_connection(self) -> bool:
-    """ Close a SQL connection after commiting the changes """
+    """ Commit the changes and return the connection to the pool """
     self.connection.commit()
     self.connection.close()
+    self.connection = None
     return True
 
   def __enter__(self):
@@ -100,13 +66,16 @@ class DbCursor():
 
   def __init__(self):
     self.cnx: DbConnection = None
-    self.sql_connection: MySQLConnection = None
-    self.cur: MySQLCursor = None
+    self.sql_connection: Any = None
+    self.cur: Any = None
 
-  def __enter__(self) -> MySQLCursor:
+  def __enter__(self) -> Any:
     self.cnx = DbConnection()
     self.sql_connection = self.cnx.get_connection()
     self.cur = self.sql_connection.cursor()
+    profiler = get_profiler()
+    if profiler:
+      self.cur = profiler.wrap_cursor(self.cur)
     return self.cur
 
   def __exit__(self, type_t, value, traceback):
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Per host pool of long lived ssh transports with multiplexed SFTP clients.
+File transfers to a machine reuse one authenticated transport and a bounded
+set of SFTP channels instead of opening a new session per call"""
+
+import os
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from io import BytesIO
+
+import paramiko
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.retry import RETRYABLE, RetryPolicy
+
+LOGGER = setup_logger('ssh_pool')
+
+#max SFTP channels open at once over one transport
+SFTP_POOL_SIZE = 4
+#seconds between ssh keepalive packets
+SSH_KEEPALIVE = 30
+#connection attempts before giving up
+NUM_CONNECT_RETRIES = 8
+#cap on the backoff between attempts, seconds
+MAX_BACKOFF = 60
+SSH_TIMEOUT = 60
+
+#errors that mean the channel or transport is gone, file errors are not retried
+TRANSPORT_ERRORS = (paramiko.ssh_exception.SSHException, EOFError,
+                    socket.timeout)
+
+PoolKey = Tuple[int, str, int, Optional[str]]
+#pools of the current process, keyed by (pid, hostname, port, user)
+POOLS: Dict[PoolKey, 'ChannelPool'] = {}
+POOLS_LOCK = threading.Lock()
+
+#transport connection attempts, per host breaker shared with Connection
+CONNECT_RETRY = RetryPolicy('ssh_pool_connect',
+                            max_attempts=NUM_CONNECT_RETRIES,
+                            base=1.0,
+                            cap=MAX_BACKOFF)
+
+
+# pylint: disable=too-many-instance-attributes
+class ChannelPool():
+  """Long lived transport to one host with a bounded set of SFTP clients.
+  Checked out clients that fail drop the transport, the next checkout
+  re-establishes it"""
+
+  def __init__(self,
+               hostname: str,
+               port: int = 22,
+               user: Optional[str] = None,
+               password: Optional[str] = None,
+               max_channels: int = SFTP_POOL_SIZE,
+               keepalive: int = SSH_KEEPALIVE,
+               logger: logging.Logger = LOGGER):
+    self.hostname = hostname
+    self.port = port
+    self.user = user
+    self.password = password
+    self.keepalive = keepalive
+    self.logger = logger
+    self.client: Optional[paramiko.SSHClient] = None
+    self.idle: List[paramiko.SFTPClient] = []
+    self.slots = threading.BoundedSemaphore(max_channels)
+    self.lock = threading.Lock()
+    self.reconnects = 0
+
+  def is_healthy(self) -> bool:
+    """True if the transport is up and authenticated"""
+    transport = self.client.get_transport() if self.client else None
+    return transport is not None and transport.is_active(
+    ) and transport.is_authenticated()
+
+  def __connect(self) -> paramiko.Transport:
+    """Open a new transport, retrying with backoff"""
+    retry = CONNECT_RETRY.start(f"ssh:{self.hostname}:{self.port}")
+    while retry.allow():
+      client = paramiko.SSHClient()
+      client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+      try:
+        #pylint: disable=duplicate-code
+        client.connect(self.hostname,
+                       username=self.user,
+                       password=self.password,
+                       port=self.port,
+                       timeout=SSH_TIMEOUT,
+                       allow_agent=False)
+      except (paramiko.ssh_exception.SSHException, socket.error) as err:
+        client.close()
+        self.logger.warning('Attempt %s to connect to %s:%s failed (%s)',
+                            retry.attempt, self.hostname, self.port, err)
+        if not retry.failed(RETRYABLE, err):
+          break
+      else:
+        retry.succeeded()
+        transport = client.get_transport()
+        transport.set_keepalive(self.keepalive)
+        self.client = client
+        return transport
+
+    raise ConnectionError(
+        f'Unable to connect to {self.hostname}:{self.port} after '
+        f'{retry.attempt} attempts')
+
+  def get_transport(self) -> paramiko.Transport:
+    """Return the live transport, re-establishing it when needed"""
+    with self.lock:
+      if self.is_healthy():
+        return self.client.get_transport()
+      if self.client is not None:
+        self.logger.warning('Transport to %s lost, reconnecting', self.hostname)
+        self.reconnects += 1
+        self.__reset()
+      return self.__connect()
+
+  def __reset(self) -> None:
+    """Drop the idle clients and the transport"""
+    for sftp in self.idle:
+      sftp.close()
+    self.idle = []
+    if self.client is not None:
+      self.client.close()
+      self.client = None
+
+  def __checkout(self) -> paramiko.SFTPClient:
+    """Reuse an idle SFTP client whose channel is open, or open a new one"""
+    transport = self.get_transport()
+    with self.lock:
+      while self.idle:
+        sftp = self.idle.pop()
+        if not sftp.get_channel().closed:
+          return sftp
+        sftp.close()
+    return paramiko.SFTPClient.from_transport(transport)
+
+  @contextmanager
+  def sftp(self) -> Iterator[paramiko.SFTPClient]:
+    """Check out an SFTP client, blocks while max_channels are in use"""
+    with self.slots:
+      sftp = self.__checkout()
+      try:
+        yield sftp
+      except TRANSPORT_ERRORS:
+        sftp.close()
+        with self.lock:
+          if not self.is_healthy():
+            self.__reset()
+        raise
+      finally:
+        if not sftp.get_channel().closed:
+          with self.lock:
+            self.idle.append(sftp)
+
+  def __retry(self, func):
+    """Run func(sftp), once more on a fresh transport if the first one died"""
+    try:
+      with self.sftp() as sftp:
+        return func(sftp)
+    except TRANSPORT_ERRORS as err:
+      self.logger.warning('SFTP to %s failed (%s), retrying', self.hostname,
+                          err)
+      with self.sftp() as sftp:
+        return func(sftp)
+
+  def read_file(self, filename: str) -> bytes:
+    """Return the contents of a remote file"""
+
+    def read(sftp: paramiko.SFTPClient) -> bytes:
+      content_io = BytesIO()
+      sftp.getfo(filename, content_io)
+      return content_io.getvalue()
+
+    return self.__retry(read)
+
+  def write_file(self, filename: str, contents: bytes) -> None:
+    """Write contents to a remote file"""
+
+    def write(sftp: paramiko.SFTPClient) -> None:
+      with sftp.open(filename, 'wb') as fout:
+        fout.write(contents)
+        fout.flush()
+
+    self.__retry(write)
+
+  def put_file(self, local_path: str, filename: str) -> None:
+    """Copy a local file to the remote host"""
+    self.__retry(lambda sftp: sftp.put(local_path, filename))
+
+  def close(self) -> None:
+    """Close all clients and the transport"""
+    with self.lock:
+      self.__reset()
+
+
+def get_channel_pool(hostname: str,
+                     port: int = 22,
+                     user: Optional[str] = None,
+                     password: Optional[str] = None) -> ChannelPool:
+  """Return the pool of the current process for a host, transports are not
+  shared across fork"""
+  key: PoolKey = (os.getpid(), hostname, port, user)
+  with POOLS_LOCK:
+    if key not in POOLS:
+      POOLS[key] = ChannelPool(hostname, port, user, password)
+    return POOLS[key]
+
+
+def close_channel_pools() -> None:
+  """Close the pools of the current process"""
+  pid = os.getpid()
+  with POOLS_LOCK:
+    for key in [key for key in POOLS if key[0] == pid]:
+      POOLS.pop(key).close()
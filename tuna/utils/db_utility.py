@@ -28,29 +28,39 @@
 
 import os
 import enum
-import random
 import logging
-from time import sleep
 from datetime import datetime
-from typing import Callable, Any, List, Dict
+from typing import Callable, Any, List, Dict, Optional
 import pymysql
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import OperationalError, IntegrityError, ProgrammingError
-from sqlalchemy import create_engine
 
+from tuna.db_engine import ENGINE
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.dbBase.base_class import BASE
+from tuna.dbBase.sqlite_compat import sqlite_upsert
 from tuna.utils.metadata import NUM_SQL_RETRIES
 from tuna.utils.logger import setup_logger
 from tuna.utils.utility import get_env_vars
 from tuna.utils.utility import SimpleDict
+from tuna.utils.rows import rows_to_objs
+from tuna.utils.retry import RetryPolicy
 
 LOGGER = setup_logger('db_utility')
 
+#retries of DB statements failing on contention or a lost connection
+DB_RETRY = RetryPolicy('db',
+                       max_attempts=NUM_SQL_RETRIES,
+                       budget=600,
+                       base=0.5,
+                       cap=30.0)
+
 ENV_VARS = get_env_vars()
 
-ENGINE = create_engine(f"mysql+pymysql://{ENV_VARS['user_name']}:{ENV_VARS['user_password']}" +\
-                         f"@{ENV_VARS['db_hostname']}:3306/{ENV_VARS['db_name']}",
-                       encoding="utf8")
+
+def get_db_key() -> str:
+  """circuit breaker key of the tuna DB"""
+  return f"db:{ENV_VARS['db_hostname']}/{ENV_VARS['db_name']}"
 
 
 def connect_db():
@@ -110,23 +120,24 @@ def create_indices(all_indices):
 def session_retry(session: DbSession,
                   callback: Callable,
                   actuator: Callable,
-                  logger: logging.Logger = LOGGER) -> Any:
+                  logger: logging.Logger = LOGGER,
+                  policy: RetryPolicy = DB_RETRY) -> Any:
   """retry handling for a callback function using an actuator (lamda function with params)"""
-  for idx in range(NUM_SQL_RETRIES):
+  retry = policy.start(get_db_key())
+  while retry.allow():
     try:
-      return actuator(callback)
-    except OperationalError as error:
-      logger.warning('%s, DB contention sleeping (%s)...', error, idx)
-      session.rollback()
-      sleep(random.randint(1, 30))
-    except pymysql.err.OperationalError as error:
-      logger.warning('%s, DB contention sleeping (%s)...', error, idx)
-      session.rollback()
-      sleep(random.randint(1, 30))
+      ret = actuator(callback)
     except IntegrityError as error:
       logger.error('Query failed: %s', error)
       session.rollback()
       return False
+    except (OperationalError, pymysql.err.OperationalError) as error:
+      session.rollback()
+      if not retry.failed(policy.classify(error), error):
+        break
+    else:
+      retry.succeeded()
+      return ret
 
   logger.error('All retries have failed.')
   return False
@@ -186,6 +197,33 @@ def gen_insert_query(obj, attribs, tablename):
   return query
 
 
+def bulk_upsert(session: DbSession,
+                table: Any,
+                rows: List[Dict[str, Any]],
+                key_cols: List[str],
+                update_cols: Optional[List[str]] = None) -> int:
+  """Insert rows into table updating the rows which collide on key_cols, as a
+  single executemany of INSERT ... ON DUPLICATE KEY UPDATE (ON CONFLICT DO
+  UPDATE on SQLite). All rows must have the same keys"""
+  if not rows:
+    return 0
+  table = getattr(table, '__table__', table)
+  columns = list(rows[0].keys())
+  if update_cols is None:
+    update_cols = [col for col in columns if col not in key_cols]
+
+  if session.get_bind().dialect.name == 'sqlite':
+    query = sqlite_upsert(table, columns, key_cols, update_cols)
+  else:
+    query = mysql_insert(table)
+    #a no-op update keeps the existing row when there is nothing to update
+    query = query.on_duplicate_key_update(
+        {col: query.inserted[col] for col in update_cols} or
+        {key_cols[0]: table.c[key_cols[0]]})
+  session.execute(query, rows)
+  return len(rows)
+
+
 def gen_select_objs(session, attribs, tablename, cond_str):
   """create a select query and generate name space objects for the results"""
   ret = get_job_rows(session, attribs, tablename, cond_str)
@@ -223,15 +261,8 @@ def get_job_rows(session, attribs, tablename, cond_str):
 
 
 def db_rows_to_obj(ret, attribs):
-  """Compose SimpleDict list of db jobs"""
-  entries = []
-  for row in ret:
-    #LOGGER.info('select_row: %s', row)
-    entry = SimpleDict()
-    for i, col in enumerate(attribs):
-      setattr(entry, col, row[i])
-    entries.append(entry)
-  return entries
+  """Compose row objects (SimpleDict with the columns in slots) of db jobs"""
+  return rows_to_objs(ret, attribs)
 
 
 def has_attr_set(obj, attribs):
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Set based job claiming: select a batch of job ids under row locks and move
+them to the claimed state with one UPDATE per batch, in a single transaction"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, select, type_coerce
+from sqlalchemy.inspection import inspect
+from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.types import NullType
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.utils.logger import setup_logger
+from tuna.utils.metrics import JOBS_CLAIMED
+from tuna.utils.utility import SimpleDict, split_packets
+
+LOGGER = setup_logger('job_claim')
+
+#max number of ids bound into a single UPDATE ... WHERE id IN (...)
+CLAIM_BATCH_SIZE = 1000
+
+
+class JobEntry(SimpleDict):
+  """Job row claimed from a job table, columns are set as attributes"""
+  # pylint: disable=too-few-public-methods
+  id: int  # pylint: disable=invalid-name
+  session: int
+  state: str
+  retries: int
+  reason: str
+
+
+class JobClaimer():
+  """Claims jobs of a job table (JobMixin) with bound, set based statements"""
+
+  def __init__(self,
+               job_table: Any,
+               job_attr: Optional[List[str]] = None,
+               batch_size: int = CLAIM_BATCH_SIZE,
+               logger: logging.Logger = LOGGER):
+    self.table = inspect(job_table).local_table
+    if job_attr is None:
+      job_attr = [
+          col.name
+          for col in self.table.c
+          if col.name not in ('insert_ts', 'update_ts')
+      ]
+    self.job_attr: List[str] = job_attr
+    self.batch_size: int = batch_size
+    self.logger: logging.Logger = logger
+    self.update_stmt = self.table.update().where(
+        self.table.c.id.in_(bindparam(
+            'ids', expanding=True))).values(state=bindparam('new_state'))
+    #update statements that also set other columns, by column names
+    self.update_stmts: Dict[Tuple[str, ...], Any] = {}
+
+  def select_query(self,
+                   conds: Sequence[ClauseElement],
+                   claim_num: Optional[int] = None,
+                   order_by: Optional[Sequence[Any]] = None,
+                   skip_locked: bool = True):
+    """Build the job select, all values are bound parameters"""
+    #raw column values, the same python types a textual select returns
+    cols = [type_coerce(self.table.c[attr], NullType) for attr in self.job_attr]
+    query = select(cols).where(and_(*conds))
+    if order_by is None:
+      order_by = [self.table.c.retries, self.table.c.id]
+    query = query.order_by(*order_by)
+    if claim_num:
+      query = query.limit(claim_num)
+    return query.with_for_update(skip_locked=skip_locked)
+
+  def fetch(self,
+            session: DbSession,
+            conds: Sequence[ClauseElement],
+            claim_num: Optional[int] = None,
+            order_by: Optional[Sequence[Any]] = None) -> List[JobEntry]:
+    """Select and lock jobs matching conds"""
+    query = self.select_query(conds, claim_num, order_by)
+    rows = session.execute(query).fetchall()
+    return [JobEntry(**dict(zip(self.job_attr, row))) for row in rows]
+
+  def get_update_stmt(self, cols: Tuple[str, ...]) -> Any:
+    """UPDATE setting state and cols (bound as set_<col>) by ids"""
+    if not cols:
+      return self.update_stmt
+    if cols not in self.update_stmts:
+      self.update_stmts[cols] = self.update_stmt.values(
+          {col: bindparam('set_' + col) for col in cols})
+    return self.update_stmts[cols]
+
+  def update_state(self,
+                   session: DbSession,
+                   jobs: List[SimpleDict],
+                   state: str,
+                   values: Optional[Dict[str, Any]] = None) -> int:
+    """Set state, and the columns in values, for all jobs, one UPDATE per
+    batch of ids. Does not commit"""
+    values = values if values else {}
+    cols = tuple(sorted(values))
+    stmt = self.get_update_stmt(cols)
+    params = {'set_' + col: values[col] for col in cols}
+    params['new_state'] = state
+    count = 0
+    for batch in split_packets(jobs, self.batch_size):
+      ids = [job.id for job in batch]
+      session.execute(stmt, dict(params, ids=ids))
+      for job in batch:
+        job.state = state
+        for col in cols:
+          setattr(job, col, values[col])
+      count += len(ids)
+    return count
+
+  def claim(self,
+            session: DbSession,
+            conds: Sequence[ClauseElement],
+            state: str,
+            claim_num: Optional[int] = None,
+            order_by: Optional[Sequence[Any]] = None) -> List[JobEntry]:
+    """Select, lock and move jobs to state in one transaction"""
+    try:
+      jobs = self.fetch(session, conds, claim_num, order_by)
+      if jobs:
+        self.update_state(session, jobs, state)
+      session.commit()
+    except Exception:
+      session.rollback()
+      raise
+
+    JOBS_CLAIMED.labels(self.table.name).inc(len(jobs))
+    self.logger.info('Claimed %s jobs, state set to %s', len(jobs), state)
+    return jobs
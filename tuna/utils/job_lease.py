@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Leases on in flight jobs. Jobs claimed for a celery queue get a lease of
+the enqueuer, the worker running a job takes the lease over and a heartbeat
+thread renews the leases of all jobs of the process with one UPDATE. A
+finished task leaves a lease for its result to be stored, storing it clears
+the lease. The reaper moves jobs whose lease ran out back to the state they
+were claimed from. Expired worker leases bump the retries, the job goes to
+errored once they are used up, jobs which only waited in the queue too long
+are not charged a retry.
+Expiries are epoch seconds of the writer's clock, the reaper waits CLOCK_SKEW
+seconds past an expiry before it takes the job. A task that lost its lease
+marks its result with LEASE_LOST_KEY, the reclaimed copy of the job reports
+instead"""
+
+import os
+import math
+import time
+import socket
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from typing import Set
+from uuid import uuid4
+
+from sqlalchemy import and_, bindparam, case, or_, select, type_coerce
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.types import NullType
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.db.tuna_tables import RECLAIM_STATES
+from tuna.utils.job_state import LEASE_COLS, emit_audit, get_audit_sinks
+from tuna.utils.logger import setup_logger
+from tuna.utils.metadata import MAX_ERRORED_JOB_RETRIES
+from tuna.utils.metrics import JOB_STATE_CHANGES
+from tuna.utils.statements import get_table
+from tuna.utils.utility import split_packets
+
+LOGGER = setup_logger('job_lease')
+
+#seconds a worker lease lasts without a heartbeat, TUNA_LEASE_TTL overrides
+LEASE_TTL = 600
+#seconds a job may wait in the celery queue, TUNA_QUEUE_LEASE_TTL overrides
+QUEUE_LEASE_TTL = 3600
+#seconds a finished job may wait for its result to be stored,
+#TUNA_RESULT_LEASE_TTL overrides
+RESULT_LEASE_TTL = 3600
+#marks the lease owner names of queued jobs
+QUEUE_TAG = ':queue:'
+#seconds the reaper waits past an expiry, covers clock differences between
+#the hosts
+CLOCK_SKEW = 30
+#seconds between two reaper passes of the enqueue scheduler
+REAP_INTERVAL = 60.0
+#max number of ids renewed by one heartbeat UPDATE
+RENEW_BATCH_SIZE = 1000
+#in flight state names, mapped to the state an expired job goes back to
+RECLAIM_NAMES = {
+    state.name: target.name for state, target in RECLAIM_STATES.items()
+}
+
+_KEEPERS: Dict[str, 'LeaseKeeper'] = {}
+_KEEPERS_PID: int = os.getpid()
+_KEEPERS_LOCK = threading.Lock()
+
+
+def get_lease_ttl() -> int:
+  """Worker lease duration, TUNA_LEASE_TTL overrides"""
+  if 'TUNA_LEASE_TTL' in os.environ:
+    return max(int(os.environ['TUNA_LEASE_TTL']), 1)
+  return LEASE_TTL
+
+
+def get_queue_lease_ttl() -> int:
+  """Lease duration of queued jobs, TUNA_QUEUE_LEASE_TTL overrides"""
+  if 'TUNA_QUEUE_LEASE_TTL' in os.environ:
+    return max(int(os.environ['TUNA_QUEUE_LEASE_TTL']), 1)
+  return QUEUE_LEASE_TTL
+
+
+def get_result_lease_ttl() -> int:
+  """Lease duration of finished jobs, TUNA_RESULT_LEASE_TTL overrides"""
+  if 'TUNA_RESULT_LEASE_TTL' in os.environ:
+    return max(int(os.environ['TUNA_RESULT_LEASE_TTL']), 1)
+  return RESULT_LEASE_TTL
+
+
+def has_lease(table: Any) -> bool:
+  """True if the job table has the lease columns"""
+  return all(col in table.c for col in LEASE_COLS)
+
+
+def get_owner(tag: str = '') -> str:
+  """lease owner name of this process"""
+  return f"{socket.gethostname()}:{os.getpid()}{tag}"
+
+
+def lease_values(owner: str,
+                 ttl: float,
+                 clock: Callable[[], float] = time.time) -> Dict[str, Any]:
+  """lease columns of a lease held by owner for ttl seconds"""
+  return {'lease_owner': owner, 'lease_expiry': math.ceil(clock() + ttl)}
+
+
+def get_queue_lease(tablename: str) -> Optional[Dict[str, Any]]:
+  """lease columns for jobs claimed into a celery queue, None if the job
+  table has no leases"""
+  if not has_lease(get_table(tablename)):
+    return None
+  #unique per claim, a worker takes over only the lease its task was sent with
+  return lease_values(get_owner(f"{QUEUE_TAG}{uuid4().hex[:8]}"),
+                      get_queue_lease_ttl())
+
+
+#pylint: disable=too-many-instance-attributes
+class LeaseKeeper():
+  """Leases this process holds on jobs of a job table, renewed together by a
+  heartbeat thread. Does nothing for job tables without leases"""
+
+  def __init__(self,
+               tablename: str,
+               owner: Optional[str] = None,
+               ttl: Optional[float] = None,
+               interval: Optional[float] = None,
+               result_ttl: Optional[float] = None,
+               clock: Callable[[], float] = time.time,
+               logger: Optional[logging.Logger] = None):
+    self.table = get_table(tablename)
+    self.enabled: bool = has_lease(self.table)
+    self.owner: str = owner if owner else get_owner()
+    self.ttl: float = ttl if ttl else get_lease_ttl()
+    self.interval: float = interval if interval else self.ttl / 3
+    self.result_ttl: float = result_ttl if result_ttl else \
+        get_result_lease_ttl()
+    self.clock: Callable[[], float] = clock
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.held: Set[int] = set()
+    self.lock: threading.Lock = threading.Lock()
+    self.stop: threading.Event = threading.Event()
+    self.heartbeat: Optional[threading.Thread] = None
+    if not self.enabled:
+      return
+    tbl = self.table
+    in_flight = and_(tbl.c.id == bindparam('job_id'),
+                     tbl.c.state.in_(list(RECLAIM_NAMES)))
+    self.acquire_stmt = tbl.update().where(in_flight).values(
+        lease_owner=bindparam('new_owner'),
+        lease_expiry=bindparam('new_expiry'))
+    #take over only the lease the job was enqueued with
+    self.takeover_stmt = tbl.update().where(
+        and_(in_flight, tbl.c.lease_owner == bindparam('expected'))).values(
+            lease_owner=bindparam('new_owner'),
+            lease_expiry=bindparam('new_expiry'))
+    self.release_stmt = tbl.update().where(
+        and_(tbl.c.id == bindparam('job_id'),
+             tbl.c.lease_owner == bindparam('owner'))).values(
+                 lease_expiry=bindparam('new_expiry'))
+    self.renew_stmt = tbl.update().where(
+        and_(tbl.c.id.in_(bindparam('ids', expanding=True)),
+             tbl.c.lease_owner == bindparam('owner'))).values(
+                 lease_expiry=bindparam('new_expiry'))
+
+  def get_expiry(self) -> int:
+    """expiry of a lease taken or renewed now"""
+    return math.ceil(self.clock() + self.ttl)
+
+  def acquire(self, job_id: int, expected: Optional[str] = None) -> bool:
+    """Take over the lease of an in flight job and keep renewing it. With
+    expected only the lease held by expected is taken. False if the job is no
+    longer in flight or was reclaimed and enqueued again"""
+    if not self.enabled:
+      return True
+    params = {
+        'job_id': job_id,
+        'new_owner': self.owner,
+        'new_expiry': self.get_expiry()
+    }
+    stmt = self.acquire_stmt
+    if expected is not None:
+      stmt = self.takeover_stmt
+      params['expected'] = expected
+    with DbSession() as session:
+      count = session.execute(stmt, params).rowcount
+      session.commit()
+    if not count:
+      self.logger.warning('Job %s was reclaimed, lease not taken', job_id)
+      return False
+    with self.lock:
+      self.held.add(job_id)
+    self.start()
+    return True
+
+  def renew(self, ids: Optional[List[int]] = None) -> int:
+    """Extend the leases of ids (default all held) with one UPDATE per
+    RENEW_BATCH_SIZE jobs, returns the number of leases still owned"""
+    if not self.enabled:
+      return 0
+    if ids is None:
+      with self.lock:
+        ids = sorted(self.held)
+    if not ids:
+      return 0
+    count = 0
+    expiry = self.get_expiry()
+    with DbSession() as session:
+      for batch in split_packets(ids, RENEW_BATCH_SIZE):
+        count += session.execute(self.renew_stmt, {
+            'ids': batch,
+            'owner': self.owner,
+            'new_expiry': expiry
+        }).rowcount
+      session.commit()
+    if count < len(ids):
+      self.logger.warning('%s of %s job leases were lost',
+                          len(ids) - count, len(ids))
+    return count
+
+  def release(self, job_id: int) -> bool:
+    """Stop renewing the lease of job_id, the job is done. The lease is
+    extended by result_ttl for its result to be stored, the job is reaped if
+    that never happens. False if the lease was lost, the job was reclaimed and
+    its result must be dropped"""
+    with self.lock:
+      if job_id not in self.held:
+        return not self.enabled
+      self.held.discard(job_id)
+    with DbSession() as session:
+      count = session.execute(
+          self.release_stmt, {
+              'job_id': job_id,
+              'owner': self.owner,
+              'new_expiry': math.ceil(self.clock() + self.result_ttl)
+          }).rowcount
+      session.commit()
+    if not count:
+      self.logger.warning('Lease of job %s was lost', job_id)
+    return bool(count)
+
+  def run_heartbeat(self) -> None:
+    """renew the held leases every interval"""
+    while not self.stop.wait(self.interval):
+      try:
+        self.renew()
+      except SQLAlchemyError as err:
+        self.logger.error('Lease heartbeat failed: %s', err)
+
+  def start(self) -> None:
+    """start the heartbeat thread"""
+    with self.lock:
+      if self.heartbeat is None:
+        self.stop.clear()
+        self.heartbeat = threading.Thread(target=self.run_heartbeat,
+                                          name=f"lease_{self.table.name}",
+                                          daemon=True)
+        self.heartbeat.start()
+
+  def close(self) -> None:
+    """stop the heartbeat thread, the held leases run out"""
+    heartbeat = self.heartbeat
+    if heartbeat is not None:
+      self.stop.set()
+      heartbeat.join()
+      self.heartbeat = None
+
+
+def get_lease_keeper(tablename: str,
+                     logger: Optional[logging.Logger] = None) -> LeaseKeeper:
+  """The process wide lease keeper of the job table tablename"""
+  global _KEEPERS_PID  # pylint: disable=global-statement
+  with _KEEPERS_LOCK:
+    if _KEEPERS_PID != os.getpid():
+      #forked, the heartbeat thread belongs to the parent
+      _KEEPERS.clear()
+      _KEEPERS_PID = os.getpid()
+    if tablename not in _KEEPERS:
+      _KEEPERS[tablename] = LeaseKeeper(tablename, logger=logger)
+    return _KEEPERS[tablename]
+
+
+class ReapedJob(NamedTuple):
+  """Job moved out of an expired lease"""
+  id: int  # pylint: disable=invalid-name
+  from_state: str
+  to_state: str
+  retries: int
+
+
+class LeaseReaper():
+  """Moves jobs whose lease expired out of their in flight state. Several
+  reapers may run at once: a job is first marked with a token of the reaper,
+  so exactly one reaper owns it. Jobs that expired in the queue are marked
+  with their own token, they never ran and keep their retries"""
+
+  def __init__(self,
+               tablename: str,
+               max_retries: int = MAX_ERRORED_JOB_RETRIES,
+               skew: float = CLOCK_SKEW,
+               clock: Callable[[], float] = time.time,
+               logger: Optional[logging.Logger] = None):
+    self.tablename: str = tablename
+    self.table = get_table(tablename)
+    self.max_retries: int = max_retries
+    self.skew: float = skew
+    self.clock: Callable[[], float] = clock
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.audit = get_audit_sinks()
+
+  def mark(self, session: DbSession, conds: List[Any], token: str) -> int:
+    """Mark the expired jobs matching conds with token, or with token and
+    QUEUE_TAG if they expired in the queue. Returns the number of jobs"""
+    tbl = self.table
+    queue_token = f"{token}{QUEUE_TAG}"
+    #a heartbeat or another reaper after this point no longer matches
+    marked = session.execute(tbl.update().where(
+        and_(*conds, tbl.c.lease_owner.contains(QUEUE_TAG))).values(
+            lease_owner=queue_token)).rowcount
+    marked += session.execute(tbl.update().where(
+        and_(*conds,
+             or_(tbl.c.lease_owner.is_(None), tbl.c.lease_owner
+                 != queue_token))).values(lease_owner=token)).rowcount
+    return marked
+
+  def reap(self,
+           session: DbSession,
+           where: Optional[Dict[str, Any]] = None) -> List[ReapedJob]:
+    """Reclaim the expired jobs matching where, commits. Returns the jobs"""
+    if not has_lease(self.table):
+      return []
+    tbl = self.table
+    token = f"reaper:{get_owner()}:{uuid4().hex[:8]}"
+    conds = [
+        tbl.c.state.in_(list(RECLAIM_NAMES)), tbl.c.lease_expiry
+        < math.floor(self.clock() - self.skew)
+    ]
+    conds.extend(tbl.c[col] == val for col, val in (where or {}).items())
+    owned = tbl.c.lease_owner == token
+    queued = tbl.c.lease_owner == f"{token}{QUEUE_TAG}"
+    try:
+      if not self.mark(session, conds, token):
+        session.commit()
+        return []
+      rows = session.execute(
+          select([
+              tbl.c.id,
+              type_coerce(tbl.c.state, NullType), tbl.c.retries, queued
+          ]).where(or_(owned, queued)).order_by(tbl.c.id)).fetchall()
+      cleared = {'lease_owner': None, 'lease_expiry': None}
+      session.execute(tbl.update().where(queued).values(
+          state=case(RECLAIM_NAMES, value=tbl.c.state),
+          result='queue lease expired, job reclaimed',
+          **cleared))
+      session.execute(tbl.update().where(
+          and_(owned, tbl.c.retries < self.max_retries - 1)).values(
+              state=case(RECLAIM_NAMES, value=tbl.c.state),
+              retries=tbl.c.retries + 1,
+              result='lease expired, job reclaimed',
+              **cleared))
+      session.execute(tbl.update().where(owned).values(
+          state='errored',
+          result='lease expired, max job retries exhausted',
+          **cleared))
+      session.commit()
+    except Exception:
+      session.rollback()
+      raise
+
+    jobs = []
+    for job_id, state, retries, was_queued in rows:
+      if was_queued:
+        jobs.append(ReapedJob(job_id, state, RECLAIM_NAMES[state], retries))
+      elif retries < self.max_retries - 1:
+        jobs.append(ReapedJob(job_id, state, RECLAIM_NAMES[state], retries + 1))
+      else:
+        jobs.append(ReapedJob(job_id, state, 'errored', retries))
+    self.report(jobs)
+    return jobs
+
+  def report(self, jobs: List[ReapedJob]) -> None:
+    """count, log and audit the reaped jobs"""
+    now = time.time()
+    for job in jobs:
+      JOB_STATE_CHANGES.labels(self.tablename, job.to_state).inc()
+    self.logger.warning('Reclaimed %s jobs with expired leases from %s',
+                        len(jobs), self.tablename)
+    emit_audit(self.audit, [{
+        'time': now,
+        'table': self.tablename,
+        'job': job.id,
+        'from': job.from_state,
+        'to': job.to_state,
+        'retries': job.retries,
+        'reason': 'lease expired'
+    } for job in jobs], self.logger)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Buffered job state transitions. Every change is checked against the
+JobEnum transition graph and buffered per job, a flush writes the buffer with
+one UPDATE per group of jobs setting the same columns, values that differ
+between the jobs go through CASE id WHEN ... END. The buffer is flushed once
+flush_size jobs are pending or the oldest change waited flush_delay seconds.
+Flushed changes are reported to the audit sinks, set TUNA_JOB_AUDIT_FILE to
+append them to a json lines file"""
+
+import os
+import enum
+import json
+import time
+import atexit
+import random
+import string
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case
+from sqlalchemy.exc import SQLAlchemyError
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.db.tuna_tables import ANY_STATE_TRANSITIONS, JOB_TRANSITIONS, JobEnum
+from tuna.db.tuna_tables import RECLAIM_STATES
+from tuna.utils.logger import setup_logger
+from tuna.utils.metrics import JOB_STATE_CHANGES
+from tuna.utils.statements import get_table, update_objs
+from tuna.utils.utility import SimpleDict, split_packets
+
+LOGGER = setup_logger('job_state')
+
+#pending jobs that trigger a flush
+FLUSH_SIZE = 500
+#seconds a change may wait in the buffer
+FLUSH_DELAY = 1.0
+#max number of jobs written by one UPDATE statement
+UPDATE_BATCH_SIZE = 1000
+#env var naming the json lines file flushed changes are appended to
+AUDIT_ENV = 'TUNA_JOB_AUDIT_FILE'
+#columns left out of the audit records
+AUDIT_SKIP = ('result', 'cache_loc', 'lease_owner', 'lease_expiry')
+#lease columns of the job tables, see job_lease
+LEASE_COLS = ('lease_owner', 'lease_expiry')
+#states whose jobs hold a lease
+IN_FLIGHT_STATES = frozenset(state.name for state in RECLAIM_STATES)
+
+AuditSink = Callable[[List[Dict[str, Any]]], None]
+
+_JOB_STATES: Dict[str, 'JobStateService'] = {}
+_JOB_STATES_PID: int = os.getpid()
+_JOB_STATES_LOCK = threading.Lock()
+
+
+class IllegalTransition(ValueError):
+  """A job state change missing from the transition graph"""
+
+
+def get_state_name(state: Any) -> Optional[str]:
+  """name of a job state given as string or enum member"""
+  if isinstance(state, enum.Enum):
+    return state.name
+  return state
+
+
+def check_transition(from_state: Any, to_state: Any) -> None:
+  """raise IllegalTransition unless a job may move from from_state to
+  to_state, an unknown from_state (None) only checks to_state"""
+  from_name = get_state_name(from_state)
+  to_name = get_state_name(to_state)
+  try:
+    target = JobEnum[to_name]
+    source = JobEnum[from_name] if from_name is not None else None
+  except KeyError as err:
+    raise IllegalTransition(f"Unknown job state: {err}") from err
+  if source in (None, target) or target in ANY_STATE_TRANSITIONS:
+    return
+  if target not in JOB_TRANSITIONS.get(source, ()):
+    raise IllegalTransition(f"Job state {from_name} can not move to {to_name}")
+
+
+def get_cache_loc() -> str:
+  """random miopen cache dir for a job entering a *_start state"""
+  blurr: str = ''.join(random.choice(string.ascii_lowercase) for i in range(10))
+  return '~/.cache/miopen_' + blurr
+
+
+#pylint: disable=too-few-public-methods
+class JsonlAudit():
+  """Audit sink appending every record as a json line to path"""
+
+  def __init__(self, path: str):
+    self.path: str = path
+    self.lock: threading.Lock = threading.Lock()
+
+  def __call__(self, records: List[Dict[str, Any]]) -> None:
+    lines = ''.join(json.dumps(rec, sort_keys=True) + '\n' for rec in records)
+    with self.lock, open(self.path, 'a', encoding='utf-8') as audit_file:
+      audit_file.write(lines)
+
+
+def emit_audit(sinks: Sequence[AuditSink], records: List[Dict[str, Any]],
+               logger: logging.Logger) -> None:
+  """hand records to every audit sink, a failing sink is logged"""
+  for sink in sinks:
+    try:
+      sink(records)
+    except OSError as err:
+      logger.error('Job state audit failed: %s', err)
+
+
+def get_audit_sinks() -> List[AuditSink]:
+  """audit sinks configured through the environment"""
+  if os.environ.get(AUDIT_ENV):
+    return [JsonlAudit(os.environ[AUDIT_ENV])]
+  return []
+
+
+class StateChange():
+  """Buffered change of one job, values are the columns to write"""
+  __slots__ = ('job_id', 'from_state', 'to_state', 'values', 'time')
+
+  def __init__(self, job_id: int, from_state: Optional[str], to_state: str,
+               values: Dict[str, Any], change_time: float):
+    self.job_id: int = job_id
+    self.from_state: Optional[str] = from_state
+    self.to_state: str = to_state
+    self.values: Dict[str, Any] = values
+    self.time: float = change_time
+
+
+#pylint: disable=too-many-instance-attributes
+class JobStateService():
+  """Validates, buffers and flushes the state changes of a job table"""
+
+  def __init__(self,
+               tablename: str,
+               flush_size: int = FLUSH_SIZE,
+               flush_delay: float = FLUSH_DELAY,
+               audit: Optional[Sequence[AuditSink]] = None,
+               logger: Optional[logging.Logger] = None,
+               clock: Callable[[], float] = time.monotonic):
+    self.tablename: str = tablename
+    self.table = get_table(tablename)
+    self.flush_size: int = max(flush_size, 1)
+    self.flush_delay: float = flush_delay
+    self.audit: List[AuditSink] = list(audit) if audit is not None \
+        else get_audit_sinks()
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.clock: Callable[[], float] = clock
+    #jobs leaving the in flight states drop their lease
+    self.lease_cols: Tuple[str, ...] = tuple(
+        col for col in LEASE_COLS if col in self.table.c)
+    #insertion ordered, the first change is the oldest
+    self.pending: Dict[int, StateChange] = {}
+    self.lock: threading.RLock = threading.RLock()
+    self.stop: threading.Event = threading.Event()
+    self.flusher: Optional[threading.Thread] = None
+
+  def set_state(self,
+                job: Any,
+                state: str,
+                increment_retries: bool = False,
+                result: Optional[str] = None) -> StateChange:
+    """Check and buffer the move of job to state. job is updated in place:
+    state, result, retries and the cache_loc of *_start states"""
+    from_state = get_state_name(getattr(job, 'state', None))
+    check_transition(from_state, state)
+
+    values: Dict[str, Any] = {'state': state, 'gpu_id': job.gpu_id}
+    job.state = state
+    if result:
+      values['result'] = job.result = result
+    if increment_retries:
+      job.retries += 1
+      values['retries'] = job.retries
+    if '_start' in state:
+      values['cache_loc'] = job.cache_loc = get_cache_loc()
+    if state not in IN_FLIGHT_STATES:
+      values.update({col: None for col in self.lease_cols})
+
+    with self.lock:
+      change = self.pending.get(job.id)
+      if change:
+        change.to_state = state
+        change.values.update(values)
+      else:
+        change = StateChange(job.id, from_state, state, values, self.clock())
+        self.pending[job.id] = change
+    return change
+
+  def due(self) -> bool:
+    """True when the buffer is full or its oldest change waited long enough"""
+    with self.lock:
+      if not self.pending:
+        return False
+      if len(self.pending) >= self.flush_size:
+        return True
+      oldest = next(iter(self.pending.values()))
+      return self.clock() - oldest.time >= self.flush_delay
+
+  def update_query(self, changes: List[StateChange]) -> Any:
+    """One UPDATE for changes setting the same columns"""
+    ids = [change.job_id for change in changes]
+    vals: Dict[str, Any] = {}
+    for col in changes[0].values:
+      col_vals = {change.job_id: change.values[col] for change in changes}
+      if len(set(col_vals.values())) == 1:
+        vals[col] = col_vals[ids[0]]
+      else:
+        vals[col] = case(col_vals, value=self.table.c.id)
+    return self.table.update().where(self.table.c.id.in_(ids)).values(vals)
+
+  def write(self, session: DbSession, changes: List[StateChange]) -> None:
+    """Write and commit changes, all or nothing"""
+    groups: Dict[tuple, List[StateChange]] = {}
+    for change in changes:
+      groups.setdefault(tuple(sorted(change.values)), []).append(change)
+    try:
+      for group in groups.values():
+        for batch in split_packets(group, UPDATE_BATCH_SIZE):
+          session.execute(self.update_query(batch))
+      session.commit()
+    except Exception:
+      session.rollback()
+      raise
+
+  def flush(self, session: Optional[DbSession] = None) -> int:
+    """Write the buffer in one transaction of session (a new session if None),
+    returns the number of jobs written. On failure the buffer is kept for the
+    next flush and the error raised"""
+    with self.lock:
+      if not self.pending:
+        return 0
+      changes = list(self.pending.values())
+      try:
+        if session is None:
+          with DbSession() as own_session:
+            self.write(own_session, changes)
+        else:
+          self.write(session, changes)
+      except Exception:
+        self.logger.warning('Job state flush of %s jobs failed', len(changes))
+        raise
+      self.pending = {}
+
+    self.report(changes)
+    return len(changes)
+
+  def flush_if_due(self, session: Optional[DbSession] = None) -> int:
+    """flush when the buffer is due"""
+    return self.flush(session) if self.due() else 0
+
+  def report(self, changes: List[StateChange]) -> None:
+    """Count the flushed changes and hand them to the audit sinks"""
+    for change in changes:
+      JOB_STATE_CHANGES.labels(self.tablename, change.to_state).inc()
+    self.logger.info('Flushed %s job state changes to %s', len(changes),
+                     self.tablename)
+    if not self.audit:
+      return
+    now = time.time()
+    records = []
+    for change in changes:
+      rec = {
+          col: val
+          for col, val in change.values.items()
+          if col not in AUDIT_SKIP and col != 'state'
+      }
+      rec.update({
+          'time': now,
+          'table': self.tablename,
+          'job': change.job_id,
+          'from': change.from_state,
+          'to': change.to_state
+      })
+      records.append(rec)
+    self.emit(records)
+
+  def emit(self, records: List[Dict[str, Any]]) -> None:
+    """hand records to the audit sinks"""
+    emit_audit(self.audit, records, self.logger)
+
+  def transition_where(self, session: DbSession, from_state: str, to_state: str,
+                       where: Dict[str, Any]) -> int:
+    """Move every job in from_state matching where to to_state with one
+    UPDATE and commit, returns the number of jobs moved"""
+    check_transition(from_state, to_state)
+    where = dict(where, state=from_state)
+    values = {'state': to_state}
+    if to_state not in IN_FLIGHT_STATES:
+      values.update({col: None for col in self.lease_cols})
+    count = update_objs(session, [SimpleDict(**values)], values, self.tablename,
+                        where)
+    session.commit()
+    JOB_STATE_CHANGES.labels(self.tablename, to_state).inc(count)
+    self.logger.info('Moved %s jobs of %s from %s to %s', count, self.tablename,
+                     from_state, to_state)
+    self.emit([{
+        'time': time.time(),
+        'table': self.tablename,
+        'job': None,
+        'count': count,
+        'where': {
+            col: val for col, val in where.items() if col != 'state'
+        },
+        'from': from_state,
+        'to': to_state
+    }])
+    return count
+
+  def run_flusher(self) -> None:
+    """background flush loop, bounds the time a change stays buffered"""
+    while not self.stop.wait(self.flush_delay / 2):
+      try:
+        self.flush_if_due()
+      except SQLAlchemyError as err:
+        self.logger.error('Job state flush failed, retrying: %s', err)
+
+  def start(self) -> 'JobStateService':
+    """Flush the buffer in a background thread as it gets due"""
+    with self.lock:
+      if self.flusher is None:
+        self.stop.clear()
+        self.flusher = threading.Thread(target=self.run_flusher,
+                                        name=f"job_state_{self.tablename}",
+                                        daemon=True)
+        self.flusher.start()
+    return self
+
+  def close(self) -> int:
+    """Stop the background thread and flush what is left"""
+    flusher = self.flusher
+    if flusher is not None:
+      self.stop.set()
+      flusher.join()
+      self.flusher = None
+    return self.flush()
+
+  def __enter__(self) -> 'JobStateService':
+    return self
+
+  def __exit__(self, *exc: Any) -> None:
+    self.close()
+
+
+def get_job_states(tablename: str,
+                   logger: Optional[logging.Logger] = None) -> JobStateService:
+  """The process wide state service of the job table tablename"""
+  global _JOB_STATES_PID  # pylint: disable=global-statement
+  with _JOB_STATES_LOCK:
+    if _JOB_STATES_PID != os.getpid():
+      #forked, the buffer and the flusher thread belong to the parent
+      _JOB_STATES.clear()
+      _JOB_STATES_PID = os.getpid()
+    if tablename not in _JOB_STATES:
+      _JOB_STATES[tablename] = JobStateService(tablename, logger=logger)
+    return _JOB_STATES[tablename]
+
+
+def close_job_states() -> None:
+  """Flush and stop the state services of this process"""
+  with _JOB_STATES_LOCK:
+    services = list(_JOB_STATES.values()) if _JOB_STATES_PID == os.getpid() \
+        else []
+  for service in services:
+    try:
+      service.close()
+    except SQLAlchemyError as err:
+      service.logger.error('Lost %s job state changes: %s',
+                           len(service.pending), err)
+
+
+atexit.register(close_job_states)
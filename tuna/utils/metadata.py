@@ -37,3 +37,4 @@ if 'TUNA_LOG_DIR' in os.environ:
 NUM_SQL_RETRIES = 10
 LOG_TIMEOUT = 10 * 60.0  # seconds
 MAX_JOB_RETRIES = 10
+MAX_ERRORED_JOB_RETRIES = 3
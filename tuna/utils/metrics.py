@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Prometheus metrics, exported with prometheus_client over a local HTTP
+endpoint (TUNA_METRICS_PORT) and to a textfile collector file
+(TUNA_METRICS_TEXTFILE). The samples of several processes are merged by
+prometheus_client's multiprocess mode: an exporting process started without
+PROMETHEUS_MULTIPROC_DIR creates a fresh one on import, which multiprocessing
+children and celery workers inherit and stop_exporters removes"""
+
+import os
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Iterator, List, Optional
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+from prometheus_client import multiprocess, values
+from prometheus_client import start_http_server, write_to_textfile
+from prometheus_client.core import GaugeMetricFamily
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.sql_profiler import add_statement_hook
+
+LOGGER = setup_logger('metrics')
+
+#env var naming prometheus_client's directory of per process sample files
+METRICS_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+#env var holding the port of the HTTP endpoint
+METRICS_PORT_ENV = 'TUNA_METRICS_PORT'
+#env var naming the textfile collector file, e.g. <dir>/tuna.prom
+TEXTFILE_ENV = 'TUNA_METRICS_TEXTFILE'
+#seconds between textfile writes
+TEXTFILE_INTERVAL = 15
+#address the HTTP endpoint binds to
+METRICS_ADDR = '127.0.0.1'
+#histogram upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0,
+                   300.0, 1800.0, float('inf'))
+
+#multiprocess dir created on import by the process OWNER_PID
+OWNED_DIR: Optional[str] = None
+OWNER_PID = os.getpid()
+
+
+def init_metrics_dir() -> Optional[str]:
+  """create a multiprocess dir for an exporting process which did not inherit
+  one, returns it. Runs before the first metric is created, metric values pick
+  their storage when they are created"""
+  if os.environ.get(METRICS_DIR_ENV) or not (os.environ.get(METRICS_PORT_ENV) or
+                                             os.environ.get(TEXTFILE_ENV)):
+    return None
+  metrics_dir = tempfile.mkdtemp(prefix='tuna_metrics_')
+  os.environ[METRICS_DIR_ENV] = metrics_dir
+  values.ValueClass = values.MultiProcessValue()
+  atexit.register(remove_metrics_dir)
+  return metrics_dir
+
+
+def remove_metrics_dir() -> None:
+  """remove the multiprocess dir created by this process, metrics created
+  afterwards are kept in process"""
+  global OWNED_DIR  # pylint: disable=global-statement
+  if not OWNED_DIR or OWNER_PID != os.getpid():
+    return
+  shutil.rmtree(OWNED_DIR, ignore_errors=True)
+  if os.environ.get(METRICS_DIR_ENV) == OWNED_DIR:
+    del os.environ[METRICS_DIR_ENV]
+  values.ValueClass = values.MutexValue
+  OWNED_DIR = None
+
+
+class FunctionGauge():
+  """Gauge read from a function when collected, in the exporting process
+  only. Unlike Gauge.set_function it is also exported in multiprocess mode"""
+
+  def __init__(self,
+               name: str,
+               doc: str,
+               registry: Optional[CollectorRegistry] = REGISTRY):
+    self.name: str = name
+    self.doc: str = doc
+    self.function: Optional[Callable[[], float]] = None
+    if registry is not None:
+      registry.register(self)
+
+  def set_function(self, function: Optional[Callable[[], float]]) -> None:
+    """report function(), None to stop"""
+    self.function = function
+
+  def collect(self) -> Iterator[GaugeMetricFamily]:
+    """the gauge, without sample while no function is set"""
+    family = GaugeMetricFamily(self.name, self.doc)
+    function = self.function
+    if function is not None:
+      family.add_metric([], float(function()))
+    yield family
+
+
+def get_registry(metrics_dir: Optional[str] = None) -> CollectorRegistry:
+  """registry to export: the merged samples of the processes writing the
+  multiprocess dir and the function gauges of this one, without a dir
+  REGISTRY"""
+  metrics_dir = metrics_dir if metrics_dir else os.environ.get(METRICS_DIR_ENV)
+  if not metrics_dir:
+    return REGISTRY
+  registry = CollectorRegistry()
+  multiprocess.MultiProcessCollector(registry, metrics_dir)
+  for gauge in FUNCTION_GAUGES:
+    registry.register(gauge)
+  return registry
+
+
+class TextfileWriter(threading.Thread):
+  """Rewrites the textfile every interval seconds until stopped"""
+
+  def __init__(self,
+               path: str,
+               interval: float = TEXTFILE_INTERVAL,
+               registry: Optional[CollectorRegistry] = None,
+               logger: Optional[logging.Logger] = None):
+    super().__init__(name='metrics_textfile', daemon=True)
+    self.path: str = path
+    self.interval: float = interval
+    self.registry: CollectorRegistry = registry if registry else REGISTRY
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.done = threading.Event()
+
+  def write(self) -> None:
+    """write the textfile once"""
+    try:
+      write_to_textfile(self.path, self.registry)
+    except OSError as err:
+      self.logger.warning('Could not write metrics to %s: %s', self.path, err)
+
+  def run(self) -> None:
+    while not self.done.wait(self.interval):
+      self.write()
+    self.write()
+
+  def stop(self) -> None:
+    """write a last time and stop"""
+    self.done.set()
+    self.join()
+
+
+def start_exporters(logger: Optional[logging.Logger] = None) -> List[Any]:
+  """start the exporters configured through TUNA_METRICS_PORT and
+  TUNA_METRICS_TEXTFILE, see stop_exporters"""
+  logger = logger if logger else LOGGER
+  exporters: List[Any] = []
+  port = os.environ.get(METRICS_PORT_ENV)
+  textfile = os.environ.get(TEXTFILE_ENV)
+  if not (port or textfile):
+    return exporters
+  registry = get_registry()
+  if port:
+    server, _ = start_http_server(int(port), METRICS_ADDR, registry)
+    logger.info('Serving metrics on %s:%s', *server.server_address)
+    exporters.append(server)
+  if textfile:
+    writer = TextfileWriter(textfile, registry=registry, logger=logger)
+    writer.start()
+    logger.info('Writing metrics to %s', textfile)
+    exporters.append(writer)
+  return exporters
+
+
+def stop_exporters(exporters: List[Any]) -> None:
+  """stop the exporters returned by start_exporters and remove the
+  multiprocess dir created on import"""
+  for exporter in exporters:
+    if isinstance(exporter, TextfileWriter):
+      exporter.stop()
+    else:
+      exporter.shutdown()
+      exporter.server_close()
+  remove_metrics_dir()
+
+
+def metrics_enabled() -> bool:
+  """True if metrics are exported or shared with an exporter"""
+  return any(
+      os.environ.get(env)
+      for env in (METRICS_DIR_ENV, METRICS_PORT_ENV, TEXTFILE_ENV))
+
+
+def observe_statement(_statement: str, elapsed: float, _rowcount: int) -> None:
+  """statement hook timing SQL statements"""
+  DB_STATEMENT_TIME.observe(elapsed)
+
+
+def attach_db_metrics(engine: Any) -> None:
+  """time every statement executed through engine, sharing the engine hook
+  of the SQL profiler"""
+  add_statement_hook(engine, observe_statement)
+
+
+OWNED_DIR = init_metrics_dir()
+
+#tuning metrics
+JOBS_CLAIMED = Counter('tuna_jobs_claimed', 'Jobs claimed from a job table',
+                       ['table'])
+JOBS_ENQUEUED = Counter('tuna_jobs_enqueued', 'Jobs sent to a celery queue',
+                        ['queue'])
+QUEUE_DEPTH = FunctionGauge(
+    'tuna_queue_depth', 'Jobs enqueued whose results are not collected yet')
+RESULT_LAG = Histogram('tuna_result_lag_seconds',
+                       'Time from task completion to result collection',
+                       buckets=DEFAULT_BUCKETS)
+PARSE_RESULT_TIME = Histogram('tuna_parse_result_seconds',
+                              'Time to parse and store one task result',
+                              buckets=DEFAULT_BUCKETS)
+DB_STATEMENT_TIME = Histogram('tuna_db_statement_seconds',
+                              'SQL statement execution time',
+                              buckets=DEFAULT_BUCKETS)
+COMMAND_TIME = Histogram('tuna_exec_command_seconds',
+                         'Time to run a command on a machine', ['transport'],
+                         buckets=DEFAULT_BUCKETS)
+JOB_STATE_CHANGES = Counter('tuna_job_state_changes',
+                            'Job state changes written to a job table',
+                            ['table', 'state'])
+WORKER_STEP_TIME = Histogram('tuna_worker_step_seconds',
+                             'Duration of one worker compile or eval step',
+                             ['worker', 'gpu_id'],
+                             buckets=DEFAULT_BUCKETS)
+RETRIES = Counter('tuna_retries', 'Failed attempts that were retried',
+                  ['operation', 'kind'])
+RETRY_GIVEUPS = Counter('tuna_retry_giveups',
+                        'Operations that stopped retrying, by reason',
+                        ['operation', 'reason'])
+RETRY_SLEEP = Counter('tuna_retry_sleep_seconds',
+                      'Time spent backing off before retries', ['operation'])
+CIRCUIT_OPENS = Counter('tuna_circuit_opens', 'Circuit breakers opened',
+                        ['key'])
+
+#function gauges, read by the exporting process in multiprocess mode
+FUNCTION_GAUGES = [QUEUE_DEPTH]
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Worker local cache of small, rarely changing reference tables (solver,
+tensor, machine). An entry is served for TTL seconds, then kept as long as the
+counter of its table in ref_version has not moved. Set TUNA_REF_CACHE_DIR to
+share snapshots of the entries between workers, e.g. a directory on /dev/shm"""
+
+import os
+import time
+import pickle
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from tuna.db.ref_version import RefVersion
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('ref_cache')
+
+#seconds an entry is served without looking at its version counter
+REF_TTL = 300.0
+#env var overriding REF_TTL
+TTL_ENV = 'TUNA_REF_CACHE_TTL'
+#env var naming the snapshot directory, snapshots are off when unset
+SNAPSHOT_ENV = 'TUNA_REF_CACHE_DIR'
+#snapshot file name of an entry
+SNAPSHOT_FILE = '{name}.pkl'
+#counters reported by RefCache.stats, all but loads are served from the cache
+STAT_KEYS = ('hits', 'revalidated', 'snapshot', 'loads')
+
+_REF_CACHE: Optional['RefCache'] = None
+_REF_CACHE_LOCK = threading.Lock()
+
+
+def get_version(session: Session, name: str) -> int:
+  """version counter of the table name, 0 until it is first bumped"""
+  query = select([RefVersion.version]).where(RefVersion.name == name)
+  version = session.execute(query).scalar()
+  return version if version is not None else 0
+
+
+def bump_version(session: Session, name: str) -> None:
+  """increment the version counter of the table name, the caller commits"""
+  table = RefVersion.__table__
+  query = table.update().where(table.c.name == name).values(
+      version=table.c.version + 1)
+  if session.execute(query).rowcount:
+    return
+  try:
+    with session.begin_nested():
+      session.execute(table.insert().values(name=name, version=1))
+  except IntegrityError:
+    #another writer created the counter first
+    session.execute(query)
+
+
+#pylint: disable=too-few-public-methods
+class RefEntry():
+  """A cached value, the version it was loaded at and when that was checked"""
+  __slots__ = ('value', 'version', 'checked')
+
+  def __init__(self, value: Any, version: Optional[int], checked: float):
+    self.value = value
+    self.version = version
+    self.checked = checked
+
+
+class RefCache():
+  """TTL cache of reference data, invalidated through ref_version counters.
+  Entries are named after the table whose counter invalidates them"""
+
+  def __init__(self,
+               ttl: Optional[float] = None,
+               snapshot_dir: Optional[str] = None,
+               logger: Optional[logging.Logger] = None,
+               clock: Callable[[], float] = time.monotonic):
+    self.ttl: float = ttl if ttl is not None else float(
+        os.environ.get(TTL_ENV, REF_TTL))
+    self.snapshot_dir: Optional[str] = snapshot_dir if snapshot_dir \
+        else os.environ.get(SNAPSHOT_ENV)
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.clock = clock
+    self.lock = threading.Lock()
+    self.entries: Dict[str, RefEntry] = {}
+    self.counts: Dict[str, Dict[str, int]] = {}
+
+  def reset_lock(self) -> None:
+    """replace the lock, called in forked children"""
+    self.lock = threading.Lock()
+
+  def get(self, name: str, loader: Callable[[], Any]) -> Any:
+    """cached value of name, loader() is called when there is none or the
+    version counter of name moved"""
+    with self.lock:
+      now = self.clock()
+      entry = self.entries.get(name)
+      if entry is not None and now - entry.checked < self.ttl:
+        self.count(name, 'hits')
+        return entry.value
+
+      version = self.read_version(name)
+      if entry is not None and version is not None and \
+          entry.version == version:
+        entry.checked = now
+        self.count(name, 'revalidated')
+        return entry.value
+
+      entry = self.read_snapshot(name, version)
+      if entry is not None:
+        entry.checked = now
+        self.entries[name] = entry
+        self.count(name, 'snapshot')
+        return entry.value
+
+      #the version is read before the data, a bump racing the load only
+      #causes one extra reload
+      entry = RefEntry(loader(), version, now)
+      self.entries[name] = entry
+      self.count(name, 'loads')
+      self.write_snapshot(name, entry)
+      return entry.value
+
+  def invalidate(self, name: Optional[str] = None) -> None:
+    """drop name (default: all entries) from this process and the snapshots"""
+    with self.lock:
+      names = [name] if name else list(self.entries)
+      for key in names:
+        self.entries.pop(key, None)
+        if self.snapshot_dir:
+          try:
+            os.remove(self.get_snapshot_file(key))
+          except FileNotFoundError:
+            pass
+
+  def bump(self, name: str) -> None:
+    """invalidate name in every worker, call after writing its table"""
+    try:
+      with DbSession() as session:
+        bump_version(session, name)
+        session.commit()
+    except SQLAlchemyError as err:
+      self.logger.warning('Could not bump %s version: %s', name, err)
+    self.invalidate(name)
+
+  def read_version(self, name: str) -> Optional[int]:
+    """version counter of name, None if it can not be read"""
+    try:
+      with DbSession() as session:
+        return get_version(session, name)
+    except SQLAlchemyError as err:
+      self.logger.warning('No version for %s, reloading on expiry: %s', name,
+                          err)
+      return None
+
+  def get_snapshot_file(self, name: str) -> str:
+    """snapshot path of name"""
+    return os.path.join(self.snapshot_dir, SNAPSHOT_FILE.format(name=name))
+
+  def read_snapshot(self, name: str,
+                    version: Optional[int]) -> Optional[RefEntry]:
+    """entry of name saved by another worker, if it is still current"""
+    if not self.snapshot_dir:
+      return None
+    try:
+      with open(self.get_snapshot_file(name), 'rb') as snap_file:
+        snap_version, saved, value = pickle.load(snap_file)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError) as err:
+      if not isinstance(err, FileNotFoundError):
+        self.logger.warning('Ignoring %s snapshot: %s', name, err)
+      return None
+
+    if version is None:
+      #without a counter only a snapshot younger than the TTL is trusted
+      current = time.time() - saved < self.ttl
+    else:
+      current = snap_version == version
+    return RefEntry(value, version, 0.0) if current else None
+
+  def write_snapshot(self, name: str, entry: RefEntry) -> None:
+    """save entry for the other workers, atomically replacing the old one"""
+    if not self.snapshot_dir:
+      return
+    try:
+      os.makedirs(self.snapshot_dir, exist_ok=True)
+      snap_fd, tmp_file = tempfile.mkstemp(dir=self.snapshot_dir, suffix='.tmp')
+      with os.fdopen(snap_fd, 'wb') as snap_file:
+        pickle.dump((entry.version, time.time(), entry.value), snap_file,
+                    pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp_file, self.get_snapshot_file(name))
+    except (OSError, pickle.PicklingError) as err:
+      self.logger.warning('Could not write %s snapshot: %s', name, err)
+
+  def count(self, name: str, key: str) -> None:
+    """add one to the key counter of name"""
+    if name not in self.counts:
+      self.counts[name] = dict.fromkeys(STAT_KEYS, 0)
+    self.counts[name][key] += 1
+
+  def stats(self) -> Dict[str, Any]:
+    """counters and hit rate of every entry and of the whole cache"""
+    ret: Dict[str, Any] = {}
+    total = dict.fromkeys(STAT_KEYS, 0)
+    with self.lock:
+      for name, counts in self.counts.items():
+        ret[name] = dict(counts, hit_rate=get_hit_rate(counts))
+        for key in STAT_KEYS:
+          total[key] += counts[key]
+    ret['total'] = dict(total, hit_rate=get_hit_rate(total))
+    return ret
+
+
+def get_hit_rate(counts: Dict[str, int]) -> float:
+  """share of the lookups that did not call the loader"""
+  lookups = sum(counts[key] for key in STAT_KEYS)
+  return 1 - counts['loads'] / lookups if lookups else 0.0
+
+
+def get_ref_cache() -> RefCache:
+  """The process wide reference data cache"""
+  global _REF_CACHE  # pylint: disable=global-statement
+  with _REF_CACHE_LOCK:
+    if _REF_CACHE is None:
+      _REF_CACHE = RefCache()
+      #a fork while another thread loads would leave the lock held in the
+      #child, which otherwise starts warm with the parent's entries
+      os.register_at_fork(after_in_child=_REF_CACHE.reset_lock)
+  return _REF_CACHE
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Retry policies shared by the DB and ssh call sites. Errors are classified
+as retryable, deadlock or fatal. Retries back off exponentially with
+decorrelated jitter, inside a per operation budget of attempts and seconds.
+Retryable errors also count against a circuit breaker per host or DB, an
+open breaker fails calls fast instead of adding to a retry storm"""
+
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import pymysql
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.metrics import CIRCUIT_OPENS, RETRIES, RETRY_GIVEUPS
+from tuna.utils.metrics import RETRY_SLEEP
+
+LOGGER = setup_logger('retry')
+
+#error classes
+RETRYABLE = 'retryable'
+DEADLOCK = 'deadlock'
+FATAL = 'fatal'
+#MySQL errors of lock conflicts, the server is fine, retry soon
+MYSQL_DEADLOCK_ERRORS = (1205, 1213)
+#consecutive retryable failures that open a circuit breaker
+BREAKER_THRESHOLD = 5
+#seconds an open breaker waits before letting a probe call through
+BREAKER_RESET = 30.0
+#backoff of deadlocks relative to the policy base delay
+DEADLOCK_SCALE = 0.1
+
+Classifier = Callable[[BaseException], str]
+
+
+class CircuitOpen(Exception):
+  """Raised instead of calling through an open circuit breaker"""
+
+
+def classify_db_error(error: BaseException) -> str:
+  """error class of a sqlalchemy or pymysql error"""
+  if isinstance(error, (IntegrityError, pymysql.err.IntegrityError)):
+    return FATAL
+  if isinstance(error, (OperationalError, pymysql.err.OperationalError)):
+    orig = getattr(error, 'orig', error)
+    args = getattr(orig, 'args', ())
+    if (args and args[0] in MYSQL_DEADLOCK_ERRORS) or \
+        'database is locked' in str(orig):
+      return DEADLOCK
+    return RETRYABLE
+  if isinstance(error, DBAPIError) and error.connection_invalidated:
+    return RETRYABLE
+  return FATAL
+
+
+def classify_any(_error: BaseException) -> str:
+  """every error is retryable"""
+  return RETRYABLE
+
+
+#pylint: disable=too-many-instance-attributes
+class CircuitBreaker():
+  """Opens after threshold consecutive failures. Once reset seconds passed one
+  probe call goes through, its outcome closes or reopens the breaker"""
+
+  def __init__(self,
+               key: str,
+               threshold: int = BREAKER_THRESHOLD,
+               reset: float = BREAKER_RESET,
+               clock: Callable[[], float] = time.monotonic,
+               logger: Optional[logging.Logger] = None):
+    self.key: str = key
+    self.threshold: int = threshold
+    self.reset: float = reset
+    self.clock: Callable[[], float] = clock
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.failures: int = 0
+    self.opened_at: Optional[float] = None
+    self.probe_at: Optional[float] = None
+    self.lock: threading.Lock = threading.Lock()
+
+  @property
+  def is_open(self) -> bool:
+    """True while calls are refused"""
+    return self.opened_at is not None
+
+  def allow(self) -> bool:
+    """True if a call may go through now, the first call after the reset
+    period is the probe"""
+    with self.lock:
+      if self.opened_at is None:
+        return True
+      now = self.clock()
+      last = self.probe_at if self.probe_at is not None else self.opened_at
+      if now - last >= self.reset:
+        self.probe_at = now
+        return True
+      return False
+
+  def record_success(self) -> None:
+    """close the breaker"""
+    with self.lock:
+      if self.opened_at is not None:
+        self.logger.info('Circuit %s closed', self.key)
+      self.failures = 0
+      self.opened_at = None
+      self.probe_at = None
+
+  def record_failure(self) -> None:
+    """count a failure, open the breaker at threshold or on a failed probe"""
+    with self.lock:
+      self.failures += 1
+      if self.probe_at is not None:
+        #the probe failed
+        self.opened_at = self.clock()
+        self.probe_at = None
+      elif self.opened_at is None and self.failures >= self.threshold:
+        self.opened_at = self.clock()
+        CIRCUIT_OPENS.labels(self.key).inc()
+        self.logger.warning('Circuit %s opened after %s failures', self.key,
+                            self.failures)
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(key: str) -> CircuitBreaker:
+  """The process wide circuit breaker of key, e.g. ssh:<host>:<port>"""
+  with _BREAKERS_LOCK:
+    if key not in _BREAKERS:
+      _BREAKERS[key] = CircuitBreaker(key)
+    return _BREAKERS[key]
+
+
+#pylint: disable=too-many-instance-attributes,too-many-arguments
+class RetryPolicy():
+  """Retry settings of one operation: at most max_attempts attempts within
+  budget seconds, sleeping min(cap, uniform(base, 3 * last sleep)) between
+  them. Deadlocks start from base * DEADLOCK_SCALE"""
+
+  def __init__(self,
+               name: str,
+               max_attempts: int = 10,
+               budget: Optional[float] = None,
+               base: float = 1.0,
+               cap: float = 30.0,
+               classify: Classifier = classify_db_error,
+               clock: Callable[[], float] = time.monotonic,
+               sleep: Callable[[float], None] = time.sleep,
+               rng: Optional[random.Random] = None,
+               logger: Optional[logging.Logger] = None):
+    self.name: str = name
+    self.max_attempts: int = max_attempts
+    self.budget: Optional[float] = budget
+    self.base: float = base
+    self.cap: float = cap
+    self.classify: Classifier = classify
+    self.clock: Callable[[], float] = clock
+    self.sleep: Callable[[float], None] = sleep
+    self.rng: random.Random = rng if rng else random.Random()
+    self.logger: logging.Logger = logger if logger else LOGGER
+
+  def get_delay(self, last: float, kind: str) -> float:
+    """decorrelated jitter backoff following a sleep of last seconds"""
+    base = self.base * DEADLOCK_SCALE if kind == DEADLOCK else self.base
+    return min(self.cap, self.rng.uniform(base, max(last, base) * 3))
+
+  def start(self,
+            key: Optional[str] = None,
+            breaker: Optional[CircuitBreaker] = None) -> 'RetryState':
+    """retry state of one call, guarded by the breaker of key if given"""
+    if breaker is None and key is not None:
+      breaker = get_breaker(key)
+    return RetryState(self, breaker)
+
+  def call(self,
+           func: Callable[..., Any],
+           *args: Any,
+           key: Optional[str] = None,
+           **kwargs: Any) -> Any:
+    """func(*args, **kwargs), retried. Raises the last error once the budget
+    is spent, or CircuitOpen"""
+    retry = self.start(key)
+    while True:
+      if not retry.allow():
+        raise CircuitOpen(f'{self.name}: circuit {key} is open')
+      try:
+        ret = func(*args, **kwargs)
+      except Exception as err:  #pylint: disable=broad-except
+        if not retry.failed(self.classify(err), err):
+          raise
+      else:
+        retry.succeeded()
+        return ret
+
+
+class RetryState():
+  """Attempts of one call under a RetryPolicy, for call sites with their own
+  loop: call failed() after each failure, it sleeps and returns True if the
+  call should be tried again"""
+
+  def __init__(self, policy: RetryPolicy, breaker: Optional[CircuitBreaker]):
+    self.policy: RetryPolicy = policy
+    self.breaker: Optional[CircuitBreaker] = breaker
+    self.attempt: int = 0
+    self.delay: float = 0.0
+    self.started: float = policy.clock()
+
+  def allow(self) -> bool:
+    """False if the circuit breaker refuses the call"""
+    if self.breaker is None or self.breaker.allow():
+      return True
+    RETRY_GIVEUPS.labels(self.policy.name, 'circuit_open').inc()
+    return False
+
+  def succeeded(self) -> None:
+    """record a successful attempt"""
+    if self.breaker is not None:
+      self.breaker.record_success()
+
+  def give_up(self, reason: str) -> bool:
+    """count and log the end of the retries, returns False"""
+    RETRY_GIVEUPS.labels(self.policy.name, reason).inc()
+    if reason != FATAL:
+      self.policy.logger.error('%s: giving up after %s attempts (%s)',
+                               self.policy.name, self.attempt, reason)
+    return False
+
+  def failed(self, kind: str, error: Optional[BaseException] = None) -> bool:
+    """record a failed attempt of class kind, sleep before the next one.
+    Returns False if the call should not be retried"""
+    policy = self.policy
+    self.attempt += 1
+    if kind == FATAL:
+      return self.give_up(FATAL)
+    if kind == RETRYABLE and self.breaker is not None:
+      self.breaker.record_failure()
+    if self.attempt >= policy.max_attempts:
+      return self.give_up('attempts')
+    delay = policy.get_delay(self.delay, kind)
+    if policy.budget is not None and \
+        policy.clock() + delay - self.started > policy.budget:
+      return self.give_up('budget')
+    if self.breaker is not None and self.breaker.is_open:
+      return self.give_up('circuit_open')
+
+    RETRIES.labels(policy.name, kind).inc()
+    RETRY_SLEEP.labels(policy.name).inc(delay)
+    policy.logger.warning('%s: attempt %s failed (%s: %s), retrying in %.2fs',
+                          policy.name, self.attempt, kind, error, delay)
+    policy.sleep(delay)
+    self.delay = delay
+    return True
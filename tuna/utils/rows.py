@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Row materialization for selects. Each column set gets a generated
+SimpleDict subclass holding the columns in __slots__, built once and cached.
+Rows can also be converted straight to the dicts SimpleDict.to_dict returns,
+without building the objects"""
+
+import keyword
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from tuna.utils.utility import SimpleDict, filter_row_dict
+
+#number of generated row classes and dict converters kept
+ROW_CLASS_CACHE = 256
+
+
+class Row(SimpleDict):
+  """Base of the generated row classes. The columns are slots, attributes
+  set later (e.g. attached tensors) go to the instance dict"""
+  # pylint: disable=too-few-public-methods
+  __slots__ = ()
+  _fields: Tuple[str, ...] = ()
+
+  @staticmethod
+  def _make(row: Sequence[Any]) -> 'Row':
+    """instance holding the values of row, generated by get_row_class"""
+    raise NotImplementedError("Not implemented")
+
+  def to_dict(self, ommit_ts=True, ommit_valid=False):
+    """return dict copy of object"""
+    ret = {
+        field: getattr(self, field)
+        for field in self._fields
+        if hasattr(self, field)
+    }
+    ret.update(vars(self))
+    return filter_row_dict(ret, ommit_ts, ommit_valid)
+
+  def __reduce__(self):
+    state = {
+        field: getattr(self, field)
+        for field in self._fields
+        if hasattr(self, field)
+    }
+    state.update(vars(self))
+    return (make_row, (self._fields, state))
+
+
+def check_fields(fields: Tuple[str, ...]) -> None:
+  """column names must be usable as slot names"""
+  if len(set(fields)) != len(fields):
+    raise ValueError(f"Duplicate column names: {fields}")
+  for field in fields:
+    if not field.isidentifier() or keyword.iskeyword(field) or \
+        field.startswith('_'):
+      raise ValueError(f"Invalid column name: {field}")
+
+
+@lru_cache(maxsize=ROW_CLASS_CACHE)
+def get_row_class(fields: Tuple[str, ...]) -> Any:
+  """Row subclass for the columns fields, its _make(row) builds an instance
+  from a sequence of values in fields order"""
+  check_fields(fields)
+  cls = type('Row', (Row,), {
+      '__slots__': fields,
+      '_fields': fields,
+      '__module__': __name__
+  })
+  #generated like collections.namedtuple, one unpacking per row instead of
+  #a setattr per column. fields are checked identifiers
+  namespace = {'_new': object.__new__, '_cls': cls}
+  targets = ''.join(f"self.{field}, " for field in fields)
+  assign = f"{targets}= row\n  " if fields else ''
+  exec(  # pylint: disable=exec-used
+      f"def _make(row):\n  self = _new(_cls)\n  {assign}return self", namespace)
+  cls._make = staticmethod(namespace['_make'])  # pylint: disable=protected-access
+  return cls
+
+
+def make_row(fields: Tuple[str, ...], state: Dict[str, Any]) -> Row:
+  """rebuild a pickled row"""
+  row = object.__new__(get_row_class(fields))
+  for key, val in state.items():
+    setattr(row, key, val)
+  return row
+
+
+def rows_to_objs(ret: Iterable[Sequence[Any]],
+                 attribs: Iterable[str]) -> List[Row]:
+  """Row objects for the select results ret with columns attribs"""
+  return list(map(get_row_class(tuple(attribs))._make, ret))  # pylint: disable=protected-access
+
+
+@lru_cache(maxsize=ROW_CLASS_CACHE)
+def get_dict_converter(attribs: Tuple[str, ...],
+                       ommit_ts: bool = True,
+                       ommit_valid: bool = False) -> Callable[[Sequence], dict]:
+  """function turning a row with columns attribs into the dict to_dict
+  would return for it"""
+  cols = tuple(filter_row_dict(dict.fromkeys(attribs), ommit_ts, ommit_valid))
+  if cols == attribs:
+    return lambda row: dict(zip(attribs, row))
+  if not cols:
+    return lambda row: {}
+  getter = itemgetter(*[attribs.index(col) for col in cols])
+  if len(cols) == 1:
+    return lambda row: {cols[0]: getter(row)}
+  return lambda row: dict(zip(cols, getter(row)))
+
+
+def rows_to_dicts(ret: Iterable[Sequence[Any]],
+                  attribs: Iterable[str],
+                  ommit_ts: bool = True,
+                  ommit_valid: bool = False) -> List[dict]:
+  """the to_dict shape of the select results ret, without building row
+  objects"""
+  return list(
+      map(get_dict_converter(tuple(attribs), ommit_ts, ommit_valid), ret))
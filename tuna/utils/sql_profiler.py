@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Opt-in SQL statement profiler. Statements sent through SQLAlchemy engines
+and DbCursor are grouped by fingerprint and call site. Set TUNA_SQL_PROFILE to
+enable it for every DbPool, the report is written at exit or on SIGUSR2"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import signal
+import logging
+import weakref
+import threading
+import contextlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy import event
+
+from tuna.utils.logger import setup_logger
+from tuna.utils.stats import LatencyStats
+
+LOGGER = setup_logger('sql_profiler')
+
+#env var enabling the profiler, its value is the report file or 1 to log it,
+#{pid} in the file name is replaced by the process id
+PROFILE_ENV = 'TUNA_SQL_PROFILE'
+#signal dumping the report of a running process
+REPORT_SIGNAL = signal.SIGUSR2
+#fingerprints listed when a statement budget is exceeded
+BUDGET_TOP = 10
+#connection info key holding the start times of executing statements
+START_KEY = 'sql_profiler_start'
+
+#frames in these files are skipped when looking for the call site
+TUNA_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKIP_PATHS = (os.path.dirname(sqlalchemy.__file__), contextlib.__file__,
+              os.path.abspath(__file__), os.path.join(TUNA_ROOT, 'sql.py'),
+              os.path.join(TUNA_ROOT, 'dbBase', 'sql_alchemy.py'),
+              os.path.join(TUNA_ROOT, 'utils', 'db_utility.py'))
+
+#string and numeric literals and bound parameters
+LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\""
+                        r"|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|(?<!:):\w+")
+IN_LIST_RE = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+VALUES_RE = re.compile(r"\bvalues\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))*",
+                       re.IGNORECASE)
+SPACE_RE = re.compile(r"\s+")
+
+_PROFILER: Optional['SqlProfiler'] = None
+_PROFILER_LOCK = threading.Lock()
+_HOOKS: 'weakref.WeakKeyDictionary[Any, StatementHooks]' = \
+    weakref.WeakKeyDictionary()
+_HOOKS_LOCK = threading.Lock()
+
+
+def fingerprint(statement: str) -> str:
+  """statement with literals replaced by ?, IN lists and multi row VALUES
+  collapsed, so that statements differing only in values match"""
+  ret = LITERAL_RE.sub('?', str(statement))
+  ret = IN_LIST_RE.sub('IN (...)', ret)
+  ret = VALUES_RE.sub(r'VALUES \1', ret)
+  return SPACE_RE.sub(' ', ret).strip()
+
+
+def get_call_site() -> str:
+  """file:line (function) of the first caller outside the db layers"""
+  frame = sys._getframe(1)  # pylint: disable=protected-access
+  while frame is not None:
+    file_name = frame.f_code.co_filename
+    if not file_name.startswith(SKIP_PATHS):
+      if file_name.startswith(TUNA_ROOT):
+        file_name = os.path.relpath(file_name, os.path.dirname(TUNA_ROOT))
+      return f"{file_name}:{frame.f_lineno} ({frame.f_code.co_name})"
+    frame = frame.f_back
+  return 'unknown'
+
+
+class ProfiledCursor():
+  """DBAPI cursor proxy timing execute and executemany"""
+
+  def __init__(self, cursor: Any, profiler: 'SqlProfiler'):
+    self.cursor: Any = cursor
+    self.profiler: SqlProfiler = profiler
+
+  def _timed(self, func, query, args) -> Any:
+    start = time.perf_counter()
+    try:
+      return func(query) if args is None else func(query, args)
+    finally:
+      self.profiler.record(query,
+                           time.perf_counter() - start, self.cursor.rowcount)
+
+  def execute(self, query: str, args: Any = None) -> Any:
+    """timed cursor.execute"""
+    return self._timed(self.cursor.execute, query, args)
+
+  def executemany(self, query: str, args: Any) -> Any:
+    """timed cursor.executemany"""
+    return self._timed(self.cursor.executemany, query, args)
+
+  def __iter__(self):
+    return iter(self.cursor)
+
+  def __getattr__(self, name: str) -> Any:
+    return getattr(self.cursor, name)
+
+
+class StatementHooks():
+  """The single before/after_cursor_execute listener pair of an engine, hooks
+  are called with (statement, seconds, rowcount) after every statement"""
+
+  def __init__(self):
+    self.hooks: List[Callable[[str, float, int], None]] = []
+
+  def before_execute(self, conn, _cursor, _statement, _params, _context,
+                     _executemany) -> None:
+    """engine event, stack the start time on the connection"""
+    conn.info.setdefault(START_KEY, []).append(time.perf_counter())
+
+  def after_execute(self, conn, cursor, statement, _params, _context,
+                    _executemany) -> None:
+    """engine event, pass the statement time to the hooks"""
+    starts = conn.info.get(START_KEY)
+    if starts:
+      elapsed = time.perf_counter() - starts.pop()
+      for hook in list(self.hooks):
+        hook(statement, elapsed, cursor.rowcount)
+
+
+def add_statement_hook(engine: Any, hook: Callable[[str, float, int],
+                                                   None]) -> None:
+  """call hook(statement, seconds, rowcount) for every statement executed
+  through engine, the engine is timed once whatever the number of hooks"""
+  with _HOOKS_LOCK:
+    hooks = _HOOKS.get(engine)
+    if hooks is None:
+      hooks = _HOOKS[engine] = StatementHooks()
+      event.listen(engine, 'before_cursor_execute', hooks.before_execute)
+      event.listen(engine, 'after_cursor_execute', hooks.after_execute)
+    hooks.hooks.append(hook)
+
+
+def remove_statement_hook(engine: Any, hook: Callable[[str, float, int],
+                                                      None]) -> None:
+  """undo add_statement_hook, the listeners go with the last hook"""
+  with _HOOKS_LOCK:
+    hooks = _HOOKS.get(engine)
+    if hooks is None or hook not in hooks.hooks:
+      return
+    hooks.hooks.remove(hook)
+    if not hooks.hooks:
+      event.remove(engine, 'before_cursor_execute', hooks.before_execute)
+      event.remove(engine, 'after_cursor_execute', hooks.after_execute)
+      del _HOOKS[engine]
+
+
+class SqlProfiler():
+  """Count, latency and rows per statement fingerprint and call site"""
+
+  def __init__(self, logger: Optional[logging.Logger] = None):
+    self.logger: logging.Logger = logger if logger else LOGGER
+    self.lock: threading.Lock = threading.Lock()
+    self.stats: Dict[Tuple[str, str], LatencyStats] = {}
+    self.rows: Dict[Tuple[str, str], int] = {}
+    self.engines: List[Any] = []
+
+  def attach(self, engine: Any) -> None:
+    """profile every statement executed through engine"""
+    add_statement_hook(engine, self.record)
+    self.engines.append(engine)
+
+  def detach(self) -> None:
+    """stop profiling the attached engines"""
+    for engine in self.engines:
+      remove_statement_hook(engine, self.record)
+    self.engines = []
+
+  def wrap_cursor(self, cursor: Any) -> ProfiledCursor:
+    """profile the statements of a raw DBAPI cursor, see DbCursor"""
+    return ProfiledCursor(cursor, self)
+
+  def record(self, statement: str, elapsed: float, rowcount: int) -> None:
+    """add one execution of statement"""
+    key = (fingerprint(statement), get_call_site())
+    with self.lock:
+      stats = self.stats.get(key)
+      if stats is None:
+        stats = self.stats[key] = LatencyStats()
+        self.rows[key] = 0
+      #-1 when the driver does not know, e.g. sqlite selects
+      self.rows[key] += max(rowcount or 0, 0)
+    stats.record(elapsed)
+
+  def count(self) -> int:
+    """number of statements recorded"""
+    with self.lock:
+      return sum(stats.count for stats in self.stats.values())
+
+  def reset(self) -> None:
+    """drop everything recorded so far"""
+    with self.lock:
+      self.stats = {}
+      self.rows = {}
+
+  def report(self) -> List[Dict[str, Any]]:
+    """per fingerprint and call site statistics, most total time first"""
+    with self.lock:
+      items = list(self.stats.items())
+      rows = dict(self.rows)
+    ret = []
+    for key, stats in items:
+      entry = {'fingerprint': key[0], 'call_site': key[1]}
+      entry.update(stats.summary())
+      entry['total_ms'] = stats.total * 1000
+      entry['rows'] = rows[key]
+      ret.append(entry)
+    return sorted(ret, key=lambda entry: entry['total_ms'], reverse=True)
+
+  def dump(self, report_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    """write the report as json to report_file, or to the logger"""
+    report = self.report()
+    if report_file:
+      report_file = report_file.replace('{pid}', str(os.getpid()))
+      with open(report_file, 'w', encoding='utf-8') as fout:
+        json.dump(report, fout, indent=2)
+      self.logger.info('SQL profile of %s statements written to %s',
+                       self.count(), report_file)
+    else:
+      for entry in report:
+        self.logger.info(
+            'SQL %.1f ms total, %s calls, p50 %.2f ms, p99 %.2f ms, %s rows,'
+            ' %s: %s', entry['total_ms'], entry['count'], entry['p50_ms'],
+            entry['p99_ms'], entry['rows'], entry['call_site'],
+            entry['fingerprint'])
+    return report
+
+  def check_budget(self, limit: int) -> Optional[str]:
+    """None if at most limit statements were recorded, else a description of
+    the most frequent ones"""
+    count = self.count()
+    if count <= limit:
+      return None
+    top = sorted(self.report(), key=lambda entry: entry['count'],
+                 reverse=True)[:BUDGET_TOP]
+    lines = [f"{count} SQL statements, budget is {limit}:"]
+    lines += [
+        f"  {entry['count']}x {entry['call_site']}: {entry['fingerprint']}"
+        for entry in top
+    ]
+    return '\n'.join(lines)
+
+
+def install(profiler: SqlProfiler, report_file: Optional[str] = None) -> None:
+  """dump the report of profiler at exit and on REPORT_SIGNAL"""
+  atexit.register(profiler.dump, report_file)
+  if threading.current_thread() is threading.main_thread():
+    signal.signal(REPORT_SIGNAL,
+                  lambda _sig, _frame: profiler.dump(report_file))
+
+
+def get_profiler() -> Optional[SqlProfiler]:
+  """The process wide profiler, None unless TUNA_SQL_PROFILE is set"""
+  global _PROFILER  # pylint: disable=global-statement
+  report_file = os.environ.get(PROFILE_ENV)
+  if not report_file:
+    return None
+  with _PROFILER_LOCK:
+    if _PROFILER is None:
+      _PROFILER = SqlProfiler()
+      install(_PROFILER, None if report_file == '1' else report_file)
+  return _PROFILER
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Cached SQLAlchemy Core statements with bound parameters. Replaces the
+string formatted gen_update_query, gen_insert_query and gen_select_objs: the
+statement text is the same for every call with the same table and columns, so
+it is compiled once and multi row calls go through executemany"""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, select, type_coerce
+from sqlalchemy.sql.schema import Table
+from sqlalchemy.types import NullType
+from sqlalchemy.util import LRUCache
+
+from tuna.dbBase.base_class import BASE
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.utils.db_utility import db_rows_to_obj
+from tuna.utils.logger import setup_logger
+from tuna.utils.utility import SimpleDict
+
+LOGGER = setup_logger('statements')
+
+#number of distinct statements kept per builder
+STATEMENT_CACHE = 256
+#compiled form of the cached statements, per dialect
+COMPILED_CACHE = LRUCache(STATEMENT_CACHE)
+#prefix of the WHERE clause parameters, SET parameters use the column name
+WHERE_PREFIX = 'w_'
+
+
+def get_table(tablename: str) -> Table:
+  """Core table of a declared tuna table"""
+  try:
+    return BASE.metadata.tables[tablename]
+  except KeyError as err:
+    raise ValueError(f"Unknown table: {tablename}") from err
+
+
+def get_where_clause(table: Table, where_cols: Tuple[Tuple[str, bool], ...]):
+  """col = :w_col for each (col, False), col IN :w_col for (col, True)"""
+  conds = []
+  for col, is_list in where_cols:
+    param = bindparam(WHERE_PREFIX + col, expanding=is_list)
+    conds.append(table.c[col].in_(param) if is_list else table.c[col] == param)
+  return and_(*conds)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE)
+def update_statement(tablename: str,
+                     attribs: Tuple[str, ...],
+                     where_cols: Tuple[str, ...] = ('id',)):
+  """UPDATE tablename SET attrib = :attrib ... WHERE col = :w_col ..."""
+  table = get_table(tablename)
+  where = get_where_clause(table, tuple((col, False) for col in where_cols))
+  return table.update().where(where).values(
+      {attr: bindparam(attr) for attr in attribs})
+
+
+@lru_cache(maxsize=STATEMENT_CACHE)
+def insert_statement(tablename: str, attribs: Tuple[str, ...]):
+  """INSERT INTO tablename (attribs) VALUES (:attrib, ...)"""
+  table = get_table(tablename)
+  return table.insert().values({attr: bindparam(attr) for attr in attribs})
+
+
+@lru_cache(maxsize=STATEMENT_CACHE)
+def select_statement(tablename: str,
+                     attribs: Tuple[str, ...],
+                     where_cols: Tuple[Tuple[str, bool], ...] = (),
+                     order_by: Tuple[str, ...] = (),
+                     limit: bool = False):
+  """SELECT attribs FROM tablename WHERE ... [ORDER BY ...] [LIMIT :limit]"""
+  table = get_table(tablename)
+  #raw column values, the same python types a textual select returns
+  query = select([type_coerce(table.c[attr], NullType) for attr in attribs])
+  if where_cols:
+    query = query.where(get_where_clause(table, where_cols))
+  if order_by:
+    query = query.order_by(*[table.c[col] for col in order_by])
+  if limit:
+    query = query.limit(bindparam('limit'))
+  return query
+
+
+def execute(session: DbSession, query: Any, params: Any) -> Any:
+  """Execute one of the cached statements in the session transaction, params
+  is a dict or a list of dicts (executemany). The statement is compiled once"""
+  conn = session.connection().execution_options(compiled_cache=COMPILED_CACHE)
+  return conn.execute(query, params)
+
+
+def update_objs(session: DbSession,
+                objs: Sequence[Any],
+                attribs: Iterable[str],
+                tablename: str,
+                where: Optional[Dict[str, Any]] = None) -> int:
+  """Write the attribs of objs to tablename, matching rows by obj.id or by
+  the where values. One executemany for all objs, does not commit"""
+  attribs = tuple(attribs)
+  if not objs:
+    return 0
+  if where is None:
+    query = update_statement(tablename, attribs)
+  else:
+    query = update_statement(tablename, attribs, tuple(sorted(where)))
+    where_vals = {WHERE_PREFIX + col: val for col, val in where.items()}
+  params = []
+  for obj in objs:
+    vals = {attr: getattr(obj, attr) for attr in attribs}
+    if where is None:
+      vals[WHERE_PREFIX + 'id'] = obj.id
+    else:
+      vals.update(where_vals)
+    params.append(vals)
+  LOGGER.debug('Update %s rows of %s: %s', len(params), tablename, attribs)
+  return execute(session, query,
+                 params if len(params) > 1 else params[0]).rowcount
+
+
+def insert_objs(session: DbSession, objs: Sequence[Any], attribs: Iterable[str],
+                tablename: str) -> int:
+  """Insert the attribs (without id) of objs into tablename. One executemany
+  for all objs, does not commit"""
+  attribs = tuple(attr for attr in attribs if attr != 'id')
+  if not objs:
+    return 0
+  params = [{attr: getattr(obj, attr) for attr in attribs} for obj in objs]
+  LOGGER.debug('Insert %s rows into %s', len(params), tablename)
+  execute(session, insert_statement(tablename, attribs),
+          params if len(params) > 1 else params[0])
+  return len(params)
+
+
+def select_rows(session: DbSession,
+                attribs: Iterable[str],
+                tablename: str,
+                where: Optional[Dict[str, Any]] = None,
+                order_by: Iterable[str] = (),
+                limit: Optional[int] = None) -> Any:
+  """Raw rows of tablename matching where, list, tuple and set values are
+  matched with IN"""
+  attribs = tuple(attribs)
+  where = where if where else {}
+  where_cols = []
+  params: Dict[str, Any] = {}
+  for col, val in sorted(where.items()):
+    is_list = isinstance(val, (list, tuple, set, frozenset))
+    if is_list and not val:
+      return []
+    where_cols.append((col, is_list))
+    params[WHERE_PREFIX + col] = list(val) if is_list else val
+  if limit is not None:
+    params['limit'] = limit
+  query = select_statement(tablename, attribs, tuple(where_cols),
+                           tuple(order_by), limit is not None)
+  return execute(session, query, params).fetchall()
+
+
+def select_objs(session: DbSession,
+                attribs: Iterable[str],
+                tablename: str,
+                where: Optional[Dict[str, Any]] = None,
+                order_by: Iterable[str] = (),
+                limit: Optional[int] = None) -> List[SimpleDict]:
+  """Row object (SimpleDict) per row of tablename matching where, see
+  select_rows"""
+  attribs = tuple(attribs)
+  return db_rows_to_obj(
+      select_rows(session, attribs, tablename, where, order_by, limit), attribs)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2024 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Latency statistics helpers"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable
+
+#number of samples kept for percentile reporting
+STATS_WINDOW = 4096
+
+
+def percentile(samples: Iterable[float], pct: float) -> float:
+  """Return the pct (0-100) percentile of samples, nearest rank"""
+  ordered = sorted(samples)
+  if not ordered:
+    return 0.0
+  rank = -(-pct * len(ordered) // 100)
+  return ordered[int(min(max(rank, 1), len(ordered))) - 1]
+
+
+class LatencyStats():
+  """Thread safe accumulator for latencies measured in seconds"""
+
+  def __init__(self, window: int = STATS_WINDOW):
+    self.lock = threading.Lock()
+    self.samples: deque = deque(maxlen=window)
+    self.count: int = 0
+    self.total: float = 0.0
+    self.max: float = 0.0
+
+  def record(self, elapsed: float) -> None:
+    """Add a latency sample"""
+    with self.lock:
+      self.samples.append(elapsed)
+      self.count += 1
+      self.total += elapsed
+      self.max = max(self.max, elapsed)
+
+  def summary(self) -> Dict[str, Any]:
+    """Return count and latency statistics in milliseconds"""
+    with self.lock:
+      samples = list(self.samples)
+      count = self.count
+      total = self.total
+      max_val = self.max
+
+    return {
+        'count': count,
+        'mean_ms': (total / count) * 1000 if count else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max_val * 1000
+    }
+
+  def export(self) -> Dict[str, Any]:
+    """Picklable copy of the accumulated samples, see merge"""
+    with self.lock:
+      return {
+          'samples': list(self.samples),
+          'count': self.count,
+          'total': self.total,
+          'max': self.max
+      }
+
+  def merge(self, state: Dict[str, Any]) -> None:
+    """Add the samples exported by another accumulator, e.g. from another
+    process"""
+    with self.lock:
+      self.samples.extend(state['samples'])
+      self.count += state['count']
+      self.total += state['total']
+      self.max = max(self.max, state['max'])
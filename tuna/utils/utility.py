@@ -27,13 +27,13 @@
 """Utility module for helper functions"""
 
 import os
+from itertools import islice
 from tuna.utils.logger import setup_logger
 from tuna.sql import DbCursor
+from tuna.utils.ref_cache import get_ref_cache
 
 LOGGER = setup_logger('utility')
 
-QTS_LIST = {}
-
 
 def arch2targetid(arch):
   """ Convert arch to target ID """
@@ -65,30 +65,40 @@ def split_packets(elements, pack_sz=1000):
   return all_packs
 
 
+def iter_packets(elements, pack_sz=1000):
+  """yield packets of elements as they are consumed, unlike split_packets the
+  elements are never all held in memory"""
+  elements = iter(elements)
+  while True:
+    pack = list(islice(elements, pack_sz))
+    if not pack:
+      return
+    yield pack
+
+
+def load_machine_ips():
+  """map of machine remarks, hostname and local_ip to the machine's local_ip"""
+  ip_map = {}
+  with DbCursor() as cur:
+    cur.execute("SELECT remarks, hostname, local_ip FROM machine;")
+    for remarks, hostname, local_ip in cur.fetchall():
+      for key in (remarks, hostname, local_ip):
+        if key and key not in ip_map:
+          ip_map[key] = local_ip
+  return ip_map
+
+
 def check_qts(hostname, logger=LOGGER):
   """find if hostname string has a local ip in qts"""
-  if hostname in QTS_LIST:
-    return QTS_LIST[hostname]
   if hostname.startswith('192.168'):
-    QTS_LIST[hostname] = True
     return True
 
-  inner_qts = False
-  with DbCursor() as cur:
-    # pylint: disable=consider-using-f-string
-    query = "SELECT local_ip FROM machine WHERE remarks='{0}' OR hostname='{0}'"\
-            " OR local_ip='{0}';".format(hostname)
-    cur.execute(query)
-    res = cur.fetchall()
-
-    if res:
-      local_ip = res[0][0]
-      logger.info('local ip = %s', local_ip)
-      if local_ip:
-        inner_qts = True
+  local_ip = get_ref_cache().get('machine', load_machine_ips).get(hostname)
+  if local_ip:
+    logger.info('local ip = %s', local_ip)
+  inner_qts = bool(local_ip)
 
   logger.info('inner_qts = %s', inner_qts)
-  QTS_LIST[hostname] = inner_qts
   return inner_qts
 
 
@@ -157,27 +167,28 @@ class SimpleDict:
 
   def to_dict(self, ommit_ts=True, ommit_valid=False):
     """return dict copy of object"""
-    ret = {}
-    for key, val in vars(self).items():
-      ret[key] = val
-
-    exclude_cols = [
-        '_sa_instance_state', 'md5', 'valid', 'input_tensor', 'weight_tensor'
-    ]
-    if not ommit_valid:
-      exclude_cols.remove('valid')
-
-    for col in exclude_cols:
-      if col in ret:
-        ret.pop(col)
-
-    if ommit_ts:
-      if 'update_ts' in ret:
-        ret.pop('update_ts')
-      if 'insert_ts' in ret:
-        ret.pop('insert_ts')
-
-    return ret
+    return filter_row_dict(dict(vars(self)), ommit_ts, ommit_valid)
+
+
+def filter_row_dict(ret, ommit_ts=True, ommit_valid=False):
+  """drop the columns SimpleDict.to_dict leaves out from the dict ret"""
+  exclude_cols = [
+      '_sa_instance_state', 'md5', 'valid', 'input_tensor', 'weight_tensor'
+  ]
+  if not ommit_valid:
+    exclude_cols.remove('valid')
+
+  for col in exclude_cols:
+    if col in ret:
+      ret.pop(col)
+
+  if ommit_ts:
+    if 'update_ts' in ret:
+      ret.pop('update_ts')
+    if 'insert_ts' in ret:
+      ret.pop('insert_ts')
+
+  return ret
 
 
 def serialize_job_config_row(elem):
@@ -37,10 +37,7 @@ import logging
 import os
 from datetime import datetime
 import socket
-import random
-import string
 from io import StringIO
-from time import sleep
 from typing import List, Tuple, Union, Set, Optional, Any, Dict
 from sqlalchemy.exc import IntegrityError, OperationalError, NoInspectionAvailable
 from sqlalchemy.inspection import inspect
@@ -49,14 +46,26 @@ from tuna.dbBase.sql_alchemy import DbSession
 from tuna.machine import Machine
 
 from tuna.abort import chk_abort_file
-from tuna.utils.metadata import TUNA_LOG_DIR, NUM_SQL_RETRIES, MAX_JOB_RETRIES, LOG_TIMEOUT
+from tuna.utils.metadata import TUNA_LOG_DIR, MAX_JOB_RETRIES, LOG_TIMEOUT
 from tuna.tables_interface import DBTablesInterface
-from tuna.utils.db_utility import session_retry
-from tuna.utils.db_utility import gen_select_objs, gen_update_query, has_attr_set, connect_db
+from tuna.utils.db_utility import DB_RETRY, get_db_key, session_retry
+from tuna.utils.db_utility import gen_select_objs, has_attr_set, connect_db
+from tuna.utils.statements import update_objs
+from tuna.utils.job_state import JobStateService
+from tuna.utils.metrics import JOBS_CLAIMED, WORKER_STEP_TIME
 from tuna.connection import Connection
 from tuna.utils.utility import SimpleDict
 from tuna.utils.logger import set_usr_logger
 from tuna.db.tuna_tables import JobMixin
+from tuna.utils.retry import DEADLOCK, RETRYABLE, RetryPolicy
+from tuna.utils.retry import classify_any, classify_db_error
+
+#reruns of a command failing with a disk I/O error, e.g. on a busy fdb
+DISK_IO_RETRY = RetryPolicy('disk_io',
+                            max_attempts=MAX_JOB_RETRIES,
+                            base=1.0,
+                            cap=10.0,
+                            classify=classify_any)
 
 
 class WorkerInterface(Process):
@@ -255,12 +264,12 @@ class WorkerInterface(Process):
     """Interface function to get new job for builder/evaluator"""
     job_rows: List[Tuple[SimpleDict, ...]]
     job_tables: List[SimpleDict]
-    job_set_attr: List[str]
     session: DbSession
     ids: list
     row: SimpleDict
 
-    for idx in range(NUM_SQL_RETRIES):
+    retry = DB_RETRY.start(get_db_key())
+    while retry.allow():
       try:
         with self.job_queue_lock:
           if self.job_queue.empty():
@@ -279,13 +288,12 @@ class WorkerInterface(Process):
               self.logger.info("%s jobs %s", find_state, ids)
               for job in job_tables:
                 job.state = set_state
-
-                job_set_attr = ['state']
-                query: str = gen_update_query(job, job_set_attr,
-                                              self.dbt.job_table.__tablename__)
-                session.execute(query)
+              update_objs(session, job_tables, ['state'],
+                          self.dbt.job_table.__tablename__)
 
               session.commit()
+              JOBS_CLAIMED.labels(self.dbt.job_table.__tablename__).inc(
+                  len(job_tables))
               self.job_queue_push(job_rows)
 
           #also in job_queue_lock
@@ -297,19 +305,25 @@ class WorkerInterface(Process):
       except OperationalError as error:
         session.rollback()
         self.logger.warning('%s, Db contention, sleeping ...', error)
-        sleep(random.randint(1, 30))
+        if not retry.failed(classify_db_error(error), error):
+          break
       except IntegrityError as error:
         session.rollback()
         self.logger.warning(
             'Attempt %s to update job (host = %s, worker = %s) failed (%s), retrying ... ',
-            idx, self.hostname, self.gpu_id, error)
-        sleep(5)
-      except queue.Empty:
+            retry.attempt, self.hostname, self.gpu_id, error)
+        #another worker claimed the same jobs
+        if not retry.failed(DEADLOCK, error):
+          break
+      except queue.Empty as error:
         self.logger.warning('Shared job queue empty, retrying ... ')
+        #the other workers of this host drained the queue first
+        if not retry.failed(DEADLOCK, error):
+          break
 
     self.logger.error(
         '%s retries exhausted to update job status (host = %s, worker = %s), exiting ... ',
-        NUM_SQL_RETRIES, self.hostname, self.gpu_id)
+        retry.attempt, self.hostname, self.gpu_id)
     return False
 
   def set_job(self, job: JobMixin):
@@ -324,33 +338,15 @@ class WorkerInterface(Process):
                     increment_retries: bool = False,
                     result: Union[str, None] = None) -> None:
     """Interface function to update job state for builder/evaluator"""
-    job_set_attr: List[str]
-
     self.logger.info('Setting job id %s state to %s', self.job.id, state)
+    job_states = JobStateService(self.dbt.job_table.__tablename__,
+                                 flush_size=1,
+                                 logger=self.logger)
+    job_states.set_state(self.job, state, increment_retries, result)
     with DbSession() as session:
-      job_set_attr = ['state', 'gpu_id']
-      self.job.state = state
-      if result:
-        job_set_attr.append('result')
-        self.job.result = result
-      if increment_retries:
-        job_set_attr.append('retries')
-        self.job.retries += 1
-
-      if '_start' in state:
-        job_set_attr.append('cache_loc')
-        cache: str = '~/.cache/miopen_'
-        blurr: str = ''.join(
-            random.choice(string.ascii_lowercase) for i in range(10))
-        cache_loc: str = cache + blurr
-        self.job.cache_loc = cache_loc
-
-      query: str = gen_update_query(self.job, job_set_attr,
-                                    self.dbt.job_table.__tablename__)
 
       def callback() -> bool:
-        session.execute(query)
-        session.commit()
+        job_states.flush(session)
         return True
 
       assert session_retry(session, callback, lambda x: x(), self.logger)
@@ -452,7 +448,8 @@ class WorkerInterface(Process):
           self.logger.warning('Used space overflow detected')
           return False  #type: ignore
         # the step member is defined in the derived class
-        ret = self.step()
+        with WORKER_STEP_TIME.labels(type(self).__name__, self.gpu_id).time():
+          ret = self.step()
         self.logger.info("proc %s step %s", self.gpu_id, ret)
         return ret  #type: ignore
     except KeyboardInterrupt as err:
@@ -466,7 +463,8 @@ class WorkerInterface(Process):
     ret_code: int
     out: str
     err: StringIO
-    for i in range(MAX_JOB_RETRIES):
+    retry = DISK_IO_RETRY.start()
+    while True:
       ret_code, out, err = self.exec_docker_cmd(cmd)
 
       if ret_code != 0:
@@ -475,8 +473,9 @@ class WorkerInterface(Process):
           err_str: str = err.read()
           self.logger.error('%s : %s', ret_code, err_str)
           if "disk I/O error" in err_str:
-            self.logger.error('fin retry : %u', i)
-            sleep(random.randint(1, 10))
+            self.logger.error('fin retry : %u', retry.attempt)
+            if not retry.failed(RETRYABLE):
+              break
           else:
             break
         else:
@@ -569,6 +569,31 @@ def pytestSuite1() {
            sh "python3 -m coverage run -a -m pytest tests/test_importconfigs.py -s"
            sh "python3 -m coverage run -a -m pytest tests/test_machine.py -s"
            sh "python3 -m coverage run -a -m pytest tests/test_dbBase.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_db_engine.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_job_claim.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_result_collector.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_enqueue.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_fdb_writer.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_stream_merge.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_config_importer.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_ssh_pool.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_blob_store.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_pipeline_bench.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_fdb_export.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_kdb_writer.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_delta_export.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_result_ingest.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_job_configs.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_sql_profiler.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_statements.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_rows.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_context_codec.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_ref_cache.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_metrics.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_enqueue_scheduler.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_job_state.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_job_lease.py -s"
+           sh "python3 -m coverage run -a -m pytest tests/test_retry.py -s"
            sh "python3 -m coverage run -a -m pytest tests/test_driver.py -s"
            sh "python3 -m coverage run -a -m pytest tests/test_fin_class.py -s"
            sh "python3 -m coverage run -a -m pytest tests/test_fin_utils.py -s"